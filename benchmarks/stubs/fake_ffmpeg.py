@@ -0,0 +1,46 @@
+"""
+Stand-in for the ``ffmpeg`` executable used by the benchmark suite.
+
+It answers the capability probes of ``Toolchain`` (``-version``, ``-encoders``
+and ``-muxers``). Conversions sleep for ``FAKE_FFMPEG_LATENCY`` seconds and
+copy the input file to the output file.
+"""
+
+import os
+import shutil
+import sys
+import time
+
+ENCODERS = """Encoders:
+ ------
+ A..... libmp3lame           libmp3lame MP3 (MPEG audio layer 3)
+ A..... aac                  AAC (Advanced Audio Coding)
+ V..... libx264              libx264 H.264 / AVC / MPEG-4 AVC / MPEG-4 part 10
+"""
+
+MUXERS = """File formats:
+ --
+  E  matroska        Matroska
+  E  mp3             MP3 (MPEG audio layer 3)
+  E  mp4             MP4 (MPEG-4 Part 14)
+"""
+
+
+def main(args):
+    if '-version' in args:
+        print("ffmpeg version 6.1-stub Copyright (c) 2000-2023 the FFmpeg developers")
+        return 0
+    if '-encoders' in args:
+        sys.stdout.write(ENCODERS)
+        return 0
+    if '-muxers' in args:
+        sys.stdout.write(MUXERS)
+        return 0
+    time.sleep(float(os.environ.get('FAKE_FFMPEG_LATENCY', '0')))
+    source = args[args.index('-i') + 1]
+    shutil.copyfile(source, args[-1])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
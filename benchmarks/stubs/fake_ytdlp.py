@@ -0,0 +1,116 @@
+"""
+Stand-in for the ``yt-dlp`` executable used by the benchmark suite.
+
+It understands the options ``build_command`` and ``SubprocessEngine`` pass.
+It sleeps for ``FAKE_YTDLP_LATENCY`` seconds to simulate extraction (skipped
+with ``--load-info-json``), downloads the URL's ``/media`` resource from the
+local media server and writes it to the ``-o`` template, plus the info JSON
+when ``--write-info-json`` is given. ``--extract-audio`` runs ``ffmpeg`` on
+the downloaded file, like yt-dlp's post-processor does. ``--print-to-file``
+writes its ``before_dl`` or ``after_move`` template, filled with the fields of
+the URL and the final ``filepath``, to the given file. ``--flat-playlist -J``
+prints the playlist JSON served by the media server, and ``-j`` prints the
+info of a single format without downloading.
+
+Failed requests exit with status 1 and an ``ERROR:`` line, like yt-dlp.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def _option(args, name, default=None):
+    """Return the value following the first occurrence of ``name``."""
+    for index, arg in enumerate(args[:-1]):
+        if arg == name:
+            return args[index + 1]
+    return default
+
+
+def _output_template(args, kind=None):
+    """Return the ``-o`` template of ``kind`` (e.g. ``'infojson'``), or the media template."""
+    for index, arg in enumerate(args[:-1]):
+        if arg != '-o':
+            continue
+        template = args[index + 1]
+        typed = re.match(r'^(\w+):(.*)$', template)
+        if kind is None and not typed:
+            return template
+        if kind is not None and typed and typed.group(1) == kind:
+            return typed.group(2)
+    return None if kind else '%(title)s.%(ext)s'
+
+
+def _fill(template, fields):
+    filled = re.sub(r'(?<!%)%\((\w+)\)[sS]', lambda match: str(fields.get(match.group(1), 'NA')), template)
+    return filled.replace('%%', '%')
+
+
+def _print_to_file(args, stage, fields):
+    """Write the ``--print-to-file`` templates of ``stage`` to their files."""
+    for index, arg in enumerate(args[:-2]):
+        if arg == '--print-to-file' and args[index + 1].startswith(f'{stage}:'):
+            with open(args[index + 2], 'a', encoding='utf-8') as f:
+                f.write(_fill(args[index + 1].split(':', 1)[1], fields) + '\n')
+
+
+def _fetch(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
+
+
+def main(args):
+    info_file = _option(args, '--load-info-json')
+    if info_file:
+        with open(info_file, encoding='utf-8') as f:
+            url = json.load(f)['webpage_url']
+    else:
+        url = next(arg for arg in args if re.match(r'^https?://', arg))
+        time.sleep(float(os.environ.get('FAKE_YTDLP_LATENCY', '0')))
+    try:
+        if '-J' in args:
+            sys.stdout.write(_fetch(url).decode('utf-8'))
+            return 0
+        media_id = url.rstrip('/').rsplit('/', 1)[-1]
+        audio = '--extract-audio' in args
+        ext = _option(args, '--merge-output-format', 'mp4')
+        fields = {'id': media_id, 'title': media_id, 'ext': ext, 'extractor': 'generic', 'format_id': 'media'}
+        if '-j' in args:
+            json.dump({**fields, 'webpage_url': url, 'formats': [{'format_id': 'media', 'ext': ext}]}, sys.stdout)
+            sys.stdout.write('\n')
+            return 0
+        path = _fill(_output_template(args), fields)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with urllib.request.urlopen(url.rstrip('/') + '/media', timeout=30) as response, \
+                open(path + '.part', 'wb') as f:
+            shutil.copyfileobj(response, f, 1024 * 1024)
+        os.replace(path + '.part', path)
+        info_template = _output_template(args, 'infojson')
+        if '--write-info-json' in args and info_template:
+            with open(_fill(info_template, fields) + '.info.json', 'w', encoding='utf-8') as f:
+                json.dump({**fields, 'webpage_url': url, 'original_url': url}, f)
+    except (urllib.error.URLError, OSError) as e:
+        sys.stderr.write(f"ERROR: [generic] {url}: {e}\n")
+        return 1
+    _print_to_file(args, 'before_dl', fields)
+    if audio:
+        target = os.path.splitext(path)[0] + '.' + _option(args, '--audio-format', 'mp3')
+        completed = subprocess.run(['ffmpeg', '-y', '-i', path, '-vn', target], check=False)
+        if completed.returncode:
+            sys.stderr.write(f"ERROR: Postprocessing: ffmpeg exited with {completed.returncode}\n")
+            return 1
+        os.remove(path)
+        path = target
+    _print_to_file(args, 'after_move', {**fields, 'filepath': os.path.abspath(path)})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
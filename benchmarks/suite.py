@@ -0,0 +1,352 @@
+"""
+Offline benchmark suite for the download pipeline.
+
+Every scenario runs ``VideoDownloader.download_video()`` with the subprocess
+engine against stand-ins for ``yt-dlp`` and ``ffmpeg`` (see ``benchmarks/stubs``)
+that download synthetic media from a local HTTP server. Nothing leaves the
+machine, so results are comparable between commits and machines with the same
+hardware.
+
+Scenarios:
+    single: one URL.
+    batch-100: 100 URLs given as a list.
+    batch-10k: 10,000 URLs streamed from a TXT file.
+    playlist: a playlist of 50 entries, fanned out into per-entry jobs.
+    audio: 20 URLs with audio extraction through ``ffmpeg``.
+    audio-pipeline: the ``audio`` scenario with staged post-processing, where
+        ``ffmpeg`` runs in its own worker pool while the next URLs are fetched.
+    network-drop: the connection is reported offline for 0.5 s when the batch
+        starts and the first request of every playlist entry fails, so every
+        entry recovers through a retry.
+
+Besides the scenarios, the startup time of the application is measured in
+fresh interpreters.
+
+Usage:
+    python -m benchmarks.suite [--output results.json] [--scenarios single playlist]
+    python -m benchmarks.suite --output new.json --compare old.json [--tolerance 0.1]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUBS = {'yt-dlp': 'fake_ytdlp.py', 'ffmpeg': 'fake_ffmpeg.py'}
+
+
+@dataclass
+class Scenario:
+    """Parameters of a benchmark scenario.
+
+    Attributes:
+        name (str): Scenario name used in the results.
+        urls (int): Number of URLs, or of playlist entries when ``playlist`` is set.
+        jobs (int): Concurrent downloads.
+        mode (str): ``VideoDownloader`` mode, ``'Video'`` or ``'Audio only'``.
+        playlist (bool): Download one playlist with ``urls`` entries.
+        from_file (bool): Read the URLs from a TXT file instead of a list.
+        media_size (int): Bytes served per media file.
+        latency (float): Seconds the fake yt-dlp spends "extracting" each URL.
+        ffmpeg_latency (float): Seconds the fake ffmpeg spends per conversion.
+        offline (float): Seconds the connection is reported offline when the batch starts.
+        fail_first (bool): Fail the first media request of every URL.
+        pipeline (bool): Run FFmpeg in the staged post-processing pipeline.
+    """
+
+    name: str
+    urls: int
+    jobs: int = 8
+    mode: str = 'Video'
+    playlist: bool = False
+    from_file: bool = False
+    media_size: int = 256 * 1024
+    latency: float = 0.02
+    ffmpeg_latency: float = 0.0
+    offline: float = 0.0
+    fail_first: bool = False
+    pipeline: bool = False
+
+
+SCENARIOS = [
+    Scenario('single', 1, jobs=1),
+    Scenario('batch-100', 100),
+    Scenario('batch-10k', 10_000, jobs=16, from_file=True, media_size=16 * 1024, latency=0.0),
+    Scenario('playlist', 50, playlist=True),
+    Scenario('audio', 20, mode='Audio only', ffmpeg_latency=0.05),
+    Scenario('audio-pipeline', 20, mode='Audio only', ffmpeg_latency=0.05, pipeline=True),
+    Scenario('network-drop', 20, playlist=True, offline=0.5, fail_first=True),
+]
+"""SCENARIOS: Scenarios run by default, in order."""
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """Serve synthetic media and playlists.
+
+    Routes:
+        ``/v/<id>/media``: ``media_size`` bytes of media.
+        ``/playlist?list=<id>&n=<count>``: flat playlist JSON with ``count`` entries.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    media_size = 256 * 1024
+    fail_first = False
+    _failed: set = set()
+    _lock = threading.Lock()
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        parts = urlsplit(self.path)
+        base = f'http://{self.headers["Host"]}'
+        if parts.path == '/playlist':
+            query = parse_qs(parts.query)
+            count = int(query.get('n', ['10'])[0])
+            playlist_id = query.get('list', ['PL'])[0]
+            entries = [{'_type': 'url', 'url': f'{base}/v/{playlist_id}-{index}', 'title': f'Entry {index}'}
+                       for index in range(1, count + 1)]
+            body = json.dumps({'_type': 'playlist', 'id': playlist_id, 'title': playlist_id, 'entries': entries})
+            self._reply(200, body.encode(), 'application/json')
+            return
+        match = re.fullmatch(r'/v/([\w-]+)/media', parts.path)
+        if not match:
+            self._reply(404, b'not found', 'text/plain')
+            return
+        if self.fail_first:
+            with self._lock:
+                first = match.group(1) not in self._failed
+                self._failed.add(match.group(1))
+            if first:
+                self._reply(503, b'unavailable', 'text/plain')
+                return
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(self.media_size))
+        self.end_headers()
+        chunk = b'\0' * 65536
+        remaining = self.media_size
+        while remaining > 0:
+            self.wfile.write(chunk[:remaining])
+            remaining -= len(chunk)
+
+
+def install_stubs(bin_dir: str) -> None:
+    """Install the fake ``yt-dlp`` and ``ffmpeg`` executables into ``bin_dir``."""
+    for name, script in STUBS.items():
+        with open(os.path.join(ROOT, 'benchmarks', 'stubs', script), encoding='utf-8') as f:
+            source = f.read()
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'#!{sys.executable} -S\n{source}')
+        os.chmod(path, 0o755)
+
+
+def _configure(workdir: str, scenario: Scenario) -> None:
+    """Point the application's configuration and singletons at ``workdir``."""
+    from src.config import app_config
+    from src.decorators import connected, ffmpeg
+    from src.utils import metrics, rate_limit
+
+    app_config.download_engine = 'subprocess'
+    app_config.archive_path = os.path.join(workdir, 'archive.sqlite3')
+    app_config.metadata_cache_dir = os.path.join(workdir, 'metadata')
+    app_config.toolchain_cache_path = os.path.join(workdir, 'toolchain.json')
+    app_config.download_retries = 1
+    app_config.retry_base_delay = 0.2
+    app_config.staged_postprocessing = scenario.pipeline
+    ffmpeg.reset_toolchain()
+    rate_limit._limiter = None  # pylint: disable=protected-access
+    metrics._exporter = None  # pylint: disable=protected-access
+    online_at = time.monotonic() + scenario.offline
+    connected._monitor = connected.ConnectivityMonitor(  # pylint: disable=protected-access
+        probe=lambda: time.monotonic() >= online_at, ttl=0.05, retry_interval=0.05)
+    MediaHandler.media_size = scenario.media_size
+    MediaHandler.fail_first = scenario.fail_first
+    MediaHandler._failed = set()  # pylint: disable=protected-access
+    os.environ['FAKE_YTDLP_LATENCY'] = str(scenario.latency)
+    os.environ['FAKE_FFMPEG_LATENCY'] = str(scenario.ffmpeg_latency)
+
+
+def run_scenario(scenario: Scenario, base_url: str, workdir: str) -> Dict[str, object]:
+    """Run ``scenario`` against the media server at ``base_url``.
+
+    Returns:
+        Dict[str, object]: Wall and CPU time, throughput, per-URL overhead and result counts.
+    """
+    from src.classes.video_downloader import VideoDownloader
+    from src.utils.link_reader import LinkStream
+
+    _configure(workdir, scenario)
+    folder = os.path.join(workdir, 'downloads')
+    if scenario.playlist:
+        urls = [f'{base_url}/playlist?list=PL{scenario.name.replace("-", "")}&n={scenario.urls}']
+    else:
+        urls = [f'{base_url}/v/{scenario.name}-{index}' for index in range(scenario.urls)]
+    source = None
+    if scenario.from_file:
+        source = os.path.join(workdir, 'links.txt')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(urls) + '\n')
+
+    started, cpu_started = time.monotonic(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        downloader = VideoDownloader.from_options(
+            LinkStream(source) if source else urls, mode=scenario.mode, download_folder=folder,
+            jobs=scenario.jobs, playlist_folder='playlist' if scenario.playlist else None)
+        if source:
+            downloader.source_file = source
+        results = downloader.download_video() or []
+    elapsed, cpu = time.monotonic() - started, time.process_time() - cpu_started
+
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    fixed = scenario.latency + scenario.ffmpeg_latency
+    per_worker = elapsed * min(scenario.jobs, max(1, len(results))) / max(1, len(results))
+    return {
+        'urls': len(results),
+        'jobs': scenario.jobs,
+        'elapsed_s': round(elapsed, 3),
+        'cpu_s': round(cpu, 3),
+        'urls_per_s': round(len(results) / elapsed, 2) if elapsed else None,
+        'overhead_ms_per_url': round(max(0.0, per_worker - fixed) * 1000, 2),
+        'counts': counts,
+    }
+
+
+def measure_startup(repeat: int = 5) -> Dict[str, float]:
+    """Measure the median startup time of the application in fresh interpreters.
+
+    Returns:
+        Dict[str, float]: Seconds to import ``VideoDownloader`` and to run ``main.py --help``.
+    """
+    commands = {
+        'import_s': [sys.executable, '-c', 'import src.classes.video_downloader'],
+        'cli_help_s': [sys.executable, 'main.py', 'download', '--help'],
+    }
+    timings = {}
+    for name, cmd in commands.items():
+        samples = []
+        for _ in range(repeat):
+            started = time.monotonic()
+            subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True)
+            samples.append(time.monotonic() - started)
+        timings[name] = round(statistics.median(samples), 4)
+    return timings
+
+
+def compare(base: Dict, current: Dict, tolerance: float) -> List[str]:
+    """Compare two result files and return the regressions.
+
+    A scenario regresses when its wall time or per-URL overhead grew by more
+    than ``tolerance`` (a fraction), or when it has fewer successful downloads.
+    """
+    regressions = []
+    print(f"{'scenario':<16}{'base s':>10}{'new s':>10}{'change':>9}")
+    for name, new in current['scenarios'].items():
+        old = base.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        change = (new['elapsed_s'] - old['elapsed_s']) / old['elapsed_s'] if old['elapsed_s'] else 0.0
+        print(f"{name:<16}{old['elapsed_s']:>10.3f}{new['elapsed_s']:>10.3f}{change:>+9.1%}")
+        if change > tolerance:
+            regressions.append(f"{name}: {old['elapsed_s']:.3f}s -> {new['elapsed_s']:.3f}s ({change:+.1%})")
+        if new['counts'].get('done', 0) < old['counts'].get('done', 0):
+            regressions.append(f"{name}: {new['counts'].get('done', 0)} successful downloads, "
+                               f"{old['counts'].get('done', 0)} before")
+    for name, seconds in current.get('startup', {}).items():
+        old = base.get('startup', {}).get(name)
+        if old and (seconds - old) / old > tolerance:
+            regressions.append(f"startup {name}: {old:.3f}s -> {seconds:.3f}s")
+    return regressions
+
+
+def _commit() -> Optional[str]:
+    """Return the current git commit, if available."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the suite, write the JSON results and optionally compare them with a baseline."""
+    names = [scenario.name for scenario in SCENARIOS]
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scenarios', nargs='+', choices=names, default=names)
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Multiply the URL counts, e.g. 0.1 for a quick run.")
+    parser.add_argument('--output', help="JSON file for the results (default: standard output).")
+    parser.add_argument('--compare', metavar='BASELINE', help="Results of an earlier run to compare with.")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Allowed slowdown before --compare fails (default: 0.1).")
+    parser.add_argument('--no-startup', action='store_true', help="Skip the startup measurement.")
+    args = parser.parse_args(argv)
+
+    bin_dir = tempfile.mkdtemp(prefix='streamflow-bench-bin-')
+    install_stubs(bin_dir)
+    os.environ['PATH'] = bin_dir + os.pathsep + os.environ.get('PATH', '')
+    sys.path.insert(0, ROOT)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    results = {'commit': _commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+               'scale': args.scale, 'scenarios': {}}
+    try:
+        for scenario in SCENARIOS:
+            if scenario.name not in args.scenarios:
+                continue
+            scaled = Scenario(**{**asdict(scenario), 'urls': max(1, round(scenario.urls * args.scale))})
+            with tempfile.TemporaryDirectory(prefix='streamflow-bench-') as workdir:
+                results['scenarios'][scenario.name] = run_scenario(scaled, base_url, workdir)
+            print(f"{scenario.name}: {results['scenarios'][scenario.name]}", file=sys.stderr)
+        if not args.no_startup:
+            results['startup'] = measure_startup()
+    finally:
+        server.shutdown()
+        shutil.rmtree(bin_dir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
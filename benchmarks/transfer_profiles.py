@@ -0,0 +1,149 @@
+"""
+Benchmark of the transfer profiles in ``video_settings.transfer_profiles``.
+
+A local HTTP server publishes an HLS stream and a progressive file. Every
+request is answered after a fixed latency and every connection is throttled,
+which is how CDNs typically behave. Each profile downloads both sources with
+the in-process engine, and the throughput is printed per profile.
+
+Usage:
+    python -m benchmarks.transfer_profiles [--fragments 40] [--fragment-size 262144]
+"""
+
+import argparse
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.classes.download_engine import DownloadJob, InProcessEngine
+from src.config import video_settings
+
+
+class ThrottledHandler(BaseHTTPRequestHandler):
+    """Serve ``/stream.m3u8``, ``/fragN.ts`` and ``/file.mp4`` with latency and a per-connection rate."""
+
+    protocol_version = 'HTTP/1.1'
+    fragments = 40
+    fragment_size = 256 * 1024
+    file_size = 8 * 1024 * 1024
+    latency = 0.05
+    connection_rate = 2 * 1024 * 1024
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _playlist(self) -> bytes:
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:2', '#EXT-X-MEDIA-SEQUENCE:0']
+        for index in range(self.fragments):
+            lines.extend(['#EXTINF:2.0,', f'frag{index}.ts'])
+        lines.append('#EXT-X-ENDLIST')
+        return ('\n'.join(lines) + '\n').encode()
+
+    def _send(self, body_size: int, content_type: str, status: int = 200, extra=None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(body_size))
+        self.send_header('Accept-Ranges', 'bytes')
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _stream(self, size: int) -> None:
+        """Write ``size`` bytes at ``connection_rate``."""
+        chunk = b'\0' * 65536
+        started = time.monotonic()
+        sent = 0
+        while sent < size:
+            part = chunk[:min(len(chunk), size - sent)]
+            try:
+                self.wfile.write(part)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            sent += len(part)
+            ahead = sent / self.connection_rate - (time.monotonic() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def do_HEAD(self) -> None:  # pylint: disable=invalid-name
+        self.do_GET(body=False)
+
+    def do_GET(self, body: bool = True) -> None:  # pylint: disable=invalid-name
+        time.sleep(self.latency)
+        if self.path == '/stream.m3u8':
+            payload = self._playlist()
+            self._send(len(payload), 'application/vnd.apple.mpegurl')
+            if body:
+                self.wfile.write(payload)
+            return
+        if re.fullmatch(r'/frag\d+\.ts', self.path):
+            self._send(self.fragment_size, 'video/mp2t')
+            if body:
+                self._stream(self.fragment_size)
+            return
+        if self.path == '/file.mp4':
+            start, end = 0, self.file_size - 1
+            match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), end)
+                self._send(end - start + 1, 'video/mp4', 206,
+                           {'Content-Range': f'bytes {start}-{end}/{self.file_size}'})
+            else:
+                self._send(self.file_size, 'video/mp4')
+            if body:
+                self._stream(end - start + 1)
+            return
+        self._send(0, 'text/plain', 404)
+
+
+def run_profile(name: str, url: str, folder: str) -> float:
+    """Download ``url`` with the profile ``name`` and return the elapsed seconds."""
+    profile = video_settings.transfer_profiles[name]
+    job = DownloadJob(url=url, output_template=os.path.join(folder, f'{name}-%(id)s.%(ext)s'),
+                      format_selector='best', cookies=None,
+                      concurrent_fragments=profile.concurrent_fragments,
+                      http_chunk_size=profile.http_chunk_size, buffer_size=profile.buffer_size,
+                      external_downloader=profile.external_downloader,
+                      external_downloader_args=list(profile.external_downloader_args))
+    with InProcessEngine() as engine:
+        started = time.monotonic()
+        engine.download(job, capture_output=True)
+        return time.monotonic() - started
+
+
+def main() -> None:
+    """Run the benchmark and print a throughput table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--fragments', type=int, default=ThrottledHandler.fragments)
+    parser.add_argument('--fragment-size', type=int, default=ThrottledHandler.fragment_size)
+    parser.add_argument('--profiles', nargs='+', default=list(video_settings.transfer_profiles))
+    args = parser.parse_args()
+    ThrottledHandler.fragments = args.fragments
+    ThrottledHandler.fragment_size = args.fragment_size
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottledHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    sources = {'HLS': (f'{base}/stream.m3u8', args.fragments * args.fragment_size),
+               'HTTP': (f'{base}/file.mp4', ThrottledHandler.file_size)}
+
+    print(f"{'profile':<12}{'source':<8}{'seconds':>9}{'MiB/s':>9}")
+    try:
+        for name in args.profiles:
+            for source, (url, size) in sources.items():
+                with tempfile.TemporaryDirectory() as folder:
+                    try:
+                        elapsed = run_profile(name, url, folder)
+                    except Exception as e:  # pylint: disable=broad-except
+                        print(f"{name:<12}{source:<8}  failed: {e}")
+                        continue
+                print(f"{name:<12}{source:<8}{elapsed:>9.2f}{size / elapsed / 1024 ** 2:>9.2f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
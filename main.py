@@ -4,13 +4,15 @@ Main script for the Video Downloader application.
 This script initializes the `VideoDownloader` class, prompts the user for download options,
 and handles multiple download requests in a loop. It supports both single video links
 and TXT files containing multiple links, as well as video or audio download modes.
+
+When command line arguments are given, the non-interactive interface from
+``src.utils.cli`` is used instead, for example::
+
+    python main.py download --mode audio --input links.txt --json
 """
 
+import sys
 import time
-import inquirer
-from art import text2art
-from src.classes.video_downloader import VideoDownloader
-from src.utils.console import clear_console
 
 def main() -> None:
     """Run the Video Downloader application.
@@ -18,9 +20,17 @@ def main() -> None:
     Continuously prompts the user for download options and executes downloads
     until the user chooses to exit.
 
+    The prompt and ASCII-art stack is imported here, so the non-interactive
+    interface starts without loading it.
+
     Returns:
         None: This function does not return a value.
     """
+    import inquirer  # pylint: disable=import-outside-toplevel
+    from art import text2art  # pylint: disable=import-outside-toplevel
+    from src.classes.video_downloader import VideoDownloader  # pylint: disable=import-outside-toplevel
+    from src.utils.console import clear_console  # pylint: disable=import-outside-toplevel
+
     clear_console()
     while True:
         print(text2art("StreamFlow"))
@@ -51,4 +61,7 @@ def main() -> None:
         clear_console()
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        from src.utils.cli import run_cli
+        sys.exit(run_cli(sys.argv[1:]))
     main()
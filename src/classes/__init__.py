@@ -4,8 +4,28 @@ This module provides the main class for downloading videos and audio from YouTub
 Modules:
 - `VideoDownloader`: A class to handle downloading videos, audio, playlists, and multiple links
   with support for different quality options, output formats, and network handling.
+- `DownloadScheduler`: A bounded worker pool running several downloads at once.
+- `DownloadResult`: The outcome of a single download job.
+
+The classes are imported on first access, so importing a single module such as
+``src.classes.download_engine`` does not load the whole package.
 """
 
-from .video_downloader import VideoDownloader
+import importlib
+
+_EXPORTS = {
+    'VideoDownloader': '.video_downloader',
+    'DownloadScheduler': '.download_scheduler',
+    'DownloadResult': '.download_scheduler',
+}
+
+__all__ = ['VideoDownloader', 'DownloadScheduler', 'DownloadResult']
+
 
-__all__ = ['VideoDownloader']
+def __getattr__(name: str):
+    """Import an exported class on first access."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,112 @@
+"""
+This module provides a persistent archive of completed downloads.
+
+The archive is a SQLite database keyed by extractor, video ID and the output
+the media was downloaded as (mode, format and target path template), so the
+same video requested as audio, in another format or into another folder is not
+mistaken for a finished download. It is shared across runs and download folders
+and tolerates several processes writing to it at the same time.
+
+Classes:
+    DownloadArchive: Indexed store of media that has already been downloaded.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    extractor TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    output TEXT NOT NULL,
+    url TEXT,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (extractor, video_id, output)
+) WITHOUT ROWID
+"""
+
+
+class DownloadArchive:
+    """Persistent, indexed archive of completed downloads.
+
+    The database runs in WAL mode with a busy timeout, so concurrent readers
+    never block and concurrent writers wait for each other instead of failing.
+
+    Attributes:
+        path (str): Location of the SQLite database.
+
+    Example:
+        ```python
+        archive = DownloadArchive('~/.local/share/streamflow/archive.sqlite3')
+        if not archive.contains('youtube', 'dQw4w9WgXcQ', output):
+            ...
+            archive.add('youtube', 'dQw4w9WgXcQ', url, output)
+        ```
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """Open or create the archive.
+
+        Args:
+            path (str): Location of the SQLite database. Parent folders are created.
+            timeout (float, optional): Seconds to wait for a concurrent writer. Defaults to 30.
+        """
+        self.path = os.path.expanduser(path)
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        columns = {row[1] for row in self._connection.execute('PRAGMA table_info(downloads)')}
+        if columns and 'output' not in columns:
+            # Entries of the first release do not say what was produced; keep them aside unused.
+            self._connection.execute('ALTER TABLE downloads RENAME TO downloads_without_output')
+        self._connection.execute(_SCHEMA)
+
+    def contains(self, extractor: str, video_id: str, output: str = '') -> bool:
+        """Check whether a media item has already been downloaded as ``output``.
+
+        Args:
+            extractor (str): Extractor name, for example ``'youtube'``.
+            video_id (str): Video ID within the extractor.
+            output (str, optional): Description of the requested output, e.g. mode, format
+                and target path template. Defaults to ``''``.
+
+        Returns:
+            bool: True if the item is in the archive with the same output.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT 1 FROM downloads WHERE extractor = ? AND video_id = ? AND output = ?',
+                (extractor, video_id, output)).fetchone()
+        return row is not None
+
+    def add(self, extractor: str, video_id: str, url: Optional[str] = None, output: str = '') -> None:
+        """Record a completed download. Existing entries are kept unchanged.
+
+        Args:
+            extractor (str): Extractor name.
+            video_id (str): Video ID within the extractor.
+            url (Optional[str]): URL the item was downloaded from.
+            output (str, optional): Description of the produced output, see `contains`.
+        """
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR IGNORE INTO downloads (extractor, video_id, output, url, completed_at) '
+                'VALUES (?, ?, ?, ?, ?)', (extractor, video_id, output, url, time.time()))
+
+    def __len__(self) -> int:
+        """Return the number of archived items."""
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM downloads').fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
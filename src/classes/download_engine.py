@@ -0,0 +1,637 @@
+"""
+This module provides the backends that actually run yt-dlp.
+
+Two engines share one job description:
+
+- `SubprocessEngine` starts a ``yt-dlp`` process per job. It works with any
+  yt-dlp installation on ``PATH`` and is always available as a fallback.
+- `InProcessEngine` keeps long-lived ``yt_dlp.YoutubeDL`` instances for the
+  whole batch, so interpreter startup, extractor imports, HTTP connections and
+  cookie parsing are paid once instead of once per URL.
+
+Classes:
+    DownloadJob: Backend-independent description of one download.
+    DownloadEngineError: Raised when a job fails.
+    DownloadEngine: Base class of all engines.
+    SubprocessEngine: Runs ``yt-dlp`` as a subprocess.
+    InProcessEngine: Runs yt-dlp inside the current interpreter.
+
+Functions:
+    build_command: Builds the ``yt-dlp`` command line for a job.
+    build_selection_command: Builds the ``yt-dlp`` command selecting the formats of a staged job.
+    staged_formats: Lists the formats selected for a staged job as separate downloads.
+    save_staged_info: Stores the selected formats of a staged job in its staging directory.
+    staged_name_template: Turns an output template into a template naming the final file.
+    playlist_entries: Extracts the entries of a flat playlist info dictionary.
+    build_ydl_options: Builds the ``YoutubeDL`` options dictionary for a job.
+    create_engine: Creates an engine by name.
+"""
+
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+ENGINES = ('auto', 'inprocess', 'subprocess')
+"""ENGINES: Accepted values of ``app_config.download_engine``."""
+
+STAGED_MEDIA = 'media'
+"""STAGED_MEDIA: Base name of the raw streams in the staging directory of a job."""
+
+STAGED_NAME = 'name'
+"""STAGED_NAME: File in the staging directory of a job holding the final file path."""
+
+STAGED_INFO = 'info.json'
+"""STAGED_INFO: File in the staging directory of a job holding the info of its selected formats."""
+
+STAGED_OUTPUT = f'{STAGED_MEDIA}.f%(format_id)s.%(ext)s'
+"""STAGED_OUTPUT: yt-dlp output template of the raw streams of a staged job."""
+
+
+@dataclass
+class DownloadJob:
+    """Backend-independent description of one download.
+
+    Attributes:
+        url (str): URL to download.
+        output_template (str): yt-dlp output template.
+        format_selector (str): yt-dlp format selector.
+        merge_output_format (Optional[str]): Container for merged video, e.g. ``'mp4'``.
+        extract_audio (bool): Convert the download to an audio file.
+        audio_format (str): Target audio codec when ``extract_audio`` is set. ``'best'`` keeps
+            the source codec and only remuxes the stream.
+        audio_quality (str): Target audio quality when ``extract_audio`` is set.
+        playlist (bool): Allow yt-dlp to download a whole playlist.
+        cookies (str): Netscape cookie file.
+        info_json (Optional[str]): Cached info JSON to start from instead of extracting ``url``.
+        info_template (Optional[str]): yt-dlp ``infojson`` output template; when set, the
+            extracted info is written there for later jobs.
+        rate_limit (Optional[int]): Maximum download rate in bytes per second.
+        concurrent_fragments (int): DASH/HLS fragments downloaded at the same time.
+        http_chunk_size (Optional[int]): Size of the ranges requested for plain HTTP downloads.
+        buffer_size (Optional[int]): Download buffer size in bytes.
+        external_downloader (Optional[str]): External downloader executable, e.g. ``'aria2c'``.
+        external_downloader_args (List[str]): Arguments for the external downloader.
+        stage_dir (Optional[str]): Staging directory. When set, the engine first selects the
+            formats, then yt-dlp fetches each of them into it as a raw stream, unmerged and
+            unconverted, and writes the final path (from ``output_template``) to its ``name``
+            file. Merging and audio conversion are left to `PostprocessPipeline`.
+        staged_formats (Optional[str]): Comma-separated format IDs selected for a staged job,
+            see `staged_formats`. Set by the engine.
+        path_file (Optional[str]): File yt-dlp appends the final path of the downloaded file to.
+            Not used for staged jobs, whose final path is known to `PostprocessPipeline`.
+        publish_dir (Optional[str]): Final folder of a job whose ``output_template`` points into
+            a staging folder; the downloaded file is moved there afterwards. Not passed to yt-dlp.
+    """
+
+    url: str
+    output_template: str
+    format_selector: str
+    merge_output_format: Optional[str] = None
+    extract_audio: bool = False
+    audio_format: str = 'mp3'
+    audio_quality: str = '192'
+    playlist: bool = False
+    cookies: str = 'cookies.txt'
+    info_json: Optional[str] = None
+    info_template: Optional[str] = None
+    rate_limit: Optional[int] = None
+    concurrent_fragments: int = 1
+    http_chunk_size: Optional[int] = None
+    buffer_size: Optional[int] = None
+    external_downloader: Optional[str] = None
+    external_downloader_args: List[str] = field(default_factory=list)
+    stage_dir: Optional[str] = None
+    staged_formats: Optional[str] = None
+    path_file: Optional[str] = None
+    publish_dir: Optional[str] = None
+
+
+class DownloadEngineError(Exception):
+    """Raised when a download job fails.
+
+    Attributes:
+        output (Optional[str]): Output collected from yt-dlp before the failure.
+    """
+
+    def __init__(self, message: str, output: Optional[str] = None):
+        super().__init__(message)
+        self.output = output
+
+
+def build_command(job: DownloadJob) -> List[str]:
+    """Build the ``yt-dlp`` command line for a job.
+
+    Args:
+        job (DownloadJob): Job to run.
+
+    Staged jobs need ``staged_formats`` and the info saved by `save_staged_info`.
+
+    Returns:
+        List[str]: Command suitable for ``subprocess.run``.
+    """
+    if job.stage_dir:
+        cmd = ['yt-dlp', '--cookies', job.cookies, '-o', os.path.join(job.stage_dir, STAGED_OUTPUT),
+               '--load-info-json', os.path.join(job.stage_dir, STAGED_INFO), '-f', job.staged_formats,
+               '--continue', '--fixup', 'never', '--no-post-overwrites', '-k',
+               '--print-to-file', f'before_dl:{staged_name_template(job.output_template)}',
+               os.path.join(job.stage_dir, STAGED_NAME)]
+    else:
+        source = ['--load-info-json', job.info_json] if job.info_json else [job.url]
+        cmd = ['yt-dlp', '--cookies', job.cookies, '-o', job.output_template, *source, '-f', job.format_selector,
+               '--continue']
+        if job.merge_output_format:
+            cmd.extend(['--merge-output-format', job.merge_output_format])
+        if job.extract_audio:
+            cmd.extend(['--extract-audio', '--audio-format', job.audio_format,
+                        '--audio-quality', job.audio_quality])
+        if job.path_file:
+            cmd.extend(['--print-to-file', 'after_move:%(filepath)s', job.path_file])
+    if not job.playlist:
+        cmd.append('--no-playlist')
+    if job.rate_limit:
+        cmd.extend(['--limit-rate', str(job.rate_limit)])
+    if job.concurrent_fragments > 1:
+        cmd.extend(['--concurrent-fragments', str(job.concurrent_fragments)])
+    if job.http_chunk_size:
+        cmd.extend(['--http-chunk-size', str(job.http_chunk_size)])
+    if job.buffer_size:
+        cmd.extend(['--buffer-size', str(job.buffer_size)])
+    if job.external_downloader:
+        cmd.extend(['--downloader', job.external_downloader])
+        if job.external_downloader_args:
+            cmd.extend(['--downloader-args',
+                        f'{job.external_downloader}:{shlex.join(job.external_downloader_args)}'])
+    if job.info_template:
+        cmd.extend(['--write-info-json', '--no-write-playlist-metafiles', '-o', f'infojson:{job.info_template}'])
+    return cmd
+
+
+def build_selection_command(job: DownloadJob) -> List[str]:
+    """Build the ``yt-dlp`` command printing the info of the formats a staged job selects.
+
+    Args:
+        job (DownloadJob): Staged job.
+
+    Returns:
+        List[str]: Command whose standard output is the info JSON of the selection.
+    """
+    source = ['--load-info-json', job.info_json] if job.info_json else [job.url]
+    return ['yt-dlp', '--cookies', job.cookies, *source, '-f', job.format_selector, '--no-playlist', '-j']
+
+
+def staged_formats(info: Dict) -> str:
+    """Return a selector fetching the formats selected in ``info`` as separate files.
+
+    yt-dlp merges the streams of a ``video+audio`` selection as soon as both are
+    downloaded. Listing their IDs with commas fetches each one to its own file
+    instead, with every other step of yt-dlp, such as HLS and DASH downloads
+    through FFmpeg, left intact.
+
+    Args:
+        info (Dict): Info of a processed video, e.g. printed by ``yt-dlp -j``.
+
+    Returns:
+        str: Format IDs, e.g. ``'137,140'``.
+
+    Raises:
+        DownloadEngineError: If no format was selected.
+    """
+    formats = info.get('requested_formats') or [info]
+    if not all(fmt.get('format_id') for fmt in formats):
+        raise DownloadEngineError(f"No format was selected for {info.get('webpage_url') or info.get('id')}")
+    return ','.join(str(fmt['format_id']) for fmt in formats)
+
+
+def save_staged_info(job: DownloadJob, info: Dict) -> None:
+    """Store the info of the selected formats in the staging directory and set ``staged_formats``.
+
+    Args:
+        job (DownloadJob): Staged job.
+        info (Dict): Sanitized info of the processed video.
+
+    Raises:
+        DownloadEngineError: If no format was selected.
+    """
+    job.staged_formats = staged_formats(info)
+    os.makedirs(job.stage_dir, exist_ok=True)
+    with open(os.path.join(job.stage_dir, STAGED_INFO), 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+
+
+def staged_name_template(template: str) -> str:
+    """Turn a yt-dlp output template into a ``--print`` template of the final file path.
+
+    Fields are sanitized like in filenames (``%(title)S``) and ``%(ext)s`` is kept
+    as a literal placeholder, because the extension is only known after post-processing.
+
+    Args:
+        template (str): yt-dlp output template, e.g. ``'/downloads/%(title)s.%(ext)s'``.
+
+    Returns:
+        str: Print template, e.g. ``'/downloads/%(title)S.%%(ext)s'``.
+    """
+    escaped = re.sub(r'%(?!\()', '%%', template)
+    return re.sub(r'%\((\w+)\)s', lambda match: '%%(ext)s' if match.group(1) == 'ext' else f'%({match.group(1)})S',
+                  escaped)
+
+
+def build_ydl_options(job: DownloadJob) -> Dict:
+    """Build the ``YoutubeDL`` options equivalent to ``build_command(job)``.
+
+    Args:
+        job (DownloadJob): Job to run.
+
+    Returns:
+        Dict: Options for ``yt_dlp.YoutubeDL``.
+    """
+    options = {
+        'cookiefile': job.cookies,
+        'outtmpl': {'default': (os.path.join(job.stage_dir, STAGED_OUTPUT) if job.stage_dir
+                                else job.output_template)},
+        'format': job.staged_formats if job.stage_dir else job.format_selector,
+        'noplaylist': not job.playlist,
+        'continuedl': True,
+        'writeinfojson': bool(job.info_template),
+        'allow_playlist_files': False,
+        'ratelimit': job.rate_limit,
+        'concurrent_fragment_downloads': job.concurrent_fragments,
+        'http_chunk_size': job.http_chunk_size,
+        'buffersize': job.buffer_size or 1024,
+        'external_downloader': {'default': job.external_downloader} if job.external_downloader else None,
+        'external_downloader_args': ({job.external_downloader: list(job.external_downloader_args)}
+                                     if job.external_downloader else None),
+    }
+    if job.info_template:
+        options['outtmpl']['infojson'] = job.info_template
+    if job.stage_dir:
+        options['fixup'] = 'never'
+        options['nopostoverwrites'] = True
+        options['keepvideo'] = True
+        options['print_to_file'] = {'before_dl': [(staged_name_template(job.output_template),
+                                                   os.path.join(job.stage_dir, STAGED_NAME))]}
+        return options
+    if job.merge_output_format:
+        options['merge_output_format'] = job.merge_output_format
+    if job.extract_audio:
+        if job.audio_format != 'best':
+            options['final_ext'] = job.audio_format
+        options['postprocessors'] = [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': job.audio_format,
+            'preferredquality': job.audio_quality,
+        }]
+    if job.path_file:
+        options['print_to_file'] = {'after_move': [('%(filepath)s', job.path_file)]}
+    return options
+
+
+def playlist_entries(info: Dict) -> List[Dict]:
+    """Return the entries of a flat-extracted playlist.
+
+    Args:
+        info (Dict): Info dictionary produced with ``extract_flat``.
+
+    Returns:
+        List[Dict]: ``{'index', 'url', 'title', 'duration'}`` per available entry, numbered from 1
+        in playlist order. Unavailable entries keep their number but are left out.
+    """
+    entries = []
+    for index, entry in enumerate(info.get('entries') or [], start=1):
+        url = (entry or {}).get('url') or (entry or {}).get('webpage_url')
+        if url:
+            entries.append({'index': entry.get('playlist_index') or index, 'url': url, 'title': entry.get('title'),
+                            'duration': entry.get('duration')})
+    return entries
+
+
+_TRANSFER_OPTIONS = ('concurrent_fragment_downloads', 'http_chunk_size', 'buffersize', 'external_downloader',
+                     'external_downloader_args')
+
+_STAGE_OPTIONS = {'fixup': None, 'nopostoverwrites': False, 'keepvideo': False, 'print_to_file': {}}
+
+
+class DownloadEngine:
+    """Base class of download engines.
+
+    Engines are context managers; resources kept for the batch are released
+    when the ``with`` block ends.
+
+    Attributes:
+        adjustable_rate (bool): Whether `update_rate_limit` reaches running downloads.
+    """
+
+    name = 'base'
+    adjustable_rate = False
+
+    def download(self, job: DownloadJob, capture_output: bool = False) -> Optional[str]:
+        """Run a single job.
+
+        Args:
+            job (DownloadJob): Job to run.
+            capture_output (bool, optional): Collect output instead of writing it to the
+                terminal. Defaults to False.
+
+        Returns:
+            Optional[str]: Captured output, or None if output was not captured.
+
+        Raises:
+            DownloadEngineError: If the download fails.
+        """
+        raise NotImplementedError
+
+    def expand_playlist(self, url: str, cookies: str = 'cookies.txt') -> List[Dict]:
+        """List the entries of a playlist without extracting the individual videos.
+
+        Args:
+            url (str): Playlist URL.
+            cookies (str, optional): Netscape cookie file. Defaults to ``'cookies.txt'``.
+
+        Returns:
+            List[Dict]: Entries as returned by `playlist_entries`.
+
+        Raises:
+            DownloadEngineError: If the playlist cannot be extracted.
+        """
+        raise NotImplementedError
+
+    def update_rate_limit(self, job: DownloadJob, rate_limit: Optional[int]) -> None:
+        """Change the rate limit of a job.
+
+        Jobs that have not started yet use the new limit. The base implementation
+        cannot change the limit of a running download.
+
+        Args:
+            job (DownloadJob): Job to update.
+            rate_limit (Optional[int]): Bytes per second, or None for no limit.
+        """
+        job.rate_limit = rate_limit
+
+    def close(self) -> None:
+        """Release resources held for the batch."""
+
+    def __enter__(self) -> 'DownloadEngine':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class SubprocessEngine(DownloadEngine):
+    """Run every job in a separate ``yt-dlp`` process.
+
+    The rate limit is passed as ``--limit-rate`` when the process starts and
+    stays fixed for the whole download, so each process gets a fixed slot of
+    the bandwidth budget. Without ``capture_output``, progress is
+    shown live while standard error is collected, so the error of a failed job
+    can be classified; it is printed when the process exits.
+    """
+
+    name = 'subprocess'
+
+    def download(self, job: DownloadJob, capture_output: bool = False) -> Optional[str]:
+        if job.stage_dir:
+            self._select_formats(job)
+        cmd = build_command(job)
+        try:
+            if capture_output:
+                completed = subprocess.run(cmd, check=True, capture_output=True, text=True)
+                return completed.stdout if isinstance(completed.stdout, str) else None
+            completed = subprocess.run(cmd, check=True, stderr=subprocess.PIPE, text=True)
+            if isinstance(completed.stderr, str) and completed.stderr:
+                sys.stderr.write(completed.stderr)
+            return None
+        except subprocess.CalledProcessError as e:
+            output = ''.join(part for part in (e.output, e.stderr) if isinstance(part, str))
+            raise DownloadEngineError(str(e), output or None) from e
+
+    @staticmethod
+    def _select_formats(job: DownloadJob) -> None:
+        """Select the formats of a staged job with a ``yt-dlp -j`` run and save them."""
+        try:
+            completed = subprocess.run(build_selection_command(job), check=True, capture_output=True, text=True)
+            info = json.loads(completed.stdout.splitlines()[0])
+        except subprocess.CalledProcessError as e:
+            raise DownloadEngineError(str(e), e.stderr if isinstance(e.stderr, str) else None) from e
+        except (AttributeError, IndexError, TypeError, ValueError) as e:
+            raise DownloadEngineError(f"Unreadable format selection for {job.url}: {e}") from e
+        save_staged_info(job, info)
+
+    def expand_playlist(self, url: str, cookies: str = 'cookies.txt') -> List[Dict]:
+        cmd = ['yt-dlp', '--cookies', cookies, '--flat-playlist', '--yes-playlist', '-J', url]
+        try:
+            completed = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            return playlist_entries(json.loads(completed.stdout))
+        except subprocess.CalledProcessError as e:
+            raise DownloadEngineError(str(e), e.stderr if isinstance(e.stderr, str) else None) from e
+        except (TypeError, ValueError) as e:
+            raise DownloadEngineError(f"Unreadable playlist info for {url}: {e}") from e
+
+
+class _CaptureLogger:
+    """yt-dlp logger collecting the messages of one job."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def debug(self, message: str) -> None:
+        if not message.startswith('[debug] '):
+            self.lines.append(message)
+
+    info = debug
+
+    def warning(self, message: str) -> None:
+        self.lines.append(message)
+
+    error = warning
+
+
+class InProcessEngine(DownloadEngine):
+    """Run jobs inside the current interpreter with long-lived ``YoutubeDL`` instances.
+
+    ``YoutubeDL`` is not thread-safe, so each worker thread keeps its own
+    instance per option profile. Instances are reused for every job of the
+    batch and closed together with the engine. Rate limit changes apply to
+    running downloads immediately.
+
+    Attributes:
+        progress_hooks (List[Callable]): Called with yt-dlp progress dictionaries.
+        postprocessor_hooks (List[Callable]): Called with yt-dlp post-processing dictionaries.
+    """
+
+    name = 'inprocess'
+    adjustable_rate = True
+
+    def __init__(self, progress_hooks: Optional[List[Callable]] = None,
+                 postprocessor_hooks: Optional[List[Callable]] = None):
+        """Create the engine.
+
+        Args:
+            progress_hooks (Optional[List[Callable]]): yt-dlp progress hooks.
+            postprocessor_hooks (Optional[List[Callable]]): yt-dlp post-processor hooks.
+
+        Raises:
+            ImportError: If ``yt_dlp`` is not installed.
+        """
+        import yt_dlp  # pylint: disable=import-outside-toplevel
+
+        self._yt_dlp = yt_dlp
+        self.progress_hooks = list(progress_hooks or [])
+        self.postprocessor_hooks = list(postprocessor_hooks or [])
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+        self._flat = None
+        self._flat_lock = threading.Lock()
+        self._running: Dict[int, object] = {}
+
+    @staticmethod
+    def _profile_key(options: Dict) -> str:
+        """Return a key for the options that are fixed when ``YoutubeDL`` is created."""
+        return repr((options.get('cookiefile'), options.get('postprocessors'), options.get('final_ext')))
+
+    def _instance(self, options: Dict):
+        """Return this thread's ``YoutubeDL`` for the option profile of ``options``."""
+        instances = getattr(self._local, 'instances', None)
+        if instances is None:
+            instances = self._local.instances = {}
+        key = self._profile_key(options)
+        ydl = instances.get(key)
+        if ydl is None:
+            params = dict(options)
+            params['progress_hooks'] = self.progress_hooks
+            params['postprocessor_hooks'] = self.postprocessor_hooks
+            ydl = self._yt_dlp.YoutubeDL(params)
+            instances[key] = ydl
+            with self._lock:
+                self._instances.append(ydl)
+        return ydl
+
+    def download(self, job: DownloadJob, capture_output: bool = False) -> Optional[str]:
+        options = build_ydl_options(job)
+        ydl = self._instance(options)
+        ydl.params['outtmpl'].update(options['outtmpl'])
+        ydl.params['writeinfojson'] = options['writeinfojson']
+        self._use_format(ydl, job.format_selector)
+        ydl.params['noplaylist'] = not job.playlist
+        ydl.params['merge_output_format'] = job.merge_output_format
+        for key in _TRANSFER_OPTIONS:
+            ydl.params[key] = options[key]
+        for key, default in _STAGE_OPTIONS.items():
+            ydl.params[key] = options.get(key, default)
+        logger = _CaptureLogger() if capture_output else None
+        ydl.params['logger'] = logger
+        ydl.params['noprogress'] = capture_output
+        with self._lock:
+            ydl.params['ratelimit'] = job.rate_limit
+            self._running[id(job)] = ydl
+
+        try:
+            if job.stage_dir:
+                self._select_formats(ydl, job)
+                self._use_format(ydl, job.staged_formats)
+                retcode = ydl.download_with_info_file(os.path.join(job.stage_dir, STAGED_INFO))
+            elif job.info_json:
+                retcode = ydl.download_with_info_file(job.info_json)
+            else:
+                retcode = ydl.download([job.url])
+        except self._yt_dlp.utils.DownloadError as e:
+            raise DownloadEngineError(str(e), self._joined(logger)) from e
+        finally:
+            with self._lock:
+                self._running.pop(id(job), None)
+        if retcode:
+            raise DownloadEngineError(f"yt-dlp returned {retcode} for {job.url}", self._joined(logger))
+        return self._joined(logger)
+
+    @staticmethod
+    def _use_format(ydl, spec: str) -> None:
+        """Make ``ydl`` select formats with ``spec``.
+
+        ``YoutubeDL`` compiles its format selector from ``params['format']`` only
+        when it is created, so the selector of a reused instance is replaced here.
+        """
+        ydl.params['format'] = spec
+        ydl.format_selector = ydl.build_format_selector(spec)
+
+    @staticmethod
+    def _select_formats(ydl, job: DownloadJob) -> None:
+        """Select the formats of a staged job without downloading and save them."""
+        if job.info_json:
+            with open(job.info_json, 'r', encoding='utf-8') as f:
+                info = ydl.process_ie_result(json.load(f), download=False)
+        else:
+            info = ydl.extract_info(job.url, download=False)
+        save_staged_info(job, ydl.sanitize_info(info or {}))
+
+    def update_rate_limit(self, job: DownloadJob, rate_limit: Optional[int]) -> None:
+        with self._lock:
+            job.rate_limit = rate_limit
+            ydl = self._running.get(id(job))
+            if ydl is not None:
+                ydl.params['ratelimit'] = rate_limit
+
+    def expand_playlist(self, url: str, cookies: str = 'cookies.txt') -> List[Dict]:
+        with self._flat_lock:
+            if self._flat is None:
+                self._flat = self._yt_dlp.YoutubeDL({'cookiefile': cookies, 'extract_flat': 'in_playlist',
+                                                     'noplaylist': False, 'quiet': True, 'skip_download': True})
+            flat = self._flat
+            try:
+                info = flat.extract_info(url, download=False)
+            except self._yt_dlp.utils.DownloadError as e:
+                raise DownloadEngineError(str(e)) from e
+        return playlist_entries(info or {})
+
+    @staticmethod
+    def _joined(logger: Optional[_CaptureLogger]) -> Optional[str]:
+        """Return the captured output of ``logger``."""
+        if logger is None:
+            return None
+        return '\n'.join(logger.lines) or None
+
+    def close(self) -> None:
+        with self._lock:
+            instances, self._instances = self._instances, []
+        with self._flat_lock:
+            if self._flat is not None:
+                instances.append(self._flat)
+                self._flat = None
+        self._flat_lock = threading.Lock()
+        self._running: Dict[int, object] = {}
+        for ydl in instances:
+            ydl.close()
+
+
+def create_engine(name: str = 'auto', **kwargs) -> DownloadEngine:
+    """Create a download engine by name.
+
+    ``'auto'`` selects the in-process engine when ``yt_dlp`` can be imported and
+    falls back to the subprocess engine otherwise.
+
+    Args:
+        name (str, optional): ``'auto'``, ``'inprocess'`` or ``'subprocess'``. Defaults to ``'auto'``.
+        **kwargs: Hook arguments for `InProcessEngine`. Ignored by the subprocess engine.
+
+    Returns:
+        DownloadEngine: The engine.
+
+    Raises:
+        ValueError: If ``name`` is not a known engine.
+        ImportError: If ``'inprocess'`` is requested but ``yt_dlp`` is not installed.
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown download engine: {name}")
+    if name == 'subprocess':
+        return SubprocessEngine()
+    if name == 'inprocess':
+        return InProcessEngine(**kwargs)
+    try:
+        return InProcessEngine(**kwargs)
+    except ImportError:
+        return SubprocessEngine()
@@ -0,0 +1,305 @@
+"""
+This module provides a bounded worker pool for running several downloads at once.
+
+By default jobs start in input order. A `SchedulePolicy` looks a bounded
+number of items ahead and picks the next job from that window: explicit
+priorities first, then input order, the shortest job, or round-robin across
+playlists and sources. An aging rule starts every item after a bounded number of others were
+picked ahead of it, so large items still finish.
+
+Classes:
+    DownloadResult: Outcome of a single download job.
+    JobEstimate: Scheduling details of a queued item.
+    SchedulePolicy: Chooses which queued item starts next.
+    DownloadScheduler: Runs download jobs concurrently with a fixed number of workers.
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+POLICIES = ('fifo', 'priority', 'shortest', 'fair')
+"""POLICIES: Names accepted by `SchedulePolicy`."""
+
+
+@dataclass
+class DownloadResult:
+    """Outcome of a single download job.
+
+    Attributes:
+        url (str): URL that was processed.
+        status (str): One of ``'done'``, ``'skipped'``, ``'failed'`` or ``'cancelled'``. Jobs
+            whose streams wait for the post-processing pipeline are ``'staged'`` until it finishes.
+        error (Optional[str]): Error message for failed jobs.
+        output (Optional[str]): Captured yt-dlp output, if output was captured.
+        elapsed (float): Wall time spent on the job in seconds.
+        attempts (int): Download attempts, including retries.
+        failure (Optional[str]): Failure class of a failed job, see `src.utils.retry.classify_error`.
+        path (Optional[str]): Final file of a successful job, when it is known.
+    """
+
+    url: str
+    status: str
+    error: Optional[str] = None
+    output: Optional[str] = None
+    elapsed: float = 0.0
+    attempts: int = 1
+    failure: Optional[str] = None
+    path: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        """bool: True if the job finished without an error or was already downloaded."""
+        return self.status in ('done', 'skipped')
+
+
+@dataclass
+class JobEstimate:
+    """Scheduling details of a queued item.
+
+    Attributes:
+        priority (int): Items with a higher priority start first.
+        size (Optional[float]): Estimated size in bytes, or None if unknown.
+        group (Optional[str]): Playlist or source the item belongs to, for round-robin.
+    """
+
+    priority: int = 0
+    size: Optional[float] = None
+    group: Optional[str] = None
+
+
+@dataclass
+class _Waiting:
+    """Item in the window of a `SchedulePolicy`."""
+
+    index: int
+    item: str
+    estimate: JobEstimate
+    skipped: int = 0
+
+
+class SchedulePolicy:
+    """Choose which of the next ``window`` queued items starts next.
+
+    ``'fifo'`` starts items in input order. The other policies consider the
+    items with the highest priority first, and among them:
+
+    - ``'priority'`` starts them in input order;
+    - ``'shortest'`` starts the smallest estimated size first; items of unknown
+      size count as the mean size of the window;
+    - ``'fair'`` takes turns between groups (playlists and sources), in input
+      order within a group.
+
+    Aging: an item that was passed over ``max_skips`` times starts next,
+    whatever its priority or size.
+
+    Attributes:
+        name (str): One of `POLICIES`.
+        window (int): Queued items considered at once.
+        max_skips (int): Picks another item may win before a waiting item starts.
+
+    Example:
+        ```python
+        policy = SchedulePolicy('shortest', estimate=lambda url: JobEstimate(size=sizes.get(url)))
+        DownloadScheduler(jobs=4, policy=policy).run(urls, worker)
+        ```
+    """
+
+    def __init__(self, name: str = 'fifo', estimate: Optional[Callable[[str], JobEstimate]] = None,
+                 window: int = 64, max_skips: int = 32):
+        """Create a policy.
+
+        Args:
+            name (str, optional): One of `POLICIES`. Defaults to ``'fifo'``.
+            estimate (Optional[Callable[[str], JobEstimate]]): Returns the scheduling details of
+                an item when it enters the window. Defaults to priority 0, unknown size, no group.
+            window (int, optional): Queued items considered at once. Defaults to 64.
+            max_skips (int, optional): Picks another item may win before a waiting item starts.
+                Defaults to 32.
+
+        Raises:
+            ValueError: If ``name`` is unknown.
+        """
+        if name not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {name}")
+        self.name = name
+        self.window = max(1, window)
+        self.max_skips = max(0, max_skips)
+        self._estimate = estimate or (lambda item: JobEstimate())
+        self._waiting: List[_Waiting] = []
+        self._turns: Dict[Optional[str], int] = {}
+        self._picks = 0
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def add(self, index: int, item: str) -> None:
+        """Put ``item``, the ``index``-th item of the input, into the window."""
+        self._waiting.append(_Waiting(index, item, self._estimate(item)))
+
+    def pop(self) -> Tuple[int, str]:
+        """Remove the item that starts next from the window.
+
+        Returns:
+            Tuple[int, str]: Input index and item.
+
+        Raises:
+            IndexError: If the window is empty.
+        """
+        if not self._waiting:
+            raise IndexError("pop from an empty schedule")
+        chosen = self._choose()
+        self._waiting.remove(chosen)
+        for waiting in self._waiting:
+            waiting.skipped += 1
+        self._picks += 1
+        self._turns[chosen.estimate.group] = self._picks
+        return chosen.index, chosen.item
+
+    def drain(self) -> List[Tuple[int, str]]:
+        """Remove and return every item of the window, in input order."""
+        waiting, self._waiting = self._waiting, []
+        return [(entry.index, entry.item) for entry in sorted(waiting, key=lambda entry: entry.index)]
+
+    def _choose(self) -> _Waiting:
+        """Return the waiting item that starts next."""
+        overdue = [entry for entry in self._waiting if entry.skipped >= self.max_skips]
+        if overdue:
+            return min(overdue, key=lambda entry: entry.index)
+        if self.name == 'fifo':
+            return min(self._waiting, key=lambda entry: entry.index)
+        top = max(entry.estimate.priority for entry in self._waiting)
+        candidates = [entry for entry in self._waiting if entry.estimate.priority == top]
+        if self.name == 'shortest':
+            known = [entry.estimate.size for entry in candidates if entry.estimate.size is not None]
+            default = sum(known) / len(known) if known else 0.0
+            return min(candidates, key=lambda entry: (
+                entry.estimate.size if entry.estimate.size is not None else default, entry.index))
+        if self.name == 'fair':
+            first: Dict[Optional[str], _Waiting] = {}
+            for entry in candidates:
+                if entry.estimate.group not in first or entry.index < first[entry.estimate.group].index:
+                    first[entry.estimate.group] = entry
+            return min(first.values(), key=lambda entry: (self._turns.get(entry.estimate.group, 0), entry.index))
+        return min(candidates, key=lambda entry: entry.index)
+
+
+class DownloadScheduler:
+    """Run download jobs on a bounded pool of worker threads.
+
+    Items are pulled from the input iterable lazily, so at most ``jobs`` items
+    are in flight at any time, plus the window of the scheduling policy, if
+    any. Pressing Ctrl-C stops new jobs from being started, cancels queued ones
+    and waits for the running jobs to finish.
+
+    Attributes:
+        jobs (int): Maximum number of concurrently running jobs.
+        policy (Optional[SchedulePolicy]): Order in which items start; None starts them in input order.
+        cancelled (bool): True if the last run was interrupted.
+    """
+
+    def __init__(self, jobs: int = 1, policy: Optional[SchedulePolicy] = None):
+        """Create a scheduler.
+
+        Args:
+            jobs (int, optional): Maximum number of concurrent jobs. Defaults to 1.
+            policy (Optional[SchedulePolicy]): Order in which items start. Defaults to input order.
+        """
+        self.jobs = max(1, int(jobs))
+        self.policy = policy
+        self.cancelled = False
+        self._cancel_event = threading.Event()
+
+    def cancel(self) -> None:
+        """Stop scheduling new jobs. Running jobs are allowed to finish."""
+        self._cancel_event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        """bool: True once ``cancel`` has been requested."""
+        return self._cancel_event.is_set()
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to ``seconds``, waking early when the run is cancelled.
+
+        Returns:
+            bool: True if the run was cancelled.
+        """
+        return self._cancel_event.wait(seconds)
+
+    def run(self, items: Iterable[str], worker: Callable[[str], DownloadResult]) -> List[DownloadResult]:
+        """Run ``worker`` for every item, keeping at most ``jobs`` running at once.
+
+        Args:
+            items (Iterable[str]): URLs to process. May be a lazy iterator.
+            worker (Callable[[str], DownloadResult]): Function downloading one URL.
+
+        Returns:
+            List[DownloadResult]: One result per started or cancelled item, in input order.
+            Items still waiting in the policy window when the run is cancelled are cancelled.
+        """
+        self.cancelled = False
+        self._cancel_event.clear()
+        results: dict = {}
+        pending: dict = {}
+        policy = self.policy if self.policy is not None else SchedulePolicy(window=1)
+        iterator = iter(items)
+        index = 0
+        exhausted = False
+
+        executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='download')
+        try:
+            while True:
+                while len(pending) < self.jobs and not self.is_cancelled:
+                    while not exhausted and len(policy) < policy.window:
+                        try:
+                            policy.add(index, next(iterator))
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        index += 1
+                    if not policy:
+                        break
+                    position, item = policy.pop()
+                    future = executor.submit(self._run_one, worker, item)
+                    pending[future] = (position, item)
+
+                if not pending:
+                    break
+
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    position, item = pending[future]
+                    results[position] = future.result()
+                    del pending[future]
+        except KeyboardInterrupt:
+            self.cancel()
+            self.cancelled = True
+            for future, (position, item) in pending.items():
+                if future.cancel():
+                    results[position] = DownloadResult(item, 'cancelled')
+            executor.shutdown(wait=True, cancel_futures=True)
+            for future, (position, item) in pending.items():
+                if position not in results:
+                    try:
+                        results[position] = future.result()
+                    except BaseException as error:  # pylint: disable=broad-except
+                        results[position] = DownloadResult(item, 'cancelled', error=str(error))
+        finally:
+            executor.shutdown(wait=True)
+            for position, item in policy.drain():
+                results[position] = DownloadResult(item, 'cancelled')
+
+        return [results[position] for position in sorted(results)]
+
+    def _run_one(self, worker: Callable[[str], DownloadResult], item: str) -> DownloadResult:
+        """Run a single job unless the scheduler has been cancelled."""
+        if self.is_cancelled:
+            return DownloadResult(item, 'cancelled')
+        start = time.monotonic()
+        result = worker(item)
+        if not result.elapsed:
+            result.elapsed = time.monotonic() - start
+        return result
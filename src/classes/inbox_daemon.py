@@ -0,0 +1,244 @@
+"""
+This module provides the watch-folder daemon for continuous ingestion.
+
+`InboxDaemon` watches an inbox folder with ``watchdog``. Link files (``*.txt``)
+dropped into the inbox, or appended to later, are read from the last stored
+offset once they stopped changing for ``debounce`` seconds, and their links
+are added to the persistent `JobQueue`. Queued jobs are downloaded in batches
+with the normal `VideoDownloader`, and a link file whose jobs are all finished
+is moved to the ``done`` or ``failed`` folder.
+
+The daemon sleeps on file system notifications and debounce deadlines only,
+so it uses no CPU while the inbox is idle. Jobs and read offsets survive a
+restart: jobs are leased like those of a `QueueWorker`, so the jobs of a
+crashed run are queued again once their lease expired, and files are not read
+twice.
+
+Classes:
+    InboxDaemon: Watches an inbox folder and downloads the links dropped into it.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+from src.utils.link_reader import LinkStream
+from .job_queue import FAILED, QUEUED, RUNNING, JobQueue
+from .queue_worker import QueueWorker, default_worker_id
+
+LINK_FILE_EXTENSIONS = ('.txt',)
+"""LINK_FILE_EXTENSIONS: Extensions of the files read from the inbox."""
+
+
+class _InboxHandler:
+    """Forward ``watchdog`` events about link files to an `InboxDaemon`."""
+
+    def __init__(self, daemon: 'InboxDaemon'):
+        self._daemon = daemon
+
+    def dispatch(self, event) -> None:
+        """Handle a ``watchdog`` file system event."""
+        if event.is_directory or event.event_type not in ('created', 'modified', 'moved', 'closed'):
+            return
+        path = event.dest_path if event.event_type == 'moved' else event.src_path
+        self._daemon.file_changed(os.fsdecode(path))
+
+
+class InboxDaemon:
+    """Watch an inbox folder and download the links dropped into it.
+
+    Attributes:
+        inbox (str): Watched folder.
+        queue (JobQueue): Persistent queue of the ingested links.
+        options (Dict): Keyword arguments for `VideoDownloader.from_options`.
+        debounce (float): Seconds a link file must stay unchanged before it is read.
+        batch_size (int): Jobs downloaded as one batch.
+        done_folder (str): Folder receiving link files whose jobs all succeeded.
+        failed_folder (str): Folder receiving link files with at least one failed job.
+
+    Example:
+        ```python
+        daemon = InboxDaemon('~/inbox', JobQueue(app_config.job_queue_path), {'mode': 'Audio only'})
+        daemon.run()  # until Ctrl-C or daemon.stop()
+        ```
+    """
+
+    def __init__(self, inbox: str, queue: JobQueue, options: Optional[Dict] = None, debounce: float = 2.0,
+                 batch_size: int = 50, done_folder: Optional[str] = None, failed_folder: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic, lease: float = 60.0):
+        """Create the daemon. Nothing is watched before `run`.
+
+        Args:
+            inbox (str): Folder to watch. It is created if missing.
+            queue (JobQueue): Persistent queue of the ingested links.
+            options (Optional[Dict]): Keyword arguments for `VideoDownloader.from_options`.
+            debounce (float, optional): Seconds a link file must stay unchanged. Defaults to 2.
+            batch_size (int, optional): Jobs downloaded as one batch. Defaults to 50.
+            done_folder (Optional[str]): Defaults to ``done`` inside the inbox.
+            failed_folder (Optional[str]): Defaults to ``failed`` inside the inbox.
+            clock (Callable[[], float], optional): Monotonic clock. Defaults to ``time.monotonic``.
+            lease (float, optional): Seconds the daemon holds a batch without a heartbeat, so
+                other processes sharing the queue leave its jobs alone. Defaults to 60.
+        """
+        self.inbox = os.path.abspath(os.path.expanduser(inbox))
+        self.queue = queue
+        self.options = dict(options or {})
+        self.debounce = debounce
+        self.batch_size = max(1, batch_size)
+        self.done_folder = os.path.abspath(os.path.expanduser(done_folder or os.path.join(self.inbox, 'done')))
+        self.failed_folder = os.path.abspath(os.path.expanduser(failed_folder or os.path.join(self.inbox, 'failed')))
+        self._clock = clock
+        self._pending: Dict[str, float] = {}
+        self._sources: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._worker = QueueWorker(queue, default_worker_id('inbox'), lease, self.batch_size)
+        os.makedirs(self.inbox, exist_ok=True)
+
+    def _is_link_file(self, path: str) -> bool:
+        """Check whether ``path`` is a visible link file directly inside the inbox."""
+        name = os.path.basename(path)
+        return (os.path.dirname(os.path.abspath(path)) == self.inbox and not name.startswith('.')
+                and name.lower().endswith(LINK_FILE_EXTENSIONS))
+
+    def file_changed(self, path: str) -> None:
+        """Schedule ``path`` to be read once it stopped changing for ``debounce`` seconds.
+
+        Called from the ``watchdog`` observer thread; every call restarts the debounce delay.
+        """
+        if not self._is_link_file(path):
+            return
+        with self._lock:
+            self._pending[os.path.abspath(path)] = self._clock() + self.debounce
+        self._wake.set()
+
+    def scan(self) -> None:
+        """Schedule the link files already in the inbox and those of the previous run."""
+        for name in sorted(os.listdir(self.inbox)):
+            self.file_changed(os.path.join(self.inbox, name))
+        for path in self.queue.sources():
+            if self._is_link_file(path):
+                self._sources.add(path)
+
+    def ingest(self, path: str) -> int:
+        """Queue the links added to ``path`` since it was last read.
+
+        A file that became shorter than the stored offset was replaced and is read
+        from the start.
+
+        Returns:
+            int: Number of queued jobs.
+        """
+        offset = self.queue.source_offset(path)
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < offset:
+                    offset = 0
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return 0
+        if offset + len(data) == 0:
+            return 0  # created but not written yet
+        lines = data.decode('utf-8', errors='replace').splitlines()
+        ids = self.queue.enqueue(LinkStream(lines=lines), self.options, source=path,
+                                 source_offset=offset + len(data))
+        self._sources.add(path)
+        return len(ids)
+
+    def _ingest_due(self) -> Optional[float]:
+        """Ingest the link files whose debounce delay expired.
+
+        Returns:
+            Optional[float]: Seconds until the next pending file is due, or None if none is pending.
+        """
+        now = self._clock()
+        with self._lock:
+            due = [path for path, deadline in self._pending.items() if deadline <= now]
+            for path in due:
+                del self._pending[path]
+        for path in due:
+            self.ingest(path)
+        with self._lock:
+            return max(0.0, min(self._pending.values()) - now) if self._pending else None
+
+    def settle(self) -> None:
+        """Move link files whose jobs are all finished to the done or failed folder."""
+        with self._lock:
+            pending = set(self._pending)
+        for path in sorted(self._sources - pending):
+            counts = self.queue.counts(path)
+            if counts.get(QUEUED) or counts.get(RUNNING):
+                continue
+            self._sources.discard(path)
+            folder = self.failed_folder if counts.get(FAILED) else self.done_folder
+            target = self._move(path, folder)
+            self.queue.move_source(path, target or path)
+
+    @staticmethod
+    def _move(path: str, folder: str) -> Optional[str]:
+        """Move ``path`` into ``folder`` without replacing a file of the same name.
+
+        Returns:
+            Optional[str]: New path, or None if the file could not be moved.
+        """
+        os.makedirs(folder, exist_ok=True)
+        stem, extension = os.path.splitext(os.path.basename(path))
+        target = os.path.join(folder, stem + extension)
+        if os.path.exists(target):
+            target = os.path.join(folder, f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}{extension}")
+        try:
+            os.replace(path, target)
+        except OSError:
+            return None
+        return target
+
+    def run_once(self) -> Optional[float]:
+        """Ingest due link files, download every queued job and settle finished files.
+
+        Returns:
+            Optional[float]: Seconds until the next pending file is due, or None if none is pending.
+        """
+        delay = self._ingest_due()
+        while not self._stopped:
+            interrupted = self._worker.run_once()
+            if interrupted is None:
+                break
+            if interrupted:
+                self._stopped = True
+                break
+            delay = self._ingest_due()
+        self.settle()
+        return delay
+
+    def run(self) -> None:
+        """Watch the inbox and process link files until `stop` is called or Ctrl-C is pressed."""
+        from watchdog.observers import Observer  # pylint: disable=import-outside-toplevel
+
+        requeued = self.queue.recover()
+        if requeued:
+            print(f"Resuming {requeued} interrupted job(s).")
+        observer = Observer()
+        observer.schedule(_InboxHandler(self), self.inbox, recursive=False)
+        observer.start()
+        print(f"Watching {self.inbox} for link files. Press Ctrl-C to stop.")
+        try:
+            self.scan()
+            while not self._stopped:
+                self._wake.clear()
+                delay = self.run_once()
+                if self.queue.counts().get(RUNNING):
+                    # Leased elsewhere or by a crashed run; check again once such a lease can expire.
+                    delay = min(delay, self._worker.lease) if delay is not None else self._worker.lease
+                if not self._stopped:
+                    self._wake.wait(delay)
+        finally:
+            observer.stop()
+            observer.join()
+
+    def stop(self) -> None:
+        """Stop `run` after the current batch."""
+        self._stopped = True
+        self._wake.set()
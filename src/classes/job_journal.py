@@ -0,0 +1,292 @@
+"""
+This module provides a crash-safe journal of batch downloads.
+
+Every state change of every URL is appended to a JSON-lines file in the
+download folder and flushed to disk, so a batch interrupted by Ctrl-C, a
+reboot or an OOM kill can be resumed exactly where it stopped.
+
+Several downloaders may share a download folder and its journal. The journal
+is only emptied when no batch in it is still running or has unfinished URLs.
+
+Classes:
+    JobJournal: Append-only journal of batches and per-URL job states.
+"""
+
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import IO, Dict, Iterable, Iterator, List, Optional
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+EXPANDED = 'expanded'
+
+
+class JobJournal:
+    """Append-only journal of batches and per-URL job states.
+
+    Each line is a JSON record. A ``batch`` record opens a batch and stores the
+    source, the download options and the process running it; ``job`` records
+    store the state of one URL (``queued``, ``running``, ``done`` or ``failed``)
+    and error details. ``resume`` and ``end`` records mark when a process takes
+    up a batch again and when it stops working on it.
+    Playlists split into per-entry jobs are recorded as ``expanded``; their
+    entries are recorded with the output template they are saved under.
+    A torn last line left by a crash is ignored when the journal is read.
+
+    Attributes:
+        path (str): Location of the journal file.
+        batch_id (Optional[str]): Batch that new job records belong to.
+
+    Example:
+        ```python
+        journal = JobJournal(download_folder)
+        journal.start_batch(source='links.txt', options={'mode': 'Video'})
+        journal.record(url, 'running')
+        journal.record(url, 'done')
+        journal.finish_batch()
+        ```
+    """
+
+    FILENAME = '.streamflow-journal.jsonl'
+
+    def __init__(self, folder: str, fsync: bool = True):
+        """Open the journal of a download folder.
+
+        Args:
+            folder (str): Download folder holding the journal.
+            fsync (bool, optional): Force every record to disk. Defaults to True.
+        """
+        self.path = os.path.join(folder, self.FILENAME)
+        self.batch_id: Optional[str] = None
+        self._fsync = fsync
+        self._lock = threading.Lock()
+
+    def _append(self, record: Dict) -> None:
+        """Append one record and make it durable."""
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                if self._fsync:
+                    os.fsync(f.fileno())
+
+    @contextlib.contextmanager
+    def _exclusive(self) -> Iterator[IO[str]]:
+        """Open the journal for appending, locked against other processes where supported."""
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            try:
+                import fcntl  # pylint: disable=import-outside-toplevel
+            except ImportError:
+                yield f
+                return
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _owner() -> Dict:
+        """Return the fields identifying the process that works on a batch."""
+        return {'host': socket.gethostname(), 'pid': os.getpid()}
+
+    @staticmethod
+    def _is_alive(owner: Dict) -> bool:
+        """Return True unless the process of ``owner`` is known to have exited.
+
+        Processes on other hosts, or on platforms without a signal-free check, are
+        assumed to be alive.
+        """
+        if owner.get('host') != socket.gethostname() or not owner.get('pid') or os.name != 'posix':
+            return True
+        try:
+            os.kill(owner['pid'], 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+
+    def records(self) -> Iterator[Dict]:
+        """Yield all readable records in file order.
+
+        Yields:
+            Dict: Journal record.
+        """
+        try:
+            f = open(self.path, 'r', encoding='utf-8')  # pylint: disable=consider-using-with
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def start_batch(self, source: Optional[str] = None, options: Optional[Dict] = None) -> str:
+        """Open a new batch.
+
+        The journal is emptied first if none of its batches is still running or has
+        queued or running URLs, so it does not grow forever. Failed URLs do not keep
+        a batch open.
+
+        Args:
+            source (Optional[str]): TXT file or other description of the URL source.
+            options (Optional[Dict]): Download options needed to resume the batch.
+
+        Returns:
+            str: ID of the new batch.
+        """
+        self.batch_id = uuid.uuid4().hex
+        record = {'event': 'batch', 'batch': self.batch_id, 'source': source,
+                  'options': options or {}, **self._owner(), 'ts': time.time()}
+        with self._exclusive() as f:
+            if self._all_finished():
+                f.truncate(0)
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            if self._fsync:
+                os.fsync(f.fileno())
+        return self.batch_id
+
+    def resume_batch(self, batch_id: str) -> None:
+        """Append new job records to an existing batch.
+
+        Args:
+            batch_id (str): ID of the batch to continue.
+        """
+        self.batch_id = batch_id
+        self._append({'event': 'resume', 'batch': batch_id, **self._owner(), 'ts': time.time()})
+
+    def finish_batch(self) -> None:
+        """Record that this process stopped working on the current batch.
+
+        URLs left queued or running, e.g. after Ctrl-C, can still be resumed.
+        """
+        if self.batch_id is not None:
+            self._append({'event': 'end', 'batch': self.batch_id, 'ts': time.time()})
+
+    def _all_finished(self) -> bool:
+        """Return True if no batch of the journal is running or has queued or running URLs."""
+        owners: Dict[str, Optional[Dict]] = {}
+        for record in self.records():
+            if record.get('event') in ('batch', 'resume'):
+                owners[record['batch']] = record
+            elif record.get('event') == 'end':
+                owners[record['batch']] = None
+        for batch_id, owner in owners.items():
+            if owner is not None and self._is_alive(owner):
+                return False
+            if self.pending(batch_id):
+                return False
+        return True
+
+    def record(self, url: str, state: str, error: Optional[str] = None,
+               output_template: Optional[str] = None) -> None:
+        """Record the state of a URL in the current batch.
+
+        Args:
+            url (str): URL of the job.
+            state (str): ``'queued'``, ``'running'``, ``'done'``, ``'failed'`` or ``'expanded'``.
+            error (Optional[str]): Error details for failed jobs.
+            output_template (Optional[str]): Output template of a playlist entry.
+        """
+        record = {'event': 'job', 'batch': self.batch_id, 'url': url, 'state': state, 'ts': time.time()}
+        if error:
+            record['error'] = error
+        if output_template:
+            record['output_template'] = output_template
+        self._append(record)
+
+    def track(self, urls: Iterable[str], templates: Optional[Dict[str, str]] = None) -> Iterator[str]:
+        """Record each URL as queued when it is pulled from ``urls``.
+
+        Args:
+            urls (Iterable[str]): URLs of the batch.
+            templates (Optional[Dict[str, str]]): Output templates of playlist entries,
+                looked up when each URL is recorded.
+
+        Yields:
+            str: The same URLs.
+        """
+        templates = templates if templates is not None else {}
+        for url in urls:
+            self.record(url, QUEUED, output_template=templates.get(url))
+            yield url
+
+    def last_batch(self) -> Optional[Dict]:
+        """Return the ``batch`` record of the most recent batch.
+
+        Returns:
+            Optional[Dict]: Batch record, or None if the journal is empty.
+        """
+        last = None
+        for record in self.records():
+            if record.get('event') == 'batch':
+                last = record
+        return last
+
+    def states(self, batch_id: str) -> Dict[str, Dict]:
+        """Return the latest job record of every URL of a batch, in queue order.
+
+        The output template of a playlist entry is kept from its ``queued`` record.
+
+        Args:
+            batch_id (str): Batch ID.
+
+        Returns:
+            Dict[str, Dict]: Latest job record per URL.
+        """
+        states: Dict[str, Dict] = {}
+        for record in self.records():
+            if record.get('event') == 'job' and record.get('batch') == batch_id:
+                previous = states.get(record['url'], {})
+                if 'output_template' in previous and 'output_template' not in record:
+                    record['output_template'] = previous['output_template']
+                states[record['url']] = record
+        return states
+
+    def pending(self, batch_id: str) -> List[str]:
+        """Return the queued or running URLs of a batch.
+
+        Args:
+            batch_id (str): Batch ID.
+
+        Returns:
+            List[str]: URLs in their original queue order.
+        """
+        return [url for url, record in self.states(batch_id).items() if record['state'] in (QUEUED, RUNNING)]
+
+    def failed(self, batch_id: str) -> List[str]:
+        """Return the failed URLs of a batch.
+
+        Args:
+            batch_id (str): Batch ID.
+
+        Returns:
+            List[str]: URLs in their original queue order.
+        """
+        return [url for url, record in self.states(batch_id).items() if record['state'] == FAILED]
+
+    def unfinished_batch(self) -> Optional[Dict]:
+        """Return the most recent batch if it still has queued or running URLs.
+
+        Returns:
+            Optional[Dict]: Batch record extended with a ``pending`` list, or None.
+        """
+        last = self.last_batch()
+        if last is None:
+            return None
+        pending = self.pending(last['batch'])
+        if not pending:
+            return None
+        return dict(last, pending=pending)
@@ -0,0 +1,471 @@
+"""
+This module provides a persistent queue of download jobs.
+
+Jobs survive restarts: the queue is a SQLite database in WAL mode, like the
+download archive. Every job stores its URL together with the keyword arguments
+of `VideoDownloader.from_options`, so queued work can be picked up later by a
+daemon or a server without any prompts.
+
+Several processes can share one queue. A worker that claims jobs with a lease
+holds them only while it renews the lease; jobs of a crashed worker are claimed
+again once their lease expired, and a worker that lost a lease can no longer
+record an outcome, so every job is completed by exactly one worker.
+
+Classes:
+    QueuedJob: One job of the queue.
+    JobQueue: Persistent queue of download jobs and the read offsets of link files.
+
+Functions:
+    run_jobs: Downloads claimed jobs as one batch and records their outcomes.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    from .video_downloader import VideoDownloader
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (DONE, SKIPPED, FAILED, CANCELLED)
+"""FINISHED_STATES: States a job never leaves."""
+
+JOURNAL_MODES = ('WAL', 'DELETE')
+"""JOURNAL_MODES: Supported SQLite journal modes of the queue database."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    source TEXT,
+    state TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, id);
+CREATE INDEX IF NOT EXISTS jobs_by_source ON jobs (source, state);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = 'id, url, options, source, state, error, created_at, updated_at, priority, worker, lease_expires'
+"""_COLUMNS: Columns of a `QueuedJob`, in field order."""
+
+
+@dataclass
+class QueuedJob:
+    """One job of the queue.
+
+    Attributes:
+        id (int): Job ID, increasing in enqueue order.
+        url (str): URL to download.
+        options (Dict): Keyword arguments for `VideoDownloader.from_options`.
+        source (Optional[str]): Link file the job was read from.
+        state (str): ``'queued'``, ``'running'``, ``'done'``, ``'skipped'``, ``'failed'`` or ``'cancelled'``.
+        error (Optional[str]): Error of a failed job.
+        created_at (float): Enqueue time as a UNIX timestamp.
+        updated_at (float): Time of the last state change as a UNIX timestamp.
+        priority (int): Jobs with a higher priority are claimed first.
+        worker (Optional[str]): Worker that holds the job's lease, or that completed it.
+        lease_expires (Optional[float]): UNIX time at which the lease of a running job
+            expires; None for jobs claimed without a lease.
+    """
+
+    id: int
+    url: str
+    options: Dict
+    source: Optional[str]
+    state: str
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+    priority: int = 0
+    worker: Optional[str] = None
+    lease_expires: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        """Return the job as a JSON-serializable dictionary."""
+        return asdict(self)
+
+
+class JobQueue:
+    """Persistent queue of download jobs.
+
+    Jobs are claimed by priority. Jobs of the same priority are claimed in
+    turns from every source (link file), in enqueue order within a source, so
+    a large link file does not hold back the jobs of a small one. `wait` blocks
+    without polling until a job is enqueued in this process, so an idle
+    consumer uses no CPU.
+
+    Consumers in other processes claim jobs with a ``worker`` name and a
+    ``lease``, keep them with `renew` and record outcomes with the same name.
+    On one host the default WAL journal is used; a queue on a network file
+    system shared by several hosts needs ``journal_mode='DELETE'``, because WAL
+    relies on shared memory.
+
+    Attributes:
+        path (str): Location of the SQLite database.
+
+    Example:
+        ```python
+        queue = JobQueue('~/.local/share/streamflow/queue.sqlite3')
+        queue.enqueue(['https://youtu.be/dQw4w9WgXcQ'], {'mode': 'Audio only'})
+        for job in queue.claim(10):
+            ...
+            queue.complete(job.id, 'done')
+        ```
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0, journal_mode: str = 'WAL'):
+        """Open or create the queue.
+
+        Args:
+            path (str): Location of the SQLite database. Parent folders are created.
+            timeout (float, optional): Seconds to wait for a concurrent writer. Defaults to 30.
+            journal_mode (str, optional): SQLite journal mode; ``'DELETE'`` for a queue shared
+                over a network file system. Every process of a queue must use the same mode.
+                Defaults to ``'WAL'``.
+        """
+        if journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"Unsupported journal mode: {journal_mode}")
+        journal_mode = journal_mode.upper()
+        self.path = os.path.expanduser(path)
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._version = 0
+        self._connection = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute(f'PRAGMA journal_mode={journal_mode}')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+
+    @staticmethod
+    def _job(row: tuple) -> QueuedJob:
+        """Turn a row of `_COLUMNS` into a `QueuedJob`."""
+        job_id, url, options, *rest = row
+        return QueuedJob(job_id, url, json.loads(options), *rest)
+
+    def enqueue(self, urls: Iterable[str], options: Optional[Dict] = None, source: Optional[str] = None,
+                source_offset: Optional[int] = None, priority: int = 0) -> List[int]:
+        """Append jobs for ``urls`` and wake waiting consumers.
+
+        Args:
+            urls (Iterable[str]): URLs to download. The ``priority=N`` of lines read by a
+                `LinkStream` overrides ``priority``.
+            options (Optional[Dict]): Keyword arguments for `VideoDownloader.from_options`.
+            source (Optional[str]): Link file the URLs were read from.
+            source_offset (Optional[int]): New read offset of ``source``, stored in the same
+                transaction so no line is enqueued twice after a crash.
+            priority (int, optional): Priority of the jobs. Defaults to 0.
+
+        Returns:
+            List[int]: IDs of the new jobs.
+        """
+        encoded = json.dumps(options or {}, sort_keys=True)
+        now = time.time()
+        ids = []
+        with self._changed:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                for url in urls:
+                    cursor = self._connection.execute(
+                        'INSERT INTO jobs (url, options, source, state, created_at, updated_at, priority) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (url, encoded, source, QUEUED, now, now, getattr(urls, 'priorities', {}).get(url, priority)))
+                    ids.append(cursor.lastrowid)
+                if source is not None and source_offset is not None:
+                    self._connection.execute('INSERT OR REPLACE INTO sources (path, offset) VALUES (?, ?)',
+                                             (source, source_offset))
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            if ids:
+                self._changed_locked()
+        return ids
+
+    def claim(self, limit: int, worker: Optional[str] = None, lease: Optional[float] = None) -> List[QueuedJob]:
+        """Mark up to ``limit`` queued jobs with the same options as running.
+
+        Jobs are claimed with the options of the first queued job by priority and
+        enqueue order, so they can be downloaded as one batch. Within a priority,
+        sources take turns. Jobs whose lease expired are queued again first.
+
+        Args:
+            limit (int): Maximum number of jobs.
+            worker (Optional[str]): Name of the claiming worker, required for `renew`.
+            lease (Optional[float]): Seconds the worker holds the jobs without renewing.
+                None claims them until they are completed, e.g. in a queue used by a single thread.
+
+        Returns:
+            List[QueuedJob]: Claimed jobs in claim order; empty if nothing is queued.
+        """
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                self._reclaim_locked(now)
+                first = self._connection.execute(
+                    'SELECT options FROM jobs WHERE state = ? ORDER BY priority DESC, id LIMIT 1',
+                    (QUEUED,)).fetchone()
+                rows = [] if first is None else [row[:-1] for row in self._connection.execute(
+                    f'SELECT {_COLUMNS}, ROW_NUMBER() OVER (PARTITION BY priority, source ORDER BY id) AS turn '
+                    'FROM jobs WHERE state = ? AND options = ? ORDER BY priority DESC, turn, id LIMIT ?',
+                    (QUEUED, first[0], max(1, limit)))]
+                expires = now + lease if lease is not None else None
+                self._connection.executemany(
+                    'UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, updated_at = ? WHERE id = ?',
+                    [(RUNNING, worker, expires, now, row[0]) for row in rows])
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+        jobs = [self._job(row) for row in rows]
+        for job in jobs:
+            job.state, job.updated_at, job.worker, job.lease_expires = RUNNING, now, worker, expires
+        return jobs
+
+    def _reclaim_locked(self, now: float) -> int:
+        """Queue running jobs with an expired lease again; the lock must be held."""
+        return self._connection.execute(
+            'UPDATE jobs SET state = ?, worker = NULL, lease_expires = NULL, updated_at = ? '
+            'WHERE state = ? AND lease_expires < ?', (QUEUED, now, RUNNING, now)).rowcount
+
+    def renew(self, worker: str, job_ids: Iterable[int], lease: float) -> List[int]:
+        """Extend the leases ``worker`` holds on ``job_ids`` by ``lease`` seconds from now.
+
+        Returns:
+            List[int]: IDs of the jobs the worker still holds. A job missing here was
+            claimed again after its lease expired, or completed.
+        """
+        held = []
+        with self._lock:
+            now = time.time()
+            for job_id in job_ids:
+                cursor = self._connection.execute(
+                    'UPDATE jobs SET lease_expires = ? WHERE id = ? AND state = ? AND worker = ?',
+                    (now + lease, job_id, RUNNING, worker))
+                if cursor.rowcount:
+                    held.append(job_id)
+        return held
+
+    def complete(self, job_id: int, state: str, error: Optional[str] = None, worker: Optional[str] = None) -> bool:
+        """Record the outcome of a running job.
+
+        Args:
+            job_id (int): Job ID.
+            state (str): One of `FINISHED_STATES`, or ``'queued'`` to run the job again later.
+            error (Optional[str]): Error of a failed job.
+            worker (Optional[str]): Worker that claimed the job. When given, the outcome is only
+                recorded while the worker still holds the job, so a worker whose lease expired
+                cannot overwrite the outcome of the worker that took the job over.
+
+        Returns:
+            bool: False if ``worker`` no longer holds the job.
+        """
+        query = ('UPDATE jobs SET state = ?, error = ?, updated_at = ?, lease_expires = NULL'
+                 + (', worker = NULL' if state == QUEUED else '') + ' WHERE id = ?')
+        params: tuple = (state, error, time.time(), job_id)
+        if worker is not None:
+            query += ' AND state = ? AND worker = ?'
+            params += (RUNNING, worker)
+        with self._changed:
+            cursor = self._connection.execute(query, params)
+            self._changed_locked()
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that has not started yet.
+
+        Returns:
+            bool: True if the job was queued and is now cancelled.
+        """
+        with self._changed:
+            cursor = self._connection.execute(
+                'UPDATE jobs SET state = ?, updated_at = ? WHERE id = ? AND state = ?',
+                (CANCELLED, time.time(), job_id, QUEUED))
+            self._changed_locked()
+        return cursor.rowcount == 1
+
+    def recover(self) -> int:
+        """Queue jobs again whose lease expired, e.g. because their worker crashed.
+
+        Jobs leased by live workers, in this or another process, are left alone.
+        `claim` does the same before leasing jobs.
+
+        Returns:
+            int: Number of requeued jobs.
+        """
+        with self._lock:
+            return self._reclaim_locked(time.time())
+
+    def get(self, job_id: int) -> Optional[QueuedJob]:
+        """Return the job with ``job_id``, or None if it does not exist."""
+        with self._lock:
+            row = self._connection.execute(f'SELECT {_COLUMNS} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def jobs(self, state: Optional[str] = None, after: int = 0, limit: int = 100) -> List[QueuedJob]:
+        """List jobs in enqueue order.
+
+        Args:
+            state (Optional[str]): Only list jobs in this state.
+            after (int, optional): Only list jobs with a greater ID, for paging. Defaults to 0.
+            limit (int, optional): Maximum number of jobs. Defaults to 100.
+
+        Returns:
+            List[QueuedJob]: Matching jobs.
+        """
+        query, params = f'SELECT {_COLUMNS} FROM jobs WHERE id > ?', [after]
+        if state is not None:
+            query += ' AND state = ?'
+            params.append(state)
+        with self._lock:
+            rows = self._connection.execute(query + ' ORDER BY id LIMIT ?', (*params, limit)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def counts(self, source: Optional[str] = None) -> Dict[str, int]:
+        """Count jobs per state, optionally only those read from ``source``."""
+        query, params = 'SELECT state, COUNT(*) FROM jobs', ()
+        if source is not None:
+            query, params = query + ' WHERE source = ?', (source,)
+        with self._lock:
+            return dict(self._connection.execute(query + ' GROUP BY state', params).fetchall())
+
+    @property
+    def version(self) -> int:
+        """int: Counter increased by every change in this process, see `wait`."""
+        return self._version
+
+    def _changed_locked(self) -> None:
+        """Count a change and wake waiting threads; the lock must be held."""
+        self._version += 1
+        self._changed.notify_all()
+
+    def wait(self, timeout: Optional[float] = None, since: Optional[int] = None) -> bool:
+        """Block until a job is enqueued or changes state in this process.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait; None waits indefinitely.
+            since (Optional[int]): `version` read before the queue was last checked. The
+                call returns at once if a change happened since, so no wake-up is missed.
+
+        Returns:
+            bool: False if the timeout expired.
+        """
+        with self._changed:
+            if since is not None and since != self._version:
+                return True
+            return self._changed.wait(timeout)
+
+    def notify(self) -> None:
+        """Wake every thread blocked in `wait`."""
+        with self._changed:
+            self._changed_locked()
+
+    def source_offset(self, path: str) -> int:
+        """Return how many bytes of the link file ``path`` were already enqueued."""
+        with self._lock:
+            row = self._connection.execute('SELECT offset FROM sources WHERE path = ?', (path,)).fetchone()
+        return row[0] if row else 0
+
+    def sources(self) -> List[str]:
+        """Return the link files with a stored read offset."""
+        with self._lock:
+            return [row[0] for row in self._connection.execute('SELECT path FROM sources ORDER BY path')]
+
+    def move_source(self, path: str, new_path: str) -> None:
+        """Record that the link file ``path`` was moved to ``new_path`` and forget its offset."""
+        with self._lock:
+            self._connection.execute('UPDATE jobs SET source = ? WHERE source = ?', (new_path, path))
+            self._connection.execute('DELETE FROM sources WHERE path = ?', (path,))
+
+    def set_source_offset(self, path: str, offset: Optional[int]) -> None:
+        """Store the read offset of the link file ``path``; None forgets the file."""
+        with self._lock:
+            if offset is None:
+                self._connection.execute('DELETE FROM sources WHERE path = ?', (path,))
+            else:
+                self._connection.execute('INSERT OR REPLACE INTO sources (path, offset) VALUES (?, ?)',
+                                         (path, offset))
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+
+def run_jobs(queue: JobQueue, jobs: List[QueuedJob], prepare: Optional[Callable[['VideoDownloader'], None]] = None,
+             worker: Optional[str] = None) -> bool:
+    """Download claimed jobs as one batch with `VideoDownloader` and record their outcomes.
+
+    All jobs must share the options of the first one, as returned by `JobQueue.claim`.
+    Jobs cancelled by Ctrl-C or `VideoDownloader.cancel` are queued again. A playlist
+    job that was split into entry jobs fails if one of its own entries failed.
+
+    Args:
+        queue (JobQueue): Queue the jobs were claimed from.
+        jobs (List[QueuedJob]): Running jobs.
+        prepare (Optional[Callable[[VideoDownloader], None]]): Called with the downloader
+            before the batch starts, e.g. to subscribe to its events.
+        worker (Optional[str]): Worker that leased the jobs; outcomes of jobs it no longer
+            holds are dropped.
+
+    Returns:
+        bool: True if the batch was interrupted.
+    """
+    from .video_downloader import VideoDownloader  # pylint: disable=import-outside-toplevel
+
+    try:
+        downloader = VideoDownloader.from_options([job.url for job in jobs], **jobs[0].options)
+        downloader.priorities = {job.url: job.priority for job in jobs if job.priority}
+        downloader.groups = {job.url: job.source for job in jobs if job.source}
+        if prepare is not None:
+            prepare(downloader)
+        results = downloader.download_video()
+        error = "FFmpeg cannot produce the selected output." if results is None else None
+    except ValueError as e:
+        results, error = None, str(e)
+    if results is None:
+        for job in jobs:
+            queue.complete(job.id, FAILED, error, worker)
+        return False
+
+    direct = {result.url: result for result in results}
+    # A cancelled scheduler leaves out the jobs it never started.
+    interrupted = (any(result.status == CANCELLED for result in results)
+                   or any(job.url not in direct and 'list=' not in job.url for job in jobs))
+    entries = downloader.playlist_results(results) if any(job.url not in direct for job in jobs) else {}
+    for job in jobs:
+        result = direct.get(job.url)
+        if result is None:
+            failed = next((entry for entry in entries.get(job.url, []) if entry.status == FAILED), None)
+            if interrupted:
+                queue.complete(job.id, QUEUED, worker=worker)
+            else:
+                queue.complete(job.id, FAILED if failed else DONE, failed.error if failed else None, worker)
+        elif result.status == CANCELLED:
+            queue.complete(job.id, QUEUED, worker=worker)
+        else:
+            queue.complete(job.id, result.status, result.error, worker)
+    return interrupted
@@ -0,0 +1,701 @@
+"""
+This module provides the local HTTP API for submitting and tracking download jobs.
+
+`JobServer` listens on ``127.0.0.1`` by default and accepts jobs as JSON.
+Jobs are stored in the persistent `JobQueue` and downloaded by a pool of
+worker threads, each running regular `VideoDownloader` batches. The server
+also coordinates `QueueWorker` processes on other hosts, which lease jobs over
+the lease endpoints instead of opening the database. Endpoints:
+
+| Method and path | Purpose |
+|-----------------|---------|
+| ``POST /jobs`` | enqueue URLs or playlists with download options |
+| ``GET /jobs`` | list jobs, filtered with ``state``, ``after`` and ``limit`` |
+| ``GET /jobs/<id>`` | state and progress of one job |
+| ``DELETE /jobs/<id>`` | cancel a job that has not started |
+| ``GET /events`` | progress as server-sent events, optionally for one ``job`` |
+| ``GET /health`` | liveness, job counts of the session and of the whole queue |
+| ``POST /leases`` | lease queued jobs to a remote worker |
+| ``POST /leases/renew`` | extend the leases a remote worker holds |
+| ``POST /jobs/<id>/result`` | record the outcome of a leased job |
+
+Status requests are answered from `JobBoard`, an in-memory view that the
+download workers update through their event streams. A poll therefore costs
+a dictionary lookup and never waits for SQLite or a download.
+
+Classes:
+    JobBoard: In-memory state, progress and recent events of the jobs.
+    JobServer: HTTP endpoint and worker pool on top of a `JobQueue`.
+
+Functions:
+    job_options: Turns the options of a request into `VideoDownloader.from_options` arguments.
+"""
+
+import bisect
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from src.utils.cli import MODE_ALIASES, QUALITY_ALIASES
+from src.utils.link_reader import LinkStream
+from .job_queue import FINISHED_STATES, QUEUED, RUNNING, JobQueue, QueuedJob
+from .queue_worker import QueueWorker, default_worker_id
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+    from .video_downloader import VideoDownloader
+
+_REQUEST_OPTIONS = {
+    'mode': ('mode', lambda value: MODE_ALIASES.get(value, value)),
+    'quality': ('quality', lambda value: QUALITY_ALIASES.get(value, value)),
+    'format': ('output_format', lambda value: str(value).capitalize()),
+    'audio_format': ('audio_profile', str),
+    'audio_bitrate': ('audio_bitrate', str),
+    'output': ('download_folder', str),
+    'playlist_folder': ('playlist_folder', str),
+    'transfer': ('transfer_profile', str),
+}
+"""_REQUEST_OPTIONS: Request option names with their `VideoDownloader.from_options` argument and converter."""
+
+_MAX_BODY = 1024 * 1024
+"""_MAX_BODY: Largest accepted request body in bytes."""
+
+_JOB_EVENTS = ('queued', 'started', 'progress', 'retry', 'postprocessing', 'finished', 'skipped', 'failed',
+               'cancelled')
+"""_JOB_EVENTS: `EventStream` events forwarded to ``/events``."""
+
+
+def job_options(request: Dict, defaults: Optional[Dict] = None) -> Dict:
+    """Turn the options of a ``POST /jobs`` body into `VideoDownloader.from_options` arguments.
+
+    Values use the command line names, e.g. ``{"mode": "audio", "audio_format": "opus"}``
+    or ``{"quality": "720p", "format": "mkv"}``. An ``output`` folder, relative or
+    absolute, and a ``playlist_folder`` must stay inside the default download folder.
+
+    Args:
+        request (Dict): Request body.
+        defaults (Optional[Dict]): Arguments used for options the request leaves out.
+
+    Returns:
+        Dict: Keyword arguments for `VideoDownloader.from_options`.
+
+    Raises:
+        ValueError: If an option is unknown, not supported or points outside the download
+            folder. Folders are not created.
+    """
+    from src.config import app_config  # pylint: disable=import-outside-toplevel
+    from .video_downloader import VideoDownloader  # pylint: disable=import-outside-toplevel
+
+    unknown = set(request) - set(_REQUEST_OPTIONS) - {'url', 'urls', 'priority'}
+    if unknown:
+        raise ValueError(f"Unknown option: {', '.join(sorted(unknown))}")
+    options = dict(defaults or {})
+    root = os.path.realpath(os.path.expanduser(options.get('download_folder') or app_config.download_folder))
+    for name, (argument, convert) in _REQUEST_OPTIONS.items():
+        if request.get(name) is not None:
+            options[argument] = convert(request[name])
+    if request.get('output') is not None:
+        options['download_folder'] = _inside(root, options['download_folder'], 'output')
+    if request.get('playlist_folder') is not None:
+        _inside(options.get('download_folder') or root, options['playlist_folder'], 'playlist_folder')
+    VideoDownloader.check_options(**options)
+    return options
+
+
+def _inside(root: str, path: str, name: str) -> str:
+    """Resolve ``path`` against ``root`` and make sure it stays inside it.
+
+    Returns:
+        str: Resolved path.
+
+    Raises:
+        ValueError: If ``path`` leads outside ``root``.
+    """
+    resolved = os.path.realpath(os.path.join(root, os.path.expanduser(path)))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"'{name}' must be inside the download folder {root}.")
+    return resolved
+
+
+def _worker(request: Dict) -> str:
+    """Return the ``worker`` name of a lease request."""
+    worker = request.get('worker')
+    if not isinstance(worker, str) or not worker:
+        raise ValueError("'worker' must be a non-empty string.")
+    return worker
+
+
+def _number(request: Dict, name: str, kind: type = float):
+    """Return the positive number ``name`` of a lease request."""
+    value = request.get(name)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+        raise ValueError(f"'{name}' must be a positive number.")
+    return kind(value)
+
+
+class JobBoard:
+    """In-memory state, progress and recent events of the jobs.
+
+    Unfinished jobs and the last ``keep_finished`` finished jobs are kept; older
+    ones are read from the queue on request. Events are numbered and the last
+    ``history`` of them are kept, so ``/events`` clients can resume with
+    ``Last-Event-ID``.
+
+    Attributes:
+        keep_finished (int): Finished jobs kept in memory.
+    """
+
+    def __init__(self, keep_finished: int = 1000, history: int = 1000):
+        """Create an empty board.
+
+        Args:
+            keep_finished (int, optional): Finished jobs kept in memory. Defaults to 1000.
+            history (int, optional): Events kept for ``/events`` clients. Defaults to 1000.
+        """
+        self.keep_finished = keep_finished
+        self._jobs: Dict[int, Dict] = {}
+        self._finished: 'OrderedDict[int, None]' = OrderedDict()
+        self._urls: Dict[str, List[int]] = {}
+        self._events: deque = deque(maxlen=history)
+        self._sequence = 0
+        self._closed = False
+        self._changed = threading.Condition()
+
+    def put(self, job: QueuedJob) -> None:
+        """Store the state of ``job`` and publish it as a ``job`` event.
+
+        A state older than the stored one is ignored, so a request thread cannot
+        overwrite what a worker recorded meanwhile.
+        """
+        status = job.to_dict()
+        with self._changed:
+            previous = self._jobs.get(job.id)
+            if previous is not None and previous['updated_at'] > job.updated_at:
+                return
+            status['progress'] = previous.get('progress') if previous and job.state == RUNNING else None
+            self._jobs[job.id] = status
+            if job.state in FINISHED_STATES:
+                self._finished[job.id] = None
+                while len(self._finished) > self.keep_finished:
+                    self._jobs.pop(self._finished.popitem(last=False)[0], None)
+            self._publish_locked({'event': 'job', 'job': job.id, 'state': job.state, 'error': job.error})
+
+    def bind(self, jobs: Iterable[QueuedJob]) -> None:
+        """Attribute the download events of the URLs of ``jobs`` to them."""
+        with self._changed:
+            for job in jobs:
+                self._urls.setdefault(job.url, []).append(job.id)
+
+    def unbind(self, jobs: Iterable[QueuedJob]) -> None:
+        """Stop attributing events to ``jobs``."""
+        with self._changed:
+            for job in jobs:
+                ids = self._urls.get(job.url, [])
+                if job.id in ids:
+                    ids.remove(job.id)
+                if not ids:
+                    self._urls.pop(job.url, None)
+
+    def handle(self, event: Dict) -> None:
+        """`EventStream` subscriber recording the events of bound jobs.
+
+        Called from the download worker threads; only takes the board's lock briefly.
+        """
+        if event.get('event') not in _JOB_EVENTS:
+            return
+        with self._changed:
+            for job_id in self._urls.get(event.get('url'), ()):
+                if event['event'] == 'progress' and job_id in self._jobs:
+                    self._jobs[job_id]['progress'] = {
+                        key: event.get(key) for key in ('downloaded_bytes', 'total_bytes', 'speed', 'eta')}
+                self._publish_locked({**event, 'job': job_id})
+
+    def _publish_locked(self, event: Dict) -> None:
+        """Number and keep ``event`` and wake ``/events`` clients; the lock must be held."""
+        self._sequence += 1
+        self._events.append((self._sequence, event))
+        self._changed.notify_all()
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        """Return a copy of the state of ``job_id``, or None if it is not in memory."""
+        with self._changed:
+            status = self._jobs.get(job_id)
+            return dict(status) if status is not None else None
+
+    def progress(self, job_id: int) -> Optional[Dict]:
+        """Return the last progress of a running job."""
+        with self._changed:
+            status = self._jobs.get(job_id)
+            return status.get('progress') if status is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        """Count the jobs in memory per state."""
+        counts: Dict[str, int] = {}
+        with self._changed:
+            for status in self._jobs.values():
+                counts[status['state']] = counts.get(status['state'], 0) + 1
+        return counts
+
+    def events(self, after: int, job_id: Optional[int] = None,
+               timeout: Optional[float] = None) -> Tuple[int, List[Tuple[int, Dict]]]:
+        """Wait for events newer than ``after``.
+
+        Args:
+            after (int): Number of the last event the client has seen.
+            job_id (Optional[int]): Only return events of this job.
+            timeout (Optional[float]): Seconds to wait for a new event.
+
+        Returns:
+            Tuple[int, List[Tuple[int, Dict]]]: Number of the newest event, and the
+            numbered events; empty after the timeout or when the board is closed.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._sequence > after or self._closed, timeout)
+            if not self._events:
+                return self._sequence, []
+            start = bisect.bisect_right([sequence for sequence, _ in self._events], after)
+            events = [(sequence, event) for sequence, event in list(self._events)[start:]
+                      if job_id is None or event.get('job') == job_id]
+            return self._sequence, events
+
+    @property
+    def sequence(self) -> int:
+        """int: Number of the newest event."""
+        return self._sequence
+
+    @property
+    def closed(self) -> bool:
+        """bool: True once `close` was called."""
+        return self._closed
+
+    def close(self) -> None:
+        """Wake and end every waiting ``/events`` client."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+
+class JobServer:
+    """Local HTTP API and worker pool on top of a `JobQueue`.
+
+    Every worker leases up to ``batch_size`` queued jobs with the same options
+    and downloads them as one `VideoDownloader` batch, so jobs beyond that stay
+    queued and can still be cancelled. With ``workers=0`` the server only
+    queues jobs and leases them to remote `QueueWorker` processes.
+
+    Attributes:
+        queue (JobQueue): Persistent queue of the jobs.
+        host (str): Listening address. Anything but ``127.0.0.1`` exposes the API, which has
+            no authentication, to the network; only use it on trusted networks.
+        port (int): Listening port; the bound port after `start`.
+        workers (int): Batches downloaded at the same time by this process.
+        batch_size (int): Jobs per batch.
+        worker_lease (float): Seconds a worker holds its batch without a heartbeat.
+        defaults (Dict): `VideoDownloader.from_options` arguments for options a request leaves out.
+        board (JobBoard): In-memory view answering status requests.
+
+    Example:
+        ```python
+        server = JobServer(JobQueue(app_config.job_queue_path), port=8765)
+        server.run()  # until Ctrl-C
+        ```
+        ```bash
+        curl -s localhost:8765/jobs --json '{"urls": ["https://youtu.be/dQw4w9WgXcQ"], "mode": "audio"}'
+        curl -s localhost:8765/jobs/1
+        curl -sN localhost:8765/events?job=1
+        ```
+    """
+
+    def __init__(self, queue: JobQueue, port: int = 8765, workers: int = 2, batch_size: int = 3,
+                 defaults: Optional[Dict] = None, keepalive: float = 15.0, host: str = '127.0.0.1',
+                 worker_lease: float = 60.0):
+        """Create the server. Nothing is started before `start`.
+
+        Args:
+            queue (JobQueue): Persistent queue of the jobs.
+            port (int, optional): Port; 0 picks a free port. Defaults to 8765.
+            workers (int, optional): Batches downloaded at the same time; 0 leaves all jobs
+                to remote workers. Defaults to 2.
+            batch_size (int, optional): Jobs per batch. Defaults to 3.
+            defaults (Optional[Dict]): Arguments for options a request leaves out.
+            keepalive (float, optional): Seconds between keep-alive comments on idle
+                ``/events`` streams. Defaults to 15.
+            host (str, optional): Listening address. Defaults to ``127.0.0.1``.
+            worker_lease (float, optional): Seconds a worker holds its batch without a heartbeat.
+                Defaults to 60.
+        """
+        self.queue = queue
+        self.host = host
+        self.port = port
+        self.workers = max(0, workers)
+        self.batch_size = max(1, batch_size)
+        self.defaults = dict(defaults or {})
+        self.keepalive = keepalive
+        self.worker_lease = worker_lease
+        self.board = JobBoard()
+        self._stopping = threading.Event()
+        self._active: Set['VideoDownloader'] = set()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._server: Optional['ThreadingHTTPServer'] = None
+
+    def start(self) -> 'JobServer':
+        """Queue jobs with an expired lease again and start the endpoint and the workers.
+
+        Returns:
+            JobServer: ``self``; ``port`` holds the bound port.
+        """
+        from http.server import ThreadingHTTPServer  # pylint: disable=import-outside-toplevel
+
+        self.queue.recover()
+        after = 0
+        while True:
+            jobs = self.queue.jobs(QUEUED, after=after, limit=1000)
+            for job in jobs:
+                self.board.put(job)
+            if len(jobs) < 1000:
+                break
+            after = jobs[-1].id
+
+        class Server(ThreadingHTTPServer):
+            """Threaded server with a backlog for bursts of status polls."""
+
+            daemon_threads = True
+            request_queue_size = 128
+
+        self._server = Server((self.host, self.port), self._handler())
+        self.port = self._server.server_address[1]
+        self._spawn(self._server.serve_forever, 'streamflow-api-http')
+        for index in range(self.workers):
+            self._spawn(lambda index=index: self._work(index), f'streamflow-api-worker-{index}')
+        return self
+
+    def _spawn(self, target, name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def run(self) -> None:
+        """Start the server and serve until Ctrl-C."""
+        self.start()
+        print(f"Serving the job API on http://{self.host}:{self.port}. Press Ctrl-C to stop.")
+        try:
+            self._stopping.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stop accepting requests, cancel the running batches and wait for the workers.
+
+        Jobs that have not started are queued again for the next start.
+        """
+        self._stopping.set()
+        with self._lock:
+            active = list(self._active)
+        for downloader in active:
+            downloader.cancel()
+        self.queue.notify()
+        self.board.close()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, request: Dict) -> List[Dict]:
+        """Enqueue the URLs of a ``POST /jobs`` body.
+
+        Args:
+            request (Dict): ``url`` or ``urls``, an optional integer ``priority`` and options as
+                accepted by `job_options`.
+
+        Returns:
+            List[Dict]: The new jobs.
+
+        Raises:
+            ValueError: If the body holds no valid URL or an unsupported option.
+        """
+        urls = request.get('urls') or ([request['url']] if request.get('url') else [])
+        if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+            raise ValueError("'urls' must be a list of strings.")
+        priority = request.get('priority', 0)
+        if isinstance(priority, bool) or not isinstance(priority, int):
+            raise ValueError("'priority' must be an integer.")
+        options = job_options(request, self.defaults)
+        urls = list(LinkStream(lines=urls))
+        if not urls:
+            raise ValueError("No valid URL given.")
+        jobs = [self.queue.get(job_id) for job_id in self.queue.enqueue(urls, options, priority=priority)]
+        for job in jobs:
+            self.board.put(job)
+        return [self.status(job.id) for job in jobs]
+
+    def cancel(self, job_id: int) -> Optional[bool]:
+        """Cancel a queued job.
+
+        Returns:
+            Optional[bool]: True if it was cancelled, False if it already started, None if it does not exist.
+        """
+        if not self.queue.cancel(job_id):
+            return None if self.queue.get(job_id) is None else False
+        self.board.put(self.queue.get(job_id))
+        return True
+
+    def lease(self, request: Dict) -> List[Dict]:
+        """Lease queued jobs to the remote worker of a ``POST /leases`` body.
+
+        Args:
+            request (Dict): ``worker`` name, ``limit`` of jobs and ``lease`` in seconds.
+
+        Returns:
+            List[Dict]: The leased jobs; empty if nothing is queued.
+
+        Raises:
+            ValueError: If a field is missing or invalid.
+        """
+        worker = _worker(request)
+        jobs = self.queue.claim(_number(request, 'limit', int), worker=worker, lease=_number(request, 'lease'))
+        for job in jobs:
+            self.board.put(job)
+        return [job.to_dict() for job in jobs]
+
+    def renew(self, request: Dict) -> List[int]:
+        """Extend the leases of a ``POST /leases/renew`` body.
+
+        Args:
+            request (Dict): ``worker`` name, job ``ids`` and ``lease`` in seconds.
+
+        Returns:
+            List[int]: IDs of the jobs the worker still holds.
+
+        Raises:
+            ValueError: If a field is missing or invalid.
+        """
+        ids = request.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(job_id, int) for job_id in ids):
+            raise ValueError("'ids' must be a list of job IDs.")
+        return self.queue.renew(_worker(request), ids, _number(request, 'lease'))
+
+    def report(self, job_id: int, request: Dict) -> bool:
+        """Record the outcome of a leased job from a ``POST /jobs/<id>/result`` body.
+
+        Args:
+            job_id (int): Job ID.
+            request (Dict): ``worker`` name, ``state`` and optional ``error``.
+
+        Returns:
+            bool: False if the worker no longer holds the job.
+
+        Raises:
+            ValueError: If a field is missing or invalid.
+        """
+        state = request.get('state')
+        if state not in FINISHED_STATES + (QUEUED,):
+            raise ValueError(f"Invalid state: {state}")
+        error = request.get('error')
+        if not self.queue.complete(job_id, state, str(error) if error is not None else None, _worker(request)):
+            return False
+        self.board.put(self.queue.get(job_id))
+        return True
+
+    def status(self, job_id: int) -> Optional[Dict]:
+        """Return the state of ``job_id`` from the board, or from the queue for old jobs."""
+        status = self.board.get(job_id)
+        if status is None:
+            job = self.queue.get(job_id)
+            if job is None:
+                return None
+            status = {**job.to_dict(), 'progress': None}
+        return status
+
+    def _attach(self, downloader: 'VideoDownloader') -> None:
+        """Feed the events of a worker's downloader into the board."""
+        downloader.events.subscribe(self.board.handle)
+        with self._lock:
+            self._active.add(downloader)
+        if self._stopping.is_set():
+            downloader.cancel()
+
+    def _work(self, index: int) -> None:
+        """Download leased batches of queued jobs until `stop` is called.
+
+        The jobs are leased like those of a `QueueWorker` process, so other
+        servers or workers sharing the queue leave them alone while this one runs.
+        The queue is checked again after ``worker_lease`` seconds without a change here,
+        which picks up jobs whose worker died in another process.
+        """
+        worker = QueueWorker(self.queue, default_worker_id(f'api-{index}'), self.worker_lease,
+                             self.batch_size)
+        while not self._stopping.is_set():
+            version = self.queue.version
+            jobs = worker.claim()
+            if not jobs:
+                self.queue.wait(self.worker_lease, since=version)
+                continue
+            self.board.bind(jobs)
+            for job in jobs:
+                self.board.put(job)
+            prepared: List['VideoDownloader'] = []
+
+            def prepare(downloader: 'VideoDownloader') -> None:
+                prepared.append(downloader)
+                self._attach(downloader)
+
+            try:
+                worker.run_batch(jobs, prepare=prepare)
+            finally:
+                with self._lock:
+                    self._active.difference_update(prepared)
+                self.board.unbind(jobs)
+                for job in jobs:
+                    self.board.put(self.queue.get(job.id))
+
+    def _handler(self):
+        """Build the request handler class bound to this server."""
+        from http.server import BaseHTTPRequestHandler  # pylint: disable=import-outside-toplevel
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Serve the job API as JSON."""
+
+            protocol_version = 'HTTP/1.1'
+
+            def _send_json(self, status: int, payload) -> None:
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _error(self, status: int, message: str) -> None:
+                self._send_json(status, {'error': message})
+
+            def _job_id(self, path: str) -> Optional[int]:
+                parts = path.strip('/').split('/')
+                if len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+                    return int(parts[1])
+                return None
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                url = urlsplit(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                job_id = self._job_id(url.path)
+                try:
+                    if url.path == '/jobs':
+                        jobs = server.queue.jobs(query.get('state'), after=int(query.get('after', 0)),
+                                                 limit=min(1000, int(query.get('limit', 100))))
+                        self._send_json(200, {'jobs': [{**job.to_dict(), 'progress': server.board.progress(job.id)}
+                                                       for job in jobs]})
+                    elif job_id is not None:
+                        status = server.status(job_id)
+                        if status is None:
+                            self._error(404, f"Job {job_id} does not exist.")
+                        else:
+                            self._send_json(200, status)
+                    elif url.path == '/events':
+                        self._stream(int(query['job']) if 'job' in query else None)
+                    elif url.path == '/health':
+                        self._send_json(200, {'status': 'ok', 'jobs': server.board.counts(),
+                                              'queue': server.queue.counts()})
+                    else:
+                        self._error(404, "Not found.")
+                except ValueError:
+                    self._error(400, "Invalid query parameter.")
+
+            def _refused(self) -> bool:
+                """Answer requests a web page could send cross-site; True if the request was refused."""
+                origin = self.headers.get('Origin')
+                if origin is not None and origin != f"http://{self.headers.get('Host')}":
+                    self.close_connection = True
+                    self._error(403, "Cross-origin requests are not allowed.")
+                    return True
+                return False
+
+            def do_POST(self):  # pylint: disable=invalid-name
+                if self._refused():
+                    return
+                content_type = (self.headers.get('Content-Type') or '').split(';', 1)[0].strip().lower()
+                if content_type != 'application/json':
+                    self.close_connection = True
+                    self._error(415, "The body must be sent as application/json.")
+                    return
+                path = self.path.split('?', 1)[0]
+                parts = path.strip('/').split('/')
+                result_of = (int(parts[1]) if len(parts) == 3 and parts[0] == 'jobs' and parts[1].isdigit()
+                             and parts[2] == 'result' else None)
+                if path not in ('/jobs', '/leases', '/leases/renew') and result_of is None:
+                    self._error(404, "Not found.")
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > _MAX_BODY:
+                    self.close_connection = True
+                    self._error(413, "Request body is too large.")
+                    return
+                try:
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                    if not isinstance(request, dict):
+                        raise ValueError("The body must be a JSON object.")
+                    if path == '/leases':
+                        self._send_json(200, {'jobs': server.lease(request)})
+                    elif path == '/leases/renew':
+                        self._send_json(200, {'ids': server.renew(request)})
+                    elif result_of is not None:
+                        if server.report(result_of, request):
+                            self._send_json(200, server.status(result_of))
+                        else:
+                            self._error(409, f"Job {result_of} is not leased to {request.get('worker')}.")
+                    else:
+                        self._send_json(201, {'jobs': server.submit(request)})
+                except (OSError, ValueError) as e:
+                    self._error(400, str(e))
+
+            def do_DELETE(self):  # pylint: disable=invalid-name
+                if self._refused():
+                    return
+                job_id = self._job_id(self.path.split('?', 1)[0])
+                if job_id is None:
+                    self._error(404, "Not found.")
+                    return
+                cancelled = server.cancel(job_id)
+                if cancelled is None:
+                    self._error(404, f"Job {job_id} does not exist.")
+                elif not cancelled:
+                    self._error(409, f"Job {job_id} has already started.")
+                else:
+                    self._send_json(200, server.status(job_id))
+
+            def _stream(self, job_id: Optional[int]) -> None:
+                """Send events as ``text/event-stream`` until the client or the server goes away."""
+                after = int(self.headers.get('Last-Event-ID') or 0)
+                if not after:
+                    after = server.board.sequence
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                try:
+                    while not server.board.closed:
+                        latest, events = server.board.events(after, job_id, timeout=server.keepalive)
+                        chunk = ''.join(f"id: {sequence}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+                                        for sequence, event in events)
+                        if latest == after:
+                            chunk = ': keep-alive\n\n'
+                        after = latest
+                        if chunk:
+                            self.wfile.write(chunk.encode('utf-8'))
+                            self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        return Handler
@@ -0,0 +1,374 @@
+"""
+This module provides a content-addressed store of downloaded media files.
+
+Every downloaded file is added to the store as a blob named after the SHA-256
+of its contents, and recorded under a media key made of the source ID and the
+requested format, e.g. ``youtube:dQw4w9WgXcQ:video/The best/Mp4``. A later
+request for the same key, in any folder, is satisfied with a hardlink, a
+reflink or a symlink to the blob instead of a new download. Files whose source
+ID is unknown are still deduplicated by their content hash once downloaded.
+
+The index is a SQLite database in WAL mode, like the download archive.
+
+Classes:
+    StoredMedia: Blob recorded under a media key.
+    GcStats: Outcome of a garbage collection.
+    MediaStore: Content-addressed blobs, media keys and the links pointing at them.
+
+Functions:
+    file_digest: Returns the SHA-256 of a file.
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+LINK_MODES = ('hardlink', 'reflink', 'symlink', 'copy')
+"""LINK_MODES: Ways a blob can be placed at a download path, in `MediaStore.link_modes`."""
+
+_FICLONE = 0x40049409
+"""_FICLONE: Linux ``ioctl`` request cloning a file's extents (reflink)."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    added_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS media (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    title TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS media_by_digest ON media (digest);
+CREATE TABLE IF NOT EXISTS links (
+    path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    mode TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS links_by_digest ON links (digest);
+"""
+
+_ADDED_COLUMNS = {'size': 'INTEGER', 'mtime_ns': 'INTEGER'}
+"""_ADDED_COLUMNS: Columns added to ``links`` after its first release, created in older databases on open."""
+
+
+@dataclass
+class StoredMedia:
+    """Blob recorded under a media key.
+
+    Attributes:
+        digest (str): SHA-256 of the contents.
+        ext (str): File extension without the dot.
+        title (Optional[str]): Title used in filenames, as sanitized by yt-dlp.
+        path (str): Location of the blob.
+    """
+
+    digest: str
+    ext: str
+    title: Optional[str]
+    path: str
+
+
+@dataclass
+class GcStats:
+    """Outcome of `MediaStore.gc`.
+
+    Attributes:
+        blobs (int): Removed (or, in a dry run, removable) blobs.
+        bytes (int): Disk space of those blobs.
+        links (int): Forgotten links whose file was deleted or replaced.
+    """
+
+    blobs: int = 0
+    bytes: int = 0
+    links: int = 0
+
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of the file at ``path``."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(source: str, target: str) -> None:
+    """Create ``target`` as a copy-on-write clone of ``source``.
+
+    Raises:
+        OSError: If the platform or file system does not support reflinks.
+    """
+    try:
+        import fcntl  # pylint: disable=import-outside-toplevel
+    except ImportError as e:
+        raise OSError("reflinks are not supported on this platform") from e
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+class MediaStore:
+    """Content-addressed blobs, media keys and the links pointing at them.
+
+    Blobs live in ``root/blobs/<2 hex digits>/<digest>.<ext>``. Hardlinks and
+    reflinks need the store on the same file system as the download folders;
+    otherwise links fall back to symlinks or copies.
+
+    Attributes:
+        root (str): Store folder.
+        link_modes (Tuple[str, ...]): Ways of placing a blob at a download path, tried in
+            order; see `LINK_MODES`.
+
+    Example:
+        ```python
+        store = MediaStore('~/.local/share/streamflow/store')
+        stored = store.lookup('youtube:dQw4w9WgXcQ:audio/mp3/192')
+        if stored:
+            store.link(stored, '/music/Rick Astley - Never Gonna Give You Up.mp3')
+        ```
+    """
+
+    def __init__(self, root: str, link_modes: Iterable[str] = ('hardlink', 'reflink', 'symlink'),
+                 timeout: float = 30.0):
+        """Open or create the store.
+
+        Args:
+            root (str): Store folder. It is created if missing.
+            link_modes (Iterable[str], optional): Ways of placing a blob at a download path,
+                tried in order. Defaults to hardlink, reflink, symlink.
+            timeout (float, optional): Seconds to wait for a concurrent writer. Defaults to 30.
+
+        Raises:
+            ValueError: If a link mode is unknown.
+        """
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.link_modes = tuple(link_modes)
+        unknown = set(self.link_modes) - set(LINK_MODES)
+        if unknown:
+            raise ValueError(f"Unknown link mode: {', '.join(sorted(unknown))}")
+        os.makedirs(os.path.join(self.root, 'blobs'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), timeout=timeout,
+                                           check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(_SCHEMA)
+        existing = {row[1] for row in self._connection.execute('PRAGMA table_info(links)')}
+        for column, definition in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._connection.execute(f'ALTER TABLE links ADD COLUMN {column} {definition}')
+
+    def blob_path(self, digest: str, ext: str) -> str:
+        """Return the location of the blob ``digest``."""
+        return os.path.join(self.root, 'blobs', digest[:2], f'{digest}.{ext}' if ext else digest)
+
+    def lookup(self, key: str) -> Optional[StoredMedia]:
+        """Return the blob recorded under ``key``, or None if there is none or it was removed."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT media.digest, blobs.ext, media.title FROM media JOIN blobs USING (digest) '
+                'WHERE media.key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        stored = StoredMedia(row[0], row[1], row[2], self.blob_path(row[0], row[1]))
+        return stored if os.path.isfile(stored.path) else None
+
+    def add(self, path: str, key: Optional[str] = None, title: Optional[str] = None) -> StoredMedia:
+        """Add a downloaded file to the store.
+
+        A file whose contents are new becomes a blob, hardlinked (or copied) from
+        ``path``. A file with the contents of an existing blob is replaced by a link
+        to that blob, so the copy is freed.
+
+        Args:
+            path (str): Downloaded file.
+            key (Optional[str]): Media key of the file; None when the source ID is unknown.
+            title (Optional[str]): Title used in filenames, for later links under other templates.
+
+        Returns:
+            StoredMedia: The blob holding the file's contents.
+
+        Raises:
+            OSError: If the file cannot be read or the blob cannot be written.
+        """
+        path = os.path.abspath(path)
+        ext = os.path.splitext(path)[1][1:]
+        digest = file_digest(path)
+        blob = self.blob_path(digest, ext)
+        stored = StoredMedia(digest, ext, title, blob)
+        if os.path.isfile(blob):
+            if not os.path.samefile(blob, path):
+                mode = self._place(blob, path)
+                self._record_link(path, digest, mode)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            temporary = f'{blob}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                os.link(path, temporary)
+                mode = 'hardlink'
+            except OSError:
+                shutil.copyfile(path, temporary)
+                mode = 'copy'
+            os.replace(temporary, blob)
+            self._record_link(path, digest, mode)
+        with self._lock:
+            self._connection.execute('INSERT OR IGNORE INTO blobs (digest, ext, size, added_at) VALUES (?, ?, ?, ?)',
+                                     (digest, ext, os.path.getsize(blob), time.time()))
+            if key is not None:
+                self._connection.execute('INSERT OR REPLACE INTO media (key, digest, title) VALUES (?, ?, ?)',
+                                         (key, digest, title))
+        return stored
+
+    def link(self, stored: StoredMedia, target: str) -> str:
+        """Place the blob ``stored`` at ``target``.
+
+        A file that already exists at ``target`` is kept if it is the blob itself.
+        A copy with the blob's size and digest, or a dangling symlink, is replaced
+        by a link, so it no longer takes space. Any other file is left alone and
+        the link fails.
+
+        Returns:
+            str: Link mode used, see `LINK_MODES`; ``'existing'`` if ``target`` already is the blob.
+
+        Raises:
+            FileExistsError: If ``target`` holds other contents.
+            OSError: If no link mode works.
+        """
+        target = os.path.abspath(target)
+        if os.path.exists(target):
+            try:
+                if os.path.samefile(target, stored.path):
+                    self._record_link(target, stored.digest, 'symlink' if os.path.islink(target) else 'hardlink')
+                    return 'existing'
+                replaceable = (os.path.getsize(target) == os.path.getsize(stored.path)
+                               and file_digest(target) == stored.digest)
+            except OSError:
+                replaceable = False
+            if not replaceable:
+                raise FileExistsError(errno.EEXIST, "A different file is in the way", target)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        mode = self._place(stored.path, target)
+        self._record_link(target, stored.digest, mode)
+        return mode
+
+    def _place(self, blob: str, target: str) -> str:
+        """Atomically put a link to ``blob`` at ``target`` with the first working link mode."""
+        temporary = os.path.join(os.path.dirname(target), f'.{os.path.basename(target)}.streamflow-link')
+        error: Optional[OSError] = None
+        for mode in self.link_modes:
+            try:
+                if os.path.lexists(temporary):
+                    os.remove(temporary)
+                if mode == 'hardlink':
+                    os.link(blob, temporary)
+                elif mode == 'reflink':
+                    _reflink(blob, temporary)
+                elif mode == 'symlink':
+                    os.symlink(blob, temporary)
+                else:
+                    shutil.copyfile(blob, temporary)
+                os.replace(temporary, target)
+                return mode
+            except OSError as e:
+                error = e
+        raise error or OSError(f"No link mode configured for {target}")
+
+    def _record_link(self, path: str, digest: str, mode: str) -> None:
+        """Remember that ``path`` holds the blob ``digest``, with its size and modification time."""
+        try:
+            info = os.stat(path)
+            size, mtime_ns = info.st_size, info.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO links (path, digest, mode, size, mtime_ns) VALUES (?, ?, ?, ?, ?)',
+                (path, digest, mode, size, mtime_ns))
+
+    @staticmethod
+    def _is_linked(path: str, blob: str, mode: str, size: Optional[int], mtime_ns: Optional[int]) -> bool:
+        """Check whether the file at ``path`` still refers to, or for copies still equals, ``blob``."""
+        try:
+            if mode == 'symlink':
+                return os.path.islink(path) and os.path.realpath(path) == os.path.realpath(blob)
+            if mode == 'hardlink':
+                return os.path.samefile(path, blob)
+            info = os.stat(path)
+            return size is not None and (info.st_size, info.st_mtime_ns) == (size, mtime_ns)
+        except OSError:
+            return False
+
+    def gc(self, dry_run: bool = False) -> GcStats:
+        """Remove blobs that no downloaded file refers to.
+
+        A blob is referenced while a hardlink or a symlink created by the store
+        still points at it, or a reflink or copy placed by the store is unchanged,
+        i.e. still has the size and modification time it was recorded with. Links
+        whose file was deleted, replaced or modified are forgotten.
+
+        Args:
+            dry_run (bool, optional): Only count what would be removed. Defaults to False.
+
+        Returns:
+            GcStats: Removed blobs, reclaimed bytes and forgotten links.
+        """
+        stats = GcStats()
+        with self._lock:
+            blobs = self._connection.execute('SELECT digest, ext, size FROM blobs').fetchall()
+            links = self._connection.execute('SELECT path, digest, mode, size, mtime_ns FROM links').fetchall()
+        alive = set()
+        dead_links = []
+        paths = {digest: self.blob_path(digest, ext) for digest, ext, _ in blobs}
+        for path, digest, mode, size, mtime_ns in links:
+            if digest in paths and self._is_linked(path, paths[digest], mode, size, mtime_ns):
+                alive.add(digest)
+            else:
+                dead_links.append(path)
+        stats.links = len(dead_links)
+        unreferenced = [(digest, size) for digest, _, size in blobs if digest not in alive]
+        stats.blobs = len(unreferenced)
+        stats.bytes = sum(size for _, size in unreferenced)
+        if dry_run:
+            return stats
+        for digest, _ in unreferenced:
+            try:
+                os.remove(paths[digest])
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._connection.executemany('DELETE FROM links WHERE path = ?', [(path,) for path in dead_links])
+                for digest, _ in unreferenced:
+                    self._connection.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+                    self._connection.execute('DELETE FROM media WHERE digest = ?', (digest,))
+                    self._connection.execute('DELETE FROM links WHERE digest = ?', (digest,))
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+        return stats
+
+    def usage(self) -> Tuple[int, int]:
+        """Return the number of blobs and their total size in bytes."""
+        with self._lock:
+            count, size = self._connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+        return count, size
+
+    def close(self) -> None:
+        """Close the index database."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,180 @@
+"""
+This module provides an on-disk cache of extracted video information.
+
+Extracting the info JSON of a video is often the slowest and most
+rate-limited step of a download. yt-dlp writes the info of every download into
+the cache, and later jobs for the same video, for example a retry or a
+different quality, start from the cached info instead of extracting it again.
+
+Classes:
+    MetadataCache: Size-bounded, expiring store of yt-dlp info JSON files.
+
+Functions:
+    describe_info: Returns the title, duration and estimated size of an info dictionary.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+SUFFIX = '.info.json'
+"""SUFFIX: Extension yt-dlp appends to info JSON files."""
+
+
+def describe_info(info: Dict) -> Dict:
+    """Return the details of an info dictionary shown before a download.
+
+    Args:
+        info (Dict): yt-dlp info dictionary.
+
+    Returns:
+        Dict: ``title``, ``duration`` in seconds and estimated ``filesize`` in bytes.
+        Unknown values are None.
+    """
+    formats = info.get('requested_formats') or []
+    sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+    if formats and all(sizes):
+        filesize = sum(sizes)
+    else:
+        filesize = info.get('filesize') or info.get('filesize_approx')
+    return {'title': info.get('title'), 'duration': info.get('duration'), 'filesize': filesize}
+
+
+class MetadataCache:
+    """Size-bounded, expiring store of yt-dlp info JSON files.
+
+    Every video is stored as ``<extractor>-<id>.info.json``, the name yt-dlp
+    produces for the ``infojson`` output template returned by `template`, so
+    both engines can write into the cache and read from it directly. A file's
+    modification time is the extraction time and decides expiry; its access time
+    is updated on every hit and decides which files are evicted first when the
+    cache grows beyond ``max_bytes``.
+
+    Attributes:
+        folder (str): Directory holding the info JSON files.
+        ttl (float): Seconds an entry stays valid. Stream URLs in the info expire, so
+            this should stay well below a few hours.
+        max_bytes (int): Total size of the cache before least recently used entries are evicted.
+
+    Example:
+        ```python
+        cache = MetadataCache('~/.cache/streamflow/metadata')
+        info_path = cache.lookup('youtube', 'dQw4w9WgXcQ')
+        ```
+    """
+
+    def __init__(self, folder: str, ttl: float = 3600.0, max_bytes: int = 256 * 1024 * 1024):
+        """Open or create the cache.
+
+        Args:
+            folder (str): Directory holding the info JSON files. Created if missing.
+            ttl (float, optional): Seconds an entry stays valid. Defaults to one hour.
+            max_bytes (int, optional): Size limit of the cache. Defaults to 256 MiB.
+        """
+        self.folder = os.path.expanduser(folder)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+
+    @property
+    def template(self) -> str:
+        """str: yt-dlp ``infojson`` output template writing into the cache."""
+        return os.path.join(self.folder, '%(extractor)s-%(id)s')
+
+    def path(self, extractor: str, video_id: str) -> str:
+        """Return the location of the entry of a video, whether it exists or not."""
+        return os.path.join(self.folder, f"{extractor}-{video_id}{SUFFIX}")
+
+    def lookup(self, extractor: str, video_id: str) -> Optional[str]:
+        """Return the info JSON file of a video if it is cached and fresh.
+
+        Expired entries are removed, so yt-dlp writes a fresh one on the next download.
+
+        Args:
+            extractor (str): Extractor name, for example ``'youtube'``.
+            video_id (str): Video ID within the extractor.
+
+        Returns:
+            Optional[str]: Path of the info JSON file, or None on a cache miss.
+        """
+        path = self.path(extractor, video_id)
+        try:
+            modified = os.stat(path).st_mtime
+            if time.time() - modified > self.ttl:
+                os.remove(path)
+                return None
+            os.utime(path, (time.time(), modified))
+        except OSError:
+            return None
+        return path
+
+    def get(self, extractor: str, video_id: str) -> Optional[Dict]:
+        """Return the cached info dictionary of a video.
+
+        Args:
+            extractor (str): Extractor name.
+            video_id (str): Video ID within the extractor.
+
+        Returns:
+            Optional[Dict]: Info dictionary, or None on a cache miss or unreadable entry.
+        """
+        path = self.lookup(extractor, video_id)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, info: Dict) -> str:
+        """Store a sanitized info dictionary and evict entries beyond the size limit.
+
+        Args:
+            info (Dict): JSON-serializable info with ``extractor`` and ``id`` keys.
+
+        Returns:
+            str: Path of the stored entry.
+        """
+        path = self.path(info['extractor'], info['id'])
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def evict(self) -> int:
+        """Remove expired entries and the least recently used entries beyond ``max_bytes``.
+
+        Returns:
+            int: Number of removed entries.
+        """
+        now = time.time()
+        with self._lock:
+            entries = []
+            with os.scandir(self.folder) as listing:
+                for entry in listing:
+                    if not entry.name.endswith(SUFFIX):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+            total = sum(size for _, _, size, _ in entries)
+            removed = 0
+            for _, modified, size, path in entries:
+                if total <= self.max_bytes and now - modified <= self.ttl:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            return removed
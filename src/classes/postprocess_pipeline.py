@@ -0,0 +1,276 @@
+"""
+This module runs FFmpeg post-processing as a separate stage of the download pipeline.
+
+With staged post-processing, download workers only fetch the raw streams of a
+job into its staging directory (see `DownloadJob.stage_dir`) and hand the job
+to `PostprocessPipeline`. The pipeline's workers merge, remux or convert the
+streams with FFmpeg and move the result to its final path while the download
+workers already fetch the next URLs, so network and CPU are busy at the same
+time. The queue between both stages is bounded: when FFmpeg falls behind, the
+download workers wait instead of filling the disk with staged streams.
+
+Classes:
+    PostprocessError: Raised when a staged job cannot be finished.
+    PostprocessPipeline: Bounded queue and worker pool running FFmpeg.
+
+Functions:
+    staged_inputs: Lists the raw streams fetched into a staging directory.
+    build_postprocess_command: Builds the FFmpeg command producing the final file.
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from src.utils.storage import publish_file
+from .download_engine import STAGED_MEDIA, STAGED_NAME, DownloadEngineError, DownloadJob
+from .download_scheduler import DownloadResult
+
+_SOURCE_CODECS = {
+    'm4a': 'aac', 'aac': 'aac', 'webm': 'opus', 'opus': 'opus', 'mp3': 'mp3',
+    'ogg': 'vorbis', 'oga': 'vorbis', 'flac': 'flac', 'wav': 'wav',
+}
+"""_SOURCE_CODECS: Audio codec of an audio-only stream, by file extension."""
+
+_CODEC_EXTENSIONS = {'aac': 'm4a', 'opus': 'opus', 'mp3': 'mp3', 'vorbis': 'ogg', 'flac': 'flac', 'wav': 'wav'}
+"""_CODEC_EXTENSIONS: Extension of an audio file holding a codec without re-encoding."""
+
+_AUDIO_TARGETS = {
+    'mp3': ('mp3', 'libmp3lame'),
+    'opus': ('opus', 'libopus'),
+    'm4a': ('aac', 'aac'),
+    'vorbis': ('vorbis', 'libvorbis'),
+    'flac': ('flac', 'flac'),
+    'wav': ('wav', 'pcm_s16le'),
+}
+"""_AUDIO_TARGETS: Codec and FFmpeg encoder of every ``DownloadJob.audio_format`` except ``'best'``."""
+
+
+class PostprocessError(DownloadEngineError):
+    """Raised when the staged streams of a job cannot be turned into the final file."""
+
+
+def _extension(path: str) -> str:
+    """Return the extension of ``path`` without the dot."""
+    return os.path.splitext(path)[1][1:].lower()
+
+
+def staged_inputs(stage_dir: str, formats: Optional[str] = None) -> List[str]:
+    """List the complete raw streams yt-dlp fetched into ``stage_dir``.
+
+    Args:
+        stage_dir (str): Staging directory of a job.
+        formats (Optional[str]): Comma-separated format IDs of the job, see `DownloadJob.staged_formats`.
+            Streams of other formats, left by an earlier attempt, are skipped. Defaults to all streams.
+
+    Returns:
+        List[str]: Sorted paths; partial downloads are left out.
+    """
+    try:
+        names = os.listdir(stage_dir)
+    except OSError:
+        return []
+    prefixes = tuple(f'{STAGED_MEDIA}.f{format_id}.' for format_id in formats.split(',')) if formats else \
+        (f'{STAGED_MEDIA}.',)
+    return sorted(os.path.join(stage_dir, name) for name in names
+                  if name.startswith(prefixes) and '.part' not in name
+                  and not name.endswith(('.ytdl', '.temp')))
+
+
+def build_postprocess_command(job: DownloadJob, inputs: List[str]) -> Tuple[Optional[List[str]], str]:
+    """Build the FFmpeg command turning the staged streams of ``job`` into its output.
+
+    Streams are copied whenever the target container can hold them: separate
+    video and audio streams are merged, a single stream is remuxed and audio is
+    only encoded when its codec differs from the requested one.
+
+    Args:
+        job (DownloadJob): Job whose ``merge_output_format`` or audio settings describe the output.
+        inputs (List[str]): Raw streams of the job, see `staged_inputs`.
+
+    Returns:
+        Tuple[Optional[List[str]], str]: The command, or None if the only stream already
+        is the final file, and the path of the file to publish.
+
+    Raises:
+        PostprocessError: If the requested audio format is not supported, or audio is to be
+            extracted from more than one stream.
+    """
+    stage_dir = os.path.dirname(inputs[0])
+    command = ['ffmpeg', '-y', '-nostdin', '-loglevel', 'error']
+    if job.extract_audio:
+        if len(inputs) > 1:
+            raise PostprocessError(f"Expected one stream to extract audio from, got {len(inputs)}: "
+                                   f"{', '.join(os.path.basename(path) for path in inputs)}")
+        source = inputs[0]
+        codec = _SOURCE_CODECS.get(_extension(source))
+        if job.audio_format == 'best':
+            extension, encode = _CODEC_EXTENSIONS.get(codec, 'mka'), ['-c:a', 'copy']
+        elif job.audio_format in _AUDIO_TARGETS:
+            target, encoder = _AUDIO_TARGETS[job.audio_format]
+            extension = _CODEC_EXTENSIONS[target]
+            encode = ['-c:a', 'copy'] if codec == target else ['-c:a', encoder, '-b:a', f'{job.audio_quality}k']
+        else:
+            raise PostprocessError(f"Unsupported audio format: {job.audio_format}")
+        if encode == ['-c:a', 'copy'] and _extension(source) == extension:
+            return None, source
+        output = os.path.join(stage_dir, f'output.{extension}')
+        return command + ['-i', source, '-vn', *encode, output], output
+
+    extension = job.merge_output_format or _extension(inputs[0])
+    if len(inputs) == 1 and _extension(inputs[0]) == extension:
+        return None, inputs[0]
+    output = os.path.join(stage_dir, f'output.{extension}')
+    for path in inputs:
+        command.extend(['-i', path])
+    for index in range(len(inputs)):
+        command.extend(['-map', str(index)])
+    return command + ['-c', 'copy', output], output
+
+
+class PostprocessPipeline:
+    """Run the FFmpeg stage of staged jobs on its own worker pool.
+
+    FFmpeg runs in its own processes, so ``workers`` threads keep up to
+    ``workers`` CPU cores busy. `submit` blocks while ``queue_size`` jobs are
+    waiting, which pauses the download workers that feed the pipeline.
+
+    Attributes:
+        workers (int): FFmpeg processes running at the same time.
+        queue_size (int): Fetched jobs that may wait for a worker.
+
+    Example:
+        ```python
+        pipeline = PostprocessPipeline(on_finished=lambda job, result, error: print(job.url, error))
+        pipeline.submit(job, result)
+        pipeline.close()
+        ```
+    """
+
+    def __init__(self, on_finished: Callable[[DownloadJob, DownloadResult, Optional[Exception]], None],
+                 workers: Optional[int] = None, queue_size: int = 4,
+                 postprocessor_hooks: Optional[List[Callable[[dict], None]]] = None):
+        """Create the pipeline. Worker threads are started by the first `submit`.
+
+        Args:
+            on_finished (Callable[[DownloadJob, DownloadResult, Optional[Exception]], None]): Called
+                from a worker thread when a job was published or failed.
+            workers (Optional[int]): FFmpeg processes at the same time. Defaults to the CPU count.
+            queue_size (int, optional): Fetched jobs that may wait for a worker. Defaults to 4.
+            postprocessor_hooks (Optional[List[Callable[[dict], None]]]): Called with yt-dlp style
+                post-processor dictionaries when FFmpeg starts and finishes.
+        """
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queue_size = max(1, queue_size)
+        self._on_finished = on_finished
+        self._hooks = list(postprocessor_hooks or [])
+        self._queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def submit(self, job: DownloadJob, result: DownloadResult) -> None:
+        """Queue a fetched job, waiting while the queue is full.
+
+        Args:
+            job (DownloadJob): Job whose streams are in ``job.stage_dir``.
+            result (DownloadResult): Result updated once the job is published.
+        """
+        with self._lock:
+            if not self._threads:
+                self._threads = [threading.Thread(target=self._work, name=f'postprocess-{index}', daemon=True)
+                                 for index in range(self.workers)]
+                for thread in self._threads:
+                    thread.start()
+        self._queue.put((job, result, time.monotonic()))
+
+    def close(self) -> None:
+        """Finish every queued job and stop the workers."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def publish(self, job: DownloadJob) -> str:
+        """Run FFmpeg for ``job`` and move the result to its final path.
+
+        The staging directory is removed afterwards. It is kept when the job fails,
+        so a retry can reuse the fetched streams.
+
+        Returns:
+            str: Path of the published file.
+
+        Raises:
+            PostprocessError: If the streams or the final name are missing, or FFmpeg fails.
+        """
+        inputs = staged_inputs(job.stage_dir, job.staged_formats)
+        if not inputs:
+            raise PostprocessError(f"No media was fetched into {job.stage_dir}")
+        try:
+            with open(os.path.join(job.stage_dir, STAGED_NAME), 'r', encoding='utf-8') as f:
+                names = [line.strip() for line in f if line.strip()]
+        except OSError:
+            names = []
+        if not names:
+            raise PostprocessError(f"yt-dlp did not report the filename of {job.url}")
+
+        command, produced = build_postprocess_command(job, inputs)
+        if command is not None:
+            self._report(job, 'started')
+            try:
+                subprocess.run(command, check=True, capture_output=True, text=True)
+            except subprocess.CalledProcessError as e:
+                raise PostprocessError(f"FFmpeg failed for {job.url}: {e}",
+                                       e.stderr if isinstance(e.stderr, str) else None) from e
+            except OSError as e:
+                raise PostprocessError(f"FFmpeg could not be started: {e}") from e
+            self._report(job, 'finished')
+
+        final = names[-1].replace('%(ext)s', _extension(produced))
+        publish_file(produced, final)
+        shutil.rmtree(job.stage_dir, ignore_errors=True)
+        return final
+
+    def _report(self, job: DownloadJob, status: str) -> None:
+        """Call the post-processor hooks for ``job``."""
+        for hook in self._hooks:
+            hook({'status': status, 'postprocessor': 'FFmpeg', 'info_dict': {'original_url': job.url}})
+
+    def _work(self) -> None:
+        """Publish queued jobs until `close` is called."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job, result, submitted = item
+            error = None
+            try:
+                result.path = self.publish(job)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                error = e
+            result.elapsed += time.monotonic() - submitted
+            self._finish(job, result, error)
+
+    def _finish(self, job: DownloadJob, result: DownloadResult, error: Optional[Exception]) -> None:
+        """Call ``on_finished`` without letting its exceptions stop the worker.
+
+        When the callback fails for a published job, it is called again with that
+        exception as the job's error, so the job is still completed as failed.
+        """
+        try:
+            self._on_finished(job, result, error)
+            return
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            if error is not None:
+                print(f"Error: finishing {job.url} failed: {e}")
+                return
+            error = e
+        try:
+            self._on_finished(job, result, error)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Error: finishing {job.url} failed: {e}")
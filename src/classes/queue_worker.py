@@ -0,0 +1,275 @@
+"""
+This module provides worker processes that share one job queue.
+
+Any number of `QueueWorker` processes, on one host or on several, can download
+the jobs of the same queue. A worker leases a batch of jobs, renews the lease
+from a heartbeat thread while the batch runs and records every outcome under
+its name. If a worker crashes, its lease expires and the jobs are claimed by
+another worker; if a worker loses its lease, for example after a long pause,
+it stops the batch and its late outcomes are rejected. A job may therefore be
+downloaded twice after a crash, but it is completed by exactly one worker.
+The worker threads of `JobServer` and `InboxDaemon` lease their batches the
+same way, so they can share a queue with other processes.
+
+Workers on the same host, or on hosts sharing a file system that supports
+SQLite locking, open the `JobQueue` directly. Workers on other hosts lease jobs
+from a `JobServer` through `RemoteQueue`.
+
+Classes:
+    RemoteQueue: Client of the lease endpoints of a `JobServer`.
+    QueueWorker: Leases batches of jobs from a queue and downloads them.
+
+Functions:
+    default_worker_id: Returns a worker name unique among the processes of all hosts.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Union
+
+from .job_queue import QUEUED, RUNNING, JobQueue, QueuedJob, run_jobs
+
+if TYPE_CHECKING:
+    from .video_downloader import VideoDownloader
+
+
+def default_worker_id(role: Optional[str] = None) -> str:
+    """Return a worker name unique among the processes of all hosts.
+
+    Args:
+        role (Optional[str]): Distinguishes several workers of one process, e.g. ``'api-0'``.
+
+    Returns:
+        str: ``host:pid``, followed by ``/role`` if given.
+    """
+    name = f'{socket.gethostname()}:{os.getpid()}'
+    return f'{name}/{role}' if role else name
+
+
+class RemoteQueue:
+    """Client of the lease endpoints of a `JobServer`.
+
+    It offers the part of the `JobQueue` interface a `QueueWorker` uses, so a
+    worker on another host can take jobs from the server's queue.
+
+    Attributes:
+        url (str): Base URL of the job API, e.g. ``http://10.0.0.2:8765``.
+        timeout (float): Seconds to wait for a response.
+
+    Example:
+        ```python
+        QueueWorker(RemoteQueue('http://10.0.0.2:8765')).run()
+        ```
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        """Create the client. Nothing is sent before the first call.
+
+        Args:
+            url (str): Base URL of the job API.
+            timeout (float, optional): Seconds to wait for a response. Defaults to 30.
+        """
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path: str, body: Optional[Dict] = None) -> Dict:
+        """Send a JSON request and return the decoded response.
+
+        Raises:
+            urllib.error.HTTPError: If the server answers with an error status.
+            OSError: If the server cannot be reached.
+        """
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(f'{self.url}{path}', data=data, method='POST' if data else 'GET',
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def claim(self, limit: int, worker: Optional[str] = None, lease: Optional[float] = None) -> List[QueuedJob]:
+        """Lease up to ``limit`` queued jobs, see `JobQueue.claim`."""
+        response = self._request('/leases', {'worker': worker, 'limit': limit, 'lease': lease})
+        return [QueuedJob(**job) for job in response['jobs']]
+
+    def renew(self, worker: str, job_ids: List[int], lease: float) -> List[int]:
+        """Extend the leases of ``job_ids``, see `JobQueue.renew`."""
+        return self._request('/leases/renew', {'worker': worker, 'ids': list(job_ids), 'lease': lease})['ids']
+
+    def complete(self, job_id: int, state: str, error: Optional[str] = None, worker: Optional[str] = None) -> bool:
+        """Record the outcome of a leased job, see `JobQueue.complete`."""
+        try:
+            self._request(f'/jobs/{job_id}/result', {'worker': worker, 'state': state, 'error': error})
+        except urllib.error.HTTPError as e:
+            if e.code == 409:
+                return False
+            raise
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        """Count the jobs of the server's queue per state."""
+        return self._request('/health')['queue']
+
+    def close(self) -> None:
+        """Nothing to release; present for symmetry with `JobQueue`."""
+
+
+class QueueWorker:
+    """Lease batches of jobs from a queue and download them.
+
+    Attributes:
+        queue (Union[JobQueue, RemoteQueue]): Shared queue.
+        worker_id (str): Name recorded with the leased jobs; ``host:pid`` by default.
+        lease (float): Seconds a batch stays leased without a heartbeat.
+        batch_size (int): Jobs leased and downloaded as one batch.
+        poll_interval (float): Seconds between checks while the queue is empty.
+
+    Example:
+        ```python
+        worker = QueueWorker(JobQueue(app_config.job_queue_path), lease=60)
+        worker.run(until_empty=True)
+        ```
+    """
+
+    def __init__(self, queue: Union[JobQueue, RemoteQueue], worker_id: Optional[str] = None, lease: float = 60.0,
+                 batch_size: int = 3, poll_interval: float = 2.0):
+        """Create the worker. Nothing is leased before `run`.
+
+        Args:
+            queue (Union[JobQueue, RemoteQueue]): Shared queue.
+            worker_id (Optional[str]): Name of the worker; must be unique among the workers of
+                the queue. Defaults to ``host:pid``.
+            lease (float, optional): Seconds a batch stays leased without a heartbeat. The
+                lease is renewed every third of it. Defaults to 60.
+            batch_size (int, optional): Jobs per batch. Defaults to 3.
+            poll_interval (float, optional): Seconds between checks while the queue is empty.
+                Defaults to 2.
+
+        Raises:
+            ValueError: If ``lease`` is not positive.
+        """
+        if lease <= 0:
+            raise ValueError("The lease must be positive.")
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.lease = lease
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self._stopped = threading.Event()
+        self._active: Optional['VideoDownloader'] = None
+        self._lock = threading.Lock()
+
+    def _heartbeat(self, job_ids: List[int], lost: threading.Event, finished: threading.Event) -> None:
+        """Renew the leases of a running batch and cancel it once they are all lost."""
+        held, renewed = list(job_ids), time.monotonic()
+        while held and not finished.wait(self.lease / 3):
+            try:
+                held, renewed = self.queue.renew(self.worker_id, held, self.lease), time.monotonic()
+            except (OSError, sqlite3.Error):
+                if time.monotonic() - renewed >= self.lease:
+                    held = []
+        if not held and not finished.is_set():
+            lost.set()
+            with self._lock:
+                if self._active is not None:
+                    self._active.cancel()
+
+    def _attach(self, downloader: 'VideoDownloader') -> None:
+        """Remember the downloader of the running batch so it can be cancelled."""
+        with self._lock:
+            self._active = downloader
+        if self._stopped.is_set():
+            downloader.cancel()
+
+    def run_once(self) -> Optional[bool]:
+        """Lease one batch and download it while a heartbeat keeps the lease.
+
+        Returns:
+            Optional[bool]: None if nothing was queued, otherwise True if the batch was
+            interrupted by `stop` or Ctrl-C.
+        """
+        jobs = self.claim()
+        if not jobs:
+            return None
+        return self.run_batch(jobs)
+
+    def claim(self) -> List[QueuedJob]:
+        """Lease up to ``batch_size`` queued jobs under this worker's name.
+
+        Returns:
+            List[QueuedJob]: Leased jobs; empty if nothing is queued.
+        """
+        return self.queue.claim(self.batch_size, worker=self.worker_id, lease=self.lease)
+
+    def run_batch(self, jobs: List[QueuedJob], prepare: Optional[Callable[['VideoDownloader'], None]] = None) -> bool:
+        """Download jobs leased with `claim` while a heartbeat keeps the lease.
+
+        Args:
+            jobs (List[QueuedJob]): Leased jobs.
+            prepare (Optional[Callable[[VideoDownloader], None]]): Called with the downloader
+                before the batch starts, see `run_jobs`.
+
+        Returns:
+            bool: True if the batch was interrupted by `stop` or Ctrl-C.
+        """
+        def attach(downloader: 'VideoDownloader') -> None:
+            self._attach(downloader)
+            if prepare is not None:
+                prepare(downloader)
+
+        lost, finished = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=([job.id for job in jobs], lost, finished),
+                                     name='streamflow-worker-heartbeat', daemon=True)
+        heartbeat.start()
+        try:
+            interrupted = run_jobs(self.queue, jobs, prepare=attach, worker=self.worker_id)
+        finally:
+            finished.set()
+            heartbeat.join()
+            with self._lock:
+                self._active = None
+        if lost.is_set() and interrupted:
+            print(f"Worker {self.worker_id} lost the lease of its batch.", file=sys.stderr)
+            return False
+        return interrupted
+
+    def run(self, until_empty: bool = False) -> bool:
+        """Download leased batches until `stop` is called.
+
+        Args:
+            until_empty (bool, optional): Return once no job is queued or running in the whole
+                queue, e.g. to drain a queue with a fixed set of workers. Jobs running under
+                another worker's lease are waited for, since they are leased again if that
+                worker dies. Defaults to False.
+
+        Returns:
+            bool: True if the worker was stopped, False if the queue was drained.
+        """
+        while not self._stopped.is_set():
+            try:
+                interrupted = self.run_once()
+                if interrupted:
+                    self._stopped.set()
+                    break
+                if interrupted is not None:
+                    continue
+                if until_empty:
+                    counts = self.queue.counts()
+                    if not counts.get(QUEUED) and not counts.get(RUNNING):
+                        return False
+            except (OSError, sqlite3.Error) as e:
+                print(f"Worker {self.worker_id}: queue unavailable: {e}", file=sys.stderr)
+            self._stopped.wait(self.poll_interval)
+        return True
+
+    def stop(self) -> None:
+        """Cancel the running batch and stop `run`; jobs that have not started are queued again."""
+        self._stopped.set()
+        with self._lock:
+            if self._active is not None:
+                self._active.cancel()
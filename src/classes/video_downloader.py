@@ -1,17 +1,42 @@
 """
 This module provides a VideoDownloader class that allows users to download
-videos, audio, and playlists using yt-dlp via subprocess. It
+videos, audio, and playlists using yt-dlp, either in-process or via subprocess. It
 supports multiple quality options, output formats, network handling, and
 downloading from a .txt file containing multiple links.
 """
 
+import hashlib
 import os
+import re
+import shutil
+import tempfile
 import time
-import subprocess
-import inquirer
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
 from src.decorators import timed
 from src.config import video_settings, app_config
-from src.decorators import ffmpeg_required, is_connected, network_required
+from src.config.video_settings import AudioProfile
+from src.decorators import ffmpeg_required, get_connectivity_monitor, get_toolchain, network_required
+from src.utils.lazy import lazy_import
+from src.utils.link_reader import LinkStream
+from src.utils.events import EventStream, JsonLinesSink
+from src.utils.media_id import extract_media_id
+from src.utils.metrics import get_download_metrics, start_exporter
+from src.utils.rate_limit import get_rate_limiter
+from src.utils.retry import PERMANENT, RATE_LIMITED, RetryPolicy, classify_error
+from src.utils.storage import InsufficientSpace, file_system, get_space_ledger, publish_file
+from .download_archive import DownloadArchive
+from .download_engine import DownloadEngineError, DownloadJob, SubprocessEngine, build_command, create_engine
+from .download_scheduler import DownloadResult, DownloadScheduler, JobEstimate, SchedulePolicy
+from .job_journal import DONE, EXPANDED, FAILED, RUNNING, JobJournal
+from .media_store import MediaStore
+from .metadata_cache import MetadataCache, describe_info
+from .postprocess_pipeline import PostprocessError, PostprocessPipeline
+
+inquirer = lazy_import('inquirer')
+
+ESTIMATED_BYTE_RATE = {'Video': 2_000_000 // 8, 'Audio only': 192_000 // 8}
+"""ESTIMATED_BYTE_RATE: Assumed bytes per second of media by mode, used when only the duration is known."""
 
 class VideoDownloader:
     """
@@ -27,6 +52,7 @@ class VideoDownloader:
     Attributes:
         QUALITY_MAP (Dict[str, str]): Mapping of human-readable quality labels to yt-dlp format selectors.
         OUTPUT_FORMATS (List[str]): Supported output formats.
+        MODES (List[str]): Supported download modes.
         download_folder (str): Path where downloaded files will be saved.
         urls (List[str]): List of video URLs to download.
         quality (str): Selected video quality.
@@ -34,11 +60,38 @@ class VideoDownloader:
         is_playlist (bool): Flag indicating if the URL is a playlist.
         playlist_folder (str): Folder path for playlist downloads.
         mode (str): Download mode, either 'Video' or 'Audio only'.
+        jobs (Optional[int]): Number of concurrent downloads. Falls back to
+            ``app_config.max_concurrent_downloads`` when not set.
+        transfer_profile (Optional[str]): Key of ``video_settings.transfer_profiles``. Falls
+            back to ``app_config.transfer_profile`` when not set.
+        audio_profile (Optional[str]): Key of ``video_settings.audio_profiles`` used in audio-only
+            mode. Falls back to ``app_config.audio_profile`` when not set.
+        audio_bitrate (Optional[str]): Bitrate in kbit/s overriding the audio profile's default.
+        priorities (Dict[str, int]): Explicit priorities by URL for the scheduling policy, in
+            addition to ``priority=N`` in the TXT file. Playlist entries inherit the playlist's.
+        groups (Dict[str, str]): Source of each URL, taking turns with the ``'fair'`` policy.
+            Playlist entries are grouped by playlist.
+        events (EventStream): Structured job and batch events; subscribe callbacks to receive them.
     """
-    def __init__(self):
-        """Initialize the downloader and verify the download folder."""
-        self.download_folder = app_config.download_folder
-        self.verify_download_folder()
+    MODES = ['Video', 'Audio only']
+
+    def __init__(self, interactive: bool = True, download_folder: Optional[str] = None):
+        """Initialize the downloader and verify the download folder.
+
+        Args:
+            interactive (bool, optional): Ask the user to confirm the download folder.
+                When False, the folder is created without any terminal interaction.
+                Defaults to True.
+            download_folder (Optional[str]): Download folder overriding
+                ``app_config.download_folder``.
+        """
+        self.interactive = interactive
+        self.download_folder = download_folder or app_config.download_folder
+        if interactive:
+            self.verify_download_folder()
+        else:
+            self.download_folder = os.path.expanduser(self.download_folder)
+            os.makedirs(self.download_folder, exist_ok=True)
         self.urls = []
         self.quality = None
         self.output_format = None
@@ -46,6 +99,214 @@ class VideoDownloader:
         self.playlist_folder = None
         self.mode = None
         self.custom_filename = None
+        self.jobs = None
+        self.transfer_profile = None
+        self.audio_profile = None
+        self.audio_bitrate = None
+        self.priorities: Dict[str, int] = {}
+        self.groups: Dict[str, str] = {}
+        self._capture_output = False
+        self._print_lock = threading.Lock()
+        self._archive = None
+        self._archive_lock = threading.Lock()
+        self._metadata_cache = None
+        self._metadata_cache_lock = threading.Lock()
+        self._media_store = None
+        self._media_store_lock = threading.Lock()
+        self._space_tickets: Dict[str, int] = {}
+        self._space_tickets_lock = threading.Lock()
+        self._engine = SubprocessEngine()
+        self._scheduler: Optional[DownloadScheduler] = None
+        self._pipeline: Optional[PostprocessPipeline] = None
+        self.source_file = None
+        self._resume_batch_id = None
+        self._journal = None
+        self._entry_templates: Dict[str, str] = {}
+        self._entry_playlists: Dict[str, str] = {}
+        self._playlist_urls: Dict[str, List[str]] = {}
+        self._entry_durations: Dict[str, float] = {}
+        self.events = EventStream(app_config.progress_event_interval)
+        self._current = threading.local()
+
+    @classmethod
+    def from_options(cls, urls: Iterable[str], mode: str = 'Video', quality: str = 'The best',
+                     output_format: Optional[str] = 'Mp4', download_folder: Optional[str] = None,
+                     playlist_folder: Optional[str] = None, custom_filename: Optional[str] = None,
+                     jobs: Optional[int] = None, transfer_profile: Optional[str] = None,
+                     audio_profile: Optional[str] = None,
+                     audio_bitrate: Optional[str] = None) -> 'VideoDownloader':
+        """Create a fully configured downloader without touching the terminal.
+
+        Args:
+            urls (Iterable[str]): URLs to download. A `LinkStream` is kept as a lazy
+                iterator; other iterables are copied into a list.
+            mode (str, optional): ``'Video'`` or ``'Audio only'``. Defaults to ``'Video'``.
+            quality (str, optional): Key of ``video_settings.quality_map``. Defaults to ``'The best'``.
+            output_format (Optional[str]): One of ``video_settings.output_formats``. Defaults to ``'Mp4'``.
+            download_folder (Optional[str]): Target folder. Defaults to ``app_config.download_folder``.
+            playlist_folder (Optional[str]): Sub-folder name for playlist downloads.
+            custom_filename (Optional[str]): Filename for a single, non-playlist URL.
+            jobs (Optional[int]): Number of concurrent downloads.
+            transfer_profile (Optional[str]): Key of ``video_settings.transfer_profiles``.
+            audio_profile (Optional[str]): Key of ``video_settings.audio_profiles`` for audio-only mode.
+            audio_bitrate (Optional[str]): Audio bitrate in kbit/s, e.g. ``'160'``.
+
+        Returns:
+            VideoDownloader: Downloader ready for ``download_video``.
+
+        Raises:
+            ValueError: If mode, quality, output format, transfer profile, audio profile or
+                audio bitrate is not supported.
+        """
+        cls.check_options(mode, quality, output_format, transfer_profile, audio_profile, audio_bitrate)
+
+        downloader = cls(interactive=False, download_folder=download_folder)
+        downloader.urls = urls if isinstance(urls, LinkStream) else list(urls)
+        downloader.mode = mode
+        downloader.quality = quality if mode == 'Video' else None
+        downloader.output_format = output_format if mode == 'Video' else None
+        downloader.jobs = jobs
+        downloader.transfer_profile = transfer_profile
+        downloader.audio_profile = audio_profile if mode != 'Video' else None
+        downloader.audio_bitrate = str(audio_bitrate) if audio_bitrate is not None and mode != 'Video' else None
+        downloader.is_playlist = isinstance(downloader.urls, list) and any('list=' in url for url in downloader.urls)
+        if playlist_folder and (downloader.is_playlist or isinstance(downloader.urls, LinkStream)):
+            downloader.playlist_folder = os.path.join(downloader.download_folder, playlist_folder)
+            os.makedirs(downloader.playlist_folder, exist_ok=True)
+        if custom_filename:
+            downloader.custom_filename = downloader._sanitize_filename(os.path.splitext(custom_filename)[0])
+        return downloader
+
+    @classmethod
+    def check_options(cls, mode: str = 'Video', quality: str = 'The best', output_format: Optional[str] = 'Mp4',
+                      transfer_profile: Optional[str] = None, audio_profile: Optional[str] = None,
+                      audio_bitrate: Optional[str] = None, **_unchecked) -> None:
+        """Check the options of `from_options` without creating a downloader or any folder.
+
+        Args:
+            mode (str, optional): See `from_options`.
+            quality (str, optional): See `from_options`.
+            output_format (Optional[str]): See `from_options`.
+            transfer_profile (Optional[str]): See `from_options`.
+            audio_profile (Optional[str]): See `from_options`.
+            audio_bitrate (Optional[str]): See `from_options`.
+            **_unchecked: Other `from_options` arguments, such as ``download_folder``.
+
+        Raises:
+            ValueError: If mode, quality, output format, transfer profile, audio profile or
+                audio bitrate is not supported.
+        """
+        if mode not in cls.MODES:
+            raise ValueError(f"Unsupported mode: {mode}")
+        if mode == 'Video':
+            if quality not in video_settings.quality_map:
+                raise ValueError(f"Unsupported quality: {quality}")
+            if output_format not in video_settings.output_formats:
+                raise ValueError(f"Unsupported output format: {output_format}")
+        if transfer_profile is not None and transfer_profile not in video_settings.transfer_profiles:
+            raise ValueError(f"Unsupported transfer profile: {transfer_profile}")
+        if audio_profile is not None and audio_profile not in video_settings.audio_profiles:
+            raise ValueError(f"Unsupported audio profile: {audio_profile}")
+        if audio_bitrate is not None and not (str(audio_bitrate).isdigit() and int(audio_bitrate) > 0):
+            raise ValueError(f"Unsupported audio bitrate: {audio_bitrate}")
+
+    @classmethod
+    def from_journal(cls, download_folder: Optional[str] = None, jobs: Optional[int] = None,
+                     retry_failed: bool = False) -> Optional['VideoDownloader']:
+        """Create a downloader that resumes the last interrupted batch of a folder.
+
+        Args:
+            download_folder (Optional[str]): Folder holding the journal. Defaults to
+                ``app_config.download_folder``.
+            jobs (Optional[int]): Number of concurrent downloads.
+            retry_failed (bool, optional): Also download the URLs that failed. Defaults to False.
+
+        Returns:
+            Optional[VideoDownloader]: Configured downloader, or None if nothing is left to resume.
+        """
+        folder = os.path.expanduser(download_folder or app_config.download_folder)
+        journal = JobJournal(folder)
+        batch = journal.last_batch()
+        if batch is None:
+            return None
+        urls = cls._remaining_urls(journal, batch, retry_failed)
+        if not urls:
+            return None
+        options = batch.get('options', {})
+        downloader = cls.from_options(urls, mode=options.get('mode', 'Video'),
+                                      quality=options.get('quality') or 'The best',
+                                      output_format=options.get('output_format') or 'Mp4',
+                                      download_folder=folder, playlist_folder=options.get('playlist_folder'),
+                                      custom_filename=options.get('custom_filename'), jobs=jobs,
+                                      transfer_profile=options.get('transfer_profile'),
+                                      audio_profile=options.get('audio_profile'),
+                                      audio_bitrate=options.get('audio_bitrate'))
+        downloader.source_file = batch.get('source')
+        downloader._resume_batch_id = batch['batch']
+        downloader._entry_templates = cls._saved_templates(journal, batch)
+        return downloader
+
+    @staticmethod
+    def _remaining_urls(journal: JobJournal, batch: dict, retry_failed: bool = False) -> List[str]:
+        """Return unfinished URLs of ``batch``, failed ones if requested, and source lines it never reached."""
+        states = journal.states(batch['batch'])
+        finished = (DONE, EXPANDED) if retry_failed else (DONE, EXPANDED, FAILED)
+        urls = [url for url, record in states.items() if record['state'] not in finished]
+        source = batch.get('source')
+        if source and os.path.isfile(source):
+            urls.extend(url for url in LinkStream(source) if url not in states)
+        return urls
+
+    @staticmethod
+    def _saved_templates(journal: JobJournal, batch: dict) -> Dict[str, str]:
+        """Return the output templates of the playlist entries of ``batch``."""
+        return {url: record['output_template'] for url, record in journal.states(batch['batch']).items()
+                if record.get('output_template')}
+
+    def _journal_options(self) -> dict:
+        """Return the options stored in the journal to resume a batch."""
+        return {
+            'mode': self.mode,
+            'quality': self.quality,
+            'output_format': self.output_format,
+            'playlist_folder': self.playlist_folder,
+            'custom_filename': self.custom_filename,
+            'transfer_profile': self.transfer_profile,
+            'audio_profile': self.audio_profile,
+            'audio_bitrate': self.audio_bitrate,
+        }
+
+    def _offer_resume(self, filepath: str) -> bool:
+        """Ask whether an interrupted batch of ``filepath`` should be resumed.
+
+        Returns:
+            bool: True if the batch was restored and no further options are needed.
+        """
+        journal = JobJournal(self.download_folder)
+        batch = journal.last_batch()
+        if batch is None or batch.get('source') != filepath:
+            return False
+        urls = self._remaining_urls(journal, batch)
+        if not urls:
+            return False
+        answer = inquirer.prompt([inquirer.Confirm(
+            'resume', message=f"An interrupted batch of this file has {len(urls)} unfinished links. Resume it?",
+            default=True)])
+        if not answer.get('resume'):
+            return False
+        options = batch.get('options', {})
+        self.urls = urls
+        self.mode = options.get('mode')
+        self.quality = options.get('quality')
+        self.output_format = options.get('output_format')
+        self.playlist_folder = options.get('playlist_folder')
+        self.transfer_profile = options.get('transfer_profile')
+        self.audio_profile = options.get('audio_profile')
+        self.audio_bitrate = options.get('audio_bitrate')
+        self.is_playlist = bool(self.playlist_folder)
+        self._resume_batch_id = batch['batch']
+        self._entry_templates = self._saved_templates(journal, batch)
+        return True
 
     def verify_download_folder(self) -> None:
         """Ensure the configured download folder exists, prompting user if needed.
@@ -79,8 +340,8 @@ class VideoDownloader:
     def prompt_user_options(self) -> None:
         """Prompt the user for download source, mode and format options.
 
-        After this call the instance attributes ``urls``, ``mode``, ``quality`` and
-        ``output_format`` will be set based on user choices.
+        After this call the instance attributes ``urls``, ``mode``, ``quality``,
+        ``output_format`` and ``audio_profile`` will be set based on user choices.
 
         Returns:
             None
@@ -117,8 +378,10 @@ class VideoDownloader:
                 print(f"Error: File {filepath} not found or invalid.")
                 self.urls = []
             else:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    self.urls = [line.strip() for line in f if line.strip()]
+                self.source_file = os.path.abspath(filepath)
+                if self._offer_resume(self.source_file):
+                    return
+                self.urls = LinkStream(self.source_file)
 
         mode_ans = inquirer.prompt([inquirer.List('mode', message="Choose download mode",
                                                   choices=['Video', 'Audio only'])])
@@ -132,6 +395,14 @@ class VideoDownloader:
             format_ans = inquirer.prompt([inquirer.List('output_format', message="Choose output format",
                                                         choices=video_settings.output_formats)])
             self.output_format = format_ans.get('output_format')
+        else:
+            profiles = video_settings.audio_profiles
+            default = app_config.audio_profile
+            profile_ans = inquirer.prompt([inquirer.List(
+                'audio_profile', message="Choose audio format",
+                choices=[(profile.label, key) for key, profile in profiles.items()],
+                default=default if default in profiles else None)])
+            self.audio_profile = profile_ans.get('audio_profile')
 
     def confirm_options(self) -> bool:
         """Display selected options and ask the user for confirmation.
@@ -142,76 +413,773 @@ class VideoDownloader:
         summary = (
             f"\nSummary of selected options:\n"
             f"-----------------------------------\n"
-            f"Number of links: {len(self.urls)}\n"
+            f"Number of links: {self._link_count()}\n"
             f"Mode: {self.mode}\n"
         )
         if self.mode == "Video":
             summary += f"Quality: {self.quality}\nOutput format: {self.output_format}\n"
+        else:
+            profile = self._audio_profile()
+            summary += f"Audio format: {profile.label}"
+            summary += f" ({self._audio_bitrate(profile)} kbit/s)\n" if profile.encoder else "\n"
         if self.is_playlist:
             summary += f"Playlist folder: {self.playlist_folder}\n"
-        if getattr(self, 'custom_filename', None) and len(self.urls) == 1 and not self.is_playlist:
+        if getattr(self, 'custom_filename', None) and self._is_single_url() and not self.is_playlist:
             summary += f"Custom filename: {self.custom_filename}\n"
-        summary += f"Download folder: {self.download_folder}\n-----------------------------------\n"
+        summary += f"Download folder: {self.download_folder}\n"
+        summary += ''.join(f"  {line}\n" for line in self._cached_details())
+        summary += "-----------------------------------\n"
         print(summary)
         confirm = inquirer.prompt([inquirer.Confirm('confirm', message="Are these options correct?", default=True)])
         return confirm.get('confirm')
 
+    def _cached_details(self, limit: int = 10) -> List[str]:
+        """Describe the first ``limit`` URLs from the metadata cache without network access.
+
+        Returns:
+            List[str]: One line per cached video with title, duration and estimated size.
+        """
+        cache = self._get_metadata_cache()
+        if cache is None or not isinstance(self.urls, (list, tuple)):
+            return []
+        lines = []
+        for url in self.urls[:limit]:
+            media_id = extract_media_id(url) if 'list=' not in url else None
+            info = cache.get(*media_id) if media_id else None
+            if info is None:
+                continue
+            details = describe_info(info)
+            line = details['title'] or url
+            extras = []
+            if details['duration']:
+                minutes, seconds = divmod(int(details['duration']), 60)
+                hours, minutes = divmod(minutes, 60)
+                extras.append(f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}")
+            if details['filesize']:
+                extras.append(f"~{details['filesize'] / (1024 * 1024):.1f} MB")
+            if extras:
+                line += f" ({', '.join(extras)})"
+            lines.append(line)
+        return lines
+
+    def _is_single_url(self) -> bool:
+        """Return True if exactly one URL was given as a list."""
+        return isinstance(self.urls, (list, tuple)) and len(self.urls) == 1
+
+    def _link_count(self) -> str:
+        """Describe the number of links without reading a streamed link file."""
+        if isinstance(self.urls, LinkStream):
+            return f"streamed from {self.urls.path or 'input'}"
+        return str(len(self.urls))
+
     def progress_hook(self, d: dict) -> None:
         """Monitor download progress and handle network interruptions.
 
+        Uses the cached state of the shared connectivity monitor, so progress
+        ticks never wait for a network probe. Progress is also reported to
+        ``events``, which throttles it.
+
         Args:
             d (dict): yt-dlp download status dictionary.
         """
+        url = self._hook_url(d)
+        if url:
+            self.events.progress(url, d)
         if d.get('status') == 'downloading':
-            if not is_connected():
+            monitor = get_connectivity_monitor()
+            if not monitor.is_online():
                 print("\nNetwork lost. Pausing download...")
-                while not is_connected():
-                    time.sleep(5)
+                monitor.wait_until_online()
                 print("Connection restored. Resuming download...")
 
-    @ffmpeg_required
-    @network_required
-    @timed
-    def download_video(self) -> None:
-        """Download configured URLs using ``yt-dlp`` and the project's cookies.
+    def postprocessor_hook(self, d: dict) -> None:
+        """Report yt-dlp post-processing (merging, audio conversion) to ``events``.
+
+        Args:
+            d (dict): yt-dlp post-processor status dictionary.
+        """
+        url = self._hook_url(d)
+        if url:
+            self.events.postprocessing(url, d)
+
+    def _hook_url(self, d: dict) -> Optional[str]:
+        """Return the job URL a yt-dlp hook call belongs to."""
+        return getattr(self._current, 'url', None) or (d.get('info_dict') or {}).get('original_url')
+
+    def _output_path(self, url: str) -> str:
+        """Return the yt-dlp output template for ``url``."""
+        if url in self._entry_templates:
+            return self._entry_templates[url]
+        is_playlist = 'list=' in url
+        if is_playlist and self.playlist_folder:
+            return os.path.join(self.playlist_folder, '%(title)s.%(ext)s')
+        if self._uses_custom_filename(url):
+            return os.path.join(self.download_folder, f"{self.custom_filename}.%(ext)s")
+        return os.path.join(self.download_folder, '%(title)s.%(ext)s')
 
-        Applies the selected quality and output format. Handles playlists by
-        placing downloads in a playlist folder when configured. Errors from
-        ``subprocess`` calls are caught and reported per-URL.
+    def _uses_custom_filename(self, url: str) -> bool:
+        """Return True if ``url`` should be saved under ``custom_filename``."""
+        return self._is_single_url() and bool(self.custom_filename) and 'list=' not in url
+
+    def _build_job(self, url: str) -> DownloadJob:
+        """Describe the download of a single URL for the download engine.
+
+        Args:
+            url (str): URL to download.
 
         Returns:
-            None
+            DownloadJob: Job with output path, format selector and mode-specific options.
         """
-        for url in self.urls:
-            is_playlist = 'list=' in url
-            if is_playlist and self.playlist_folder:
-                output_path = os.path.join(self.playlist_folder, '%(title)s.%(ext)s')
-            else:
-                if len(self.urls) == 1 and self.custom_filename and not is_playlist:
-                    output_path = os.path.join(self.download_folder, f"{self.custom_filename}.%(ext)s")
-                else:
-                    output_path = os.path.join(self.download_folder, '%(title)s.%(ext)s')
+        job = DownloadJob(url=url, output_template=self._output_path(url), format_selector='bestaudio/best',
+                          playlist='list=' in url)
+        cache = self._get_metadata_cache()
+        if cache is not None:
+            job.info_template = cache.template
+            media_id = extract_media_id(url) if not job.playlist else None
+            job.info_json = cache.lookup(*media_id) if media_id else None
+        profile = video_settings.transfer_profiles[self.transfer_profile or app_config.transfer_profile]
+        job.concurrent_fragments = profile.concurrent_fragments
+        job.http_chunk_size = profile.http_chunk_size
+        job.buffer_size = profile.buffer_size
+        if profile.external_downloader and get_toolchain().has_program(profile.external_downloader):
+            job.external_downloader = profile.external_downloader
+            job.external_downloader_args = list(profile.external_downloader_args)
+        if self.mode == "Video":
+            job.format_selector = video_settings.quality_map.get(self.quality, 'bestvideo+bestaudio/best')
+            job.merge_output_format = self.output_format.lower()
+        else:
+            audio = self._audio_profile()
+            job.format_selector = audio.format_selector
+            job.extract_audio = True
+            job.audio_format = audio.codec
+            job.audio_quality = self._audio_bitrate(audio)
+        if self._pipeline is not None and not job.playlist:
+            job.stage_dir = self._stage_dir(url)
+        elif app_config.staging_folder and not job.playlist:
+            stage_dir = self._stage_dir(url)
+            job.publish_dir = os.path.dirname(job.output_template)
+            job.output_template = os.path.join(stage_dir, os.path.basename(job.output_template))
+            job.path_file = os.path.join(stage_dir, 'path')
+        return job
+
+    def _stage_dir(self, url: str) -> str:
+        """Return the staging directory of ``url``; it is stable so retries reuse fetched streams."""
+        folder = os.path.expanduser(app_config.staging_folder or os.path.join(self.download_folder,
+                                                                              '.streamflow-staging'))
+        return os.path.join(folder, hashlib.sha1(url.encode('utf-8')).hexdigest()[:16])
+
+    def _audio_profile(self) -> AudioProfile:
+        """Return the audio profile of audio-only mode."""
+        return video_settings.audio_profiles[self.audio_profile or app_config.audio_profile]
+
+    def _audio_bitrate(self, profile: AudioProfile) -> str:
+        """Return the bitrate used when ``profile`` has to transcode."""
+        return self.audio_bitrate or profile.bitrate or '0'
+
+    def _build_command(self, url: str) -> List[str]:
+        """Build the ``yt-dlp`` command line for a single URL.
+
+        Args:
+            url (str): URL to download.
+
+        Returns:
+            List[str]: Command suitable for ``subprocess.run``.
+        """
+        return build_command(self._build_job(url))
+
+    def _expand_playlists(self, urls: Iterable[str]) -> Iterator[str]:
+        """Replace playlist URLs with the URLs of their entries.
+
+        Entries are listed with flat extraction, so no video is extracted yet. Each
+        entry becomes its own job saved in the playlist folder with its playlist
+        index in front of the title. Playlists that cannot be listed are downloaded
+        as one job.
+
+        Args:
+            urls (Iterable[str]): URLs of the batch.
+
+        Yields:
+            str: Non-playlist URLs and playlist entry URLs.
+        """
+        seen = set(self.urls) if isinstance(self.urls, (list, tuple)) else set()
+        for url in urls:
+            if not (app_config.playlist_fanout and 'list=' in url):
+                yield url
+                continue
+            try:
+                entries = self._engine.expand_playlist(url)
+            except DownloadEngineError as e:
+                self._log(f"Could not list the playlist entries, downloading it as one job: {url} ({e})")
+                yield url
+                continue
+
+            self._log(f"Playlist {url}: {len(entries)} entries")
+            folder = self.playlist_folder or self.download_folder
+            width = max(2, len(str(max((entry['index'] for entry in entries), default=0))))
+            self._playlist_urls[url] = [entry['url'] for entry in entries]
+            for entry in entries:
+                self._entry_templates[entry['url']] = os.path.join(
+                    folder, f"{entry['index']:0{width}d} - %(title)s.%(ext)s")
+                self._entry_playlists[entry['url']] = url
+                if entry.get('duration'):
+                    self._entry_durations[entry['url']] = entry['duration']
+                if entry['url'] not in seen:
+                    seen.add(entry['url'])
+                    yield entry['url']
+            if self._journal is not None:
+                self._journal.record(url, EXPANDED)
+
+    def playlist_results(self, results: List[DownloadResult]) -> Dict[str, List[DownloadResult]]:
+        """Group the results of split playlists by playlist URL.
+
+        An entry listed in several playlists belongs to each of them.
+
+        Args:
+            results (List[DownloadResult]): Results returned by `download_video`.
+
+        Returns:
+            Dict[str, List[DownloadResult]]: Results of the entries of every split playlist.
+        """
+        by_url = {result.url: result for result in results}
+        return {playlist: [by_url[url] for url in urls if url in by_url]
+                for playlist, urls in self._playlist_urls.items()}
+
+    def _get_archive(self) -> Optional[DownloadArchive]:
+        """Return the shared download archive, opening it on first use.
+
+        Returns:
+            Optional[DownloadArchive]: The archive, or None if it is disabled.
+        """
+        if not app_config.use_download_archive:
+            return None
+        with self._archive_lock:
+            if self._archive is None:
+                self._archive = DownloadArchive(app_config.archive_path)
+            return self._archive
+
+    def _get_metadata_cache(self) -> Optional[MetadataCache]:
+        """Return the shared metadata cache, opening it on first use.
+
+        Returns:
+            Optional[MetadataCache]: The cache, or None if it is disabled.
+        """
+        if not app_config.use_metadata_cache:
+            return None
+        with self._metadata_cache_lock:
+            if self._metadata_cache is None:
+                self._metadata_cache = MetadataCache(app_config.metadata_cache_dir, app_config.metadata_cache_ttl,
+                                                     app_config.metadata_cache_max_bytes)
+            return self._metadata_cache
+
+    def _get_media_store(self) -> Optional[MediaStore]:
+        """Return the shared media store, opening it on first use.
+
+        Returns:
+            Optional[MediaStore]: The store, or None if it is disabled.
+        """
+        if not app_config.use_media_store:
+            return None
+        with self._media_store_lock:
+            if self._media_store is None:
+                self._media_store = MediaStore(app_config.media_store_dir, app_config.media_store_link_modes)
+            return self._media_store
+
+    def _variant(self) -> str:
+        """Describe the selected mode, quality and format, e.g. ``'video/High (720p)/Mp4'``."""
+        if self.mode == 'Video':
+            return f"video/{self.quality}/{self.output_format}"
+        profile = self.audio_profile or app_config.audio_profile
+        return f"audio/{profile}/{self._audio_bitrate(self._audio_profile())}"
+
+    def _store_key(self, media_id: tuple) -> str:
+        """Return the media store key of ``media_id`` in the selected mode, quality and format."""
+        return f"{media_id[0]}:{media_id[1]}:{self._variant()}"
+
+    def _archive_output(self, url: str) -> str:
+        """Return the download archive output of ``url``: its variant and absolute output template."""
+        return f"{self._variant()}:{os.path.abspath(os.path.expanduser(self._output_path(url)))}"
+
+    @staticmethod
+    def _title_from_path(template: str, path: str) -> Optional[str]:
+        """Recover the filename title of ``path`` written with the output ``template``."""
+        pattern = re.escape(os.path.basename(template)).replace(re.escape('%(title)s'), '(?P<title>.+)')
+        match = re.fullmatch(pattern.replace(re.escape('%(ext)s'), '[^.]+'), os.path.basename(path))
+        return match.group('title') if match and 'title' in match.groupdict() else None
+
+    def _link_from_store(self, url: str, media_id: Optional[tuple]) -> Optional[DownloadResult]:
+        """Satisfy ``url`` with a link to a stored file instead of downloading it.
+
+        Returns:
+            Optional[DownloadResult]: A ``'done'`` result, or None if the media must be downloaded.
+        """
+        store = self._get_media_store() if media_id else None
+        stored = store.lookup(self._store_key(media_id)) if store is not None else None
+        if stored is None:
+            return None
+        target = self._output_path(url).replace('%(ext)s', stored.ext)
+        if stored.title is not None:
+            target = target.replace('%(title)s', stored.title)
+        if '%(' in target:
+            return None
+        try:
+            mode = store.link(stored, target)
+        except OSError as e:
+            self._log(f"Could not link {url} from the media store, downloading it: {e}")
+            return None
+        self._log(f"Linked from the media store ({mode}): {url} -> {target}")
+        return DownloadResult(url, 'done', path=target)
+
+    def _add_to_store(self, url: str, path: Optional[str]) -> None:
+        """Add the downloaded file of ``url`` to the media store, deduplicating its contents."""
+        store = self._get_media_store()
+        if store is None or not path or not os.path.isfile(path):
+            return
+        media_id = extract_media_id(url) if 'list=' not in url else None
+        try:
+            store.add(path, self._store_key(media_id) if media_id else None,
+                      self._title_from_path(self._output_path(url), path))
+        except OSError as e:
+            self._log(f"Warning: could not add {path} to the media store: {e}")
+
+    @staticmethod
+    def _read_path_file(job: DownloadJob) -> Optional[str]:
+        """Return the final path yt-dlp wrote to ``job.path_file`` and remove the file."""
+        if not job.path_file:
+            return None
+        try:
+            with open(job.path_file, 'r', encoding='utf-8') as f:
+                paths = [line.strip() for line in f if line.strip()]
+            os.remove(job.path_file)
+        except OSError:
+            return None
+        return paths[-1] if paths else None
+
+    def _estimated_size(self, url: str, media_id: Optional[tuple]) -> Optional[int]:
+        """Estimate the size of ``url`` without network access.
+
+        The size comes from the cached metadata; without it, the duration from the
+        metadata or the playlist listing is multiplied by ``ESTIMATED_BYTE_RATE``.
+
+        Returns:
+            Optional[int]: Estimated bytes, or None if neither size nor duration is known.
+        """
+        cache = self._get_metadata_cache() if media_id else None
+        info = cache.get(*media_id) if cache is not None else None
+        details = describe_info(info) if info else {}
+        if details.get('filesize'):
+            return int(details['filesize'])
+        duration = details.get('duration') or self._entry_durations.get(url)
+        return int(duration * ESTIMATED_BYTE_RATE.get(self.mode, ESTIMATED_BYTE_RATE['Video'])) if duration else None
+
+    def _estimate(self, url: str) -> JobEstimate:
+        """Return the scheduling details of ``url`` for the `SchedulePolicy`."""
+        playlist = self._entry_playlists.get(url)
+        listed = getattr(self.urls, 'priorities', {})
+        priority = next((priorities[key] for key in (url, playlist) for priorities in (self.priorities, listed)
+                         if key in priorities), 0)
+        media_id = extract_media_id(url) if 'list=' not in url else None
+        return JobEstimate(priority, self._estimated_size(url, media_id),
+                           playlist or self.groups.get(url) or getattr(self.urls, 'path', None))
+
+    def _space_needs(self, job: DownloadJob, media_id: Optional[tuple]) -> Dict[str, int]:
+        """Return the bytes ``job`` needs per folder for `SpaceLedger.reserve`.
 
-            cmd = ['yt-dlp', '--cookies', 'cookies.txt', '-o', output_path, url]
+        Fetched streams and the merged or converted file exist side by side in the
+        folder yt-dlp and FFmpeg work in, so it needs twice the estimated size. The
+        final folder needs the size once more if it is on another file system.
+        """
+        size = self._estimated_size(job.url, media_id) or 0
+        final = os.path.dirname(self._output_path(job.url)) or '.'
+        work = job.stage_dir or (os.path.dirname(job.output_template) if job.publish_dir else final)
+        needs = {work: 2 * size}
+        if work != final and file_system(work) != file_system(final):
+            needs[final] = size
+        return needs
+
+    def _publish_staged(self, job: DownloadJob, path: Optional[str]) -> str:
+        """Move the file downloaded into the staging folder to ``job.publish_dir``.
+
+        The staging directory is removed afterwards. It is kept when the file cannot
+        be moved, so a retry finds it.
+
+        Returns:
+            str: Final path of the file.
+
+        Raises:
+            OSError: If yt-dlp reported no file or it cannot be moved.
+        """
+        if not path or not os.path.isfile(path):
+            raise FileNotFoundError(f"yt-dlp did not report the downloaded file of {job.url}")
+        final = os.path.join(job.publish_dir, os.path.basename(path))
+        publish_file(path, final)
+        shutil.rmtree(os.path.dirname(job.path_file), ignore_errors=True)
+        return final
+
+    def _log(self, message: str) -> None:
+        """Print ``message`` without interleaving it with other jobs' output."""
+        with self._print_lock:
+            print(message)
+
+    def _download_one(self, url: str) -> DownloadResult:
+        """Download a single URL and report the outcome.
+
+        When several jobs run at once, yt-dlp output is captured and printed as a
+        single block once the job finishes, so output of different jobs never mixes.
+        With ``app_config.check_free_space``, the estimated size of the job is reserved
+        on the staging and download file systems before anything is fetched.
+
+        Args:
+            url (str): URL to download.
+
+        Returns:
+            DownloadResult: Outcome of the download.
+        """
+        media_id = extract_media_id(url) if 'list=' not in url else None
+        linked = self._link_from_store(url, media_id)
+        if linked is not None:
+            return linked
+        archive = self._get_archive() if media_id else None
+        if archive is not None and archive.contains(*media_id, self._archive_output(url)):
+            self._log(f"Already downloaded, skipping: {url}")
+            return DownloadResult(url, 'skipped')
+
+        job = self._build_job(url)
+        ticket = None
+        if app_config.check_free_space:
+            try:
+                ticket = get_space_ledger().reserve(self._space_needs(job, media_id), app_config.min_free_space,
+                                                    self._wait)
+            except InsufficientSpace as e:
+                self._log(f"Not downloading {url}: {e}")
+                return DownloadResult(url, 'failed', error=str(e))
+            if ticket is None:
+                return DownloadResult(url, 'cancelled')
+        try:
+            result = self._fetch(url, job, media_id)
+        except BaseException:
+            get_space_ledger().release(ticket)
+            raise
+        if result.status == 'staged' and ticket is not None:
+            with self._space_tickets_lock:
+                self._space_tickets[url] = ticket
+        else:
+            get_space_ledger().release(ticket)
+        return result
+
+    def _fetch(self, url: str, job: DownloadJob, media_id: Optional[tuple]) -> DownloadResult:
+        """Run the download engine for ``job`` and publish the downloaded file.
+
+        The job first waits for the rate limiter of its host; cancelling the batch
+        stops the wait.
+
+        Args:
+            url (str): URL to download.
+            job (DownloadJob): Job built by `_build_job`.
+            media_id (Optional[tuple]): Extractor and video ID of ``url``, if known.
 
-            if self.mode == "Video":
-                cmd.extend(['-f', video_settings.quality_map.get(self.quality, 'bestvideo+bestaudio/best'),
-                            '--merge-output-format', self.output_format.lower()])
+        Returns:
+            DownloadResult: Outcome of the download; ``'staged'`` if the job waits for post-processing.
+        """
+        limiter = get_rate_limiter()
+        if not limiter.admit(url, self._wait):
+            return DownloadResult(url, 'cancelled')
+        self._log(f"Downloading: {url}" + (" (cached info)" if job.info_json else ""))
+        if self._uses_custom_filename(url):
+            if self.mode == 'Video':
+                ext_display = self.output_format.lower() if self.output_format else 'file'
             else:
-                cmd.extend(['-f', 'bestaudio/best', '--extract-audio', '--audio-format', 'mp3', '--audio-quality', '192'])
+                ext_display = self._audio_profile().extension or 'audio'
+            self._log(f"Saving as: {self.custom_filename}.{ext_display}")
 
-            if not is_playlist:
-                cmd.append('--no-playlist')
+        if job.stage_dir:
+            os.makedirs(job.stage_dir, exist_ok=True)
+        elif job.publish_dir:
+            os.makedirs(os.path.dirname(job.path_file), exist_ok=True)
+        elif self._get_media_store() is not None:
+            descriptor, job.path_file = tempfile.mkstemp(prefix='streamflow-', suffix='.path')
+            os.close(descriptor)
+        engine = self._engine
+        slots = None if engine.adjustable_rate else self._concurrency()
+        try:
+            with limiter.job(lambda rate: engine.update_rate_limit(job, rate), slots):
+                output = engine.download(job, capture_output=self._capture_output)
+        except DownloadEngineError as e:
+            self._read_path_file(job)
+            self._log(f"{e.output or ''}\nDownload error for {url}: {e}")
+            return DownloadResult(url, 'failed', error=str(e), output=e.output)
 
+        if job.stage_dir:
+            self._current.job = job
+            if output:
+                self._log(f"[{url}]\n{output.rstrip()}")
+            self._log(f"Fetched, waiting for post-processing: {url}")
+            return DownloadResult(url, 'staged', output=output)
+        path = self._read_path_file(job)
+        if job.publish_dir:
             try:
-                print(f"Downloading: {url}")
-                if len(self.urls) == 1 and self.custom_filename and not is_playlist:
-                    if self.mode == 'Video':
-                        ext_display = self.output_format.lower() if self.output_format else 'file'
-                    else:
-                        ext_display = 'mp3'
-                    print(f"Saving as: {self.custom_filename}.{ext_display}")
-                subprocess.run(cmd, check=True)
-                print(f"\nSuccessful download: {url}")
-            except subprocess.CalledProcessError as e:
-                print(f"\nDownload error for {url}: {e}")
+                path = self._publish_staged(job, path)
+            except OSError as e:
+                self._log(f"Could not move the download of {url} into place: {e}")
+                return DownloadResult(url, 'failed', error=str(e), output=output)
+        archive = self._get_archive() if media_id else None
+        if archive is not None:
+            archive.add(*media_id, url, self._archive_output(url))
+        self._add_to_store(url, path)
+        if output:
+            self._log(f"[{url}]\n{output.rstrip()}")
+        self._log(f"\nSuccessful download: {url}")
+        return DownloadResult(url, 'done', output=output, path=path)
+
+    def _run_job(self, url: str) -> DownloadResult:
+        """Download ``url`` with retries and record its state changes in the job journal.
+
+        Staged jobs are handed to the post-processing pipeline, waiting while its
+        queue is full; their state is recorded once the pipeline published them.
+        """
+        if self._journal is not None:
+            self._journal.record(url, RUNNING)
+        self._current.url = url
+        self.events.started(url)
+        started = time.monotonic()
+        try:
+            result = self._download_with_retries(url)
+        except BaseException as e:
+            self.events.finished(url, 'cancelled', str(e) or type(e).__name__)
+            self._current.url = None
+            raise
+        self._current.url = None
+        if result.status == 'staged':
+            result.elapsed = time.monotonic() - started
+            self._pipeline.submit(self._current.job, result)
+            return result
+        self._finish_job(url, result)
+        return result
+
+    def _finish_job(self, url: str, result: DownloadResult) -> None:
+        """Record the outcome of ``url`` in the job journal and publish its final event."""
+        if self._journal is not None and result.status != 'cancelled':
+            self._journal.record(url, DONE if result.success else FAILED, error=result.error)
+        self.events.finished(url, result.status, result.error)
+
+    def _publish_finished(self, job: DownloadJob, result: DownloadResult, error: Optional[Exception]) -> None:
+        """Complete a staged job once the post-processing pipeline published or failed it."""
+        with self._space_tickets_lock:
+            get_space_ledger().release(self._space_tickets.pop(job.url, None))
+        if error is None:
+            result.status = 'done'
+            media_id = extract_media_id(job.url)
+            archive = self._get_archive() if media_id else None
+            if archive is not None:
+                archive.add(*media_id, job.url, self._archive_output(job.url))
+            self._add_to_store(job.url, result.path)
+            self._log(f"\nSuccessful download: {job.url}")
+        else:
+            result.status = 'failed'
+            result.error = str(error)
+            if isinstance(error, PostprocessError):
+                result.output = error.output
+            self._log(f"{result.output or ''}\nPost-processing error for {job.url}: {error}")
+        self._finish_job(job.url, result)
+
+    def _download_with_retries(self, url: str) -> DownloadResult:
+        """Download ``url``, retrying transient failures with exponential backoff and jitter.
+
+        Permanent failures, such as private or removed videos, are not retried.
+        When a host answers HTTP 429, the pause is shared through the rate limiter,
+        so every worker waits before contacting that host again.
+        """
+        policy = RetryPolicy(app_config.download_retries, app_config.retry_base_delay, app_config.retry_max_delay)
+        limiter = get_rate_limiter()
+        attempt = 1
+        while True:
+            result = self._download_one(url)
+            result.attempts = attempt
+            if result.status != 'failed':
+                if result.status in ('done', 'staged'):
+                    limiter.recovered(url)
+                return result
+            result.failure = classify_error(f"{result.error or ''}\n{result.output or ''}")
+            if not policy.should_retry(result.failure, attempt):
+                if result.failure == PERMANENT:
+                    self._log(f"Not retrying {url}: the failure is permanent.")
+                return result
+            if result.failure == RATE_LIMITED:
+                delay = limiter.back_off(url, policy.delay)
+            else:
+                delay = policy.delay(attempt)
+            self._log(f"Retrying {url} in {delay:.1f}s ({result.failure}, {attempt}/{policy.retries})")
+            self.events.retry(url, attempt, result.failure, delay)
+            if result.failure != RATE_LIMITED and self._wait(delay):
+                return result
+            attempt += 1
+
+    def _concurrency(self) -> int:
+        """Return how many jobs may download at once in this process."""
+        jobs = self._scheduler.jobs if self._scheduler is not None else 1
+        return max(jobs, app_config.max_concurrent_downloads)
+
+    def _wait(self, seconds: float) -> bool:
+        """Sleep before a retry; return True if the batch was cancelled meanwhile."""
+        if self._scheduler is None:
+            time.sleep(seconds)
+            return False
+        return self._scheduler.wait(seconds)
+
+    def _announce(self, urls: Iterable[str]) -> Iterator[str]:
+        """Report every URL as queued when the scheduler pulls it."""
+        for url in urls:
+            self.events.queued(url)
+            yield url
+
+    def _open_journal(self) -> Optional[JobJournal]:
+        """Open the journal of the download folder and start or resume the batch."""
+        if not app_config.use_job_journal:
+            return None
+        journal = JobJournal(self.download_folder)
+        if self._resume_batch_id:
+            journal.resume_batch(self._resume_batch_id)
+        else:
+            journal.start_batch(source=self.source_file, options=self._journal_options())
+        return journal
+
+    def check_toolchain(self) -> List[str]:
+        """Check that FFmpeg can produce the selected output.
+
+        Uses the memoized toolchain probe, so the check is free after the first call.
+
+        Returns:
+            List[str]: Human-readable problems; empty if the output can be produced.
+        """
+        toolchain = get_toolchain()
+        problems = []
+        if self.mode == 'Video':
+            muxer = video_settings.output_format_muxers.get(self.output_format)
+            if muxer and not toolchain.supports_muxer(muxer):
+                problems.append(f"FFmpeg cannot write {self.output_format} files (muxer '{muxer}' is missing).")
+        else:
+            profile = self._audio_profile()
+            if profile.encoder and not toolchain.supports_encoder(profile.encoder):
+                problems.append(f"FFmpeg cannot encode {profile.label} audio (encoder '{profile.encoder}' is missing).")
+        return problems
+
+    def _print_summary(self, results: List[DownloadResult], cancelled: bool) -> None:
+        """Print a short per-batch summary of download results."""
+        failed = [result for result in results if result.status == 'failed']
+        skipped = sum(1 for result in results if result.status == 'skipped')
+        if cancelled:
+            print("\nDownload cancelled. Running jobs were allowed to finish.")
+        if len(results) > 1 or failed or skipped or cancelled:
+            done = sum(1 for result in results if result.status == 'done')
+            print(f"\nCompleted: {done}, skipped (already downloaded): {skipped}, failed: {len(failed)}, "
+                  f"cancelled: {sum(1 for result in results if result.status == 'cancelled')}")
+            for result in failed:
+                print(f"  Failed: {result.url} ({result.error})")
+
+    def cancel(self) -> None:
+        """Stop a running `download_video` from another thread.
+
+        Jobs that have not started are cancelled and running jobs finish. Does
+        nothing when no batch is running.
+        """
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+
+    @ffmpeg_required
+    @network_required
+    @timed
+    def download_video(self, jobs: Optional[int] = None) -> List[DownloadResult]:
+        """Download configured URLs using ``yt-dlp`` and the project's cookies.
+
+        Applies the selected quality and output format. Playlists are split into
+        per-entry jobs that run concurrently, succeed or fail on their own and are
+        saved in the playlist folder with their playlist index in the filename.
+
+        Videos with fresh entries in the metadata cache start from the cached info
+        instead of being extracted again. Every state change is recorded in the
+        folder's job journal so the batch can be resumed, and published as a
+        structured event on ``events`` (and ``app_config.event_log_path``) that
+        also feeds the process metrics of `src.utils.metrics`. Media recorded in
+        the download archive with the same mode, format and output template is
+        skipped before any process is started.
+        With ``app_config.use_media_store``, media that is already in the media store
+        in the same format is linked into place instead, and new downloads are added
+        to the store.
+
+        Up to ``jobs`` URLs are downloaded at the same time by the engine selected
+        with ``app_config.download_engine``. Job starts are rate limited per host and
+        ``app_config.max_bandwidth`` is divided across the running jobs; a
+        cancelled batch stops waiting for a paused host. Transient
+        failures are retried with exponential backoff (``app_config.download_retries``);
+        download errors are caught and reported per-URL.
+        Unless ``app_config.schedule_policy`` is ``'fifo'``, the next job is chosen
+        among the next ``app_config.schedule_window`` URLs, using explicit priorities
+        and the size estimated from the metadata cache or the playlist listing.
+
+        With ``app_config.staged_postprocessing``, the download workers only fetch
+        the raw streams and a `PostprocessPipeline` sized to the CPU cores merges
+        and converts them, so the next transfers start while FFmpeg runs.
+
+        Args:
+            jobs (Optional[int]): Number of concurrent downloads. Defaults to
+                ``self.jobs`` or ``app_config.max_concurrent_downloads``.
+
+        Returns:
+            List[DownloadResult]: Per-URL results in input order, or None if the
+            toolchain cannot produce the selected output.
+        """
+        problems = self.check_toolchain()
+        if problems:
+            for problem in problems:
+                print(f"Error: {problem}")
+            return None
+
+        jobs = jobs or self.jobs or app_config.max_concurrent_downloads
+        fans_out = app_config.playlist_fanout and self.is_playlist
+        if isinstance(self.urls, (list, tuple)) and not fans_out:
+            jobs = max(1, min(jobs, len(self.urls)))
+        self._capture_output = jobs > 1
+
+        policy = None
+        if app_config.schedule_policy != 'fifo':
+            policy = SchedulePolicy(app_config.schedule_policy, self._estimate, app_config.schedule_window,
+                                    app_config.schedule_max_skips)
+        scheduler = self._scheduler = DownloadScheduler(jobs, policy)
+        pipeline = None
+        if app_config.staged_postprocessing:
+            pipeline = self._pipeline = PostprocessPipeline(
+                self._publish_finished, app_config.postprocess_workers, app_config.postprocess_queue_size,
+                postprocessor_hooks=[self.postprocessor_hook])
+        self._journal = self._open_journal()
+        sink = self.events.subscribe(JsonLinesSink(app_config.event_log_path)) if app_config.event_log_path else None
+        metrics = self.events.subscribe(get_download_metrics())
+        exporter = start_exporter()
+        started = time.monotonic()
+        try:
+            with create_engine(app_config.download_engine, progress_hooks=[self.progress_hook],
+                               postprocessor_hooks=[self.postprocessor_hook]) as engine:
+                self._engine = engine
+                urls = self._expand_playlists(self.urls)
+                if self._journal is not None:
+                    urls = self._journal.track(urls, self._entry_templates)
+                try:
+                    results = scheduler.run(self._announce(urls), self._run_job)
+                finally:
+                    if pipeline is not None:
+                        pipeline.close()
+                        self._pipeline = None
+            self.events.batch(results, time.monotonic() - started)
+        finally:
+            if self._journal is not None:
+                self._journal.finish_batch()
+            self.events.unsubscribe(metrics)
+            if exporter is not None:
+                exporter.write_snapshot()
+            if sink is not None:
+                self.events.unsubscribe(sink)
+                sink.close()
+        if self._metadata_cache is not None:
+            self._metadata_cache.evict()
+        self._print_summary(results, scheduler.cancelled)
+        if isinstance(self.urls, LinkStream):
+            print(f"Links {self.urls.stats}")
+        return results
@@ -3,10 +3,17 @@ This module defines the application's configuration settings using Pydantic.
 It loads variables and provides a centralized
 way to access configuration values throughout the project.
 """
+import os
+from typing import List, Literal, Optional
 from pydantic import Field
 from pydantic import BaseModel
 
 
+def _xdg_path(variable: str, fallback: str, *parts: str) -> str:
+    """Return a path below an XDG base directory, falling back to its default location."""
+    return os.path.join(os.environ.get(variable) or os.path.expanduser(fallback), 'streamflow', *parts)
+
+
 class AppConfig(BaseModel):
     """Application configuration settings.
 
@@ -14,6 +21,94 @@ class AppConfig(BaseModel):
 
     Attributes:
         download_folder (str): The default folder where downloaded videos will be saved.
+        max_concurrent_downloads (int): Number of yt-dlp jobs that may run at the same time.
+        use_download_archive (bool): Skip media that is recorded in the download archive.
+        archive_path (str): SQLite database of completed downloads, shared by all download folders.
+        download_engine (str): ``'inprocess'`` keeps one ``yt_dlp.YoutubeDL`` per worker for the
+            whole batch, ``'subprocess'`` starts a ``yt-dlp`` process per URL and ``'auto'``
+            prefers the in-process engine when ``yt_dlp`` is importable.
+        connectivity_targets (List[str]): ``host:port`` targets probed by the connectivity
+            monitor. IPv6 hosts are written as ``[addr]:port``.
+        connectivity_ttl (float): Seconds a connectivity probe result is reused.
+        toolchain_cache_path (str): JSON file caching the FFmpeg encoder and muxer listings.
+        use_job_journal (bool): Record the state of every URL in the download folder's
+            job journal so interrupted batches can be resumed.
+        playlist_fanout (bool): Split playlists into one job per entry so their videos
+            download concurrently. When False, yt-dlp downloads a playlist as one job.
+        download_retries (int): Extra attempts for a download that failed transiently,
+            e.g. with HTTP 429, a server error or a network error. Permanent failures such
+            as private or removed videos are not retried.
+        retry_base_delay (float): Seconds before the first retry. The delay doubles with
+            every further retry and is randomized (jitter).
+        retry_max_delay (float): Upper bound of a single retry delay in seconds.
+        transfer_profile (str): Key of ``video_settings.transfer_profiles`` used by default.
+        audio_profile (str): Key of ``video_settings.audio_profiles`` used by audio-only mode by default.
+        staged_postprocessing (bool): Let download workers only fetch the raw streams into a
+            staging folder and run FFmpeg merging and conversion in a separate worker pool,
+            so transfers and post-processing overlap.
+        staging_folder (Optional[str]): Folder of the fetched streams. Defaults to
+            ``.streamflow-staging`` inside the download folder, on the same file system.
+            When set, jobs without staged post-processing also download and merge there,
+            e.g. on a local SSD or tmpfs, and each finished file is moved atomically into
+            the download folder.
+        check_free_space (bool): Reserve the estimated size of a job from its cached metadata
+            on the staging and download file systems before it starts. A job that does not
+            fit waits for running jobs, or fails at once if no other job holds space there.
+        min_free_space (int): Bytes that must stay free on those file systems after the reservation.
+        postprocess_workers (Optional[int]): FFmpeg processes running at the same time.
+            None uses one per CPU core.
+        postprocess_queue_size (int): Fetched jobs that may wait for FFmpeg before the
+            download workers pause.
+        schedule_policy (str): Order in which queued URLs start: ``'fifo'`` (input order),
+            ``'priority'`` (``priority=N`` of the link file lines, then input order),
+            ``'shortest'`` (smallest estimated size first) or ``'fair'`` (taking turns between
+            playlists and sources). All but ``'fifo'`` start higher priorities first.
+        schedule_window (int): Queued URLs the scheduling policy chooses from.
+        schedule_max_skips (int): Times a URL may be passed over before it starts regardless
+            of its priority or size, so large items still finish.
+        max_bandwidth (Optional[int]): Total download rate of the process in bytes per second,
+            divided evenly across running jobs. With the subprocess engine, whose rate is fixed
+            per process, each job gets the rate divided by the number of concurrent downloads.
+            None means unlimited.
+        host_requests_per_second (Optional[float]): Jobs that may start per second against the
+            same host. None means unlimited.
+        host_request_burst (int): Jobs that may start at once against the same host before
+            ``host_requests_per_second`` applies.
+        event_log_path (Optional[str]): JSON-lines file receiving structured job and batch
+            events. ``'-'`` writes them to standard error. None disables the log.
+        progress_event_interval (float): Minimum seconds between two progress events of a job.
+        metrics_port (Optional[int]): Port of the Prometheus endpoint on ``127.0.0.1``.
+            None disables the endpoint.
+        metrics_snapshot_path (Optional[str]): JSON file the metrics are written to
+            periodically and after every batch. None disables snapshots.
+        metrics_snapshot_interval (float): Seconds between two metrics snapshots.
+        use_metadata_cache (bool): Keep extracted video info so later downloads of the same
+            video skip extraction.
+        metadata_cache_dir (str): Directory of the metadata cache.
+        metadata_cache_ttl (float): Seconds cached video info stays valid. Stream URLs in the
+            info expire after a few hours.
+        metadata_cache_max_bytes (int): Size of the metadata cache before the least recently
+            used entries are evicted.
+        job_queue_path (str): SQLite database of queued download jobs, shared by the
+            watch-folder daemon, the job API, queue workers and later sessions.
+        job_queue_journal_mode (str): SQLite journal mode of the job queue. ``'WAL'`` lets
+            processes on one host share the queue; ``'DELETE'`` is needed when workers on
+            several hosts open it over a network file system.
+        inbox_debounce (float): Seconds a link file in the watched inbox must stay unchanged
+            before its new lines are queued.
+        inbox_batch_size (int): Queued jobs the watch-folder daemon downloads as one batch.
+        use_media_store (bool): Keep downloaded files in a content-addressed store and satisfy
+            later requests for the same media and format, in any folder, with links to it.
+        media_store_dir (str): Directory of the media store. Hardlinks need it on the same
+            file system as the download folders.
+        media_store_link_modes (List[str]): Ways of placing a stored file in a download folder,
+            tried in order: ``'hardlink'``, ``'reflink'``, ``'symlink'`` or ``'copy'``.
+        server_port (int): Port of the job API on ``127.0.0.1`` (``main.py serve``).
+        server_workers (int): Batches the job API downloads at the same time. Each batch runs
+            up to ``max_concurrent_downloads`` jobs.
+        worker_lease (float): Seconds a queue worker (``main.py worker``, ``serve`` or ``watch``) holds a
+            batch without a heartbeat. Jobs of a crashed worker are claimed by others after this time.
+        worker_poll_interval (float): Seconds between checks of an empty queue by a queue worker.
 
     Example:
         ```python
@@ -23,6 +118,58 @@ class AppConfig(BaseModel):
     """
 
     download_folder: str = Field(default="~/Downloads")
+    max_concurrent_downloads: int = Field(default=3, ge=1)
+    use_download_archive: bool = Field(default=True)
+    archive_path: str = Field(
+        default_factory=lambda: _xdg_path('XDG_DATA_HOME', '~/.local/share', 'archive.sqlite3'))
+    download_engine: Literal['auto', 'inprocess', 'subprocess'] = Field(default='auto')
+    connectivity_targets: List[str] = Field(default=['8.8.8.8:53', '1.1.1.1:53', '[2001:4860:4860::8888]:53'])
+    connectivity_ttl: float = Field(default=5.0, gt=0)
+    toolchain_cache_path: str = Field(
+        default_factory=lambda: _xdg_path('XDG_CACHE_HOME', '~/.cache', 'toolchain.json'))
+    use_job_journal: bool = Field(default=True)
+    playlist_fanout: bool = Field(default=True)
+    download_retries: int = Field(default=3, ge=0)
+    retry_base_delay: float = Field(default=2.0, ge=0)
+    retry_max_delay: float = Field(default=60.0, ge=0)
+    transfer_profile: str = Field(default='default')
+    audio_profile: str = Field(default='mp3')
+    staged_postprocessing: bool = Field(default=False)
+    staging_folder: Optional[str] = Field(default=None)
+    check_free_space: bool = Field(default=True)
+    min_free_space: int = Field(default=100 * 1024 * 1024, ge=0)
+    postprocess_workers: Optional[int] = Field(default=None, ge=1)
+    postprocess_queue_size: int = Field(default=4, ge=1)
+    schedule_policy: Literal['fifo', 'priority', 'shortest', 'fair'] = Field(default='fifo')
+    schedule_window: int = Field(default=64, ge=1)
+    schedule_max_skips: int = Field(default=32, ge=0)
+    max_bandwidth: Optional[int] = Field(default=None, gt=0)
+    host_requests_per_second: Optional[float] = Field(default=None, gt=0)
+    host_request_burst: int = Field(default=3, ge=1)
+    event_log_path: Optional[str] = Field(default=None)
+    progress_event_interval: float = Field(default=0.5, ge=0)
+    metrics_port: Optional[int] = Field(default=None, ge=0, le=65535)
+    metrics_snapshot_path: Optional[str] = Field(default=None)
+    metrics_snapshot_interval: float = Field(default=15.0, gt=0)
+    use_metadata_cache: bool = Field(default=True)
+    metadata_cache_dir: str = Field(
+        default_factory=lambda: _xdg_path('XDG_CACHE_HOME', '~/.cache', 'metadata'))
+    metadata_cache_ttl: float = Field(default=3600.0, gt=0)
+    metadata_cache_max_bytes: int = Field(default=256 * 1024 * 1024, ge=0)
+    job_queue_path: str = Field(
+        default_factory=lambda: _xdg_path('XDG_DATA_HOME', '~/.local/share', 'queue.sqlite3'))
+    job_queue_journal_mode: Literal['WAL', 'DELETE'] = Field(default='WAL')
+    inbox_debounce: float = Field(default=2.0, ge=0)
+    inbox_batch_size: int = Field(default=50, ge=1)
+    use_media_store: bool = Field(default=False)
+    media_store_dir: str = Field(
+        default_factory=lambda: _xdg_path('XDG_DATA_HOME', '~/.local/share', 'store'))
+    media_store_link_modes: List[Literal['hardlink', 'reflink', 'symlink', 'copy']] = Field(
+        default=['hardlink', 'reflink', 'symlink'])
+    server_port: int = Field(default=8765, ge=0, le=65535)
+    server_workers: int = Field(default=2, ge=1)
+    worker_lease: float = Field(default=60.0, gt=0)
+    worker_poll_interval: float = Field(default=2.0, gt=0)
 
 
 app_config = AppConfig()
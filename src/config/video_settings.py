@@ -1,10 +1,55 @@
 """
 This module provides default settings for video downloading or processing.
-It defines a Pydantic model for video quality mapping and supported output formats.
+It defines Pydantic models for video quality mapping, supported output formats,
+audio profiles and transfer profiles.
 """
 
-from typing import Dict, List
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+class TransferProfile(BaseModel):
+    """
+    Describes how the bytes of a download are transferred.
+
+    Attributes:
+        concurrent_fragments (int): Fragments of DASH/HLS formats downloaded at the same time.
+        http_chunk_size (Optional[int]): Size in bytes of the ranges requested for plain HTTP
+            downloads, which avoids server-side throttling of long responses.
+        buffer_size (Optional[int]): Download buffer size in bytes.
+        external_downloader (Optional[str]): Multi-connection downloader used when it is installed,
+            e.g. ``'aria2c'``. yt-dlp's native downloader is used otherwise.
+        external_downloader_args (List[str]): Arguments passed to the external downloader.
+    """
+
+    concurrent_fragments: int = Field(default=1, ge=1)
+    http_chunk_size: Optional[int] = Field(default=None, gt=0)
+    buffer_size: Optional[int] = Field(default=None, gt=0)
+    external_downloader: Optional[str] = None
+    external_downloader_args: List[str] = []
+
+class AudioProfile(BaseModel):
+    """
+    Describes the output of audio-only downloads.
+
+    The format selector prefers a source stream that already uses the target
+    codec. yt-dlp then copies the stream into the target container and only
+    transcodes when no such source exists.
+
+    Attributes:
+        label (str): Human-readable name shown in prompts.
+        format_selector (str): yt-dlp format selector of the source stream.
+        codec (str): yt-dlp ``--audio-format`` value. ``'best'`` keeps the source codec.
+        bitrate (Optional[str]): Default bitrate in kbit/s used when transcoding.
+        encoder (Optional[str]): FFmpeg encoder needed when transcoding; None for passthrough.
+        extension (Optional[str]): Extension of the resulting file; None if it depends on the source.
+    """
+
+    label: str
+    format_selector: str = 'bestaudio/best'
+    codec: str
+    bitrate: Optional[str] = None
+    encoder: Optional[str] = None
+    extension: Optional[str] = None
 
 class VideoSettings(BaseModel):
     """
@@ -19,7 +64,17 @@ class VideoSettings(BaseModel):
                 - 'High (720p)'
                 - 'Low (<=480p)'
         output_formats (List[str]): List of supported output file formats, e.g., 'Mp4' and 'Mkv'.
-        
+        output_format_muxers (Dict[str, str]): FFmpeg muxer required by each output format.
+        audio_profiles (Dict[str, AudioProfile]): Outputs of audio-only mode. Keys include:
+                - 'best': the source stream (usually m4a or opus) copied without re-encoding
+                - 'mp3': MP3, transcoded unless the source already is MP3
+                - 'opus': Opus, copied from Opus sources
+                - 'aac': AAC in an m4a container, copied from AAC sources
+        transfer_profiles (Dict[str, TransferProfile]): Transfer presets. Keys include:
+                - 'default': one fragment and one connection at a time
+                - 'segmented': four concurrent fragments and 10 MiB HTTP chunks
+                - 'aria2c': eight concurrent fragments and 16 aria2c connections per file
+
     Example:
         ```python
         from config.video_settings import video_settings
@@ -38,5 +93,28 @@ class VideoSettings(BaseModel):
 
     output_formats: List[str] = ['Mp4', 'Mkv']
 
+    output_format_muxers: Dict[str, str] = {
+        'Mp4': 'mp4',
+        'Mkv': 'matroska',
+    }
+
+    audio_profiles: Dict[str, AudioProfile] = {
+        'best': AudioProfile(label='Best native (no re-encoding)', codec='best'),
+        'mp3': AudioProfile(label='MP3', format_selector='bestaudio[acodec=mp3]/bestaudio/best', codec='mp3',
+                            bitrate='192', encoder='libmp3lame', extension='mp3'),
+        'opus': AudioProfile(label='Opus', format_selector='bestaudio[acodec=opus]/bestaudio/best', codec='opus',
+                             bitrate='128', encoder='libopus', extension='opus'),
+        'aac': AudioProfile(label='AAC (m4a)', format_selector='bestaudio[acodec^=mp4a]/bestaudio/best',
+                            codec='m4a', bitrate='192', encoder='aac', extension='m4a'),
+    }
+
+    transfer_profiles: Dict[str, TransferProfile] = {
+        'default': TransferProfile(),
+        'segmented': TransferProfile(concurrent_fragments=4, http_chunk_size=10 * 1024 * 1024,
+                                     buffer_size=1024 * 1024),
+        'aria2c': TransferProfile(concurrent_fragments=8, external_downloader='aria2c',
+                                  external_downloader_args=['-x', '16', '-s', '16', '-k', '1M']),
+    }
+
 video_settings = VideoSettings()
 """video_settings: Global video settings instance."""
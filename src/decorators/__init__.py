@@ -9,11 +9,14 @@ Modules:
 Attributes:
     network_required: Imported from `connected`, ensures a network connection before function execution.
     is_connected: Imported from `connected`, checks if the system is connected to the internet.
+    ConnectivityMonitor: Imported from `connected`, caches connectivity state and wakes waiters.
+    get_connectivity_monitor: Imported from `connected`, returns the shared connectivity monitor.
     ffmpeg_required: Imported from `ffmpeg`, ensures FFmpeg is installed before function execution.
+    get_toolchain: Imported from `ffmpeg`, returns the memoized FFmpeg and yt-dlp capabilities.
     timed: Imported from `timed`, measures and displays the execution time of a function.
 """
-from .connected import network_required, is_connected
-from .ffmpeg import ffmpeg_required
+from .connected import network_required, is_connected, ConnectivityMonitor, get_connectivity_monitor
+from .ffmpeg import ffmpeg_required, get_toolchain
 from .timed import timed
 
-__all__ = ['network_required', 'is_connected', 'ffmpeg_required', 'timed']
+__all__ = ['network_required', 'is_connected', 'ConnectivityMonitor', 'get_connectivity_monitor', 'ffmpeg_required', 'get_toolchain', 'timed']
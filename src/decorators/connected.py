@@ -2,37 +2,205 @@
 Module providing network-related utilities.
 
 This module including:
-- `is_connected()`: Check internet connectivity.
+- `is_connected()`: Check internet connectivity with a single probe.
+- `ConnectivityMonitor`: Shared, cached connectivity state refreshed in the background.
+- `get_connectivity_monitor()`: Return the process-wide monitor.
 - `network_required`: Decorator that ensures a network connection before executing a function.
 """
 
 import socket
+import threading
 import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from src.utils.metrics import get_registry
+
+def parse_target(target: str) -> Tuple[str, int]:
+    """Split a ``host:port`` probe target. IPv6 hosts are written as ``[addr]:port``.
+
+    Args:
+        target (str): Probe target, e.g. ``"8.8.8.8:53"`` or ``"[2001:4860:4860::8888]:53"``.
+
+    Returns:
+        Tuple[str, int]: Host and port.
+
+    Raises:
+        ValueError: If the target has no valid port.
+    """
+    host, _, port = target.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid probe target: {target}")
+    return host.strip('[]'), int(port)
 
 def is_connected(host:str="8.8.8.8", port:int=53, timeout:int=3) -> bool:
     """Check internet connectivity by attempting to connect to a public DNS server.
 
+    The timeout only applies to the probe socket; the process-wide default
+    socket timeout is left untouched.
+
     Args:
-        host (str, optional): Host to connect to. Defaults to "8.8.8.8" (Google DNS).
+        host (str, optional): Host to connect to. IPv6 addresses are supported.
+            Defaults to "8.8.8.8" (Google DNS).
         port (int, optional): Port to use for the connection. Defaults to 53.
         timeout (int, optional): Connection timeout in seconds. Defaults to 3.
 
     Returns:
         bool: True if the connection succeeds, False otherwise.
     """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
     try:
-        socket.setdefaulttimeout(timeout)
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        with socket.socket(family, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
             s.connect((host, port))
         return True
     except (socket.timeout, socket.error):
         return False
 
+class ConnectivityMonitor:
+    """Shared connectivity state with a TTL cache and event-based waiting.
+
+    Reading the state is O(1) and never touches the network: a stale value
+    triggers a refresh in a background thread and the last known state is
+    returned. Only the very first check probes synchronously. While offline,
+    a background thread re-probes every ``retry_interval`` seconds and wakes
+    all waiters through an event as soon as a target is reachable.
+
+    Attributes:
+        targets (List[Tuple[str, int]]): Probe targets. Any reachable target means online.
+        ttl (float): Seconds a probe result stays fresh.
+        timeout (float): Timeout of a single probe in seconds.
+        retry_interval (float): Seconds between probes while offline.
+
+    Example:
+        ```python
+        monitor = ConnectivityMonitor(targets=['8.8.8.8:53', '[2001:4860:4860::8888]:53'])
+        if not monitor.is_online():
+            monitor.wait_until_online()
+        ```
+    """
+
+    def __init__(self, targets: Optional[Sequence[str]] = None, ttl: float = 5.0, timeout: float = 3.0,
+                 retry_interval: float = 2.0, probe: Optional[Callable[[], bool]] = None):
+        """Create a monitor.
+
+        Args:
+            targets (Optional[Sequence[str]]): ``host:port`` probe targets. Defaults to ``8.8.8.8:53``.
+            ttl (float, optional): Seconds a probe result stays fresh. Defaults to 5.
+            timeout (float, optional): Timeout of a single probe in seconds. Defaults to 3.
+            retry_interval (float, optional): Seconds between probes while offline. Defaults to 2.
+            probe (Optional[Callable[[], bool]]): Replaces the socket probe, e.g. with a
+                local stand-in for tests.
+        """
+        self.targets: List[Tuple[str, int]] = [parse_target(target) for target in (targets or ['8.8.8.8:53'])]
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._probe = probe
+        self._online: Optional[bool] = None
+        self._checked_at = 0.0
+        self._online_event = threading.Event()
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._waiter_thread: Optional[threading.Thread] = None
+
+    def probe(self) -> bool:
+        """Probe the targets now, without using the cache.
+
+        Returns:
+            bool: True if any target is reachable.
+        """
+        if self._probe is not None:
+            return bool(self._probe())
+        return any(is_connected(host, port, self.timeout) for host, port in self.targets)
+
+    def refresh(self) -> bool:
+        """Probe the targets and update the cached state.
+
+        Returns:
+            bool: The new state.
+        """
+        online = self.probe()
+        with self._lock:
+            self._online = online
+            self._checked_at = time.monotonic()
+            self._refreshing = False
+        if online:
+            self._online_event.set()
+        else:
+            self._online_event.clear()
+        return online
+
+    def is_online(self) -> bool:
+        """Return the cached connectivity state.
+
+        Returns:
+            bool: True if the network was reachable at the last probe.
+        """
+        with self._lock:
+            state = self._online
+            stale = time.monotonic() - self._checked_at > self.ttl
+            start_refresh = state is not None and stale and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+        if state is None:
+            return self.refresh()
+        if start_refresh:
+            threading.Thread(target=self.refresh, name='connectivity-refresh', daemon=True).start()
+        return state
+
+    def wait_until_online(self, timeout: Optional[float] = None) -> bool:
+        """Block until the network is reachable.
+
+        Args:
+            timeout (Optional[float]): Maximum seconds to wait. Waits forever if None.
+
+        Returns:
+            bool: True if the network is reachable, False if the timeout expired.
+        """
+        if self._online_event.is_set() and self.is_online():
+            return True
+        self._ensure_watcher()
+        return self._online_event.wait(timeout)
+
+    def _ensure_watcher(self) -> None:
+        """Start the background thread that re-probes while offline."""
+        with self._lock:
+            if self._waiter_thread is not None and self._waiter_thread.is_alive():
+                return
+            self._online_event.clear()
+            self._waiter_thread = threading.Thread(target=self._watch, name='connectivity-monitor', daemon=True)
+            self._waiter_thread.start()
+
+    def _watch(self) -> None:
+        """Probe until a target is reachable."""
+        while not self.refresh():
+            time.sleep(self.retry_interval)
+
+_monitor: Optional[ConnectivityMonitor] = None
+_monitor_lock = threading.Lock()
+
+def get_connectivity_monitor() -> ConnectivityMonitor:
+    """Return the process-wide connectivity monitor, creating it on first use.
+
+    The monitor is configured from ``app_config.connectivity_targets`` and
+    ``app_config.connectivity_ttl``.
+
+    Returns:
+        ConnectivityMonitor: The shared monitor.
+    """
+    global _monitor  # pylint: disable=global-statement
+    with _monitor_lock:
+        if _monitor is None:
+            from src.config import app_config  # pylint: disable=import-outside-toplevel
+            _monitor = ConnectivityMonitor(targets=app_config.connectivity_targets, ttl=app_config.connectivity_ttl)
+        return _monitor
+
 def network_required(func:callable) -> callable:
     """Decorator that ensures a network connection before executing a function.
 
-    If no network connection is available, the decorated function will wait
-    and retry until a connection is restored.
+    If no network connection is available, the decorated function waits until
+    the shared `ConnectivityMonitor` reports that the connection is restored.
+    Waits are counted in the ``streamflow_network_waits_total`` metric.
 
     Args:
         func (Callable): Function to decorate.
@@ -46,8 +214,10 @@ def network_required(func:callable) -> callable:
         Returns:
             Any: The return value of the wrapped function.
         """
-        while not is_connected():
+        monitor = get_connectivity_monitor()
+        if not monitor.is_online():
             print("No network connection. Waiting for the reinstatement of the connection ...")
-            time.sleep(5)
+            get_registry().counter('streamflow_network_waits_total', "Waits for a lost network connection.").inc()
+            monitor.wait_until_online()
         return func(*args, **kwargs)
     return wrapper
@@ -1,16 +1,214 @@
 """
 This module provides a decorator for verifying the presence of FFmpeg.
 
+The toolchain is probed once per process. The expensive encoder and muxer
+listings are additionally cached on disk, keyed by the FFmpeg binary path and
+modification time, so later runs can check capabilities for free.
+
+Classes:
+    Toolchain: Queryable description of the installed FFmpeg and yt-dlp.
+
 Functions:
+    get_toolchain: Returns the memoized `Toolchain` of this process.
+    reset_toolchain: Forgets the memoized `Toolchain`.
     ffmpeg_required: Ensures FFmpeg is installed before executing the decorated function.
 """
 
+import json
+import os
+import shutil
 import subprocess
+import threading
+from typing import FrozenSet, Optional
+
+def _parse_listing(output: object) -> Optional[FrozenSet[str]]:
+    """Parse the names from ``ffmpeg -encoders`` or ``ffmpeg -muxers`` output.
+
+    Returns:
+        Optional[FrozenSet[str]]: Listed names, or None if the output could not be parsed.
+    """
+    if not isinstance(output, str):
+        return None
+    names = set()
+    in_table = False
+    for line in output.splitlines():
+        stripped = line.strip()
+        if not in_table:
+            in_table = stripped.startswith('--')
+            continue
+        parts = stripped.split()
+        if len(parts) >= 2:
+            names.update(parts[1].split(','))
+    return frozenset(names) or None
+
+class Toolchain:
+    """Queryable description of the installed FFmpeg, ffprobe and yt-dlp.
+
+    Listings that cannot be determined are reported as unknown (``None``) and
+    treated as supported, so a broken probe never blocks a download.
+
+    Attributes:
+        ffmpeg_version (Optional[str]): FFmpeg version string, or None if FFmpeg is missing.
+        ffmpeg_path (Optional[str]): Resolved FFmpeg binary, if it is on ``PATH``.
+        cache_path (Optional[str]): JSON file caching encoder and muxer listings.
+    """
+
+    def __init__(self, ffmpeg_version: Optional[str], ffmpeg_path: Optional[str] = None,
+                 cache_path: Optional[str] = None):
+        self.ffmpeg_version = ffmpeg_version
+        self.ffmpeg_path = ffmpeg_path
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._listings: dict = {}
+        self._programs: dict = {}
+
+    @property
+    def ffmpeg_available(self) -> bool:
+        """bool: True if FFmpeg could be executed."""
+        return self.ffmpeg_version is not None
+
+    @property
+    def has_ffprobe(self) -> bool:
+        """bool: True if ffprobe is on ``PATH``. The result is memoized."""
+        return self.has_program('ffprobe')
+
+    def has_program(self, name: str) -> bool:
+        """Check whether the executable ``name``, e.g. ``'aria2c'``, is on ``PATH``. The result is memoized."""
+        if name not in self._programs:
+            self._programs[name] = shutil.which(name) is not None
+        return self._programs[name]
+
+    @property
+    def ytdlp_version(self) -> Optional[str]:
+        """Optional[str]: Installed yt-dlp version, or None if it is not installed."""
+        try:
+            from importlib.metadata import PackageNotFoundError, version  # pylint: disable=import-outside-toplevel
+            return version('yt-dlp')
+        except PackageNotFoundError:
+            return None
+
+    @property
+    def encoders(self) -> Optional[FrozenSet[str]]:
+        """Optional[FrozenSet[str]]: Available FFmpeg encoders, or None if unknown."""
+        return self._listing('encoders')
+
+    @property
+    def muxers(self) -> Optional[FrozenSet[str]]:
+        """Optional[FrozenSet[str]]: Available FFmpeg muxers, or None if unknown."""
+        return self._listing('muxers')
+
+    def supports_encoder(self, name: str) -> bool:
+        """Check whether FFmpeg can encode with ``name``, e.g. ``'libmp3lame'``."""
+        encoders = self.encoders
+        return self.ffmpeg_available and (encoders is None or name in encoders)
+
+    def supports_muxer(self, name: str) -> bool:
+        """Check whether FFmpeg can write the container ``name``, e.g. ``'mp4'``."""
+        muxers = self.muxers
+        return self.ffmpeg_available and (muxers is None or name in muxers)
+
+    def _cache_key(self) -> Optional[str]:
+        """Return the disk cache key of the FFmpeg binary."""
+        if not self.ffmpeg_path:
+            return None
+        try:
+            return f"{self.ffmpeg_path}:{os.stat(self.ffmpeg_path).st_mtime_ns}"
+        except OSError:
+            return None
+
+    def _read_cache(self, key: str) -> dict:
+        """Return the cached listings for ``key``."""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError, TypeError):
+            return {}
+        return data.get('listings', {}) if data.get('key') == key else {}
+
+    def _write_cache(self, key: str) -> None:
+        """Store the known listings for ``key``."""
+        listings = {kind: sorted(names) for kind, names in self._listings.items() if names}
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'listings': listings}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def _listing(self, kind: str) -> Optional[FrozenSet[str]]:
+        """Return the ``encoders`` or ``muxers`` listing, probing FFmpeg only once."""
+        if not self.ffmpeg_available:
+            return frozenset()
+        with self._lock:
+            if kind in self._listings:
+                return self._listings[kind]
+            key = self._cache_key() if self.cache_path else None
+            cached = self._read_cache(key).get(kind) if key else None
+            if cached:
+                self._listings[kind] = frozenset(cached)
+                return self._listings[kind]
+            try:
+                completed = subprocess.run(['ffmpeg', '-hide_banner', f'-{kind}'],
+                                           capture_output=True, text=True, check=True)
+                names = _parse_listing(completed.stdout)
+            except (OSError, subprocess.CalledProcessError):
+                names = None
+            self._listings[kind] = names
+            if key and names:
+                self._write_cache(key)
+            return names
+
+    def describe(self) -> dict:
+        """Return a JSON-serializable summary of the toolchain."""
+        return {
+            'ffmpeg_version': self.ffmpeg_version,
+            'ffmpeg_path': self.ffmpeg_path,
+            'ffprobe': self.has_ffprobe,
+            'ytdlp_version': self.ytdlp_version,
+            'encoders': sorted(self.encoders or []),
+            'muxers': sorted(self.muxers or []),
+        }
+
+_toolchain: Optional[Toolchain] = None
+_toolchain_lock = threading.Lock()
+
+def get_toolchain() -> Toolchain:
+    """Return the toolchain of this process, probing FFmpeg on first use.
+
+    Only a successful probe is memoized, so installing FFmpeg while the
+    application runs is picked up by the next call. An FFmpeg that cannot be
+    executed or exits with an error is reported as missing.
+
+    Returns:
+        Toolchain: Description of the installed toolchain.
+    """
+    global _toolchain  # pylint: disable=global-statement
+    with _toolchain_lock:
+        if _toolchain is not None:
+            return _toolchain
+        try:
+            completed = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            return Toolchain(None)
+        first_line = completed.stdout.splitlines()[0] if isinstance(completed.stdout, str) and completed.stdout else ''
+        version = first_line.split()[2] if first_line.startswith('ffmpeg version ') else 'unknown'
+        from src.config import app_config  # pylint: disable=import-outside-toplevel
+        _toolchain = Toolchain(version, shutil.which('ffmpeg'), app_config.toolchain_cache_path)
+        return _toolchain
+
+def reset_toolchain() -> None:
+    """Forget the memoized toolchain so the next call probes again."""
+    global _toolchain  # pylint: disable=global-statement
+    with _toolchain_lock:
+        _toolchain = None
 
 def ffmpeg_required(func:callable) -> callable:
     """Decorator that checks if FFmpeg is installed before running a function.
 
     If FFmpeg is not found, prints an error message and prevents the function from executing.
+    The check uses the memoized `Toolchain`, so FFmpeg is only started once per process.
 
     Args:
         func (Callable): Function to decorate.
@@ -24,9 +222,7 @@ def ffmpeg_required(func:callable) -> callable:
         Returns:
             Any: The return value of the wrapped function, or ``None`` if FFmpeg is missing.
         """
-        try:
-            subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True, check=True)
-        except FileNotFoundError:
+        if not get_toolchain().ffmpeg_available:
             print("Error: FFmpeg is not installed. Please install FFmpeg and try again.")
             return None
         return func(*args, **kwargs)
@@ -7,11 +7,14 @@ Functions:
 
 import time
 
+from src.utils.metrics import get_registry
+
 def timed(func:callable) -> callable:
     """Decorator that measures and displays the execution time of a function.
 
     The execution time is shown in seconds if less than 60 seconds, 
-    otherwise in minutes.
+    otherwise in minutes. It is also recorded in the ``streamflow_function_seconds``
+    histogram of the metrics registry, labelled with the function name.
 
     Args:
         func (Callable): Function to decorate.
@@ -19,6 +22,9 @@ def timed(func:callable) -> callable:
     Returns:
         Callable: Wrapped function that measures execution time.
     """
+    durations = get_registry().histogram(
+        'streamflow_function_seconds', "Duration of functions decorated with timed.", ('function',))
+
     def wrapper(*args:tuple, **kwargs:dict[str, dict]) -> callable:
         """Wrapper that measures execution time of the wrapped function.
 
@@ -29,6 +35,7 @@ def timed(func:callable) -> callable:
         result = func(*args, **kwargs)
         end_time = time.time()
         elapsed_time = end_time - start_time
+        durations.observe(elapsed_time, function=func.__name__)
 
         if elapsed_time < 60:
             print(f"\nDownload time: {elapsed_time:.2f} seconds.")
@@ -3,8 +3,10 @@ This module provides utility functions related to the console.
 
 Modules:
 - `clear_console`: Clears the terminal screen on both Windows and Unix-based systems.
+- `run_cli`: Runs the non-interactive command line interface.
 """
 
 from .console import clear_console
+from .cli import run_cli
 
-__all__ = ['clear_console']
+__all__ = ['clear_console', 'run_cli']
@@ -0,0 +1,561 @@
+"""
+This module provides the non-interactive command line interface.
+
+It lets StreamFlow run from cron, shell scripts or job runners without any
+``inquirer`` prompts. Every command returns a machine-readable exit status.
+
+Functions:
+    build_parser: Builds the ``argparse`` parser for all commands.
+    run_cli: Parses arguments, runs the selected command and returns an exit status.
+
+Exit statuses:
+    0: Every URL was downloaded successfully.
+    1: At least one URL failed.
+    2: Invalid arguments or no URLs to download.
+    3: The toolchain (FFmpeg) is not available.
+    130: The batch, the ``watch`` daemon, the ``serve`` API or a ``worker`` was interrupted with Ctrl-C.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .rate_limit import parse_rate
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_TOOLCHAIN = 3
+EXIT_INTERRUPTED = 130
+
+QUALITY_ALIASES = {
+    'best': 'The best',
+    '1440p': 'Medium (1440p)',
+    '1080p': 'Above High (1080p)',
+    '720p': 'High (720p)',
+    '480p': 'Low (<=480p)',
+}
+"""QUALITY_ALIASES: Short command line names for ``video_settings.quality_map`` keys."""
+
+MODE_ALIASES = {'video': 'Video', 'audio': 'Audio only'}
+"""MODE_ALIASES: Short command line names for ``VideoDownloader.MODES``."""
+
+
+def _rate(value: str) -> int:
+    """Parse a ``--limit-rate`` value for argparse."""
+    try:
+        return parse_rate(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+
+
+def _add_download_options(parser: argparse.ArgumentParser) -> None:
+    """Add the options shared by the ``download``, ``watch`` and ``serve`` commands."""
+    _add_job_options(parser)
+    _add_process_options(parser)
+
+
+def _add_job_options(parser: argparse.ArgumentParser) -> None:
+    """Add the options stored with every job, see `_download_options`."""
+    parser.add_argument('-m', '--mode', choices=sorted(MODE_ALIASES), default='video',
+                        help="Download mode (default: video).")
+    parser.add_argument('-q', '--quality', choices=list(QUALITY_ALIASES), default='best',
+                        help="Video quality (default: best).")
+    parser.add_argument('-f', '--format', dest='output_format', choices=['mp4', 'mkv'], default='mp4',
+                        help="Video container (default: mp4).")
+    parser.add_argument('-a', '--audio-format', dest='audio_profile', metavar='PROFILE',
+                        help="Audio profile from video_settings.audio_profiles for audio mode: best (no "
+                             "re-encoding), mp3, opus or aac (default: app_config.audio_profile).")
+    parser.add_argument('--audio-bitrate', metavar='KBPS',
+                        help="Bitrate in kbit/s used when audio has to be transcoded.")
+    parser.add_argument('-o', '--output', dest='download_folder',
+                        help="Download folder (default: app_config.download_folder).")
+    parser.add_argument('--playlist-folder', help="Sub-folder name for playlist downloads.")
+    parser.add_argument('-j', '--jobs', type=int, help="Number of concurrent downloads.")
+    parser.add_argument('--transfer', metavar='PROFILE',
+                        help="Transfer profile from video_settings.transfer_profiles, e.g. default, "
+                             "segmented or aria2c (default: app_config.transfer_profile).")
+
+
+def _add_process_options(parser: argparse.ArgumentParser) -> None:
+    """Add the ``app_config`` overrides of the commands that download."""
+    parser.add_argument('--engine', choices=['auto', 'inprocess', 'subprocess'],
+                        help="yt-dlp backend (default: app_config.download_engine).")
+    parser.add_argument('--no-archive', action='store_true',
+                        help="Download again even if the media is in the download archive.")
+    parser.add_argument('--no-playlist-fanout', action='store_true',
+                        help="Download each playlist as a single yt-dlp job instead of one job per entry.")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Only fetch raw streams in the download workers and merge or convert them "
+                             "with FFmpeg in a separate pool sized to the CPU cores.")
+    parser.add_argument('--schedule', choices=['fifo', 'priority', 'shortest', 'fair'],
+                        help="Order in which queued links start: input order, priority=N of the lines, shortest "
+                             "first, or taking turns between playlists and sources "
+                             "(default: app_config.schedule_policy).")
+    parser.add_argument('--staging-folder', metavar='DIR',
+                        help="Download and merge in DIR, e.g. a local SSD or tmpfs, and move finished files "
+                             "into the download folder (default: app_config.staging_folder).")
+    parser.add_argument('--media-store', action='store_true',
+                        help="Link media that is already in the media store instead of downloading it, "
+                             "and add new downloads to the store.")
+    parser.add_argument('--limit-rate', type=_rate, metavar='RATE',
+                        help="Total download rate shared by all jobs, e.g. 500K or 4.5M "
+                             "(default: app_config.max_bandwidth).")
+    parser.add_argument('--events', metavar='FILE',
+                        help="Append structured job events as JSON lines to FILE ('-' for standard error).")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics.")
+    parser.add_argument('--metrics-file', metavar='FILE',
+                        help="Write a JSON metrics snapshot to FILE periodically and after the batch.")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser for the non-interactive interface.
+
+    Returns:
+        argparse.ArgumentParser: Parser with one sub-command per operation.
+    """
+    parser = argparse.ArgumentParser(
+        prog='main.py',
+        description="StreamFlow batch interface. Run without arguments for the interactive mode.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    download = commands.add_parser('download', help="Download URLs without any prompts.")
+    download.add_argument('urls', nargs='*', help="URLs to download.")
+    download.add_argument('-i', '--input', dest='input_file',
+                          help="TXT file with one link per line, or '-' for standard input.")
+    _add_download_options(download)
+    download.add_argument('--filename', help="Custom filename for a single URL.")
+    download.add_argument('--resume', action='store_true',
+                          help="Resume the last interrupted batch of the download folder.")
+    download.add_argument('--retry-failed', action='store_true',
+                          help="Resume the last batch of the download folder and download its failed URLs again.")
+    download.add_argument('--json', action='store_true', help="Print a JSON summary to standard output.")
+
+    watch = commands.add_parser('watch', help="Download the links of TXT files dropped into an inbox folder.")
+    watch.add_argument('inbox', help="Folder to watch for link files.")
+    _add_download_options(watch)
+    watch.add_argument('--done-folder', metavar='DIR',
+                       help="Folder for link files whose downloads succeeded (default: INBOX/done).")
+    watch.add_argument('--failed-folder', metavar='DIR',
+                       help="Folder for link files with failed downloads (default: INBOX/failed).")
+    watch.add_argument('--queue', dest='queue_path', metavar='FILE',
+                       help="SQLite job queue (default: app_config.job_queue_path).")
+    watch.add_argument('--debounce', type=float, metavar='SECONDS',
+                       help="Seconds a link file must stay unchanged before it is read "
+                            "(default: app_config.inbox_debounce).")
+
+    serve = commands.add_parser('serve', help="Serve a local HTTP API for submitting and tracking jobs.")
+    _add_download_options(serve)
+    serve.add_argument('--host', default='127.0.0.1',
+                       help="Listening address (default: 127.0.0.1). The API has no authentication; "
+                            "only listen on other addresses in trusted networks.")
+    serve.add_argument('--port', type=int, metavar='PORT',
+                       help="Port (default: app_config.server_port).")
+    serve.add_argument('--workers', type=int, metavar='N',
+                       help="Batches downloaded at the same time; 0 leaves all jobs to 'worker' processes "
+                            "(default: app_config.server_workers).")
+    serve.add_argument('--queue', dest='queue_path', metavar='FILE',
+                       help="SQLite job queue (default: app_config.job_queue_path).")
+
+    enqueue = commands.add_parser('enqueue', help="Add URLs to the job queue for 'watch', 'serve' or 'worker'.")
+    enqueue.add_argument('urls', nargs='*', help="URLs to queue.")
+    enqueue.add_argument('-i', '--input', dest='input_file',
+                         help="TXT file with one link per line, or '-' for standard input.")
+    _add_job_options(enqueue)
+    enqueue.add_argument('--priority', type=int, default=0,
+                         help="Priority of the jobs; priority=N of a line overrides it (default: 0).")
+    enqueue.add_argument('--queue', dest='queue_path', metavar='FILE',
+                         help="SQLite job queue (default: app_config.job_queue_path).")
+    enqueue.add_argument('--json', action='store_true', help="Print the IDs of the new jobs as JSON.")
+
+    worker = commands.add_parser('worker', help="Download jobs leased from a job queue shared with other workers.")
+    source = worker.add_mutually_exclusive_group()
+    source.add_argument('--queue', dest='queue_path', metavar='FILE',
+                        help="SQLite job queue on this host or on a shared file system "
+                             "(default: app_config.job_queue_path).")
+    source.add_argument('--server', metavar='URL',
+                        help="Lease jobs from the job API at URL, e.g. http://10.0.0.2:8765, instead.")
+    worker.add_argument('--worker-id', metavar='NAME', help="Unique worker name (default: host:pid).")
+    worker.add_argument('--lease', type=float, metavar='SECONDS',
+                        help="Seconds a batch stays leased without a heartbeat (default: app_config.worker_lease).")
+    worker.add_argument('--batch-size', type=int, metavar='N',
+                        help="Jobs leased as one batch (default: app_config.max_concurrent_downloads).")
+    worker.add_argument('--poll-interval', type=float, metavar='SECONDS',
+                        help="Seconds between checks of an empty queue (default: app_config.worker_poll_interval).")
+    worker.add_argument('--exit-when-empty', action='store_true',
+                        help="Exit once no job is queued or running instead of waiting for new jobs.")
+    _add_process_options(worker)
+
+    gc = commands.add_parser('gc', help="Remove media store files that no download folder links to.")
+    gc.add_argument('--dry-run', action='store_true', help="Only report what would be removed.")
+    gc.add_argument('--json', action='store_true', help="Print the result as JSON.")
+
+    commands.add_parser('toolchain', help="Print the detected FFmpeg and yt-dlp capabilities as JSON.")
+    return parser
+
+
+def _file_lines(path: str) -> Iterator[str]:
+    """Yield the lines of a UTF-8 text file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from f
+
+
+def _collect_urls(args: argparse.Namespace) -> Iterable[str]:
+    """Collect URLs from positional arguments and the ``--input`` source.
+
+    Link files and standard input are streamed through a `LinkStream`, so they
+    are canonicalized and deduplicated without being loaded into memory.
+    """
+    from src.utils.link_reader import LinkStream  # pylint: disable=import-outside-toplevel
+
+    if args.input_file == '-':
+        return LinkStream(lines=itertools.chain(args.urls, sys.stdin))
+    if args.input_file:
+        if not os.path.isfile(args.input_file):
+            raise OSError(f"File {args.input_file} not found or invalid.")
+        if args.urls:
+            return LinkStream(lines=itertools.chain(args.urls, _file_lines(args.input_file)))
+        return LinkStream(args.input_file)
+    return list(args.urls)
+
+
+def _print_json(status: int, results: Iterable, urls: Iterable[str]) -> None:
+    """Print a machine-readable summary of a batch."""
+    results = list(results)
+    summary = {
+        'exit_status': status,
+        'counts': {
+            'total': len(results),
+            'done': sum(1 for result in results if result.status == 'done'),
+            'skipped': sum(1 for result in results if result.status == 'skipped'),
+            'failed': sum(1 for result in results if result.status == 'failed'),
+            'cancelled': sum(1 for result in results if result.status == 'cancelled'),
+        },
+        'results': [
+            {'url': result.url, 'status': result.status, 'error': result.error, 'path': result.path,
+             'failure': result.failure, 'attempts': result.attempts, 'elapsed': round(result.elapsed, 3)}
+            for result in results
+        ],
+    }
+    stats = getattr(urls, 'stats', None)
+    if stats is not None:
+        summary['links'] = {'accepted': stats.accepted, 'duplicate': stats.duplicate,
+                            'invalid': stats.invalid, 'skipped': stats.skipped}
+    print(json.dumps(summary))
+
+
+def _run_download(args: argparse.Namespace) -> int:
+    """Run the ``download`` command."""
+    try:
+        urls = _collect_urls(args)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not urls and not args.resume and not args.retry_failed:
+        print("Error: no URLs given.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.jobs is not None and args.jobs < 1:
+        print("Error: --jobs must be at least 1.", file=sys.stderr)
+        return EXIT_USAGE
+
+    from src.classes.video_downloader import VideoDownloader  # pylint: disable=import-outside-toplevel
+
+    _apply_config(args)
+    if args.resume or args.retry_failed:
+        downloader = VideoDownloader.from_journal(args.download_folder, jobs=args.jobs,
+                                                  retry_failed=args.retry_failed)
+        if downloader is None:
+            print("Error: there is no interrupted or failed batch to resume." if args.retry_failed
+                  else "Error: there is no interrupted batch to resume.", file=sys.stderr)
+            return EXIT_USAGE
+        return _finish_download(args, downloader)
+
+    try:
+        downloader = VideoDownloader.from_options(urls, custom_filename=args.filename, **_download_options(args))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.input_file and args.input_file != '-':
+        downloader.source_file = os.path.abspath(args.input_file)
+    return _finish_download(args, downloader)
+
+
+def _apply_config(args: argparse.Namespace) -> None:
+    """Apply the ``app_config`` overrides added by `_add_process_options`."""
+    from src.config import app_config  # pylint: disable=import-outside-toplevel
+
+    if args.no_archive:
+        app_config.use_download_archive = False
+    if args.no_playlist_fanout:
+        app_config.playlist_fanout = False
+    if args.pipeline:
+        app_config.staged_postprocessing = True
+    if args.schedule:
+        app_config.schedule_policy = args.schedule
+    if args.staging_folder:
+        app_config.staging_folder = args.staging_folder
+    if args.media_store:
+        app_config.use_media_store = True
+    if args.engine:
+        app_config.download_engine = args.engine
+    if args.limit_rate:
+        app_config.max_bandwidth = args.limit_rate
+    if args.events:
+        app_config.event_log_path = args.events
+    if args.metrics_port is not None:
+        app_config.metrics_port = args.metrics_port
+    if args.metrics_file:
+        app_config.metrics_snapshot_path = args.metrics_file
+
+
+def _download_options(args: argparse.Namespace) -> Dict:
+    """Return the `VideoDownloader.from_options` keyword arguments of the shared options."""
+    return {
+        'mode': MODE_ALIASES[args.mode],
+        'quality': QUALITY_ALIASES[args.quality],
+        'output_format': args.output_format.capitalize(),
+        'download_folder': args.download_folder,
+        'playlist_folder': args.playlist_folder,
+        'jobs': args.jobs,
+        'transfer_profile': args.transfer,
+        'audio_profile': args.audio_profile,
+        'audio_bitrate': args.audio_bitrate,
+    }
+
+
+def _finish_download(args: argparse.Namespace, downloader) -> int:
+    """Run a configured downloader and turn its results into an exit status."""
+    results = downloader.download_video()
+    if results is None:
+        status = EXIT_TOOLCHAIN
+        results = []
+    elif not results:
+        print("Error: no valid links to download.", file=sys.stderr)
+        status = EXIT_USAGE
+    elif any(result.status == 'cancelled' for result in results):
+        status = EXIT_INTERRUPTED
+    elif any(result.status == 'failed' for result in results):
+        status = EXIT_FAILED
+    else:
+        status = EXIT_OK
+
+    if args.json:
+        _print_json(status, results, downloader.urls)
+    return status
+
+
+def _open_queue(path: Optional[str]):
+    """Open the job queue at ``path``, or at ``app_config.job_queue_path``."""
+    # pylint: disable=import-outside-toplevel
+    from src.classes.job_queue import JobQueue
+    from src.config import app_config
+
+    return JobQueue(path or app_config.job_queue_path, journal_mode=app_config.job_queue_journal_mode)
+
+
+def _run_watch(args: argparse.Namespace) -> int:
+    """Run the ``watch`` command until Ctrl-C."""
+    if args.jobs is not None and args.jobs < 1:
+        print("Error: --jobs must be at least 1.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.debounce is not None and args.debounce < 0:
+        print("Error: --debounce must not be negative.", file=sys.stderr)
+        return EXIT_USAGE
+
+    # pylint: disable=import-outside-toplevel
+    from src.classes.inbox_daemon import InboxDaemon
+    from src.classes.video_downloader import VideoDownloader
+    from src.config import app_config
+
+    _apply_config(args)
+    options = _download_options(args)
+    try:
+        VideoDownloader.check_options(**options)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    queue = _open_queue(args.queue_path)
+    daemon = InboxDaemon(
+        args.inbox, queue, options,
+        debounce=app_config.inbox_debounce if args.debounce is None else args.debounce,
+        batch_size=app_config.inbox_batch_size,
+        done_folder=args.done_folder, failed_folder=args.failed_folder, lease=app_config.worker_lease)
+    try:
+        daemon.run()
+    finally:
+        queue.close()
+    return EXIT_INTERRUPTED
+
+
+def _run_serve(args: argparse.Namespace) -> int:
+    """Run the ``serve`` command until Ctrl-C."""
+    if args.jobs is not None and args.jobs < 1:
+        print("Error: --jobs must be at least 1.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.workers is not None and args.workers < 0:
+        print("Error: --workers must not be negative.", file=sys.stderr)
+        return EXIT_USAGE
+
+    # pylint: disable=import-outside-toplevel
+    from src.classes.job_server import JobServer, job_options
+    from src.config import app_config
+
+    _apply_config(args)
+    try:
+        defaults = job_options({}, _download_options(args))
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    queue = _open_queue(args.queue_path)
+    server = JobServer(
+        queue,
+        host=args.host,
+        port=app_config.server_port if args.port is None else args.port,
+        workers=app_config.server_workers if args.workers is None else args.workers,
+        batch_size=args.jobs or app_config.max_concurrent_downloads,
+        defaults=defaults,
+        worker_lease=app_config.worker_lease)
+    try:
+        server.run()
+    except OSError as e:
+        print(f"Error: could not start the job API: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    finally:
+        queue.close()
+    return EXIT_INTERRUPTED
+
+
+def _run_enqueue(args: argparse.Namespace) -> int:
+    """Run the ``enqueue`` command."""
+    try:
+        urls = _collect_urls(args)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.jobs is not None and args.jobs < 1:
+        print("Error: --jobs must be at least 1.", file=sys.stderr)
+        return EXIT_USAGE
+
+    # pylint: disable=import-outside-toplevel
+    from src.classes.video_downloader import VideoDownloader
+    from src.utils.link_reader import LinkStream
+
+    options = _download_options(args)
+    try:
+        VideoDownloader.check_options(**options)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if isinstance(urls, list):
+        urls = LinkStream(lines=urls)
+    queue = _open_queue(args.queue_path)
+    try:
+        ids = queue.enqueue(urls, options, priority=args.priority)
+    finally:
+        queue.close()
+    if not ids:
+        print("Error: no valid links to queue.", file=sys.stderr)
+        return EXIT_USAGE
+    if args.json:
+        print(json.dumps({'jobs': ids}))
+    else:
+        print(f"Queued {len(ids)} job(s).")
+    return EXIT_OK
+
+
+def _run_worker(args: argparse.Namespace) -> int:
+    """Run the ``worker`` command until Ctrl-C, or until the queue is drained with ``--exit-when-empty``."""
+    if args.batch_size is not None and args.batch_size < 1:
+        print("Error: --batch-size must be at least 1.", file=sys.stderr)
+        return EXIT_USAGE
+    for name in ('lease', 'poll_interval'):
+        if getattr(args, name) is not None and getattr(args, name) <= 0:
+            print(f"Error: --{name.replace('_', '-')} must be positive.", file=sys.stderr)
+            return EXIT_USAGE
+
+    # pylint: disable=import-outside-toplevel
+    from src.classes.queue_worker import QueueWorker, RemoteQueue
+    from src.config import app_config
+
+    _apply_config(args)
+    queue = RemoteQueue(args.server) if args.server else _open_queue(args.queue_path)
+    worker = QueueWorker(
+        queue, worker_id=args.worker_id,
+        lease=app_config.worker_lease if args.lease is None else args.lease,
+        batch_size=args.batch_size or app_config.max_concurrent_downloads,
+        poll_interval=app_config.worker_poll_interval if args.poll_interval is None else args.poll_interval)
+    print(f"Worker {worker.worker_id} is taking jobs from {args.server or queue.path}.", file=sys.stderr)
+    try:
+        stopped = worker.run(until_empty=args.exit_when_empty)
+    finally:
+        queue.close()
+    return EXIT_INTERRUPTED if stopped else EXIT_OK
+
+
+def _run_gc(args: argparse.Namespace) -> int:
+    """Run the ``gc`` command."""
+    # pylint: disable=import-outside-toplevel
+    from src.classes.media_store import MediaStore
+    from src.config import app_config
+
+    store = MediaStore(app_config.media_store_dir, app_config.media_store_link_modes)
+    try:
+        stats = store.gc(dry_run=args.dry_run)
+        blobs, size = store.usage()
+    finally:
+        store.close()
+    if args.json:
+        print(json.dumps({'dry_run': args.dry_run, 'blobs': stats.blobs, 'bytes': stats.bytes,
+                          'links': stats.links, 'remaining_blobs': blobs, 'remaining_bytes': size}))
+    else:
+        verb = "Would remove" if args.dry_run else "Removed"
+        print(f"{verb} {stats.blobs} unreferenced file(s), {stats.bytes / 1024 ** 2:.1f} MiB; "
+              f"forgot {stats.links} stale link(s). The store holds {blobs} file(s), {size / 1024 ** 2:.1f} MiB.")
+    return EXIT_OK
+
+
+def _run_toolchain() -> int:
+    """Run the ``toolchain`` command."""
+    from src.decorators.ffmpeg import get_toolchain  # pylint: disable=import-outside-toplevel
+
+    toolchain = get_toolchain()
+    print(json.dumps(toolchain.describe(), indent=2))
+    return EXIT_OK if toolchain.ffmpeg_available else EXIT_TOOLCHAIN
+
+
+def run_cli(argv: Optional[List[str]] = None) -> int:
+    """Parse ``argv`` and run the selected command.
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments without the program name.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'download':
+            return _run_download(args)
+        if args.command == 'watch':
+            return _run_watch(args)
+        if args.command == 'serve':
+            return _run_serve(args)
+        if args.command == 'enqueue':
+            return _run_enqueue(args)
+        if args.command == 'worker':
+            return _run_worker(args)
+        if args.command == 'gc':
+            return _run_gc(args)
+        if args.command == 'toolchain':
+            return _run_toolchain()
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    parser.error(f"unknown command: {args.command}")
+    return EXIT_USAGE
@@ -0,0 +1,232 @@
+"""
+This module provides a structured event stream for download telemetry.
+
+Every job reports ``queued``, ``started``, ``progress``, ``postprocessing``,
+``retry`` for repeated attempts and a final ``finished``, ``skipped`` or ``failed`` event; a ``batch`` event
+summarizes the whole run. Events are plain dictionaries delivered to
+subscribed callbacks, for example `JsonLinesSink`, which writes one JSON
+object per line.
+
+Progress events are throttled per job, so yt-dlp's high-frequency progress
+callbacks cost a dictionary lookup and a clock read when nothing is emitted.
+
+Classes:
+    EventStream: Publishes job and batch events to subscribers.
+    JsonLinesSink: Subscriber writing events as JSON lines.
+"""
+
+import json
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, TextIO
+
+Event = Dict[str, object]
+
+
+class JsonLinesSink:
+    """Write events as JSON lines to a file or text stream.
+
+    Attributes:
+        path (Optional[str]): Target file, or None when writing to a stream.
+    """
+
+    def __init__(self, path: Optional[str] = None, stream: Optional[TextIO] = None):
+        """Open the sink.
+
+        Args:
+            path (Optional[str]): File the events are appended to. ``'-'`` writes to standard error.
+            stream (Optional[TextIO]): Stream to write to instead of a file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if stream is not None:
+            self._stream, self._owned = stream, False
+        elif path in (None, '-'):
+            self._stream, self._owned = sys.stderr, False
+        else:
+            self._stream, self._owned = open(path, 'a', encoding='utf-8'), True  # pylint: disable=consider-using-with
+
+    def __call__(self, event: Event) -> None:
+        line = json.dumps(event, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._stream.write(line)
+            self._stream.flush()
+
+    def close(self) -> None:
+        """Close the file if the sink opened it."""
+        if self._owned:
+            self._stream.close()
+
+
+class EventStream:
+    """Publish job and batch events to subscribed callbacks.
+
+    The stream also keeps a per-job timeline so the final event of a job
+    reports how long extraction, transfer and post-processing took:
+
+    - ``extract``: from ``started`` until the first progress update;
+    - ``transfer``: from the first progress update until the last file was downloaded;
+    - ``postprocess``: from then until the job finished (merging, audio conversion).
+
+    Attributes:
+        progress_interval (float): Minimum seconds between two progress events of a job.
+
+    Example:
+        ```python
+        events = EventStream()
+        events.subscribe(lambda event: print(event['event'], event.get('url')))
+        ```
+    """
+
+    def __init__(self, progress_interval: float = 0.5, clock: Callable[[], float] = time.monotonic):
+        """Create the stream.
+
+        Args:
+            progress_interval (float, optional): Minimum seconds between progress events of a job.
+                Defaults to 0.5.
+            clock (Callable[[], float], optional): Monotonic clock. Defaults to ``time.monotonic``.
+        """
+        self.progress_interval = progress_interval
+        self._clock = clock
+        self._subscribers: List[Callable[[Event], None]] = []
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, float]] = {}
+        self._queued: Set[str] = set()
+        self._bytes = 0
+
+    def subscribe(self, callback: Callable[[Event], None]) -> Callable[[Event], None]:
+        """Deliver all future events to ``callback``.
+
+        Returns:
+            Callable[[Event], None]: The callback, for `unsubscribe`.
+        """
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+        return callback
+
+    def unsubscribe(self, callback: Callable[[Event], None]) -> None:
+        """Stop delivering events to ``callback``."""
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber is not callback]
+
+    def emit(self, event: str, **fields) -> None:
+        """Deliver an event to every subscriber.
+
+        Args:
+            event (str): Event type.
+            **fields: Event payload.
+        """
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        record = {'event': event, 'ts': time.time(), **fields}
+        for subscriber in subscribers:
+            subscriber(record)
+
+    def queued(self, url: str) -> None:
+        """Report that ``url`` entered the queue."""
+        with self._lock:
+            self._queued.add(url)
+        self.emit('queued', url=url)
+
+    def started(self, url: str) -> None:
+        """Report that a worker started ``url``."""
+        with self._lock:
+            self._queued.discard(url)
+            self._jobs[url] = {'started': self._clock(), 'last_progress': float('-inf')}
+        self.emit('started', url=url)
+
+    def progress(self, url: str, status: Dict) -> None:
+        """Report a yt-dlp progress dictionary of ``url``, throttled to ``progress_interval``.
+
+        Args:
+            url (str): URL of the job.
+            status (Dict): yt-dlp progress hook dictionary.
+        """
+        now = self._clock()
+        timeline = self._jobs.get(url)
+        if timeline is None:
+            return
+        timeline.setdefault('transfer_started', now)
+        finished = status.get('status') == 'finished'
+        if finished:
+            timeline['transfer_finished'] = now
+            with self._lock:
+                self._bytes += status.get('downloaded_bytes') or status.get('total_bytes') or 0
+        elif now - timeline['last_progress'] < self.progress_interval:
+            return
+        timeline['last_progress'] = now
+        self.emit('progress', url=url, status=status.get('status'),
+                  downloaded_bytes=status.get('downloaded_bytes'),
+                  total_bytes=status.get('total_bytes') or status.get('total_bytes_estimate'),
+                  speed=status.get('speed'), eta=status.get('eta'))
+
+    def retry(self, url: str, attempt: int, reason: Optional[str] = None, delay: float = 0.0) -> None:
+        """Report that ``url`` is downloaded again after a failed attempt.
+
+        Args:
+            url (str): URL of the job.
+            attempt (int): Number of the retry, counted from 1.
+            reason (Optional[str]): Failure class of the failed attempt.
+            delay (float, optional): Seconds waited before the retry.
+        """
+        self.emit('retry', url=url, attempt=attempt, reason=reason, delay=round(delay, 3))
+
+    def postprocessing(self, url: str, status: Dict) -> None:
+        """Report a yt-dlp post-processor hook dictionary of ``url``."""
+        timeline = self._jobs.get(url)
+        if timeline is not None:
+            timeline.setdefault('transfer_finished', self._clock())
+        self.emit('postprocessing', url=url, postprocessor=status.get('postprocessor'),
+                  status=status.get('status'))
+
+    def finished(self, url: str, status: str, error: Optional[str] = None) -> None:
+        """Report the outcome of ``url`` with its phase durations.
+
+        Args:
+            url (str): URL of the job.
+            status (str): ``'done'``, ``'skipped'``, ``'failed'`` or ``'cancelled'``.
+            error (Optional[str]): Error details of a failed job.
+        """
+        now = self._clock()
+        with self._lock:
+            timeline = self._jobs.pop(url, None) or {'started': now}
+        started = timeline['started']
+        transfer_started = timeline.get('transfer_started', now)
+        transfer_finished = timeline.get('transfer_finished', now)
+        phases = {
+            'extract': round(transfer_started - started, 3),
+            'transfer': round(max(0.0, transfer_finished - transfer_started), 3),
+            'postprocess': round(max(0.0, now - transfer_finished), 3),
+        }
+        event = {'done': 'finished'}.get(status, status)
+        fields = {'url': url, 'elapsed': round(now - started, 3), 'phases': phases}
+        if error:
+            fields['error'] = error
+        self.emit(event, **fields)
+
+    def batch(self, results: List, elapsed: float) -> None:
+        """Report the summary of a batch.
+
+        Queued jobs that never started, because the batch was cancelled, are
+        reported as ``cancelled`` first; their events carry no ``phases``.
+
+        Args:
+            results (List): `DownloadResult` objects of the batch.
+            elapsed (float): Wall time of the batch in seconds.
+        """
+        with self._lock:
+            unstarted, self._queued = self._queued, set()
+        for url in unstarted:
+            self.emit('cancelled', url=url)
+        counts: Dict[str, int] = {}
+        for result in results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        with self._lock:
+            transferred, self._bytes = self._bytes, 0
+        self.emit('batch', jobs=len(results), counts=counts, elapsed=round(elapsed, 3),
+                  bytes=transferred, bytes_per_second=round(transferred / elapsed) if elapsed > 0 else None,
+                  slowest=[{'url': result.url, 'elapsed': round(result.elapsed, 3)}
+                           for result in sorted(results, key=lambda r: r.elapsed, reverse=True)[:5]
+                           if result.elapsed])
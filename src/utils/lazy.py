@@ -0,0 +1,49 @@
+"""
+This module provides lazily executed imports.
+
+Heavy optional stacks, such as the ``inquirer`` prompt toolkit, are only
+needed by the interactive mode. `lazy_import` returns the module object
+immediately but executes it on first attribute access, so library use and the
+non-interactive command line never pay for it.
+
+Functions:
+    lazy_import: Returns a module that is executed on first use.
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import ``name`` without executing it until an attribute is accessed.
+
+    A module that is already imported is returned as is.
+
+    Args:
+        name (str): Absolute module name, e.g. ``'inquirer'``.
+
+    Returns:
+        ModuleType: The module, executed on first attribute access.
+
+    Raises:
+        ModuleNotFoundError: If the module is not installed.
+
+    Example:
+        ```python
+        inquirer = lazy_import('inquirer')
+        inquirer.prompt(questions)  # inquirer is imported here
+        ```
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
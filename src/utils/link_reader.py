@@ -0,0 +1,231 @@
+"""
+This module provides streaming ingestion of link files.
+
+Link files are read lazily, one line at a time. Each line is canonicalized so
+that different spellings of the same media (``youtu.be/X``,
+``youtube.com/watch?v=X&t=30``) are recognized as duplicates. Duplicate
+detection keeps a bounded number of compact keys in memory and spills the rest
+to a temporary SQLite database, so multi-million-line files can be ingested in
+constant memory.
+
+A line may end with ``priority=N`` to start that link before or after the
+others, e.g. ``https://youtu.be/dQw4w9WgXcQ priority=5``. Links without it have
+priority 0.
+
+Classes:
+    LinkStats: Counts of accepted, duplicate and invalid lines.
+    SeenSet: Bounded-memory set of already seen links.
+    LinkStream: Lazy iterator over canonical, deduplicated links.
+
+Functions:
+    canonicalize_url: Returns the canonical form of a link.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Optional
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+from .media_id import media_id_from_parts
+
+_PRIORITY = re.compile(r'\s+priority=([+-]?\d+)$', re.IGNORECASE)
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """Return the canonical form of ``url``.
+
+    Recognized media URLs are rewritten to one URL per extractor and ID.
+    YouTube playlist parameters are kept so playlist detection still works.
+    Other URLs get a lower-case scheme and host and lose their fragment.
+
+    Args:
+        url (str): Link as written in the file.
+
+    Returns:
+        Optional[str]: Canonical URL, or None if ``url`` is not a valid http(s) link.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    host = parts.hostname
+    if scheme not in ('http', 'https') or not host:
+        return None
+
+    playlist = parse_qs(parts.query).get('list', [''])[0] if 'list=' in parts.query else ''
+    media_id = media_id_from_parts(parts, host)
+    if media_id:
+        extractor, video_id = media_id
+        if extractor == 'youtube':
+            canonical = f'https://www.youtube.com/watch?v={video_id}'
+            return f'{canonical}&list={playlist}' if playlist else canonical
+        if extractor == 'vimeo':
+            return f'https://vimeo.com/{video_id}'
+    if playlist and host.endswith('youtube.com') and parts.path == '/playlist':
+        return f'https://www.youtube.com/playlist?list={playlist}'
+
+    default_port = {'http': 80, 'https': 443}[scheme]
+    netloc = host if port in (None, default_port) else f'{host}:{port}'
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+@dataclass
+class LinkStats:
+    """Counts collected while a link file is ingested.
+
+    Attributes:
+        accepted (int): Links passed on to the downloader.
+        duplicate (int): Links dropped because an equivalent link was seen before.
+        invalid (int): Lines that are not valid http(s) links.
+        skipped (int): Blank lines and ``#`` comments.
+    """
+
+    accepted: int = 0
+    duplicate: int = 0
+    invalid: int = 0
+    skipped: int = 0
+
+    def __str__(self) -> str:
+        return (f"accepted: {self.accepted}, duplicates: {self.duplicate}, "
+                f"invalid: {self.invalid}, comments/blank: {self.skipped}")
+
+class SeenSet:
+    """Set of link keys with bounded memory use.
+
+    Keys are reduced to 64-bit BLAKE2 digests. Up to ``max_memory_keys`` digests
+    are kept in memory; further digests go to a temporary SQLite database.
+
+    Attributes:
+        max_memory_keys (int): Number of digests kept in memory.
+    """
+
+    def __init__(self, max_memory_keys: int = 500_000):
+        self.max_memory_keys = max_memory_keys
+        self._memory = set()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_path: Optional[str] = None
+
+    @staticmethod
+    def _digest(key: str) -> int:
+        """Return the signed 64-bit digest of ``key``."""
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+    def add(self, key: str) -> bool:
+        """Add ``key`` to the set.
+
+        Args:
+            key (str): Link key.
+
+        Returns:
+            bool: True if the key was new, False if it was already present.
+        """
+        digest = self._digest(key)
+        if digest in self._memory:
+            return False
+        if len(self._memory) < self.max_memory_keys:
+            self._memory.add(digest)
+            return True
+        if self._db is None:
+            handle, self._db_path = tempfile.mkstemp(prefix='streamflow-seen-', suffix='.sqlite3')
+            os.close(handle)
+            self._db = sqlite3.connect(self._db_path, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=OFF')
+            self._db.execute('PRAGMA synchronous=OFF')
+            self._db.execute('CREATE TABLE seen (digest INTEGER PRIMARY KEY)')
+        return self._db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (digest,)).rowcount == 1
+
+    def close(self) -> None:
+        """Release the temporary database, if one was created."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.remove(self._db_path)
+
+class LinkStream:
+    """Lazy iterator over the canonical, deduplicated links of a file or stream.
+
+    Blank lines and lines starting with ``#`` are skipped. Iterating a stream
+    created from a file path reads the file again from the start.
+
+    Attributes:
+        path (Optional[str]): Source file, if the stream reads from a file.
+        stats (LinkStats): Counts of the current or last iteration.
+        priorities (Dict[str, int]): Explicit ``priority=N`` of the links read so far. Only
+            links with a priority are kept, so memory stays bounded for plain link files.
+
+    Example:
+        ```python
+        links = LinkStream('links.txt')
+        for url in links:
+            ...
+        print(links.stats)
+        ```
+    """
+
+    def __init__(self, path: Optional[str] = None, lines: Optional[Iterable[str]] = None,
+                 max_memory_keys: int = 500_000):
+        """Create a stream.
+
+        Args:
+            path (Optional[str]): UTF-8 text file with one link per line.
+            lines (Optional[Iterable[str]]): Lines to read instead of a file, e.g. ``sys.stdin``.
+            max_memory_keys (int, optional): Links remembered in memory for duplicate
+                detection before spilling to disk. Defaults to 500 000.
+
+        Raises:
+            ValueError: If neither or both of ``path`` and ``lines`` are given.
+        """
+        if (path is None) == (lines is None):
+            raise ValueError("Provide either a path or lines.")
+        self.path = path
+        self._lines = lines
+        self.max_memory_keys = max_memory_keys
+        self.stats = LinkStats()
+        self.priorities: Dict[str, int] = {}
+
+    def _read_lines(self) -> Iterator[str]:
+        """Yield raw lines from the source."""
+        if self.path is None:
+            yield from self._lines
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            yield from f
+
+    def __iter__(self) -> Iterator[str]:
+        self.stats = LinkStats()
+        self.priorities.clear()
+        seen = SeenSet(self.max_memory_keys)
+        try:
+            for line in self._read_lines():
+                text = line.strip()
+                if not text or text.startswith('#'):
+                    self.stats.skipped += 1
+                    continue
+                priority = _PRIORITY.search(text)
+                if priority:
+                    text = text[:priority.start()]
+                canonical = canonicalize_url(text)
+                if canonical is None:
+                    self.stats.invalid += 1
+                    continue
+                if not seen.add(canonical):
+                    self.stats.duplicate += 1
+                    continue
+                self.stats.accepted += 1
+                if priority:
+                    self.priorities[canonical] = int(priority.group(1))
+                yield canonical
+        finally:
+            seen.close()
+
+    def __bool__(self) -> bool:
+        """Return True if the source file contains at least one valid link."""
+        if self.path is None:
+            return True
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return any(canonicalize_url(_PRIORITY.sub('', line.strip())) for line in f
+                       if line.strip() and not line.strip().startswith('#'))
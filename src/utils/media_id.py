@@ -0,0 +1,75 @@
+"""
+This module provides offline recognition of media IDs in URLs.
+
+Recognizing the extractor and video ID without running yt-dlp lets StreamFlow
+skip work for media it has already downloaded before any process is spawned.
+
+Functions:
+    extract_media_id: Returns ``(extractor, video_id)`` for a recognized URL.
+    media_id_from_parts: Same as `extract_media_id` for an already split URL.
+"""
+
+import re
+from typing import Optional, Tuple
+from urllib.parse import SplitResult, parse_qs, urlsplit
+
+_YOUTUBE_HOSTS = {'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com',
+                  'youtube-nocookie.com', 'www.youtube-nocookie.com'}
+_YOUTUBE_ID = re.compile(r'^[0-9A-Za-z_-]{11}$')
+_YOUTUBE_PATH = re.compile(r'^/(?:shorts|embed|live|v)/([0-9A-Za-z_-]{11})(?:[/?#]|$)')
+_VIMEO_PATH = re.compile(r'^/(?:video/)?(\d+)(?:[/?#]|$)')
+
+
+def _youtube_id(host: str, path: str, query: str) -> Optional[str]:
+    """Return the YouTube video ID encoded in the URL parts, if any."""
+    if host in ('youtu.be', 'www.youtu.be'):
+        candidate = path.strip('/').split('/')[0]
+        return candidate if _YOUTUBE_ID.match(candidate) else None
+    if host not in _YOUTUBE_HOSTS:
+        return None
+    if path == '/watch':
+        candidate = parse_qs(query).get('v', [''])[0]
+        return candidate if _YOUTUBE_ID.match(candidate) else None
+    match = _YOUTUBE_PATH.match(path)
+    return match.group(1) if match else None
+
+
+def extract_media_id(url: str) -> Optional[Tuple[str, str]]:
+    """Recognize the extractor and video ID of ``url`` without network access.
+
+    The extractor names match the keys used by yt-dlp's own download archive
+    (for example ``'youtube'``). Playlist-only URLs and unknown sites return
+    ``None``.
+
+    Args:
+        url (str): Media URL.
+
+    Returns:
+        Optional[Tuple[str, str]]: ``(extractor, video_id)`` or ``None`` if not recognized.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        return media_id_from_parts(parts, parts.hostname or '')
+    except ValueError:
+        return None
+
+def media_id_from_parts(parts: SplitResult, host: str) -> Optional[Tuple[str, str]]:
+    """Recognize the extractor and video ID of an already split URL.
+
+    Args:
+        parts (SplitResult): Result of ``urllib.parse.urlsplit``.
+        host (str): Lower-case host name of the URL.
+
+    Returns:
+        Optional[Tuple[str, str]]: ``(extractor, video_id)`` or ``None`` if not recognized.
+    """
+    video_id = _youtube_id(host, parts.path, parts.query)
+    if video_id:
+        return 'youtube', video_id
+
+    if host in ('vimeo.com', 'www.vimeo.com', 'player.vimeo.com'):
+        match = _VIMEO_PATH.match(parts.path)
+        if match:
+            return 'vimeo', match.group(1)
+
+    return None
@@ -0,0 +1,463 @@
+"""
+This module provides an in-process metrics registry and its exporters.
+
+Counters, gauges and histograms are kept in memory; updating one costs a lock
+and a dictionary update, so they can be fed from download hot paths. The
+registry can be exported in the Prometheus text format on a localhost HTTP
+endpoint and written periodically to a JSON snapshot file. ``http.server`` is
+only imported when the endpoint is started.
+
+`DownloadMetrics` turns the structured events of `src.utils.events` into the
+standard StreamFlow download metrics.
+
+Classes:
+    Counter: Monotonically increasing value.
+    Gauge: Value that can go up and down.
+    Histogram: Distribution of observed values in cumulative buckets.
+    MetricsRegistry: Named metrics with Prometheus and JSON rendering.
+    MetricsExporter: Localhost Prometheus endpoint and periodic snapshot file.
+    DownloadMetrics: Event subscriber feeding the download metrics.
+
+Functions:
+    get_registry: Returns the process-wide `MetricsRegistry`.
+    get_download_metrics: Returns the process-wide `DownloadMetrics`.
+    start_exporter: Starts the process-wide `MetricsExporter` from ``app_config``.
+"""
+
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+"""DEFAULT_BUCKETS: Histogram bucket bounds in seconds, suited to download phases."""
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Render ``{name="value",...}``, or an empty string without labels."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value for the Prometheus text format."""
+    value = float(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric:
+    """Base class of named metrics with optional labels.
+
+    Attributes:
+        name (str): Metric name.
+        help (str): One-line description.
+        labelnames (Tuple[str, ...]): Names of the labels every sample carries.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        """Return the sample key of ``labels``."""
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], object]]:
+        """Return a copy of all samples as ``(label values, value)`` pairs."""
+        with self._lock:
+            return [(key, self._copy(value)) for key, value in self._values.items()]
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def render(self) -> List[str]:
+        """Render the samples as Prometheus text lines."""
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in self.samples()]
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """Return the samples as JSON-serializable dictionaries."""
+        return [{'labels': dict(zip(self.labelnames, key)), 'value': value} for key, value in self.samples()]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value, e.g. completed downloads."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the counter of ``labels`` by ``amount``."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Return the current value of ``labels``."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. active workers."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge of ``labels`` to ``value``."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        """Decrease the gauge of ``labels`` by ``amount``."""
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. phase durations.
+
+    Attributes:
+        buckets (Tuple[float, ...]): Upper bounds of the buckets, without ``+Inf``.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        """Record ``value`` for ``labels``."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self.samples():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        result = []
+        for key, (counts, total, count) in self.samples():
+            cumulative, buckets = 0, {}
+            for bound, bucket in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket
+                buckets[_format_value(bound)] = cumulative
+            result.append({'labels': dict(zip(self.labelnames, key)),
+                           'value': {'count': count, 'sum': total, 'buckets': buckets}})
+        return result
+
+
+class MetricsRegistry:
+    """Named metrics of the process.
+
+    Metrics are created on first use and returned again on later calls with the
+    same name, so modules can look them up without sharing references.
+
+    Example:
+        ```python
+        registry = MetricsRegistry()
+        registry.counter('streamflow_downloads_total', "Finished jobs.", ('status',)).inc(status='done')
+        print(registry.render())
+        ```
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        """Return the metric ``name``, creating it as ``cls`` if it does not exist."""
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+        if type(metric) is not cls:  # pylint: disable=unidiomatic-typecheck
+            raise ValueError(f"Metric {name} is a {metric.kind}, not a {cls.kind}.")
+        return metric
+
+    def counter(self, name: str, help_text: str = '', labelnames: Sequence[str] = ()) -> Counter:
+        """Return the counter ``name``."""
+        return self._get(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str = '', labelnames: Sequence[str] = ()) -> Gauge:
+        """Return the gauge ``name``."""
+        return self._get(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str = '', labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Return the histogram ``name``."""
+        return self._get(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Exposition text ending with a newline.
+        """
+        lines = []
+        for metric in sorted(self._metrics.values(), key=lambda m: m.name):
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return all metrics as a JSON-serializable dictionary."""
+        return {
+            'ts': time.time(),
+            'metrics': {metric.name: {'type': metric.kind, 'help': metric.help, 'samples': metric.snapshot()}
+                        for metric in sorted(self._metrics.values(), key=lambda m: m.name)},
+        }
+
+    def write_snapshot(self, path: str) -> None:
+        """Atomically write `snapshot` as JSON to ``path``."""
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix='.metrics-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+class MetricsExporter:
+    """Serve a registry on localhost and write periodic snapshots.
+
+    The HTTP server answers ``GET /metrics`` with the Prometheus text format. It
+    binds to ``127.0.0.1`` only; use a reverse proxy or node exporter to expose it.
+
+    Attributes:
+        registry (MetricsRegistry): Exported registry.
+        port (Optional[int]): HTTP port, ``0`` for any free port, None for no endpoint.
+        snapshot_path (Optional[str]): JSON snapshot file, or None for no snapshots.
+        snapshot_interval (float): Seconds between snapshots.
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: Optional[int] = None,
+                 snapshot_path: Optional[str] = None, snapshot_interval: float = 15.0):
+        self.registry = registry
+        self.port = port
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._server: Optional['ThreadingHTTPServer'] = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> 'MetricsExporter':
+        """Start the endpoint and the snapshot thread.
+
+        Returns:
+            MetricsExporter: ``self``; ``port`` holds the bound port.
+        """
+        if self.port is not None:
+            from http.server import ThreadingHTTPServer  # pylint: disable=import-outside-toplevel
+            self._server = ThreadingHTTPServer(('127.0.0.1', self.port), self._handler())
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]
+            self._spawn(self._server.serve_forever, 'streamflow-metrics-http')
+        if self.snapshot_path:
+            self._spawn(self._snapshot_loop, 'streamflow-metrics-snapshot')
+        return self
+
+    def _spawn(self, target, name: str) -> None:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _handler(self):
+        """Build the request handler class bound to the registry."""
+        from http.server import BaseHTTPRequestHandler  # pylint: disable=import-outside-toplevel
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            """Serve ``/metrics`` in the Prometheus text format."""
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                pass
+
+        return Handler
+
+    def _snapshot_loop(self) -> None:
+        while not self._stop.wait(self.snapshot_interval):
+            self.write_snapshot()
+
+    def write_snapshot(self) -> None:
+        """Write a snapshot now, if a snapshot file is configured."""
+        if self.snapshot_path:
+            try:
+                self.registry.write_snapshot(self.snapshot_path)
+            except OSError as e:
+                print(f"Warning: could not write metrics snapshot: {e}")
+
+    def stop(self) -> None:
+        """Stop the endpoint and the snapshot thread and write a final snapshot."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.write_snapshot()
+
+
+class DownloadMetrics:
+    """Event subscriber maintaining the StreamFlow download metrics.
+
+    Subscribe it to an `EventStream` to record:
+
+    - ``streamflow_downloads_total{status}``: finished jobs by outcome;
+    - ``streamflow_bytes_transferred_total``: bytes of finished files;
+    - ``streamflow_phase_seconds{phase}``: extraction, transfer and post-processing time;
+    - ``streamflow_job_seconds``: total time of a job;
+    - ``streamflow_queue_depth``: jobs handed to the scheduler and waiting for a worker;
+    - ``streamflow_active_workers``: jobs currently running;
+    - ``streamflow_retries_total``: repeated download attempts;
+    - ``streamflow_batches_total`` and ``streamflow_batch_seconds``: finished batches.
+    """
+
+    def __init__(self, registry: MetricsRegistry):
+        self.downloads = registry.counter('streamflow_downloads_total', "Finished download jobs.", ('status',))
+        self.bytes = registry.counter('streamflow_bytes_transferred_total', "Bytes of downloaded files.")
+        self.phases = registry.histogram('streamflow_phase_seconds', "Duration of job phases.", ('phase',))
+        self.jobs = registry.histogram('streamflow_job_seconds', "Duration of download jobs.")
+        self.queue = registry.gauge('streamflow_queue_depth', "Jobs waiting for a worker.")
+        self.active = registry.gauge('streamflow_active_workers', "Jobs being downloaded.")
+        self.retries = registry.counter('streamflow_retries_total', "Repeated download attempts.")
+        self.batches = registry.counter('streamflow_batches_total', "Finished batches.")
+        self.batch_seconds = registry.histogram('streamflow_batch_seconds', "Duration of batches.")
+
+    def __call__(self, event: Dict[str, object]) -> None:
+        kind = event['event']
+        if kind == 'progress':
+            if event.get('status') == 'finished':
+                self.bytes.inc(event.get('downloaded_bytes') or event.get('total_bytes') or 0)
+        elif kind == 'queued':
+            self.queue.inc()
+        elif kind == 'started':
+            self.queue.dec()
+            self.active.inc()
+        elif kind == 'retry':
+            self.retries.inc()
+        elif kind in ('finished', 'skipped', 'failed', 'cancelled'):
+            self.downloads.inc(status=kind)
+            if 'phases' not in event:
+                self.queue.dec()
+                return
+            self.active.dec()
+            self.jobs.observe(event['elapsed'])
+            for phase, seconds in event['phases'].items():
+                self.phases.observe(seconds, phase=phase)
+        elif kind == 'batch':
+            self.batches.inc()
+            self.batch_seconds.observe(event['elapsed'])
+
+
+_registry = MetricsRegistry()
+_download_metrics: Optional[DownloadMetrics] = None
+_exporter: Optional[MetricsExporter] = None
+_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    """Return the process-wide metrics registry.
+
+    Returns:
+        MetricsRegistry: The shared registry.
+    """
+    return _registry
+
+
+def get_download_metrics() -> DownloadMetrics:
+    """Return the process-wide download metrics subscriber.
+
+    Returns:
+        DownloadMetrics: Subscriber feeding `get_registry`.
+    """
+    global _download_metrics  # pylint: disable=global-statement
+    with _lock:
+        if _download_metrics is None:
+            _download_metrics = DownloadMetrics(_registry)
+        return _download_metrics
+
+
+def start_exporter() -> Optional[MetricsExporter]:
+    """Start the process-wide exporter from ``app_config`` once.
+
+    Uses ``app_config.metrics_port``, ``app_config.metrics_snapshot_path`` and
+    ``app_config.metrics_snapshot_interval``. Later calls return the running exporter.
+
+    Returns:
+        Optional[MetricsExporter]: The exporter, or None if neither the endpoint
+        nor snapshots are configured.
+    """
+    global _exporter  # pylint: disable=global-statement
+    from src.config import app_config  # pylint: disable=import-outside-toplevel
+    with _lock:
+        if _exporter is None and (app_config.metrics_port is not None or app_config.metrics_snapshot_path):
+            try:
+                _exporter = MetricsExporter(_registry, port=app_config.metrics_port,
+                                            snapshot_path=app_config.metrics_snapshot_path,
+                                            snapshot_interval=app_config.metrics_snapshot_interval).start()
+            except OSError as e:
+                print(f"Warning: could not start the metrics endpoint: {e}")
+        return _exporter
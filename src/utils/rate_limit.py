@@ -0,0 +1,336 @@
+"""
+This module provides bandwidth and request rate limiting for downloads.
+
+Three limits apply at the same time:
+
+- a token bucket per host limits how often jobs may start requests against
+  the same site, so large batches are not throttled or banned;
+- a host that answered HTTP 429 is paused for every job, with a pause that
+  grows while the host keeps rate limiting us;
+- an aggregate byte budget caps the bandwidth of the whole process and is
+  divided evenly across the jobs that are currently running. Jobs whose rate
+  cannot change while they run get a fixed slot of the budget instead.
+
+Classes:
+    TokenBucket: Thread-safe token bucket.
+    BandwidthBudget: Process-wide byte budget shared by active jobs.
+    RateLimiter: Per-host request buckets and backoff combined with a bandwidth budget.
+
+Functions:
+    parse_rate: Parses a rate such as ``'4.5M'`` into bytes per second.
+    get_rate_limiter: Returns the process-wide `RateLimiter`.
+"""
+
+import itertools
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_rate(value: str) -> int:
+    """Parse a rate in bytes per second, with an optional ``K``, ``M`` or ``G`` suffix.
+
+    Args:
+        value (str): Rate such as ``'500K'`` or ``'4.5M'``, as accepted by yt-dlp's ``--limit-rate``.
+
+    Returns:
+        int: Bytes per second.
+
+    Raises:
+        ValueError: If the value is not a positive rate.
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*', value, re.IGNORECASE)
+    if not match or float(match.group(1)) <= 0:
+        raise ValueError(f"Invalid rate: {value}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def _host(url: str) -> str:
+    """Return the lower-case host of ``url``."""
+    return (urlsplit(url).hostname or '').lower()
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    Tokens are added continuously at ``rate`` per second up to ``capacity``.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of stored tokens, i.e. the allowed burst.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """Create a full bucket.
+
+        Args:
+            rate (float): Tokens added per second.
+            capacity (Optional[float]): Burst size. Defaults to ``rate``, at least one token.
+            clock (Callable[[], float], optional): Monotonic clock. Defaults to ``time.monotonic``.
+            sleep (Callable[[float], None], optional): Sleep function. Defaults to ``time.sleep``.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` from the bucket and return how long the caller must wait for them."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` from the bucket, waiting until they are available.
+
+        Waiting callers reserve their tokens up front, so they are served in
+        arrival order.
+
+        Args:
+            tokens (float, optional): Number of tokens. Defaults to 1.
+
+        Returns:
+            float: Seconds waited.
+        """
+        delay = self.reserve(tokens)
+        if delay:
+            self._sleep(delay)
+        return delay
+
+
+class BandwidthBudget:
+    """Process-wide byte budget divided evenly across active jobs.
+
+    Every job joins the budget with a callback that receives its share in bytes
+    per second. When a job joins or leaves, the shares of all other active jobs
+    are recomputed and their callbacks are invoked.
+
+    Jobs that cannot change their rate once started, such as ``yt-dlp``
+    processes, join with the number of ``slots`` that may run at once. They get
+    ``limit // slots`` for their whole run, and the other jobs share the rest.
+
+    Attributes:
+        limit (Optional[int]): Total bytes per second, or None for no limit.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, Callable[[Optional[int]], None]] = {}
+        self._fixed: Dict[int, int] = {}
+        self._ids = itertools.count()
+
+    @property
+    def share(self) -> Optional[int]:
+        """Optional[int]: Current bytes per second of each active job, or None without a limit."""
+        if self.limit is None:
+            return None
+        return max(1, (self.limit - sum(self._fixed.values())) // max(1, len(self._jobs)))
+
+    def join(self, on_change: Callable[[Optional[int]], None], slots: Optional[int] = None) -> int:
+        """Add a job and rebalance the budget.
+
+        Args:
+            on_change (Callable[[Optional[int]], None]): Called with the job's new share,
+                including once for the initial share.
+            slots (Optional[int]): Give the job a fixed share of ``limit // slots`` that is never
+                changed, for jobs whose rate is fixed when they start. Defaults to None.
+
+        Returns:
+            int: Handle for `leave`.
+        """
+        with self._lock:
+            handle = next(self._ids)
+            if slots is not None and self.limit is not None:
+                self._fixed[handle] = max(1, self.limit // max(1, slots))
+                on_change(self._fixed[handle])
+            else:
+                self._jobs[handle] = on_change
+            self._rebalance()
+        return handle
+
+    def share_of(self, handle: int) -> Optional[int]:
+        """Return the current bytes per second of the job ``handle``."""
+        with self._lock:
+            return self._fixed.get(handle, self.share)
+
+    def leave(self, handle: int) -> None:
+        """Remove a job and give its bandwidth to the remaining jobs."""
+        with self._lock:
+            self._jobs.pop(handle, None)
+            self._fixed.pop(handle, None)
+            self._rebalance()
+
+    def _rebalance(self) -> None:
+        """Report the current share to every active job."""
+        share = self.share
+        for on_change in self._jobs.values():
+            on_change(share)
+
+
+class RateLimiter:
+    """Per-host request rate limiting and backoff combined with a process-wide bandwidth budget.
+
+    Attributes:
+        budget (BandwidthBudget): Byte budget shared by all running jobs.
+        requests_per_second (Optional[float]): Job starts allowed per host and second.
+        burst (int): Job starts allowed at once per host before the rate applies.
+
+    Example:
+        ```python
+        limiter = RateLimiter(max_bandwidth=10 * 1024 ** 2, requests_per_second=0.5)
+        if limiter.admit(url, scheduler.wait):
+            with limiter.job(lambda rate: print(f"{url}: {rate} B/s")):
+                ...
+        ```
+    """
+
+    def __init__(self, max_bandwidth: Optional[int] = None, requests_per_second: Optional[float] = None,
+                 burst: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """Create the limiter.
+
+        Args:
+            max_bandwidth (Optional[int]): Total bytes per second of all jobs. None disables the cap.
+            requests_per_second (Optional[float]): Job starts per host and second. None disables
+                request limiting.
+            burst (int, optional): Job starts per host allowed at once. Defaults to 1.
+            clock (Callable[[], float], optional): Monotonic clock. Defaults to ``time.monotonic``.
+            sleep (Callable[[float], None], optional): Sleep function. Defaults to ``time.sleep``.
+        """
+        self.budget = BandwidthBudget(max_bandwidth)
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._backoff: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._sleep = sleep
+
+    def host_bucket(self, host: str) -> Optional[TokenBucket]:
+        """Return the request bucket of ``host``, or None if requests are not limited."""
+        if not self.requests_per_second:
+            return None
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+            return bucket
+
+    def back_off(self, url: str, delay: Callable[[int], float]) -> float:
+        """Pause all jobs against the host of ``url`` after it rate limited us.
+
+        Consecutive rate limits of a host without a successful job in between
+        count as strikes; the pause of each strike is ``delay(strikes)``.
+
+        Args:
+            url (str): URL of the rate-limited job.
+            delay (Callable[[int], float]): Pause in seconds for the given number of strikes,
+                e.g. `RetryPolicy.delay`.
+
+        Returns:
+            float: Seconds until the host may be contacted again.
+        """
+        host = _host(url)
+        with self._lock:
+            strikes, until = self._backoff.get(host, (0, 0.0))
+            now = self._clock()
+            until = max(until, now + delay(strikes + 1))
+            self._backoff[host] = (strikes + 1, until)
+            return until - now
+
+    def recovered(self, url: str) -> None:
+        """Clear the strikes of the host of ``url`` after a successful job."""
+        if self._backoff:
+            with self._lock:
+                self._backoff.pop(_host(url), None)
+
+    def host_pause(self, host: str) -> float:
+        """Return the seconds ``host`` stays paused after rate limiting us."""
+        entry = self._backoff.get(host)
+        return max(0.0, entry[1] - self._clock()) if entry else 0.0
+
+    def _sleep_through(self, seconds: float) -> bool:
+        """Sleep without interruption; never stops waiting."""
+        self._sleep(seconds)
+        return False
+
+    def admit(self, url: str, wait: Optional[Callable[[float], bool]] = None) -> bool:
+        """Wait for the backoff of the host of ``url`` and take a token from its request bucket.
+
+        Args:
+            url (str): URL of the job; its host selects the request bucket.
+            wait (Optional[Callable[[float], bool]]): Called with each delay; returns True to stop
+                waiting, e.g. `DownloadScheduler.wait` so a cancelled batch does not wait out
+                a pause. Defaults to sleeping with the limiter's sleep function.
+
+        Returns:
+            bool: True if the job may start, False if ``wait`` stopped waiting.
+        """
+        wait = wait or self._sleep_through
+        host = _host(url)
+        pause = self.host_pause(host)
+        while pause > 0:
+            if wait(pause):
+                return False
+            pause = self.host_pause(host)
+        bucket = self.host_bucket(host)
+        if bucket is not None:
+            delay = bucket.reserve()
+            if delay and wait(delay):
+                return False
+        return True
+
+    @contextmanager
+    def job(self, on_rate_change: Callable[[Optional[int]], None],
+            slots: Optional[int] = None) -> Iterator[Optional[int]]:
+        """Hold a share of the bandwidth budget while a job runs.
+
+        Call `admit` first, so the job respects the host's backoff and request bucket.
+
+        Args:
+            on_rate_change (Callable[[Optional[int]], None]): Called with the job's bandwidth share
+                in bytes per second whenever it changes.
+            slots (Optional[int]): Number of jobs that may run at once, for jobs that cannot change
+                their rate while they run; see `BandwidthBudget.join`. Defaults to None.
+
+        Yields:
+            Optional[int]: Initial bandwidth share, or None without a cap.
+        """
+        handle = self.budget.join(on_rate_change, slots)
+        try:
+            yield self.budget.share_of(handle)
+        finally:
+            self.budget.leave(handle)
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, creating it from ``app_config`` on first use.
+
+    Returns:
+        RateLimiter: The shared limiter.
+    """
+    global _limiter  # pylint: disable=global-statement
+    with _limiter_lock:
+        if _limiter is None:
+            from src.config import app_config  # pylint: disable=import-outside-toplevel
+            _limiter = RateLimiter(max_bandwidth=app_config.max_bandwidth,
+                                   requests_per_second=app_config.host_requests_per_second,
+                                   burst=app_config.host_request_burst)
+        return _limiter
@@ -0,0 +1,118 @@
+"""
+This module classifies download failures and computes retry delays.
+
+yt-dlp reports failures as text. `classify_error` sorts them into:
+
+- ``permanent``: retrying cannot help, e.g. private, removed or geo-blocked videos;
+- ``rate_limited``: the site answered HTTP 429 and every job against it should pause;
+- ``transient``: network errors, server errors, fragment timeouts and FFmpeg
+  merge or rename failures that usually succeed on the next attempt.
+
+Failures that match no known pattern are treated as transient, so they are
+retried a limited number of times instead of being lost.
+
+Classes:
+    RetryPolicy: Attempt limit and exponential backoff with jitter.
+
+Functions:
+    classify_error: Returns the failure class of a yt-dlp error message.
+"""
+
+import random
+import re
+from typing import Callable, Optional
+
+PERMANENT = 'permanent'
+TRANSIENT = 'transient'
+RATE_LIMITED = 'rate_limited'
+
+_RATE_LIMITED = re.compile(r'HTTP Error 429|Too Many Requests|rate[- ]limit', re.IGNORECASE)
+
+_PERMANENT = re.compile('|'.join([
+    r'Private video',
+    r'Video unavailable',
+    r'This video (?:has been removed|is no longer available|is not available)',
+    r'removed (?:by the uploader|for violating)',
+    r'account associated with this video has been terminated',
+    r'copyright (?:claim|grounds)',
+    r'available in your country',
+    r'geo[- ]?restrict',
+    r'Sign in to confirm your age',
+    r'members[- ]only|Join this channel',
+    r'requires payment|only available (?:to|for) (?:Music )?Premium',
+    r'Unsupported URL',
+    r'is not a valid URL',
+    r'Requested format is not available',
+    r'HTTP Error (?:401|404|410)\b',
+    r'DRM protected',
+    # A missing cookie file is permanent; other missing files are usually a merge or rename race.
+    r"No such file or directory: '[^']*cookies[^']*'",
+    r'Permission denied|No space left on device',
+]), re.IGNORECASE)
+
+
+def classify_error(message: Optional[str]) -> str:
+    """Classify a yt-dlp failure.
+
+    Rate limits are checked first, because a 429 page often also says that the
+    video is "unavailable".
+
+    Args:
+        message (Optional[str]): Error message and output of the failed job.
+
+    Returns:
+        str: ``'permanent'``, ``'rate_limited'`` or ``'transient'``.
+    """
+    if not message:
+        return TRANSIENT
+    if _RATE_LIMITED.search(message):
+        return RATE_LIMITED
+    if _PERMANENT.search(message):
+        return PERMANENT
+    return TRANSIENT
+
+
+class RetryPolicy:
+    """Attempt limit and exponential backoff with jitter.
+
+    The delay before retry ``n`` is drawn uniformly from the upper half of
+    ``min(max_delay, base_delay * 2 ** (n - 1))``. The jitter keeps parallel
+    workers that failed together from retrying in lockstep.
+
+    Attributes:
+        retries (int): Extra attempts after the first one.
+        base_delay (float): Delay cap of the first retry in seconds.
+        max_delay (float): Upper bound of every delay in seconds.
+
+    Example:
+        ```python
+        policy = RetryPolicy(retries=3, base_delay=2.0)
+        policy.delay(1)  # between 1 and 2 seconds
+        policy.delay(3)  # between 4 and 8 seconds
+        ```
+    """
+
+    def __init__(self, retries: int = 3, base_delay: float = 2.0, max_delay: float = 60.0,
+                 rng: Callable[[float, float], float] = random.uniform):
+        """Create the policy.
+
+        Args:
+            retries (int, optional): Extra attempts after the first one. Defaults to 3.
+            base_delay (float, optional): Delay cap of the first retry in seconds. Defaults to 2.
+            max_delay (float, optional): Upper bound of every delay in seconds. Defaults to 60.
+            rng (Callable[[float, float], float], optional): ``uniform(low, high)`` function.
+                Defaults to ``random.uniform``.
+        """
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng
+
+    def should_retry(self, kind: str, attempt: int) -> bool:
+        """Check whether a failure of class ``kind`` after ``attempt`` attempts is retried."""
+        return kind != PERMANENT and attempt <= self.retries
+
+    def delay(self, attempt: int) -> float:
+        """Return the seconds to wait before retry ``attempt`` (counted from 1)."""
+        cap = min(self.max_delay, self.base_delay * 2 ** max(0, attempt - 1))
+        return self._rng(cap / 2, cap) if cap > 0 else 0.0
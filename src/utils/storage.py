@@ -0,0 +1,205 @@
+"""
+This module provides free-space admission and atomic publishing of finished files.
+
+Before a job starts, its estimated size is reserved on the file systems of the
+staging and download folders with `SpaceLedger.reserve`. A job that does not
+fit waits while other jobs hold reservations on the same file system, because
+their space is returned when they finish; if nothing else is running, it fails
+at once instead of after gigabytes were transferred.
+
+`publish_file` moves a finished file from the staging folder into its final
+folder. Across file systems the file is copied under a hidden name first, so
+the final name only ever shows a complete file.
+
+Classes:
+    InsufficientSpace: Raised when a job does not fit on a file system.
+    SpaceLedger: Free-space reservations of the running jobs.
+
+Functions:
+    file_system: Returns the device of the file system holding a path.
+    publish_file: Atomically moves a file to its final path.
+    get_space_ledger: Returns the process-wide `SpaceLedger`.
+"""
+
+import errno
+import itertools
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+_MIB = 1024 ** 2
+
+
+class InsufficientSpace(OSError):
+    """Raised when a job needs more space than a file system has free.
+
+    Attributes:
+        path (str): Folder on the full file system.
+        needed (int): Bytes the job needs, including the free-space margin.
+        free (int): Bytes available.
+    """
+
+    def __init__(self, path: str, needed: int, free: int):
+        super().__init__(errno.ENOSPC, f"No space left on device: {path} needs {needed / _MIB:.0f} MiB, "
+                                       f"{free / _MIB:.0f} MiB free")
+        self.path = path
+        self.needed = needed
+        self.free = free
+
+
+def _existing(path: str) -> str:
+    """Return ``path`` or its closest existing parent folder."""
+    path = os.path.abspath(os.path.expanduser(path))
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def file_system(path: str) -> int:
+    """Return the device of the file system that holds, or will hold, ``path``."""
+    return os.stat(_existing(path)).st_dev
+
+
+def publish_file(source: str, target: str) -> None:
+    """Move ``source`` to ``target`` so that ``target`` never shows a partial file.
+
+    On the same file system this is a rename. Otherwise the file is copied to a
+    hidden name next to ``target``, flushed to disk and renamed, and ``source``
+    is removed afterwards.
+
+    Raises:
+        OSError: If the file cannot be moved; ``target`` is left untouched.
+    """
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    try:
+        os.replace(source, target)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    temporary = os.path.join(os.path.dirname(target), f'.{os.path.basename(target)}.streamflow-part')
+    try:
+        with open(source, 'rb') as src, open(temporary, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copystat(source, temporary)
+        os.replace(temporary, target)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    os.remove(source)
+
+
+class SpaceLedger:
+    """Free-space reservations of the running jobs.
+
+    Free space reported by the file system does not yet include what running
+    jobs are about to write, so every admitted job reserves its estimate until
+    it is released. Reservations are counted per file system: folders on the
+    same device share one budget.
+
+    Attributes:
+        poll_interval (float): Seconds between checks while a job waits for space.
+
+    Example:
+        ```python
+        ticket = get_space_ledger().reserve({'/mnt/ssd/staging': 2 * size, '/mnt/nas/videos': size})
+        try:
+            ...  # download
+        finally:
+            get_space_ledger().release(ticket)
+        ```
+    """
+
+    def __init__(self, poll_interval: float = 1.0,
+                 usage: Callable[[str], Tuple[int, int, int]] = shutil.disk_usage):
+        """Create an empty ledger.
+
+        Args:
+            poll_interval (float, optional): Seconds between checks while waiting. Defaults to 1.
+            usage (Callable[[str], Tuple[int, int, int]], optional): Returns total, used and
+                free bytes of a path. Defaults to ``shutil.disk_usage``.
+        """
+        self.poll_interval = poll_interval
+        self._usage = usage
+        self._reserved: Dict[int, int] = {}
+        self._holders: Dict[int, int] = {}
+        self._tickets: Dict[int, Dict[int, int]] = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def reserve(self, needs: Dict[str, int], margin: int = 0,
+                wait: Optional[Callable[[float], bool]] = None) -> Optional[int]:
+        """Reserve free space for a job, waiting while other jobs hold the missing space.
+
+        Args:
+            needs (Dict[str, int]): Bytes needed per folder; folders on the same file
+                system are added up.
+            margin (int, optional): Bytes that must stay free on every file system. Defaults to 0.
+            wait (Optional[Callable[[float], bool]]): Called with a delay while the job waits;
+                returns True to give up. Defaults to ``time.sleep``.
+
+        Returns:
+            Optional[int]: Ticket for `release`, or None if ``wait`` gave up.
+
+        Raises:
+            InsufficientSpace: If the job does not fit even though no other job holds space there.
+            OSError: If a file system cannot be queried.
+        """
+        devices: Dict[int, Tuple[str, int]] = {}
+        for path, size in needs.items():
+            device = file_system(path)
+            first, total = devices.get(device, (path, 0))
+            devices[device] = (first, total + size)
+        while True:
+            with self._lock:
+                shortage = None
+                for device, (path, size) in devices.items():
+                    free = self._usage(_existing(path))[2]
+                    if size + margin > free - self._reserved.get(device, 0):
+                        shortage = (device, path, size + margin, free)
+                        break
+                if shortage is None:
+                    ticket = next(self._counter)
+                    self._tickets[ticket] = {device: size for device, (_, size) in devices.items()}
+                    for device, (_, size) in devices.items():
+                        self._reserved[device] = self._reserved.get(device, 0) + size
+                        self._holders[device] = self._holders.get(device, 0) + 1
+                    return ticket
+                device, path, needed, free = shortage
+                if not self._holders.get(device):
+                    raise InsufficientSpace(path, needed, free)
+            if wait is None:
+                time.sleep(self.poll_interval)
+            elif wait(self.poll_interval):
+                return None
+
+    def release(self, ticket: Optional[int]) -> None:
+        """Return the space of ``ticket``; None and released tickets are ignored."""
+        with self._lock:
+            sizes = self._tickets.pop(ticket, None) if ticket is not None else None
+            for device, size in (sizes or {}).items():
+                self._reserved[device] -= size
+                self._holders[device] -= 1
+
+    def reserved(self, path: str) -> int:
+        """Return the bytes reserved on the file system of ``path``."""
+        device = file_system(path)
+        with self._lock:
+            return self._reserved.get(device, 0)
+
+
+_ledger = SpaceLedger()
+
+
+def get_space_ledger() -> SpaceLedger:
+    """Return the process-wide space ledger shared by every downloader.
+
+    Returns:
+        SpaceLedger: The shared ledger.
+    """
+    return _ledger
@@ -0,0 +1,158 @@
+import io
+import json
+import pytest
+from src.classes.download_scheduler import DownloadResult
+from src.utils import cli
+
+class FakeDownloader:
+    created = []
+
+    def __init__(self, urls, **options):
+        self.urls = urls
+        self.options = options
+        self.consumed = []
+
+    @staticmethod
+    def check_options(**options):
+        pass
+
+    @classmethod
+    def from_options(cls, urls, **options):
+        downloader = cls(urls, **options)
+        cls.created.append(downloader)
+        return downloader
+
+    def download_video(self):
+        self.consumed = list(self.urls)
+        return [DownloadResult(url, 'done') for url in self.consumed]
+
+@pytest.fixture
+def fake_downloader(monkeypatch):
+    FakeDownloader.created = []
+    monkeypatch.setattr('src.classes.video_downloader.VideoDownloader', FakeDownloader)
+    return FakeDownloader
+
+def test_download_maps_arguments_to_options(fake_downloader, tmp_path):
+    status = cli.run_cli(['download', 'http://example.com/a', '-m', 'video', '-q', '720p',
+                          '-f', 'mkv', '-o', str(tmp_path), '-j', '2', '--transfer', 'segmented'])
+
+    assert status == cli.EXIT_OK
+    downloader = fake_downloader.created[0]
+    assert downloader.consumed == ['http://example.com/a']
+    assert downloader.options['mode'] == 'Video'
+    assert downloader.options['quality'] == 'High (720p)'
+    assert downloader.options['output_format'] == 'Mkv'
+    assert downloader.options['jobs'] == 2
+    assert downloader.options['transfer_profile'] == 'segmented'
+
+def test_download_reads_links_from_file_and_stdin(fake_downloader, monkeypatch, tmp_path):
+    links = tmp_path / 'links.txt'
+    links.write_text('http://example.com/a\n\nhttp://example.com/b\n# comment\nhttp://example.com/a\n',
+                     encoding='utf-8')
+
+    assert cli.run_cli(['download', '-i', str(links)]) == cli.EXIT_OK
+    assert fake_downloader.created[-1].consumed == ['http://example.com/a', 'http://example.com/b']
+
+    monkeypatch.setattr('sys.stdin', io.StringIO('http://example.com/c\n'))
+    assert cli.run_cli(['download', '-i', '-', '-m', 'audio', '-a', 'opus', '--audio-bitrate', '96']) == cli.EXIT_OK
+    assert fake_downloader.created[-1].consumed == ['http://example.com/c']
+    assert fake_downloader.created[-1].options['mode'] == 'Audio only'
+    assert fake_downloader.created[-1].options['audio_profile'] == 'opus'
+    assert fake_downloader.created[-1].options['audio_bitrate'] == '96'
+
+def test_download_without_urls_is_usage_error(fake_downloader):
+    assert cli.run_cli(['download']) == cli.EXIT_USAGE
+    assert not fake_downloader.created
+
+def test_download_reports_failure_as_json(fake_downloader, monkeypatch, capsys):
+    def failing(self):
+        return [DownloadResult('http://example.com/a', 'failed', error='boom')]
+
+    monkeypatch.setattr(FakeDownloader, 'download_video', failing)
+
+    status = cli.run_cli(['download', 'http://example.com/a', '--json'])
+
+    assert status == cli.EXIT_FAILED
+    summary = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert summary['exit_status'] == cli.EXIT_FAILED
+    assert summary['counts']['failed'] == 1
+    assert summary['results'][0]['error'] == 'boom'
+
+def test_download_reports_missing_toolchain(fake_downloader, monkeypatch):
+    monkeypatch.setattr(FakeDownloader, 'download_video', lambda self: None)
+
+    assert cli.run_cli(['download', 'http://example.com/a']) == cli.EXIT_TOOLCHAIN
+
+def test_toolchain_command_reports_missing_ffmpeg(monkeypatch, capsys):
+    from src.decorators.ffmpeg import Toolchain
+    monkeypatch.setattr('src.decorators.ffmpeg.get_toolchain', lambda: Toolchain(None))
+
+    assert cli.run_cli(['toolchain']) == cli.EXIT_TOOLCHAIN
+    assert json.loads(capsys.readouterr().out)['ffmpeg_version'] is None
+
+def test_download_reports_link_counts_as_json(fake_downloader, tmp_path, capsys):
+    links = tmp_path / 'links.txt'
+    links.write_text('https://youtu.be/dQw4w9WgXcQ\nhttps://www.youtube.com/watch?v=dQw4w9WgXcQ&t=30\n'
+                     'not a link\n', encoding='utf-8')
+
+    assert cli.run_cli(['download', '-i', str(links), '--json']) == cli.EXIT_OK
+    summary = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert summary['links'] == {'accepted': 1, 'duplicate': 1, 'invalid': 1, 'skipped': 0}
+
+def test_download_without_valid_links_is_usage_error(fake_downloader, tmp_path):
+    links = tmp_path / 'links.txt'
+    links.write_text('# nothing here\n\n', encoding='utf-8')
+
+    assert cli.run_cli(['download', '-i', str(links)]) == cli.EXIT_USAGE
+
+def test_watch_runs_inbox_daemon_with_download_options(fake_downloader, monkeypatch, tmp_path):
+    started = []
+    monkeypatch.setattr('src.classes.inbox_daemon.InboxDaemon.run', lambda self: started.append(self))
+
+    status = cli.run_cli(['watch', str(tmp_path / 'inbox'), '-m', 'audio', '-a', 'opus',
+                          '--queue', str(tmp_path / 'queue.sqlite3'), '--debounce', '0.5'])
+
+    assert status == cli.EXIT_INTERRUPTED
+    daemon = started[0]
+    assert daemon.options['mode'] == 'Audio only'
+    assert daemon.options['audio_profile'] == 'opus'
+    assert daemon.debounce == 0.5
+    assert daemon.done_folder == str(tmp_path / 'inbox' / 'done')
+
+def test_serve_passes_download_options_as_job_defaults(fake_downloader, monkeypatch, tmp_path):
+    started = []
+    monkeypatch.setattr('src.classes.job_server.JobServer.run', lambda self: started.append(self))
+
+    status = cli.run_cli(['serve', '--port', '0', '--workers', '3', '-j', '2', '-q', '720p',
+                          '--queue', str(tmp_path / 'queue.sqlite3')])
+
+    assert status == cli.EXIT_INTERRUPTED
+    server = started[0]
+    assert (server.port, server.workers, server.batch_size) == (0, 3, 2)
+    assert server.defaults['quality'] == 'High (720p)'
+
+def test_enqueue_and_worker_share_a_queue(fake_downloader, tmp_path, capsys):
+    queue = str(tmp_path / 'queue.sqlite3')
+
+    status = cli.run_cli(['enqueue', 'https://example.com/a', 'https://example.com/b', '-m', 'audio',
+                          '--priority', '2', '--queue', queue, '--json'])
+
+    assert status == cli.EXIT_OK
+    assert json.loads(capsys.readouterr().out) == {'jobs': [1, 2]}
+    assert cli.run_cli(['worker', '--queue', queue, '--worker-id', 'w', '--exit-when-empty']) == cli.EXIT_OK
+    batch = fake_downloader.created[-1]
+    assert batch.consumed == ['https://example.com/a', 'https://example.com/b']
+    assert batch.options['mode'] == 'Audio only'
+
+def test_gc_reports_unreferenced_store_files(monkeypatch, tmp_path, capsys):
+    from src.classes.media_store import MediaStore
+    monkeypatch.setattr('src.config.app_config.media_store_dir', str(tmp_path / 'store'))
+    media = tmp_path / 'a.mp4'
+    media.write_bytes(b'video')
+    MediaStore(str(tmp_path / 'store')).add(str(media), 'youtube:abc:video/The best/Mp4')
+    media.unlink()
+
+    assert cli.run_cli(['gc', '--dry-run', '--json']) == cli.EXIT_OK
+    assert json.loads(capsys.readouterr().out)['blobs'] == 1
+    assert cli.run_cli(['gc', '--json']) == cli.EXIT_OK
+    assert json.loads(capsys.readouterr().out)['remaining_blobs'] == 0
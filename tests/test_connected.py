@@ -1,6 +1,8 @@
 import socket
+import threading
+import time
 import pytest
-from src.decorators.connected import is_connected, network_required
+from src.decorators.connected import ConnectivityMonitor, is_connected, network_required, parse_target
 
 """
 Fake socket implementation for testing network connectivity.
@@ -8,6 +10,10 @@ Fake socket implementation for testing network connectivity.
 class FakeSocket:
     def __init__(self, *args, **kwargs):
         self.connected = False
+        self.timeout = None
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
 
     def connect(self, addr):
         if addr == ('8.8.8.8', 53):
@@ -42,18 +48,99 @@ def test_is_connected_failure(monkeypatch):
     assert is_connected() is False
 
 
-def test_network_required_retries_until_connected(monkeypatch):
-    calls = []
-    states = [False, False, True]
+def test_is_connected_leaves_default_timeout_alone(monkeypatch):
+    def fail(timeout):
+        raise AssertionError('setdefaulttimeout must not be called')
+
+    monkeypatch.setattr('src.decorators.connected.socket.setdefaulttimeout', fail)
+    monkeypatch.setattr('src.decorators.connected.socket.socket', FakeSocket)
+
+    assert is_connected() is True
+
+def test_is_connected_uses_ipv6_family(monkeypatch):
+    families = []
+
+    class RecordingSocket(FakeSocket):
+        def __init__(self, family, kind):
+            super().__init__()
+            families.append(family)
+
+        def connect(self, addr):
+            return None
+
+    monkeypatch.setattr('src.decorators.connected.socket.socket', RecordingSocket)
+
+    assert is_connected('2001:4860:4860::8888', 53) is True
+    assert families == [socket.AF_INET6]
+
+def test_parse_target_handles_ipv4_and_ipv6():
+    assert parse_target('8.8.8.8:53') == ('8.8.8.8', 53)
+    assert parse_target('[2001:4860:4860::8888]:53') == ('2001:4860:4860::8888', 53)
+    with pytest.raises(ValueError):
+        parse_target('8.8.8.8')
 
-    def fake_is_connected(*args, **kwargs):
-        calls.append('check')
-        return states.pop(0)
+def test_monitor_is_online_with_any_reachable_target(monkeypatch):
+    probed = []
 
-    sleep_calls = []
+    def fake_is_connected(host, port, timeout):
+        probed.append(host)
+        return host == '2001:db8::1'
 
     monkeypatch.setattr('src.decorators.connected.is_connected', fake_is_connected)
-    monkeypatch.setattr('src.decorators.connected.time.sleep', lambda seconds: sleep_calls.append(seconds))
+    monitor = ConnectivityMonitor(targets=['192.0.2.1:53', '[2001:db8::1]:53'])
+
+    assert monitor.is_online() is True
+    assert probed == ['192.0.2.1', '2001:db8::1']
+
+def test_monitor_caches_state_within_ttl():
+    calls = []
+    monitor = ConnectivityMonitor(probe=lambda: calls.append(1) or True, ttl=60)
+
+    for _ in range(100):
+        assert monitor.is_online() is True
+
+    assert len(calls) == 1
+
+def test_monitor_refreshes_stale_state_in_background():
+    release = threading.Event()
+    calls = []
+
+    def slow_probe():
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(1)
+        return True
+
+    monitor = ConnectivityMonitor(probe=slow_probe, ttl=0)
+    monitor.is_online()
+
+    start = time.monotonic()
+    assert monitor.is_online() is True
+    assert time.monotonic() - start < 0.5
+    release.set()
+
+def test_monitor_wakes_waiters_when_connection_returns():
+    states = [False, False, True]
+    monitor = ConnectivityMonitor(probe=lambda: states.pop(0) if states else True, retry_interval=0.01)
+
+    assert monitor.is_online() is False
+    assert monitor.wait_until_online(timeout=2) is True
+    assert monitor.is_online() is True
+
+def test_monitor_with_local_stand_in_target():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    port = server.getsockname()[1]
+    try:
+        assert ConnectivityMonitor(targets=[f'127.0.0.1:{port}'], timeout=1).is_online() is True
+    finally:
+        server.close()
+
+def test_network_required_waits_until_connected(monkeypatch, capsys):
+    states = [False, False, True]
+    monitor = ConnectivityMonitor(probe=lambda: states.pop(0) if states else True, retry_interval=0.01)
+    monkeypatch.setattr('src.decorators.connected._monitor', monitor)
 
     @network_required
     def target(value):
@@ -62,12 +149,12 @@ def test_network_required_retries_until_connected(monkeypatch):
     result = target('x')
 
     assert result == 'done:x'
-    assert calls == ['check', 'check', 'check']
-    assert sleep_calls == [5, 5]
+    assert states == []
+    assert 'No network connection' in capsys.readouterr().out
 
 
 def test_network_required_executes_immediately_when_connected(monkeypatch):
-    monkeypatch.setattr('src.decorators.connected.is_connected', lambda *args, **kwargs: True)
+    monkeypatch.setattr('src.decorators.connected._monitor', ConnectivityMonitor(probe=lambda: True))
     monkeypatch.setattr('src.decorators.connected.time.sleep', lambda seconds: pytest.skip('sleep should not be called'))
 
     executed = []
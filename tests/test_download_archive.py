@@ -0,0 +1,54 @@
+import multiprocessing
+from src.classes.download_archive import DownloadArchive
+
+def test_archive_records_and_finds_items(tmp_path):
+    archive = DownloadArchive(str(tmp_path / 'nested' / 'archive.sqlite3'))
+
+    assert archive.contains('youtube', 'abcdefghijk') is False
+    archive.add('youtube', 'abcdefghijk', 'https://youtu.be/abcdefghijk')
+    archive.add('youtube', 'abcdefghijk', 'https://youtu.be/abcdefghijk')
+
+    assert archive.contains('youtube', 'abcdefghijk') is True
+    assert archive.contains('vimeo', 'abcdefghijk') is False
+    assert len(archive) == 1
+
+def test_archive_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'archive.sqlite3')
+    DownloadArchive(path).add('vimeo', '123')
+
+    assert DownloadArchive(path).contains('vimeo', '123') is True
+
+def _write_items(path, start):
+    archive = DownloadArchive(path)
+    for i in range(start, start + 50):
+        archive.add('youtube', f'id{i}')
+    archive.close()
+
+def test_archive_survives_concurrent_writers(tmp_path):
+    path = str(tmp_path / 'archive.sqlite3')
+    DownloadArchive(path).close()
+    processes = [multiprocessing.Process(target=_write_items, args=(path, n * 50)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert all(process.exitcode == 0 for process in processes)
+    assert len(DownloadArchive(path)) == 200
+
+def test_archive_tells_outputs_apart_and_sets_old_entries_aside(tmp_path):
+    import sqlite3
+    path = str(tmp_path / 'archive.sqlite3')
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE downloads (extractor TEXT NOT NULL, video_id TEXT NOT NULL, url TEXT, '
+                       'completed_at REAL NOT NULL, PRIMARY KEY (extractor, video_id)) WITHOUT ROWID')
+    connection.execute("INSERT INTO downloads VALUES ('youtube', 'abcdefghijk', NULL, 0)")
+    connection.commit()
+    connection.close()
+
+    archive = DownloadArchive(path)
+    assert archive.contains('youtube', 'abcdefghijk', 'video/mp4:/videos') is False
+    archive.add('youtube', 'abcdefghijk', output='video/mp4:/videos')
+
+    assert archive.contains('youtube', 'abcdefghijk', 'video/mp4:/videos') is True
+    assert archive.contains('youtube', 'abcdefghijk', 'audio/mp3:/videos') is False
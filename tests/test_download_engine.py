@@ -0,0 +1,307 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import types
+from http.server import ThreadingHTTPServer
+import pytest
+from unittest.mock import MagicMock
+from benchmarks.suite import MediaHandler
+from src.classes.download_engine import (DownloadEngineError, DownloadJob, InProcessEngine, SubprocessEngine,
+                                         build_command, build_selection_command, build_ydl_options, create_engine,
+                                         staged_formats)
+from src.classes.postprocess_pipeline import staged_inputs
+
+class FakeYoutubeDL:
+    instances = []
+
+    def __init__(self, params):
+        self.params = params
+        self.params.setdefault('outtmpl', {})
+        self.format_selector = self.build_format_selector(params.get('format'))
+        self.downloaded = []
+        self.closed = False
+        FakeYoutubeDL.instances.append(self)
+
+    def download(self, urls):
+        for hook in self.params['progress_hooks']:
+            hook({'status': 'downloading'})
+        if 'fail' in urls[0]:
+            raise FakeDownloadError('ERROR: unavailable')
+        self.downloaded.append((urls[0], self.params['outtmpl']['default'], self.format_selector))
+        return 0
+
+    def extract_info(self, url, download=True):
+        return {'webpage_url': url, 'format_id': '137+140',
+                'requested_formats': [{'format_id': '137'}, {'format_id': '140'}]}
+
+    @staticmethod
+    def sanitize_info(info):
+        return info
+
+    @staticmethod
+    def build_format_selector(spec):
+        return spec
+
+    def download_with_info_file(self, path):
+        self.downloaded.append((path, self.params['outtmpl']['default'], self.format_selector))
+        return 0
+
+    def close(self):
+        self.closed = True
+
+class FakeDownloadError(Exception):
+    pass
+
+@pytest.fixture
+def fake_yt_dlp(monkeypatch):
+    FakeYoutubeDL.instances = []
+    module = types.ModuleType('yt_dlp')
+    module.YoutubeDL = FakeYoutubeDL
+    module.utils = types.SimpleNamespace(DownloadError=FakeDownloadError)
+    monkeypatch.setitem(sys.modules, 'yt_dlp', module)
+    return module
+
+@pytest.fixture
+def media_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+    MediaHandler.media_size, MediaHandler.fail_first = 1024, False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://%s:%d' % server.server_address
+    server.shutdown()
+    server.server_close()
+
+def _write_info(path, base, formats):
+    """Write an info.json whose formats are served by the local media server."""
+    info = {'id': 'clip', 'title': 'Clip', 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': f'{base}/v/clip', 'formats': [
+                {'format_id': format_id, 'url': f'{base}/v/{format_id}/media', 'protocol': 'http', **fields}
+                for format_id, fields in formats.items()]}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    return str(path)
+
+def _video_job(url='http://example.com/a', template='/tmp/%(title)s.%(ext)s'):
+    return DownloadJob(url=url, output_template=template, format_selector='bestvideo+bestaudio/best',
+                       merge_output_format='mp4')
+
+def test_passthrough_audio_keeps_the_source_extension():
+    job = DownloadJob(url='http://example.com/a', output_template='out.%(ext)s', format_selector='bestaudio/best',
+                      extract_audio=True, audio_format='best')
+
+    cmd = build_command(job)
+    options = build_ydl_options(job)
+
+    assert cmd[cmd.index('--audio-format') + 1] == 'best'
+    assert options['postprocessors'][0]['preferredcodec'] == 'best'
+    assert 'final_ext' not in options
+
+def test_staged_job_only_fetches_raw_streams():
+    job = _video_job(template='/downloads/%(title)s.%(ext)s')
+    job.stage_dir = '/downloads/.stage/abc'
+    job.staged_formats = staged_formats({'format_id': '137+140', 'requested_formats': [{'format_id': '137'},
+                                                                                        {'format_id': '140'}]})
+
+    selection = build_selection_command(job)
+    cmd = build_command(job)
+    options = build_ydl_options(job)
+
+    assert selection[selection.index('-f') + 1] == job.format_selector and selection[-1] == '-j'
+    assert cmd[cmd.index('-f') + 1] == '137,140'
+    assert cmd[cmd.index('-o') + 1] == '/downloads/.stage/abc/media.f%(format_id)s.%(ext)s'
+    assert cmd[cmd.index('--load-info-json') + 1] == '/downloads/.stage/abc/info.json'
+    assert cmd[cmd.index('--fixup') + 1] == 'never' and '-k' in cmd
+    assert '--ffmpeg-location' not in cmd and '--merge-output-format' not in cmd
+    assert cmd[cmd.index('--print-to-file') + 1] == 'before_dl:/downloads/%(title)S.%%(ext)s'
+    assert options['format'] == '137,140' and options['fixup'] == 'never'
+    assert 'ffmpeg_location' not in options
+    assert 'merge_output_format' not in options and 'postprocessors' not in options
+    assert options['print_to_file']['before_dl'] == [('/downloads/%(title)S.%%(ext)s',
+                                                      '/downloads/.stage/abc/name')]
+    assert staged_formats({'format_id': '251'}) == '251'
+
+def test_path_file_records_the_final_path():
+    job = _video_job()
+    job.path_file = '/tmp/streamflow-1.path'
+
+    cmd = build_command(job)
+    options = build_ydl_options(job)
+
+    assert cmd[cmd.index('--print-to-file') + 1:cmd.index('--print-to-file') + 3] == \
+        ['after_move:%(filepath)s', '/tmp/streamflow-1.path']
+    assert options['print_to_file'] == {'after_move': [('%(filepath)s', '/tmp/streamflow-1.path')]}
+
+def test_command_and_options_describe_the_same_job():
+    job = DownloadJob(url='http://example.com/a', output_template='out.%(ext)s', format_selector='bestaudio/best',
+                      extract_audio=True)
+
+    cmd = build_command(job)
+    options = build_ydl_options(job)
+
+    assert cmd[cmd.index('-f') + 1] == options['format']
+    assert cmd[cmd.index('-o') + 1] == options['outtmpl']['default']
+    assert '--no-playlist' in cmd and options['noplaylist'] is True
+    assert options['postprocessors'][0]['preferredcodec'] == cmd[cmd.index('--audio-format') + 1]
+
+def test_inprocess_engine_reuses_one_instance_per_thread(fake_yt_dlp):
+    events = []
+    with InProcessEngine(progress_hooks=[events.append]) as engine:
+        engine.download(_video_job('http://example.com/a', 'a.%(ext)s'))
+        engine.download(_video_job('http://example.com/b', 'b.%(ext)s'))
+
+    assert len(FakeYoutubeDL.instances) == 1
+    ydl = FakeYoutubeDL.instances[0]
+    assert [item[:2] for item in ydl.downloaded] == [('http://example.com/a', 'a.%(ext)s'),
+                                                     ('http://example.com/b', 'b.%(ext)s')]
+    assert events == [{'status': 'downloading'}, {'status': 'downloading'}]
+    assert ydl.closed is True
+
+def test_inprocess_engine_applies_each_jobs_format_selector(tmp_path, media_server):
+    pytest.importorskip('yt_dlp')
+    muxed = {'vcodec': 'avc1', 'acodec': 'mp4a', 'ext': 'mp4'}
+    info_json = _write_info(tmp_path / 'clip.info.json', media_server,
+                            {'low': {'height': 360, **muxed}, 'high': {'height': 1080, **muxed}})
+    template = str(tmp_path / '%(title)s-%(format_id)s.%(ext)s')
+
+    with InProcessEngine() as engine:
+        for selector in ('best[height<=480]', 'best'):
+            job = DownloadJob(url=f'{media_server}/v/clip', output_template=template, format_selector=selector,
+                              info_json=info_json, cookies=str(tmp_path / 'cookies.txt'))
+            engine.download(job, capture_output=True)
+
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.mp4')) == ['Clip-high.mp4', 'Clip-low.mp4']
+
+def test_inprocess_engine_selects_formats_before_fetching_staged_streams(fake_yt_dlp, tmp_path):
+    job = _video_job()
+    job.stage_dir = str(tmp_path / 'stage')
+
+    with InProcessEngine(progress_hooks=[lambda d: None]) as engine:
+        engine.download(job)
+
+    info_path, output = str(tmp_path / 'stage' / 'info.json'), str(tmp_path / 'stage' / 'media.f%(format_id)s.%(ext)s')
+    assert FakeYoutubeDL.instances[0].downloaded == [(info_path, output, '137,140')]
+    with open(info_path, encoding='utf-8') as f:
+        assert json.load(f)['format_id'] == '137+140'
+
+def test_inprocess_engine_stages_the_capped_streams_separately(tmp_path, media_server):
+    pytest.importorskip('yt_dlp')
+    video = {'vcodec': 'avc1', 'acodec': 'none', 'ext': 'mp4'}
+    info_json = _write_info(tmp_path / 'clip.info.json', media_server,
+                            {'v360': {'height': 360, **video}, 'v720': {'height': 720, **video},
+                             'v1080': {'height': 1080, **video},
+                             'audio': {'vcodec': 'none', 'acodec': 'mp4a', 'ext': 'm4a'}})
+    job = DownloadJob(url=f'{media_server}/v/clip', output_template=str(tmp_path / '%(title)s.%(ext)s'),
+                      format_selector='bv[height<=720]+ba', merge_output_format='mp4', info_json=info_json,
+                      cookies=str(tmp_path / 'cookies.txt'), stage_dir=str(tmp_path / 'stage'))
+
+    with InProcessEngine() as engine:
+        engine.download(job, capture_output=True)
+
+    assert job.staged_formats == 'v720,audio'
+    assert [os.path.basename(path) for path in staged_inputs(job.stage_dir, job.staged_formats)] == \
+        ['media.faudio.m4a', 'media.fv720.mp4']
+    assert not os.path.exists(tmp_path / 'Clip.mp4')
+
+def test_inprocess_engine_wraps_download_errors(fake_yt_dlp):
+    with InProcessEngine() as engine:
+        with pytest.raises(DownloadEngineError):
+            engine.download(_video_job('http://example.com/fail'))
+
+def test_subprocess_engine_wraps_process_errors(monkeypatch):
+    def fake_run(cmd, **kwargs):
+        raise subprocess.CalledProcessError(1, cmd, output='partial', stderr='ERROR: gone')
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
+
+    with pytest.raises(DownloadEngineError) as error:
+        SubprocessEngine().download(_video_job(), capture_output=True)
+    assert error.value.output == 'partialERROR: gone'
+
+def test_auto_engine_falls_back_to_subprocess(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'yt_dlp', None)
+
+    assert isinstance(create_engine('auto'), SubprocessEngine)
+    with pytest.raises(ImportError):
+        create_engine('inprocess')
+    with pytest.raises(ValueError):
+        create_engine('curl')
+
+def test_auto_engine_prefers_inprocess(fake_yt_dlp):
+    assert isinstance(create_engine('auto'), InProcessEngine)
+
+def test_jobs_start_from_cached_info_and_write_new_info(fake_yt_dlp):
+    job = _video_job()
+    job.info_json = '/cache/youtube-abc.info.json'
+    job.info_template = '/cache/%(extractor)s-%(id)s'
+
+    cmd = build_command(job)
+    assert cmd[cmd.index('--load-info-json') + 1] == job.info_json
+    assert job.url not in cmd
+    assert 'infojson:/cache/%(extractor)s-%(id)s' in cmd
+
+    with InProcessEngine() as engine:
+        engine.download(job)
+    ydl = FakeYoutubeDL.instances[0]
+    assert ydl.downloaded[0][0] == job.info_json
+    assert ydl.params['writeinfojson'] is True
+    assert ydl.params['outtmpl']['infojson'] == job.info_template
+
+def test_subprocess_engine_lists_flat_playlist_entries(monkeypatch):
+    info = {'entries': [{'url': 'https://youtu.be/a', 'title': 'A', 'duration': 61.0}, None,
+                        {'url': 'https://youtu.be/c'}]}
+    calls = []
+
+    def fake_run(args, **kwargs):
+        calls.append(args)
+        return MagicMock(returncode=0, stdout=json.dumps(info))
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
+
+    entries = SubprocessEngine().expand_playlist('https://www.youtube.com/playlist?list=PL1')
+
+    assert entries == [{'index': 1, 'url': 'https://youtu.be/a', 'title': 'A', 'duration': 61.0},
+                       {'index': 3, 'url': 'https://youtu.be/c', 'title': None, 'duration': None}]
+    assert '--flat-playlist' in calls[0]
+
+def test_rate_limit_changes_apply_to_running_inprocess_downloads(fake_yt_dlp):
+    job = _video_job()
+    job.rate_limit = 1000
+    assert build_command(job)[build_command(job).index('--limit-rate') + 1] == '1000'
+
+    with InProcessEngine() as engine:
+        seen = []
+
+        def download(urls):
+            seen.append(ydl.params['ratelimit'])
+            engine.update_rate_limit(job, 500)
+            seen.append(ydl.params['ratelimit'])
+            return 0
+
+        ydl = engine._instance(build_ydl_options(job))
+        ydl.download = download
+        engine.download(job)
+        engine.update_rate_limit(job, 250)
+
+    assert seen == [1000, 500]
+    assert ydl.params['ratelimit'] == 500
+    assert job.rate_limit == 250
+
+def test_transfer_options_reach_both_engines(fake_yt_dlp):
+    job = _video_job()
+    job.concurrent_fragments = 4
+    job.http_chunk_size = 1024
+    job.external_downloader = 'aria2c'
+    job.external_downloader_args = ['-x', '16']
+
+    cmd = build_command(job)
+    assert cmd[cmd.index('--concurrent-fragments') + 1] == '4'
+    assert cmd[cmd.index('--http-chunk-size') + 1] == '1024'
+    assert cmd[cmd.index('--downloader-args') + 1] == 'aria2c:-x 16'
+
+    with InProcessEngine() as engine:
+        engine.download(job)
+        engine.download(_video_job('http://example.com/b'))
+    params = FakeYoutubeDL.instances[0].params
+    assert params['concurrent_fragment_downloads'] == 1
+    assert params['external_downloader'] is None
@@ -0,0 +1,113 @@
+import threading
+import time
+from src.classes.download_scheduler import DownloadResult, DownloadScheduler, JobEstimate, SchedulePolicy
+
+def test_scheduler_returns_results_in_input_order():
+    def worker(url):
+        time.sleep(0.01 if url == 'a' else 0)
+        return DownloadResult(url, 'done')
+
+    results = DownloadScheduler(jobs=3).run(['a', 'b', 'c'], worker)
+
+    assert [r.url for r in results] == ['a', 'b', 'c']
+    assert all(r.success for r in results)
+
+def test_scheduler_never_exceeds_job_limit():
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def worker(url):
+        with lock:
+            active.append(url)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.remove(url)
+        return DownloadResult(url, 'done')
+
+    DownloadScheduler(jobs=2).run([str(i) for i in range(8)], worker)
+
+    assert max(peak) == 2
+
+def test_scheduler_consumes_iterator_lazily():
+    pulled = []
+
+    def source():
+        for i in range(5):
+            pulled.append(i)
+            yield str(i)
+
+    def worker(url):
+        assert len(pulled) <= int(url) + 2
+        return DownloadResult(url, 'done')
+
+    results = DownloadScheduler(jobs=1).run(source(), worker)
+
+    assert len(results) == 5
+
+def test_scheduler_cancels_pending_jobs_on_keyboard_interrupt(monkeypatch):
+    calls = []
+
+    def fake_wait(futures, return_when):
+        raise KeyboardInterrupt()
+
+    monkeypatch.setattr('src.classes.download_scheduler.wait', fake_wait)
+
+    def worker(url):
+        calls.append(url)
+        return DownloadResult(url, 'done')
+
+    scheduler = DownloadScheduler(jobs=2)
+    results = scheduler.run(['a', 'b', 'c'], worker)
+
+    assert scheduler.cancelled is True
+    assert [r.url for r in results] == ['a', 'b']
+    assert 'c' not in calls
+
+def _order(policy, items, jobs=1):
+    started = []
+
+    def worker(url):
+        started.append(url)
+        return DownloadResult(url, 'done')
+
+    results = DownloadScheduler(jobs=jobs, policy=policy).run(items, worker)
+    assert [r.url for r in results] == list(items)
+    return started
+
+def test_shortest_policy_starts_small_jobs_first():
+    sizes = {'long': 4000, 'short': 10, 'medium': 300}
+    policy = SchedulePolicy('shortest', lambda url: JobEstimate(size=sizes.get(url)))
+
+    assert _order(policy, ['long', 'unknown', 'short', 'medium']) == ['short', 'medium', 'long', 'unknown']
+
+def test_explicit_priority_comes_before_size():
+    estimates = {'big': JobEstimate(priority=1, size=10 ** 9), 'small': JobEstimate(size=1)}
+    policy = SchedulePolicy('shortest', estimates.get)
+
+    assert _order(policy, ['small', 'big']) == ['big', 'small']
+
+def test_fair_policy_takes_turns_between_groups():
+    policy = SchedulePolicy('fair', lambda url: JobEstimate(group=url[0]))
+
+    assert _order(policy, ['a1', 'a2', 'a3', 'b1', 'b2', 'c1']) == ['a1', 'b1', 'c1', 'a2', 'b2', 'a3']
+
+def test_aging_starts_passed_over_jobs():
+    policy = SchedulePolicy('shortest', lambda url: JobEstimate(size=10 ** 9 if url == 'huge' else 1),
+                            window=4, max_skips=2)
+
+    started = _order(policy, ['huge'] + [f'clip{i}' for i in range(8)])
+
+    assert started.index('huge') == 2
+
+def test_cancel_reports_jobs_waiting_in_the_window():
+    scheduler = DownloadScheduler(jobs=1, policy=SchedulePolicy(window=8))
+
+    def worker(url):
+        scheduler.cancel()
+        return DownloadResult(url, 'done')
+
+    results = scheduler.run(['a', 'b', 'c'], worker)
+
+    assert [(r.url, r.status) for r in results] == [('a', 'done'), ('b', 'cancelled'), ('c', 'cancelled')]
@@ -0,0 +1,75 @@
+import io
+import json
+from types import SimpleNamespace
+from src.utils.events import EventStream, JsonLinesSink
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _stream():
+    clock = FakeClock()
+    events = []
+    stream = EventStream(progress_interval=1.0, clock=clock)
+    stream.subscribe(events.append)
+    return stream, clock, events
+
+def test_progress_events_are_throttled_per_job():
+    stream, clock, events = _stream()
+    stream.started('a')
+    for tick in range(10):
+        clock.now = tick * 0.25
+        stream.progress('a', {'status': 'downloading', 'downloaded_bytes': tick})
+    stream.progress('a', {'status': 'finished', 'downloaded_bytes': 100})
+
+    progress = [event for event in events if event['event'] == 'progress']
+    assert [event['downloaded_bytes'] for event in progress] == [0, 4, 8, 100]
+
+def test_finished_event_reports_phase_durations():
+    stream, clock, events = _stream()
+    stream.started('a')
+    clock.now = 2.0
+    stream.progress('a', {'status': 'downloading'})
+    clock.now = 5.0
+    stream.progress('a', {'status': 'finished', 'downloaded_bytes': 10})
+    clock.now = 6.5
+    stream.finished('a', 'done')
+
+    assert events[-1]['event'] == 'finished'
+    assert events[-1]['elapsed'] == 6.5
+    assert events[-1]['phases'] == {'extract': 2.0, 'transfer': 3.0, 'postprocess': 1.5}
+
+def test_batch_event_summarizes_results():
+    stream, _, events = _stream()
+    stream.started('a')
+    stream.progress('a', {'status': 'finished', 'downloaded_bytes': 2048})
+    results = [SimpleNamespace(url='a', status='done', elapsed=3.0),
+               SimpleNamespace(url='b', status='failed', elapsed=1.0)]
+    stream.batch(results, elapsed=4.0)
+
+    batch = events[-1]
+    assert batch['counts'] == {'done': 1, 'failed': 1}
+    assert batch['bytes'] == 2048 and batch['bytes_per_second'] == 512
+    assert [entry['url'] for entry in batch['slowest']] == ['a', 'b']
+
+def test_json_lines_sink_writes_one_object_per_line(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    sink = JsonLinesSink(str(path))
+    stream = EventStream()
+    stream.subscribe(sink)
+    stream.queued('a')
+    stream.finished('a', 'failed', 'boom')
+    stream.unsubscribe(sink)
+    stream.queued('b')
+    sink.close()
+
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [line['event'] for line in lines] == ['queued', 'failed']
+    assert lines[1]['error'] == 'boom'
+
+    buffer = io.StringIO()
+    JsonLinesSink(stream=buffer)({'event': 'queued'})
+    assert json.loads(buffer.getvalue()) == {'event': 'queued'}
@@ -1,5 +1,12 @@
+import pytest
 from unittest.mock import MagicMock
-from src.decorators.ffmpeg import ffmpeg_required
+from src.decorators.ffmpeg import Toolchain, ffmpeg_required, get_toolchain, reset_toolchain
+
+@pytest.fixture(autouse=True)
+def fresh_toolchain():
+    reset_toolchain()
+    yield
+    reset_toolchain()
 
 @ffmpeg_required
 def sample_action(x, y=0):
@@ -24,3 +31,86 @@ def test_ffmpeg_required_returns_none_when_ffmpeg_missing(monkeypatch):
     monkeypatch.setattr('src.decorators.ffmpeg.subprocess.run', fake_run)
 
     assert sample_action(2, y=3) is None
+
+def test_ffmpeg_required_returns_none_when_ffmpeg_is_broken(monkeypatch, capsys):
+    import subprocess
+
+    def fake_run(cmd, **kwargs):
+        raise subprocess.CalledProcessError(127, cmd, stderr='error while loading shared libraries')
+
+    monkeypatch.setattr('src.decorators.ffmpeg.subprocess.run', fake_run)
+
+    assert sample_action(2, y=3) is None
+    assert 'FFmpeg is not installed' in capsys.readouterr().out
+
+def test_ffprobe_lookup_is_memoized(monkeypatch):
+    calls = []
+    monkeypatch.setattr('src.decorators.ffmpeg.shutil.which', lambda name: calls.append(name) or '/usr/bin/' + name)
+    toolchain = Toolchain('7.1')
+
+    assert toolchain.has_ffprobe and toolchain.has_ffprobe
+    assert calls == ['ffprobe']
+
+def test_ffmpeg_is_probed_once_per_process(monkeypatch):
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return MagicMock(returncode=0, stdout='ffmpeg version 7.1 Copyright (c) 2000-2024\n')
+
+    monkeypatch.setattr('src.decorators.ffmpeg.subprocess.run', fake_run)
+
+    assert sample_action(1) == 1
+    assert sample_action(2) == 2
+    assert calls == [['ffmpeg', '-version']]
+    assert get_toolchain().ffmpeg_version == '7.1'
+
+MUXERS = """File formats:
+ D. = Demuxing supported
+ .E = Muxing supported
+ --
+  E matroska        Matroska
+ DE mp4             MP4 (MPEG-4 Part 14)
+"""
+
+ENCODERS = """Encoders:
+ V..... = Video
+ ------
+ A....D libmp3lame           libmp3lame MP3 (MPEG audio layer 3) (codec mp3)
+ A....D aac                  AAC (Advanced Audio Coding)
+"""
+
+def test_toolchain_reports_encoders_and_muxers(monkeypatch):
+    def fake_run(cmd, **kwargs):
+        return MagicMock(stdout=MUXERS if cmd[-1] == '-muxers' else ENCODERS)
+
+    monkeypatch.setattr('src.decorators.ffmpeg.subprocess.run', fake_run)
+    toolchain = Toolchain('7.1')
+
+    assert toolchain.muxers == frozenset({'matroska', 'mp4'})
+    assert toolchain.supports_muxer('mp4') is True
+    assert toolchain.supports_muxer('webm') is False
+    assert toolchain.supports_encoder('libmp3lame') is True
+    assert toolchain.supports_encoder('libopus') is False
+
+def test_toolchain_listings_are_cached_on_disk(monkeypatch, tmp_path):
+    binary = tmp_path / 'ffmpeg'
+    binary.write_text('')
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return MagicMock(stdout=MUXERS)
+
+    monkeypatch.setattr('src.decorators.ffmpeg.subprocess.run', fake_run)
+    cache = str(tmp_path / 'cache' / 'toolchain.json')
+
+    assert Toolchain('7.1', str(binary), cache).supports_muxer('mp4') is True
+    assert Toolchain('7.1', str(binary), cache).supports_muxer('mp4') is True
+    assert len(calls) == 1
+
+def test_unknown_listing_does_not_block(monkeypatch):
+    monkeypatch.setattr('src.decorators.ffmpeg.subprocess.run', lambda cmd, **kwargs: MagicMock(stdout=''))
+
+    assert Toolchain('7.1').supports_muxer('mp4') is True
+    assert Toolchain(None).supports_muxer('mp4') is False
@@ -0,0 +1,119 @@
+import pytest
+from src.classes.download_scheduler import DownloadResult
+from src.classes.inbox_daemon import InboxDaemon
+from src.classes.job_queue import JobQueue
+
+class FakeDownloader:
+    batches = []
+    failing = set()
+    during = None
+
+    def __init__(self, urls, options):
+        self.urls = urls
+        self.options = options
+
+    @classmethod
+    def from_options(cls, urls, **options):
+        cls.batches.append((list(urls), options))
+        return cls(list(urls), options)
+
+    def download_video(self):
+        if FakeDownloader.during is not None:
+            FakeDownloader.during()
+        return [DownloadResult(url, 'failed' if url in self.failing else 'done', error='boom' if url in self.failing else None)
+                for url in self.urls]
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    FakeDownloader.batches = []
+    FakeDownloader.failing = set()
+    FakeDownloader.during = None
+    monkeypatch.setattr('src.classes.video_downloader.VideoDownloader', FakeDownloader)
+    clock = Clock()
+    inbox = InboxDaemon(str(tmp_path / 'inbox'), JobQueue(str(tmp_path / 'queue.sqlite3')),
+                        {'mode': 'Audio only'}, debounce=2.0, clock=clock)
+    inbox.clock = clock
+    return inbox
+
+def test_daemon_waits_for_debounce_before_reading(daemon, tmp_path):
+    links = tmp_path / 'inbox' / 'links.txt'
+    links.write_text('http://example.com/a\n', encoding='utf-8')
+    daemon.file_changed(str(links))
+
+    assert daemon.run_once() == 2.0
+    assert not FakeDownloader.batches
+
+    daemon.clock.now = 1.5
+    daemon.file_changed(str(links))
+    daemon.clock.now = 3.0
+    assert daemon.run_once() == 0.5
+    assert not FakeDownloader.batches
+
+    daemon.clock.now = 3.5
+    assert daemon.run_once() is None
+    assert FakeDownloader.batches == [(['http://example.com/a'], {'mode': 'Audio only'})]
+    assert (tmp_path / 'inbox' / 'done' / 'links.txt').exists()
+    assert not links.exists()
+
+def test_daemon_reads_only_appended_lines(daemon, tmp_path):
+    links = tmp_path / 'inbox' / 'links.txt'
+    links.write_text('http://example.com/a\n', encoding='utf-8')
+
+    assert daemon.ingest(str(links)) == 1
+    with open(links, 'a', encoding='utf-8') as f:
+        f.write('# comment\nhttp://example.com/b\n')
+
+    assert daemon.ingest(str(links)) == 1
+    assert [job.url for job in daemon.queue.jobs()] == ['http://example.com/a', 'http://example.com/b']
+
+def test_daemon_moves_files_with_failed_jobs_to_failed_folder(daemon, tmp_path):
+    FakeDownloader.failing = {'http://example.com/b'}
+    (tmp_path / 'inbox' / 'good.txt').write_text('http://example.com/a\n', encoding='utf-8')
+    (tmp_path / 'inbox' / 'bad.txt').write_text('http://example.com/b\n', encoding='utf-8')
+    (tmp_path / 'inbox' / 'notes.md').write_text('http://example.com/c\n', encoding='utf-8')
+    daemon.scan()
+    daemon.clock.now = 10.0
+
+    daemon.run_once()
+
+    assert (tmp_path / 'inbox' / 'done' / 'good.txt').exists()
+    assert (tmp_path / 'inbox' / 'failed' / 'bad.txt').exists()
+    assert (tmp_path / 'inbox' / 'notes.md').exists()
+    assert daemon.queue.counts() == {'done': 1, 'failed': 1}
+
+def test_daemon_keeps_a_new_file_with_a_reused_name_separate(daemon, tmp_path):
+    links = tmp_path / 'inbox' / 'links.txt'
+    links.write_text('http://example.com/a\n', encoding='utf-8')
+    daemon.ingest(str(links))
+    daemon.run_once()
+    FakeDownloader.failing = {'http://example.com/b'}
+
+    links.write_text('http://example.com/b\n', encoding='utf-8')
+    assert daemon.ingest(str(links)) == 1
+    daemon.run_once()
+
+    assert (tmp_path / 'inbox' / 'done' / 'links.txt').read_text(encoding='utf-8') == 'http://example.com/a\n'
+    assert (tmp_path / 'inbox' / 'failed' / 'links.txt').read_text(encoding='utf-8') == 'http://example.com/b\n'
+
+def test_daemon_leases_its_batches(daemon, tmp_path):
+    links = tmp_path / 'inbox' / 'links.txt'
+    links.write_text('http://example.com/a\n', encoding='utf-8')
+    seen = []
+
+    def recover_elsewhere():
+        other = JobQueue(str(tmp_path / 'queue.sqlite3'))
+        seen.append((other.recover(), other.jobs('running')[0].worker))
+        other.close()
+
+    FakeDownloader.during = recover_elsewhere
+    daemon.file_changed(str(links))
+    daemon.clock.now = 2.0
+    daemon.run_once()
+
+    assert len(seen) == 1 and seen[0][0] == 0 and seen[0][1].endswith('/inbox')
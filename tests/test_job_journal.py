@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+from src.classes.job_journal import JobJournal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_pending_returns_unfinished_urls_in_queue_order(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    batch = journal.start_batch(source='links.txt', options={'mode': 'Video'})
+    for url in journal.track(['a', 'b', 'c', 'd']):
+        pass
+    journal.record('a', 'running')
+    journal.record('a', 'done')
+    journal.record('b', 'running')
+    journal.record('c', 'failed', error='HTTP Error 500')
+
+    assert journal.pending(batch) == ['b', 'd']
+    assert journal.failed(batch) == ['c']
+    assert journal.states(batch)['c']['error'] == 'HTTP Error 500'
+
+def test_journal_ignores_torn_last_line(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    batch = journal.start_batch()
+    journal.record('a', 'queued')
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "job", "batch": "')
+
+    assert JobJournal(str(tmp_path)).pending(batch) == ['a']
+
+def test_completed_batches_are_discarded_on_next_batch(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    journal.start_batch()
+    journal.record('a', 'done')
+    journal.record('b', 'failed', error='HTTP Error 404')
+    journal.finish_batch()
+    journal.start_batch()
+
+    with open(journal.path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [r['event'] for r in records] == ['batch']
+
+def test_unfinished_batch_is_kept(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    first = journal.start_batch(source='one.txt')
+    journal.record('a', 'queued')
+
+    unfinished = journal.unfinished_batch()
+    assert unfinished['batch'] == first
+    assert unfinished['pending'] == ['a']
+
+def test_playlist_entries_keep_their_output_template(tmp_path):
+    journal = JobJournal(str(tmp_path))
+    batch = journal.start_batch()
+    for url in journal.track(['entry1', 'entry2'], {'entry1': '/pl/01 - %(title)s.%(ext)s'}):
+        journal.record(url, 'running')
+    journal.record('playlist', 'expanded')
+
+    states = journal.states(batch)
+    assert states['entry1']['output_template'] == '/pl/01 - %(title)s.%(ext)s'
+    assert 'output_template' not in states['entry2']
+    assert journal.pending(batch) == ['entry1', 'entry2']
+
+def test_running_batch_of_another_downloader_is_kept(tmp_path):
+    ours, theirs = JobJournal(str(tmp_path)), JobJournal(str(tmp_path))
+    running = theirs.start_batch(source='theirs.txt')
+    theirs.record('a', 'done')
+    ours.start_batch(source='ours.txt')
+    ours.finish_batch()
+    ours.start_batch(source='ours.txt')
+
+    assert theirs.states(running)['a']['state'] == 'done'
+    theirs.finish_batch()
+    ours.finish_batch()
+    ours.start_batch()
+    assert theirs.states(running) == {}
+
+def test_batch_of_a_crashed_process_is_discarded_once_finished(tmp_path):
+    crashed = subprocess.run([sys.executable, '-c', (
+        "import sys; from src.classes.job_journal import JobJournal; journal = JobJournal(sys.argv[1]); "
+        "print(journal.start_batch()); journal.record('a', 'done')"), str(tmp_path)],
+        cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    journal = JobJournal(str(tmp_path))
+    journal.start_batch()
+
+    assert journal.states(crashed) == {}
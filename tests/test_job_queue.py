@@ -0,0 +1,123 @@
+import threading
+from src.classes.download_scheduler import DownloadResult
+from src.classes.job_queue import JobQueue, run_jobs
+
+class FakeDownloader:
+    results = {}
+    playlists = {}
+
+    def __init__(self, urls):
+        self.urls = urls
+
+    @classmethod
+    def from_options(cls, urls, **options):
+        return cls(list(urls))
+
+    def download_video(self):
+        urls = [entry for url in self.urls for entry in self.playlists.get(url, [url])]
+        return [DownloadResult(url, self.results.get(url, 'done')) for url in urls]
+
+    def playlist_results(self, results):
+        by_url = {result.url: result for result in results}
+        return {playlist: [by_url[url] for url in urls] for playlist, urls in self.playlists.items()}
+
+def test_queue_claims_jobs_with_the_same_options_in_order(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.sqlite3'))
+    queue.enqueue(['http://example.com/a', 'http://example.com/b'], {'mode': 'Video'})
+    queue.enqueue(['http://example.com/c'], {'mode': 'Audio only'})
+    queue.enqueue(['http://example.com/d'], {'mode': 'Video'})
+
+    first = queue.claim(10)
+    second = queue.claim(10)
+
+    assert [job.url for job in first] == ['http://example.com/a', 'http://example.com/b', 'http://example.com/d']
+    assert [job.url for job in second] == ['http://example.com/c']
+    assert second[0].options == {'mode': 'Audio only'}
+    assert queue.claim(10) == []
+    assert queue.counts() == {'running': 4}
+
+def test_queue_survives_restart_and_recovers_expired_leases(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    queue = JobQueue(path)
+    queue.enqueue(['http://example.com/a', 'http://example.com/b', 'http://example.com/c'], source='links.txt',
+                  source_offset=42)
+    live, = queue.claim(1, worker='live', lease=60)
+    crashed, = queue.claim(1, worker='crashed', lease=-1)
+    queue.close()
+
+    reopened = JobQueue(path)
+    assert reopened.source_offset('links.txt') == 42
+    assert reopened.recover() == 1
+    assert [queued.url for queued in reopened.claim(10)] == ['http://example.com/b', 'http://example.com/c']
+    assert reopened.get(live.id).worker == 'live'
+
+def test_queue_cancels_only_queued_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.sqlite3'))
+    first, second = queue.enqueue(['http://example.com/a', 'http://example.com/b'])
+    queue.claim(1)
+
+    assert queue.cancel(first) is False
+    assert queue.cancel(second) is True
+    assert queue.get(second).state == 'cancelled'
+    assert queue.claim(10) == []
+
+def test_queue_wait_wakes_on_enqueue(tmp_path):
+    queue = JobQueue(str(tmp_path / 'queue.sqlite3'))
+    timer = threading.Timer(0.05, queue.enqueue, args=(['http://example.com/a'],))
+    timer.start()
+
+    assert queue.wait(5) is True
+    timer.join()
+
+def test_run_jobs_records_outcomes(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.classes.video_downloader.VideoDownloader', FakeDownloader)
+    monkeypatch.setattr(FakeDownloader, 'results', {'http://example.com/b': 'failed', 'http://example.com/c': 'cancelled'})
+    queue = JobQueue(str(tmp_path / 'queue.sqlite3'))
+    a, b, c = queue.enqueue(['http://example.com/a', 'http://example.com/b', 'http://example.com/c'])
+
+    assert run_jobs(queue, queue.claim(10)) is True
+    assert [queue.get(job_id).state for job_id in (a, b, c)] == ['done', 'failed', 'queued']
+
+def test_playlist_jobs_only_fail_for_their_own_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.classes.video_downloader.VideoDownloader', FakeDownloader)
+    monkeypatch.setattr(FakeDownloader, 'playlists', {'http://example.com/p?list=1': ['http://example.com/1a'],
+                                                      'http://example.com/p?list=2': ['http://example.com/2a',
+                                                                                      'http://example.com/2b']})
+    monkeypatch.setattr(FakeDownloader, 'results', {'http://example.com/2b': 'failed'})
+    queue = JobQueue(str(tmp_path / 'queue.sqlite3'))
+    first, second = queue.enqueue(['http://example.com/p?list=1', 'http://example.com/p?list=2'])
+
+    assert run_jobs(queue, queue.claim(10)) is False
+    assert [queue.get(job_id).state for job_id in (first, second)] == ['done', 'failed']
+
+def test_queue_claims_by_priority_and_takes_turns_between_sources(tmp_path):
+    from src.utils.link_reader import LinkStream
+    queue = JobQueue(str(tmp_path / 'queue.sqlite3'))
+    queue.enqueue([f'http://example.com/big{i}' for i in range(3)], source='big.txt')
+    queue.enqueue(['http://example.com/small0', 'http://example.com/small1'], source='small.txt')
+    queue.enqueue(LinkStream(lines=['http://example.com/urgent priority=2']), source='other.txt')
+
+    claimed = queue.claim(10)
+
+    assert [job.url.rsplit('/', 1)[1] for job in claimed] == ['urgent', 'big0', 'small0', 'big1', 'small1', 'big2']
+    assert claimed[0].priority == 2
+
+def test_queue_leases_jobs_and_reclaims_expired_leases(tmp_path):
+    path = str(tmp_path / 'queue.sqlite3')
+    queue = JobQueue(path)
+    queue.enqueue(['http://example.com/a', 'http://example.com/b', 'http://example.com/c'])
+    other = JobQueue(path)
+
+    live, = other.claim(1, worker='live', lease=60)
+    crashed, = queue.claim(1, worker='crashed', lease=-1)
+
+    assert other.recover() == 1
+    assert queue.renew('live', [live.id, crashed.id], 60) == [live.id]
+    reclaimed = queue.claim(10, worker='second', lease=60)
+    assert [job.url for job in reclaimed] == ['http://example.com/b', 'http://example.com/c']
+    assert reclaimed[0].lease_expires > live.updated_at
+    assert not queue.complete(crashed.id, 'failed', 'late', worker='crashed')
+    assert queue.complete(crashed.id, 'done', worker='second')
+    assert queue.get(crashed.id).state == 'done'
+    assert queue.get(crashed.id).worker == 'second'
+    assert queue.renew('second', [crashed.id], 60) == []
@@ -0,0 +1,167 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from src.classes.download_scheduler import DownloadResult
+from src.classes.job_queue import JobQueue
+from src.classes.job_server import JobServer, job_options
+from src.utils.events import EventStream
+
+class FakeDownloader:
+    release = threading.Event()
+    batches = []
+
+    def __init__(self, urls, options):
+        self.urls = urls
+        self.options = options
+        self.events = EventStream(progress_interval=0)
+
+    @staticmethod
+    def check_options(**options):
+        pass
+
+    @classmethod
+    def from_options(cls, urls, **options):
+        downloader = cls(list(urls), options)
+        if downloader.urls:
+            cls.batches.append(downloader)
+        return downloader
+
+    def cancel(self):
+        self.release.set()
+
+    def download_video(self):
+        for url in self.urls:
+            self.events.started(url)
+            self.events.progress(url, {'status': 'downloading', 'downloaded_bytes': 50, 'total_bytes': 100})
+        self.release.wait(5)
+        for url in self.urls:
+            self.events.finished(url, 'done')
+        return [DownloadResult(url, 'done') for url in self.urls]
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    FakeDownloader.release = threading.Event()
+    FakeDownloader.batches = []
+    monkeypatch.setattr('src.classes.video_downloader.VideoDownloader', FakeDownloader)
+    job_server = JobServer(JobQueue(str(tmp_path / 'queue.sqlite3')), port=0, workers=1, batch_size=1,
+                           keepalive=0.1).start()
+    yield job_server
+    FakeDownloader.release.set()
+    job_server.stop()
+
+def _request(server, method, path, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(f'http://127.0.0.1:{server.port}{path}', data=data, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def _wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("condition not reached")
+
+def test_job_options_use_command_line_names():
+    options = job_options({'mode': 'audio', 'audio_format': 'opus', 'url': 'x'}, {'jobs': 2})
+
+    assert options == {'jobs': 2, 'mode': 'Audio only', 'audio_profile': 'opus'}
+    with pytest.raises(ValueError):
+        job_options({'quality': '4k'})
+    with pytest.raises(ValueError):
+        job_options({'colour': 'red'})
+
+def test_job_options_do_not_create_folders(tmp_path):
+    options = job_options({'output': str(tmp_path / 'new'), 'playlist_folder': 'list'})
+
+    assert options == {'download_folder': str(tmp_path / 'new'), 'playlist_folder': 'list'}
+    assert not (tmp_path / 'new').exists()
+
+def test_server_answers_os_errors_with_bad_request(server, monkeypatch):
+    def enqueue(*args, **kwargs):
+        raise PermissionError("Permission denied: '/srv'")
+
+    monkeypatch.setattr(server.queue, 'enqueue', enqueue)
+
+    status, body = _request(server, 'POST', '/jobs', {'url': 'https://example.com/a'})
+    assert (status, body['error']) == (400, "Permission denied: '/srv'")
+
+def test_server_enqueues_tracks_and_cancels_jobs(server):
+    status, body = _request(server, 'POST', '/jobs', {'urls': ['https://youtu.be/dQw4w9WgXcQ', 'not a url',
+                                                               'https://example.com/b'], 'mode': 'audio',
+                                                      'priority': 3})
+    assert status == 201
+    first, second = body['jobs']
+    assert first['url'] == 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+    assert first['options']['mode'] == 'Audio only'
+    assert first['priority'] == 3
+
+    _wait_for(lambda: (server.status(first['id']) or {}).get('progress'))
+    assert _request(server, 'GET', f"/jobs/{first['id']}")[1]['progress']['downloaded_bytes'] == 50
+    assert _request(server, 'DELETE', f"/jobs/{first['id']}")[0] == 409
+    status, cancelled = _request(server, 'DELETE', f"/jobs/{second['id']}")
+    assert (status, cancelled['state']) == (200, 'cancelled')
+
+    FakeDownloader.release.set()
+    _wait_for(lambda: server.status(first['id'])['state'] == 'done')
+    listed = _request(server, 'GET', '/jobs?state=done')[1]['jobs']
+    assert [job['id'] for job in listed] == [first['id']]
+    assert len(FakeDownloader.batches) == 1
+    assert _request(server, 'GET', '/jobs/999')[0] == 404
+    assert _request(server, 'POST', '/jobs', {'urls': ['not a url']})[0] == 400
+    assert _request(server, 'POST', '/jobs', {'url': 'https://example.com/c', 'priority': 'high'})[0] == 400
+
+def test_server_streams_job_events(server):
+    request = urllib.request.Request(f'http://127.0.0.1:{server.port}/events?job=1')
+    with urllib.request.urlopen(request, timeout=5) as response:
+        _request(server, 'POST', '/jobs', {'url': 'https://example.com/a'})
+        events = []
+        while 'started' not in events:
+            line = response.readline().decode('utf-8')
+            if line.startswith('event: '):
+                events.append(line[len('event: '):].strip())
+
+    assert events[0] == 'job'
+    assert 'started' in events
+
+def test_server_serves_concurrent_status_polls(server):
+    job_id = _request(server, 'POST', '/jobs', {'url': 'https://example.com/a'})[1]['jobs'][0]['id']
+    results = []
+
+    def poll():
+        for _ in range(5):
+            results.append(_request(server, 'GET', f'/jobs/{job_id}')[0])
+
+    threads = [threading.Thread(target=poll) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [200] * 250
+
+def test_server_validates_lease_requests(server):
+    assert _request(server, 'POST', '/leases', {'limit': 1, 'lease': 30})[0] == 400
+    assert _request(server, 'POST', '/leases', {'worker': 'w', 'limit': 0, 'lease': 30})[0] == 400
+    assert _request(server, 'POST', '/leases/renew', {'worker': 'w', 'ids': 'all', 'lease': 30})[0] == 400
+    assert _request(server, 'POST', '/jobs/1/result', {'worker': 'w', 'state': 'running'})[0] == 400
+    assert _request(server, 'POST', '/jobs/1/result', {'worker': 'w', 'state': 'done'})[0] == 409
+    status, body = _request(server, 'GET', '/health')
+    assert status == 200 and body['queue'] == {}
+
+def test_server_workers_lease_their_batches(server, tmp_path):
+    job, = _request(server, 'POST', '/jobs', {'url': 'https://example.com/a'})[1]['jobs']
+    _wait_for(lambda: server.status(job['id'])['state'] == 'running')
+
+    other = JobQueue(str(tmp_path / 'queue.sqlite3'))
+    assert other.recover() == 0
+    leased = other.get(job['id'])
+    assert leased.state == 'running' and leased.worker.endswith('/api-0') and leased.lease_expires
+    other.close()
+    FakeDownloader.release.set()
+    _wait_for(lambda: server.status(job['id'])['state'] == 'done')
@@ -0,0 +1,15 @@
+import sys
+import pytest
+from src.utils.lazy import lazy_import
+
+def test_lazy_import_executes_module_on_first_attribute_access(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'colorsys', raising=False)
+    module = lazy_import('colorsys')
+
+    assert sys.modules['colorsys'] is module
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+
+def test_lazy_import_returns_loaded_modules_and_rejects_missing_ones():
+    assert lazy_import('os') is sys.modules['os']
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import('streamflow_missing_module')
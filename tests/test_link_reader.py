@@ -0,0 +1,61 @@
+import pytest
+from src.utils.link_reader import LinkStream, SeenSet, canonicalize_url
+
+@pytest.mark.parametrize('url', [
+    'https://youtu.be/dQw4w9WgXcQ',
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=30',
+    'HTTPS://YOUTUBE.COM/watch?v=dQw4w9WgXcQ#comments',
+])
+def test_youtube_spellings_share_one_canonical_url(url):
+    assert canonicalize_url(url) == 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+def test_playlist_parameter_is_kept():
+    assert canonicalize_url('https://youtu.be/dQw4w9WgXcQ?list=PL1') == \
+        'https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL1'
+    assert canonicalize_url('https://youtube.com/playlist?list=PL1&si=x') == \
+        'https://www.youtube.com/playlist?list=PL1'
+
+def test_other_urls_are_normalized():
+    assert canonicalize_url('HTTP://Example.COM:80/a?b=1#frag') == 'http://example.com/a?b=1'
+    assert canonicalize_url('ftp://example.com/a') is None
+    assert canonicalize_url('just words') is None
+
+def test_stream_skips_comments_and_counts_lines(tmp_path):
+    links = tmp_path / 'links.txt'
+    links.write_text('# header\n\nhttps://youtu.be/dQw4w9WgXcQ\nhttps://youtube.com/watch?v=dQw4w9WgXcQ&t=1\n'
+                     'garbage\nhttp://example.com/a\n', encoding='utf-8')
+    stream = LinkStream(str(links))
+
+    assert list(stream) == ['https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'http://example.com/a']
+    assert (stream.stats.accepted, stream.stats.duplicate, stream.stats.invalid, stream.stats.skipped) == (2, 1, 1, 2)
+    assert bool(stream) is True
+
+def test_stream_reads_line_priorities():
+    stream = LinkStream(lines=['http://example.com/a priority=5\n', 'http://example.com/b\n',
+                               'https://youtu.be/dQw4w9WgXcQ  PRIORITY=-1\n'])
+
+    assert list(stream) == ['http://example.com/a', 'http://example.com/b',
+                            'https://www.youtube.com/watch?v=dQw4w9WgXcQ']
+    assert stream.priorities == {'http://example.com/a': 5, 'https://www.youtube.com/watch?v=dQw4w9WgXcQ': -1}
+
+def test_stream_is_lazy():
+    consumed = []
+
+    def lines():
+        for i in range(1000):
+            consumed.append(i)
+            yield f'http://example.com/{i}\n'
+
+    iterator = iter(LinkStream(lines=lines()))
+    next(iterator)
+
+    assert len(consumed) == 1
+
+def test_seen_set_spills_to_disk_beyond_memory_limit():
+    seen = SeenSet(max_memory_keys=10)
+    try:
+        assert all(seen.add(f'key{i}') for i in range(100))
+        assert not any(seen.add(f'key{i}') for i in range(100))
+        assert len(seen._memory) == 10
+    finally:
+        seen.close()
@@ -0,0 +1,25 @@
+import pytest
+from src.utils.media_id import extract_media_id
+
+@pytest.mark.parametrize('url', [
+    'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'https://youtube.com/watch?v=dQw4w9WgXcQ&t=30',
+    'https://youtu.be/dQw4w9WgXcQ',
+    'https://youtu.be/dQw4w9WgXcQ?si=abc',
+    'https://m.youtube.com/shorts/dQw4w9WgXcQ',
+    'https://www.youtube.com/embed/dQw4w9WgXcQ',
+])
+def test_youtube_urls_share_one_id(url):
+    assert extract_media_id(url) == ('youtube', 'dQw4w9WgXcQ')
+
+def test_vimeo_url():
+    assert extract_media_id('https://vimeo.com/76979871') == ('vimeo', '76979871')
+
+@pytest.mark.parametrize('url', [
+    'https://www.youtube.com/playlist?list=PL123',
+    'https://www.youtube.com/watch?v=short',
+    'http://example.com/video',
+    'not a url',
+])
+def test_unrecognized_urls(url):
+    assert extract_media_id(url) is None
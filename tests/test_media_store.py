@@ -0,0 +1,92 @@
+import os
+import pytest
+from src.classes.media_store import MediaStore, file_digest
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return str(path)
+
+def test_added_file_is_linked_under_its_key(tmp_path):
+    store = MediaStore(str(tmp_path / 'store'))
+    source = _write(tmp_path / 'a' / 'Clip.mp4', b'video')
+
+    stored = store.add(source, 'youtube:abc:video/The best/Mp4', 'Clip')
+    found = store.lookup('youtube:abc:video/The best/Mp4')
+    mode = store.link(found, str(tmp_path / 'b' / 'Clip.mp4'))
+
+    assert stored.digest == file_digest(source) and found.title == 'Clip'
+    assert mode == 'hardlink'
+    assert os.path.samefile(tmp_path / 'b' / 'Clip.mp4', source)
+    assert store.link(found, source) == 'existing'
+    assert store.lookup('youtube:other:video/The best/Mp4') is None
+
+def test_duplicate_content_is_replaced_by_a_link(tmp_path):
+    store = MediaStore(str(tmp_path / 'store'))
+    first = _write(tmp_path / 'a.mp3', b'same')
+    second = _write(tmp_path / 'b.mp3', b'same')
+
+    store.add(first)
+    store.add(second)
+
+    assert os.path.samefile(first, second)
+    assert store.usage() == (1, 4)
+
+def test_gc_removes_blobs_without_links(tmp_path):
+    store = MediaStore(str(tmp_path / 'store'))
+    kept = _write(tmp_path / 'kept.mp4', b'kept')
+    deleted = _write(tmp_path / 'deleted.mp4', b'deleted!')
+    store.add(kept, 'youtube:kept:video/The best/Mp4')
+    store.add(deleted, 'youtube:deleted:video/The best/Mp4')
+    os.remove(deleted)
+
+    preview = store.gc(dry_run=True)
+    assert (preview.blobs, preview.bytes, preview.links) == (1, 8, 1)
+    assert store.usage() == (2, 12)
+
+    stats = store.gc()
+
+    assert (stats.blobs, stats.bytes) == (1, 8)
+    assert store.usage() == (1, 4)
+    assert store.lookup('youtube:deleted:video/The best/Mp4') is None
+    assert store.lookup('youtube:kept:video/The best/Mp4') is not None
+
+def test_symlink_mode_keeps_blob_alive(tmp_path):
+    store = MediaStore(str(tmp_path / 'store'), link_modes=['symlink'])
+    source = _write(tmp_path / 'a.mp4', b'video')
+    stored = store.add(source, 'youtube:abc:video/The best/Mp4')
+    os.remove(source)
+    target = str(tmp_path / 'b' / 'a.mp4')
+
+    assert store.link(stored, target) == 'symlink'
+    assert os.path.islink(target) and store.gc().blobs == 0
+    assert open(target, 'rb').read() == b'video'
+
+def test_existing_target_is_only_replaced_by_the_same_contents(tmp_path):
+    store = MediaStore(str(tmp_path / 'store'))
+    stored = store.add(_write(tmp_path / 'a.mp4', b'video'), 'youtube:abc:video/The best/Mp4')
+    copy = _write(tmp_path / 'b' / 'copy.mp4', b'video')
+    other = _write(tmp_path / 'b' / 'other.mp4', b'other')
+
+    assert store.link(stored, copy) == 'hardlink'
+    assert os.path.samefile(copy, stored.path)
+    with pytest.raises(FileExistsError):
+        store.link(stored, other)
+    assert open(other, 'rb').read() == b'other'
+
+def test_copies_keep_blob_alive_until_they_change(tmp_path):
+    store = MediaStore(str(tmp_path / 'store'), link_modes=['copy'])
+    source = _write(tmp_path / 'a.mp4', b'video')
+    stored = store.add(source, 'youtube:abc:video/The best/Mp4')
+    os.remove(source)
+    target = str(tmp_path / 'b' / 'a.mp4')
+
+    assert store.link(stored, target) == 'copy'
+    assert store.gc().blobs == 0
+    with open(target, 'ab') as f:
+        f.write(b' edited')
+    assert store.gc().blobs == 1
+
+def test_unknown_link_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        MediaStore(str(tmp_path / 'store'), link_modes=['teleport'])
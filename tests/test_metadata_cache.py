@@ -0,0 +1,43 @@
+import os
+import time
+from src.classes.metadata_cache import MetadataCache, describe_info
+
+def _info(video_id, **extra):
+    return dict({'extractor': 'youtube', 'id': video_id, 'title': video_id}, **extra)
+
+def test_cache_returns_stored_info(tmp_path):
+    cache = MetadataCache(str(tmp_path / 'nested'))
+    path = cache.put(_info('abcdefghijk'))
+
+    assert path == cache.path('youtube', 'abcdefghijk')
+    assert cache.lookup('youtube', 'abcdefghijk') == path
+    assert cache.get('youtube', 'abcdefghijk')['title'] == 'abcdefghijk'
+    assert cache.get('youtube', 'missing') is None
+
+def test_expired_entries_are_removed_on_lookup(tmp_path):
+    cache = MetadataCache(str(tmp_path), ttl=60)
+    path = cache.put(_info('abcdefghijk'))
+    old = time.time() - 120
+    os.utime(path, (old, old))
+
+    assert cache.lookup('youtube', 'abcdefghijk') is None
+    assert not os.path.exists(path)
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = MetadataCache(str(tmp_path), max_bytes=10 ** 6)
+    paths = [cache.put(_info(f'video{i}', padding='x' * 1000)) for i in range(3)]
+    for offset, path in enumerate(paths):
+        stamp = time.time() - 100 + offset
+        os.utime(path, (stamp, stamp))
+    cache.lookup('youtube', 'video0')
+
+    cache.max_bytes = 2 * os.path.getsize(paths[0])
+    assert cache.evict() == 1
+    assert [os.path.exists(path) for path in paths] == [True, False, True]
+
+def test_describe_info_sums_requested_formats():
+    info = {'title': 'T', 'duration': 10, 'filesize_approx': 1,
+            'requested_formats': [{'filesize': 100}, {'filesize_approx': 50}]}
+
+    assert describe_info(info) == {'title': 'T', 'duration': 10, 'filesize': 150}
+    assert describe_info({'title': 'T'})['filesize'] is None
@@ -0,0 +1,69 @@
+import json
+import urllib.request
+import pytest
+from src.utils.events import EventStream
+from src.utils.metrics import DownloadMetrics, MetricsExporter, MetricsRegistry
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.counter('jobs_total', "Jobs.", ('status',)).inc(status='done')
+    registry.counter('jobs_total').inc(2, status='failed')
+    registry.gauge('workers', "Workers.").set(3)
+    histogram = registry.histogram('seconds', "Durations.", buckets=(1, 5))
+    histogram.observe(0.5)
+    histogram.observe(3)
+    histogram.observe(30)
+
+    text = registry.render()
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{status="done"} 1' in text
+    assert 'jobs_total{status="failed"} 2' in text
+    assert 'workers 3' in text
+    assert 'seconds_bucket{le="1"} 1' in text
+    assert 'seconds_bucket{le="5"} 2' in text
+    assert 'seconds_bucket{le="+Inf"} 3' in text
+    assert 'seconds_sum 33.5' in text and 'seconds_count 3' in text
+
+def test_registry_rejects_conflicting_metric_types():
+    registry = MetricsRegistry()
+    registry.counter('jobs_total')
+    with pytest.raises(ValueError):
+        registry.gauge('jobs_total')
+
+def test_download_metrics_follow_job_events():
+    registry = MetricsRegistry()
+    metrics = DownloadMetrics(registry)
+    events = EventStream()
+    events.subscribe(metrics)
+
+    events.queued('a')
+    events.queued('b')
+    events.started('a')
+    assert metrics.queue.value() == 1 and metrics.active.value() == 1
+    events.progress('a', {'status': 'finished', 'downloaded_bytes': 1000})
+    events.retry('a', 1)
+    events.finished('a', 'done')
+    events.started('b')
+    events.finished('b', 'failed', 'boom')
+
+    assert metrics.active.value() == 0 and metrics.queue.value() == 0
+    assert metrics.downloads.value(status='finished') == 1
+    assert metrics.downloads.value(status='failed') == 1
+    assert metrics.bytes.value() == 1000
+    assert metrics.retries.value() == 1
+    assert 'streamflow_phase_seconds_count{phase="transfer"} 2' in registry.render()
+
+def test_exporter_serves_metrics_and_writes_snapshots(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter('jobs_total', "Jobs.").inc()
+    snapshot = tmp_path / 'metrics.json'
+    exporter = MetricsExporter(registry, port=0, snapshot_path=str(snapshot), snapshot_interval=60).start()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/metrics', timeout=5) as response:
+            body = response.read().decode('utf-8')
+    finally:
+        exporter.stop()
+
+    assert 'jobs_total 1' in body
+    data = json.loads(snapshot.read_text(encoding='utf-8'))
+    assert data['metrics']['jobs_total']['samples'] == [{'labels': {}, 'value': 1}]
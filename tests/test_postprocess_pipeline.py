@@ -0,0 +1,120 @@
+import os
+import shutil
+import threading
+import pytest
+from unittest.mock import MagicMock
+from src.classes.download_engine import DownloadJob
+from src.classes.download_scheduler import DownloadResult
+from src.classes.postprocess_pipeline import (PostprocessError, PostprocessPipeline, build_postprocess_command,
+                                               staged_inputs)
+
+def _job(stage_dir, **kwargs):
+    return DownloadJob(url='http://example.com/a', output_template='unused', format_selector='best',
+                       stage_dir=str(stage_dir), **kwargs)
+
+def _fake_ffmpeg(monkeypatch):
+    commands = []
+
+    def fake_run(args, **kwargs):
+        commands.append(args)
+        shutil.copyfile(args[args.index('-i') + 1], args[-1])
+        return MagicMock(returncode=0)
+
+    monkeypatch.setattr('src.classes.postprocess_pipeline.subprocess.run', fake_run)
+    return commands
+
+def test_video_streams_are_merged_without_reencoding(tmp_path):
+    inputs = [str(tmp_path / 'media.f137.mp4'), str(tmp_path / 'media.f251.webm')]
+
+    command, output = build_postprocess_command(_job(tmp_path, merge_output_format='mkv'), inputs)
+
+    assert command[-3:] == ['-c', 'copy', str(tmp_path / 'output.mkv')]
+    assert command.count('-i') == 2 and output.endswith('output.mkv')
+    assert build_postprocess_command(_job(tmp_path, merge_output_format='mp4'), inputs[:1]) == (None, inputs[0])
+
+def test_audio_is_only_encoded_when_the_codec_differs(tmp_path):
+    webm = [str(tmp_path / 'media.webm')]
+    m4a = [str(tmp_path / 'media.m4a')]
+
+    command, output = build_postprocess_command(_job(tmp_path, extract_audio=True, audio_format='best'), webm)
+    assert command[-3:] == ['-c:a', 'copy', output] and output.endswith('.opus')
+    command, output = build_postprocess_command(_job(tmp_path, extract_audio=True, audio_format='opus'), webm)
+    assert '-c:a' in command and 'copy' in command
+    assert build_postprocess_command(_job(tmp_path, extract_audio=True, audio_format='m4a'), m4a) == (None, m4a[0])
+    command, output = build_postprocess_command(_job(tmp_path, extract_audio=True, audio_format='mp3',
+                                                     audio_quality='160'), m4a)
+    assert command[command.index('-c:a') + 1:command.index('-c:a') + 4] == ['libmp3lame', '-b:a', '160k']
+    assert output.endswith('output.mp3')
+
+def test_audio_extraction_rejects_extra_streams(tmp_path):
+    for name in ('media.f140.m4a', 'media.f251.webm', 'media.f251.webm.part'):
+        (tmp_path / name).write_bytes(b'')
+
+    assert [os.path.basename(path) for path in staged_inputs(str(tmp_path), '140')] == ['media.f140.m4a']
+    with pytest.raises(PostprocessError, match='one stream'):
+        build_postprocess_command(_job(tmp_path, extract_audio=True, audio_format='best'), staged_inputs(str(tmp_path)))
+
+def test_pipeline_publishes_the_final_file(tmp_path, monkeypatch):
+    commands = _fake_ffmpeg(monkeypatch)
+    stage = tmp_path / 'stage'
+    stage.mkdir()
+    (stage / 'media.f137.mp4').write_bytes(b'video')
+    (stage / 'media.f140.m4a').write_bytes(b'audio')
+    (stage / 'media.f140.m4a.part').write_bytes(b'')
+    (stage / 'name').write_text(f"{tmp_path / 'out' / 'Title.%(ext)s'}\n", encoding='utf-8')
+    finished = []
+    pipeline = PostprocessPipeline(lambda job, result, error: finished.append((result.status, error)), workers=2)
+
+    assert len(staged_inputs(str(stage))) == 2
+    pipeline.submit(_job(stage, merge_output_format='mp4'), DownloadResult('http://example.com/a', 'staged'))
+    pipeline.close()
+
+    assert finished == [('staged', None)]
+    assert len(commands) == 1
+    assert (tmp_path / 'out' / 'Title.mp4').read_bytes() == b'video'
+    assert not stage.exists()
+
+def test_full_queue_blocks_submit(tmp_path, monkeypatch):
+    _fake_ffmpeg(monkeypatch)
+    release = threading.Event()
+    pipeline = PostprocessPipeline(lambda job, result, error: release.wait(5), workers=1, queue_size=1)
+    jobs = [_job(tmp_path / str(index), merge_output_format='mp4') for index in range(3)]
+    submitted = []
+
+    def feed():
+        for job in jobs:
+            pipeline.submit(job, DownloadResult(job.url, 'staged'))
+            submitted.append(job)
+
+    feeder = threading.Thread(target=feed)
+    feeder.start()
+    feeder.join(0.3)
+    assert len(submitted) == 2
+    release.set()
+    feeder.join(5)
+    pipeline.close()
+    assert len(submitted) == 3
+
+def test_unexpected_errors_are_reported_and_keep_the_workers_running(tmp_path, monkeypatch):
+    def publish(self, job):
+        if job.url.endswith('boom'):
+            raise RuntimeError('boom')
+        return job.url
+
+    monkeypatch.setattr(PostprocessPipeline, 'publish', publish)
+    finished = []
+
+    def on_finished(job, result, error):
+        finished.append((job.url, str(error) if error else None))
+        if job.url.endswith('hook') and error is None:
+            raise KeyError('hook')
+
+    pipeline = PostprocessPipeline(on_finished, workers=1, queue_size=1)
+    for name in ('boom', 'hook', 'ok'):
+        job = DownloadJob(url=f'http://example.com/{name}', output_template='unused', format_selector='best',
+                          stage_dir=str(tmp_path))
+        pipeline.submit(job, DownloadResult(job.url, 'staged'))
+    pipeline.close()
+
+    assert finished == [('http://example.com/boom', 'boom'), ('http://example.com/hook', None),
+                        ('http://example.com/hook', "'hook'"), ('http://example.com/ok', None)]
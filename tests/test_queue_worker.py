@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+from benchmarks.suite import MediaHandler, install_stubs
+from src.classes.download_scheduler import DownloadResult
+from src.classes.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue
+from src.classes.job_server import JobServer
+from src.classes.queue_worker import QueueWorker, RemoteQueue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Workers probe the local media server for connectivity instead of public DNS servers.
+BOOTSTRAP = ("import sys; from src.config import app_config; app_config.connectivity_targets = [sys.argv.pop(1)]; "
+             "from src.utils.cli import run_cli; sys.exit(run_cli(sys.argv[1:]))")
+
+class FakeDownloader:
+    def __init__(self, urls):
+        self.urls = urls
+
+    @classmethod
+    def from_options(cls, urls, **options):
+        return cls(list(urls))
+
+    def cancel(self):
+        pass
+
+    def download_video(self):
+        return [DownloadResult(url, 'done') for url in self.urls]
+
+@pytest.fixture
+def media_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+    MediaHandler.media_size, MediaHandler.fail_first = 16 * 1024, False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_worker_processes_share_a_queue_and_take_over_expired_leases(tmp_path, media_server):
+    host, port = media_server.server_address[:2]
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    install_stubs(str(bin_dir))
+    path = str(tmp_path / 'queue.sqlite3')
+    queue = JobQueue(path)
+    queue.enqueue([f'http://{host}:{port}/v/worker-{index}' for index in range(12)],
+                  {'mode': 'Audio only', 'audio_profile': 'best', 'download_folder': str(tmp_path / 'downloads')})
+    crashed = queue.claim(2, worker='crashed', lease=0.5)
+    env = {**os.environ, 'PATH': f"{bin_dir}{os.pathsep}{os.environ['PATH']}", 'FAKE_YTDLP_LATENCY': '0',
+           'XDG_DATA_HOME': str(tmp_path / 'data'), 'XDG_CACHE_HOME': str(tmp_path / 'cache')}
+
+    workers = [subprocess.Popen([sys.executable, '-c', BOOTSTRAP, f'{host}:{port}', 'worker', '--queue', path,
+                                 '--worker-id', f'worker-{index}', '--lease', '5', '--batch-size', '2',
+                                 '--poll-interval', '0.1', '--exit-when-empty', '--engine', 'subprocess'],
+                                cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+               for index in range(3)]
+    for worker in workers:
+        _, errors = worker.communicate(timeout=120)
+        assert worker.returncode == 0, errors
+
+    jobs = queue.jobs()
+    assert [job.state for job in jobs] == [DONE] * 12
+    assert {job.worker for job in jobs} <= {'worker-0', 'worker-1', 'worker-2'}
+    assert len([name for name in os.listdir(tmp_path / 'downloads') if not name.startswith('.')]) == 12
+    assert not queue.complete(crashed[0].id, FAILED, 'late', worker='crashed')
+    assert queue.get(crashed[0].id).state == DONE
+
+def test_worker_leases_jobs_from_a_job_server(tmp_path, monkeypatch):
+    monkeypatch.setattr('src.classes.video_downloader.VideoDownloader', FakeDownloader)
+    queue = JobQueue(str(tmp_path / 'queue.sqlite3'))
+    server = JobServer(queue, port=0, workers=0).start()
+    try:
+        queue.enqueue(['https://example.com/a', 'https://example.com/b', 'https://example.com/c'])
+        remote = RemoteQueue(f'http://127.0.0.1:{server.port}')
+        taken = remote.claim(1, worker='other', lease=30)
+
+        worker = QueueWorker(remote, worker_id='remote', lease=30, batch_size=2, poll_interval=0.05)
+        assert worker.run_once() is False
+        assert worker.run_once() is None
+        assert remote.counts() == {DONE: 2, RUNNING: 1}
+        assert not remote.complete(taken[0].id, DONE, worker='remote')
+        assert remote.complete(taken[0].id, QUEUED, worker='other')
+        assert not worker.run(until_empty=True)
+        assert [job.worker for job in queue.jobs()] == ['remote'] * 3
+        assert server.board.get(taken[0].id)['state'] == DONE
+    finally:
+        server.stop()
+        queue.close()
@@ -0,0 +1,87 @@
+import pytest
+from src.utils.rate_limit import BandwidthBudget, RateLimiter, TokenBucket, parse_rate
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def test_parse_rate_accepts_yt_dlp_suffixes():
+    assert parse_rate('500') == 500
+    assert parse_rate('500K') == 500 * 1024
+    assert parse_rate('1.5M') == int(1.5 * 1024 ** 2)
+    with pytest.raises(ValueError):
+        parse_rate('fast')
+
+def test_token_bucket_allows_burst_then_waits():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(0.5)
+
+def test_bandwidth_budget_is_split_across_active_jobs():
+    budget = BandwidthBudget(limit=900)
+    shares = {}
+    first = budget.join(lambda rate: shares.__setitem__('first', rate))
+    assert shares == {'first': 900}
+
+    second = budget.join(lambda rate: shares.__setitem__('second', rate))
+    budget.join(lambda rate: shares.__setitem__('third', rate))
+    assert shares == {'first': 300, 'second': 300, 'third': 300}
+
+    budget.leave(second)
+    assert shares['first'] == 450 and shares['third'] == 450
+    budget.leave(first)
+    assert shares['third'] == 900
+
+def test_jobs_with_a_fixed_rate_get_a_slot_of_the_budget():
+    budget = BandwidthBudget(limit=900)
+    shares = {}
+    fixed = budget.join(lambda rate: shares.__setitem__('fixed', rate), slots=3)
+    budget.join(lambda rate: shares.__setitem__('adjustable', rate))
+    assert shares == {'fixed': 300, 'adjustable': 600}
+    assert budget.share_of(fixed) == 300
+
+    budget.join(lambda rate: shares.__setitem__('other', rate))
+    assert shares == {'fixed': 300, 'adjustable': 300, 'other': 300}
+    budget.leave(fixed)
+    assert shares['adjustable'] == 450
+
+def test_rate_limiter_uses_one_bucket_per_host():
+    limiter = RateLimiter(max_bandwidth=1000, requests_per_second=1, burst=1)
+
+    assert limiter.host_bucket('a.example') is limiter.host_bucket('a.example')
+    assert limiter.host_bucket('a.example') is not limiter.host_bucket('b.example')
+    with limiter.job(lambda rate: None) as share:
+        assert share == 1000
+    assert RateLimiter().host_bucket('a.example') is None
+
+def test_rate_limited_host_is_paused_for_every_job():
+    clock = FakeClock()
+    limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+
+    assert limiter.back_off('https://a.example/1', lambda strikes: 2.0 ** strikes) == 2.0
+    assert limiter.back_off('https://a.example/2', lambda strikes: 2.0 ** strikes) == 4.0
+    assert limiter.host_pause('b.example') == 0
+    assert limiter.admit('https://a.example/3')
+    assert clock.now == 4.0
+
+    limiter.recovered('https://a.example/3')
+    assert limiter.back_off('https://a.example/4', lambda strikes: 2.0 ** strikes) == 2.0
+
+def test_admission_stops_waiting_when_the_wait_is_cancelled():
+    clock = FakeClock()
+    limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+    limiter.back_off('https://a.example/1', lambda strikes: 60.0)
+    waits = []
+
+    assert not limiter.admit('https://a.example/2', lambda seconds: waits.append(seconds) or True)
+    assert waits == [60.0] and clock.now == 0.0
@@ -0,0 +1,36 @@
+import pytest
+from src.utils.retry import PERMANENT, RATE_LIMITED, TRANSIENT, RetryPolicy, classify_error
+
+@pytest.mark.parametrize('message, expected', [
+    ("ERROR: [youtube] abc: Private video. Sign in if you've been granted access", PERMANENT),
+    ("ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader", PERMANENT),
+    ("ERROR: [youtube] abc: The uploader has not made this video available in your country", PERMANENT),
+    ("ERROR: Unsupported URL: https://example.com/page", PERMANENT),
+    ("ERROR: unable to download video data: HTTP Error 429: Too Many Requests", RATE_LIMITED),
+    ("ERROR: unable to download video data: HTTP Error 503: Service Unavailable", TRANSIENT),
+    ("ERROR: [download] Got error: Connection reset by peer", TRANSIENT),
+    ("ERROR: fragment 12 not found, unable to continue", TRANSIENT),
+    ("ERROR: Postprocessing: Conversion failed!", TRANSIENT),
+    ("ERROR: Unable to rename file: [Errno 2] No such file or directory: 'Video.f137.mp4.part' -> 'Video.f137.mp4'",
+     TRANSIENT),
+    ("FileNotFoundError: [Errno 2] No such file or directory: '/home/user/cookies.txt'", PERMANENT),
+    (None, TRANSIENT),
+])
+def test_classify_error(message, expected):
+    assert classify_error(message) == expected
+
+def test_retry_policy_backs_off_exponentially_with_jitter():
+    policy = RetryPolicy(retries=3, base_delay=2.0, max_delay=10.0, rng=lambda low, high: (low, high))
+
+    assert policy.delay(1) == (1.0, 2.0)
+    assert policy.delay(3) == (4.0, 8.0)
+    assert policy.delay(5) == (5.0, 10.0)
+    assert RetryPolicy(base_delay=0).delay(1) == 0.0
+
+def test_retry_policy_never_retries_permanent_failures():
+    policy = RetryPolicy(retries=2)
+
+    assert policy.should_retry(TRANSIENT, 1)
+    assert policy.should_retry(RATE_LIMITED, 2)
+    assert not policy.should_retry(TRANSIENT, 3)
+    assert not policy.should_retry(PERMANENT, 1)
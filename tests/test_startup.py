@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLD_START_BUDGET_MS = float(os.environ.get('STREAMFLOW_COLD_START_BUDGET_MS', '100'))
+INTERACTIVE_STACK = {'inquirer', 'blessed', 'readchar', 'art'}
+
+def _import_times(*args):
+    """Run Python with ``-X importtime`` and return ``{module: (self_us, cumulative_us)}``."""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=ROOT,
+                               capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+def test_cli_help_skips_interactive_and_download_stack():
+    modules = _import_times('main.py', 'download', '--help')
+
+    assert not INTERACTIVE_STACK & set(modules)
+    assert not {'pydantic', 'yt_dlp', 'src.config', 'src.classes.video_downloader'} & set(modules)
+
+def test_library_import_skips_interactive_stack():
+    modules = _import_times('-c', 'import src.classes.download_engine, src.classes.video_downloader')
+
+    assert 'src.classes.video_downloader' in modules
+    assert not INTERACTIVE_STACK & set(modules)
+
+def test_cli_help_stays_within_cold_start_budget():
+    modules = _import_times('main.py', 'download', '--help')
+    total_ms = sum(own for own, _ in modules.values()) / 1000
+
+    assert total_ms < COLD_START_BUDGET_MS, (
+        f"imports of 'main.py download --help' took {total_ms:.1f} ms, budget {COLD_START_BUDGET_MS} ms")
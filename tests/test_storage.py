@@ -0,0 +1,51 @@
+import errno
+import os
+import pytest
+from src.utils import storage
+from src.utils.storage import InsufficientSpace, SpaceLedger, publish_file
+
+def _ledger(free):
+    return SpaceLedger(poll_interval=0.01, usage=lambda path: (free, 0, free))
+
+def test_reservations_share_the_free_space_of_a_file_system(tmp_path):
+    ledger = _ledger(1000)
+    staging, final = tmp_path / 'staging', tmp_path / 'final'
+
+    first = ledger.reserve({str(staging): 400, str(final): 200})
+    waits = []
+    second = ledger.reserve({str(staging): 500}, wait=lambda delay: waits.append(delay) or True)
+
+    assert first is not None and ledger.reserved(str(tmp_path)) == 600
+    assert second is None and waits == [0.01]
+    ledger.release(first)
+    assert ledger.reserve({str(staging): 500}) is not None
+
+def test_job_that_cannot_fit_fails_without_waiting(tmp_path):
+    ledger = _ledger(1000)
+
+    with pytest.raises(InsufficientSpace) as error:
+        ledger.reserve({str(tmp_path): 950}, margin=100, wait=lambda delay: pytest.fail("waited"))
+
+    assert error.value.errno == errno.ENOSPC and error.value.needed == 1050
+    assert 'No space left on device' in str(error.value)
+
+def test_publish_copies_across_file_systems(tmp_path, monkeypatch):
+    source = tmp_path / 'stage' / 'Clip.mp4'
+    source.parent.mkdir()
+    source.write_bytes(b'video')
+    target = tmp_path / 'videos' / 'Clip.mp4'
+    real_replace = os.replace
+    attempts = []
+
+    def cross_device_replace(src, dst):
+        attempts.append(src)
+        if src == str(source):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        real_replace(src, dst)
+
+    monkeypatch.setattr(storage.os, 'replace', cross_device_replace)
+    publish_file(str(source), str(target))
+
+    assert target.read_bytes() == b'video' and not source.exists()
+    assert attempts[1].endswith('.Clip.mp4.streamflow-part')
+    assert os.listdir(target.parent) == ['Clip.mp4']
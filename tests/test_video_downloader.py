@@ -1,10 +1,17 @@
+import json
 import os
+import subprocess
 import pytest
 from unittest.mock import MagicMock
 from src.classes.video_downloader import VideoDownloader
+from src.decorators.connected import ConnectivityMonitor
+from src.classes.metadata_cache import MetadataCache
+from src.decorators.ffmpeg import Toolchain
+from src.utils.link_reader import LinkStream
+from src.utils.rate_limit import RateLimiter
 
 @pytest.fixture
-def downloader_environment(monkeypatch):
+def downloader_environment(monkeypatch, tmp_path):
     """Prepare the VideoDownloader environment without real prompts or subprocess calls."""
     calls = []
 
@@ -12,11 +19,16 @@ def downloader_environment(monkeypatch):
         calls.append(args)
         return MagicMock(returncode=0)
 
-    monkeypatch.setattr('src.classes.video_downloader.subprocess.run', fake_run)
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
     monkeypatch.setattr('src.decorators.ffmpeg.subprocess.run', fake_run)
     monkeypatch.setattr('src.decorators.connected.is_connected', lambda *a, **k: True)
-    monkeypatch.setattr('src.classes.video_downloader.is_connected', lambda *a, **k: True)
+    monkeypatch.setattr('src.decorators.connected._monitor', ConnectivityMonitor(probe=lambda: True))
     monkeypatch.setattr('src.classes.video_downloader.VideoDownloader.verify_download_folder', lambda self: None)
+    monkeypatch.setattr('src.classes.video_downloader.app_config.download_engine', 'subprocess')
+    monkeypatch.setattr('src.classes.video_downloader.app_config.metadata_cache_dir', str(tmp_path / 'metadata'))
+    monkeypatch.setattr('src.classes.video_downloader.app_config.archive_path', str(tmp_path / 'archive.sqlite3'))
+    monkeypatch.setattr('src.classes.video_downloader.app_config.retry_base_delay', 0.0)
+    monkeypatch.setattr('src.utils.rate_limit._limiter', RateLimiter())
     return calls
 
 def _get_downloader(tmp_path, mode='Video', custom_filename='test', urls=None, output_format='Mp4'):
@@ -62,7 +74,8 @@ def test_custom_filename_audio(tmp_path, downloader_environment):
     assert '--audio-quality' in cmd
     assert '--no-playlist' in cmd
 
-def test_playlist_download_uses_playlist_folder(tmp_path, downloader_environment):
+def test_playlist_download_uses_playlist_folder(tmp_path, monkeypatch, downloader_environment):
+    monkeypatch.setattr('src.classes.video_downloader.app_config.playlist_fanout', False)
     playlist_url = 'http://example.com/watch?v=1&list=PL123'
     playlist_folder = tmp_path / 'playlist'
 
@@ -109,3 +122,436 @@ def test_sanitize_filename(monkeypatch):
     for ch in '<>:"/\\|?*':
         assert ch not in clean
     assert clean == 'inva_________name'
+
+def test_download_video_returns_per_url_results(tmp_path, downloader_environment):
+    d = _get_downloader(tmp_path, custom_filename=None,
+                        urls=['http://example.com/a', 'http://example.com/b', 'http://example.com/c'])
+    results = d.download_video(jobs=2)
+
+    assert [r.url for r in results] == ['http://example.com/a', 'http://example.com/b', 'http://example.com/c']
+    assert all(r.success for r in results)
+    assert len([c for c in downloader_environment if c[0] == 'yt-dlp']) == 3
+
+def test_download_video_reports_failed_url(tmp_path, monkeypatch, downloader_environment):
+    def failing_run(args, **kwargs):
+        if args[0] == 'yt-dlp' and 'http://example.com/bad' in args:
+            raise subprocess.CalledProcessError(1, args)
+        return MagicMock(returncode=0, stdout='')
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', failing_run)
+    d = _get_downloader(tmp_path, custom_filename=None, urls=['http://example.com/ok', 'http://example.com/bad'])
+    results = d.download_video(jobs=2)
+
+    assert [r.status for r in results] == ['done', 'failed']
+
+def test_from_options_never_prompts(monkeypatch, tmp_path):
+    def fail_prompt(*args, **kwargs):
+        raise AssertionError('prompted')
+
+    monkeypatch.setattr('src.classes.video_downloader.inquirer.prompt', fail_prompt)
+    folder = tmp_path / 'headless'
+
+    d = VideoDownloader.from_options(['http://example.com/watch?v=1&list=PL1'], mode='Video',
+                                     quality='High (720p)', output_format='Mkv',
+                                     download_folder=str(folder), playlist_folder='pl')
+
+    assert folder.exists()
+    assert d.is_playlist is True
+    assert d.playlist_folder == os.path.join(str(folder), 'pl')
+    assert d.quality == 'High (720p)'
+
+def test_from_options_rejects_unknown_quality(tmp_path):
+    with pytest.raises(ValueError):
+        VideoDownloader.from_options(['http://example.com/a'], quality='8K', download_folder=str(tmp_path))
+
+def test_archived_media_is_skipped_before_spawning(tmp_path, monkeypatch, downloader_environment):
+    monkeypatch.setattr('src.classes.video_downloader.app_config.archive_path', str(tmp_path / 'archive.sqlite3'))
+    monkeypatch.setattr('src.classes.video_downloader.app_config.use_download_archive', True)
+    urls = ['https://youtu.be/dQw4w9WgXcQ']
+
+    first = _get_downloader(tmp_path, custom_filename=None, urls=urls).download_video()
+    second = _get_downloader(tmp_path, custom_filename=None, urls=urls).download_video()
+
+    assert [r.status for r in first] == ['done']
+    assert [r.status for r in second] == ['skipped']
+    assert len([c for c in downloader_environment if c[0] == 'yt-dlp']) == 1
+
+def test_archive_only_skips_media_downloaded_as_the_same_output(tmp_path, monkeypatch, downloader_environment):
+    monkeypatch.setattr('src.classes.video_downloader.app_config.archive_path', str(tmp_path / 'archive.sqlite3'))
+    monkeypatch.setattr('src.classes.video_downloader.app_config.use_download_archive', True)
+    urls = ['https://youtu.be/dQw4w9WgXcQ']
+
+    video = _get_downloader(tmp_path, custom_filename=None, urls=urls).download_video()
+    audio = VideoDownloader.from_options(urls, mode='Audio only', download_folder=str(tmp_path)).download_video()
+    elsewhere = VideoDownloader.from_options(urls, download_folder=str(tmp_path / 'other')).download_video()
+
+    assert [r.status for r in video + audio + elsewhere] == ['done', 'done', 'done']
+    assert len([c for c in downloader_environment if c[0] == 'yt-dlp']) == 3
+
+def test_download_fails_fast_when_output_format_is_unsupported(tmp_path, monkeypatch, downloader_environment):
+    toolchain = Toolchain('7.1')
+    toolchain._listings = {'muxers': frozenset({'mp4'}), 'encoders': frozenset()}
+    monkeypatch.setattr('src.classes.video_downloader.get_toolchain', lambda: toolchain)
+
+    d = _get_downloader(tmp_path, custom_filename=None, output_format='Mkv')
+
+    assert d.download_video() is None
+    assert not [c for c in downloader_environment if c[0] == 'yt-dlp']
+
+def test_audio_profiles_select_matching_sources(tmp_path, downloader_environment):
+    passthrough = VideoDownloader.from_options(['http://example.com/a'], mode='Audio only',
+                                               download_folder=str(tmp_path), audio_profile='best')
+    opus = VideoDownloader.from_options(['http://example.com/a'], mode='Audio only',
+                                        download_folder=str(tmp_path), audio_profile='opus', audio_bitrate='96')
+
+    cmd = passthrough._build_command('http://example.com/a')
+    assert cmd[cmd.index('--audio-format') + 1] == 'best'
+    assert cmd[cmd.index('-f') + 1] == 'bestaudio/best'
+    cmd = opus._build_command('http://example.com/a')
+    assert cmd[cmd.index('-f') + 1].startswith('bestaudio[acodec=opus]')
+    assert cmd[cmd.index('--audio-format') + 1] == 'opus'
+    assert cmd[cmd.index('--audio-quality') + 1] == '96'
+
+    with pytest.raises(ValueError):
+        VideoDownloader.from_options(['http://example.com/a'], mode='Audio only', audio_profile='wma')
+
+def test_passthrough_audio_needs_no_encoder(tmp_path, monkeypatch, downloader_environment):
+    toolchain = Toolchain('7.1')
+    toolchain._listings = {'muxers': frozenset(), 'encoders': frozenset({'aac'})}
+    monkeypatch.setattr('src.classes.video_downloader.get_toolchain', lambda: toolchain)
+
+    def downloader(profile):
+        return VideoDownloader.from_options(['http://example.com/a'], mode='Audio only',
+                                            download_folder=str(tmp_path), audio_profile=profile)
+
+    assert downloader('best').check_toolchain() == []
+    assert downloader('aac').check_toolchain() == []
+    assert 'libmp3lame' in downloader('mp3').check_toolchain()[0]
+
+def test_interrupted_batch_resumes_where_it_stopped(tmp_path, monkeypatch, downloader_environment):
+    links = tmp_path / 'links.txt'
+    links.write_text('http://example.com/1\nhttp://example.com/2\nhttp://example.com/3\n', encoding='utf-8')
+
+    def interrupted_run(args, **kwargs):
+        if args[0] == 'yt-dlp' and 'http://example.com/2' in args:
+            raise KeyboardInterrupt()
+        downloader_environment.append(args)
+        return MagicMock(returncode=0, stdout='')
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', interrupted_run)
+    urls = ['http://example.com/1', 'http://example.com/2', 'http://example.com/3']
+    d = VideoDownloader.from_options(urls, download_folder=str(tmp_path),
+                                     quality='High (720p)', output_format='Mkv', jobs=1)
+    d.source_file = str(links)
+    interrupted = d.download_video()
+    assert [r.status for r in interrupted] == ['done', 'cancelled']
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run',
+                        lambda args, **kwargs: downloader_environment.append(args) or MagicMock(returncode=0))
+    resumed = VideoDownloader.from_journal(str(tmp_path), jobs=1)
+
+    assert resumed.urls == ['http://example.com/2', 'http://example.com/3']
+    assert resumed.quality == 'High (720p)'
+    assert resumed.output_format == 'Mkv'
+    results = resumed.download_video()
+    assert [r.status for r in results] == ['done', 'done']
+    assert VideoDownloader.from_journal(str(tmp_path)) is None
+
+def test_failed_urls_are_only_resumed_when_retrying(tmp_path, monkeypatch, downloader_environment):
+    def failing_run(args, **kwargs):
+        if args[0] == 'yt-dlp' and 'http://example.com/2' in args:
+            raise subprocess.CalledProcessError(1, args, stderr='ERROR: HTTP Error 404: Not Found')
+        downloader_environment.append(args)
+        return MagicMock(returncode=0, stdout='')
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', failing_run)
+    urls = ['http://example.com/1', 'http://example.com/2']
+    results = VideoDownloader.from_options(urls, download_folder=str(tmp_path), jobs=1).download_video()
+    assert [r.status for r in results] == ['done', 'failed']
+
+    assert VideoDownloader.from_journal(str(tmp_path)) is None
+    assert VideoDownloader.from_journal(str(tmp_path), retry_failed=True).urls == ['http://example.com/2']
+
+def test_cached_info_is_used_instead_of_extracting(tmp_path, monkeypatch, downloader_environment):
+    cache = MetadataCache(str(tmp_path / 'metadata'))
+    info_path = cache.put({'extractor': 'youtube', 'id': 'dQw4w9WgXcQ', 'title': 'Cached title',
+                           'duration': 212, 'filesize_approx': 10 * 1024 * 1024})
+    d = _get_downloader(tmp_path, custom_filename=None, urls=['https://youtu.be/dQw4w9WgXcQ'])
+
+    d.download_video()
+    cmd = _extract_yt_dlp_command(downloader_environment)
+    assert cmd[cmd.index('--load-info-json') + 1] == info_path
+    assert 'https://youtu.be/dQw4w9WgXcQ' not in cmd
+
+    printed = []
+    monkeypatch.setattr('builtins.print', printed.append)
+    monkeypatch.setattr('src.classes.video_downloader.inquirer.prompt', lambda *args, **kwargs: {'confirm': True})
+    d.confirm_options()
+    assert 'Cached title (3:32, ~10.0 MB)' in printed[0]
+
+def test_playlist_is_split_into_concurrent_entry_jobs(tmp_path, monkeypatch, downloader_environment):
+    playlist = {'entries': [{'url': f'https://www.youtube.com/watch?v=video{i}aaaa', 'title': f'Video {i}'}
+                            for i in range(1, 4)]}
+    attempts = []
+
+    def fake_run(args, **kwargs):
+        if args[0] != 'yt-dlp':
+            return MagicMock(returncode=0, stdout='')
+        if '--flat-playlist' in args:
+            return MagicMock(returncode=0, stdout=json.dumps(playlist))
+        attempts.append(args)
+        if 'https://www.youtube.com/watch?v=video2aaaa' in args and sum(1 for cmd in attempts if args == cmd) == 1:
+            raise subprocess.CalledProcessError(1, args)
+        return MagicMock(returncode=0, stdout='')
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
+    d = VideoDownloader.from_options(['https://www.youtube.com/playlist?list=PL123'], download_folder=str(tmp_path),
+                                     playlist_folder='playlist', jobs=3)
+
+    results = d.download_video()
+
+    assert [r.url for r in results] == [entry['url'] for entry in playlist['entries']]
+    assert [r.status for r in results] == ['done', 'done', 'done']
+    templates = sorted(cmd[cmd.index('-o') + 1] for cmd in attempts)
+    assert templates[0] == os.path.join(str(tmp_path), 'playlist', '01 - %(title)s.%(ext)s')
+    assert all('--no-playlist' in cmd for cmd in attempts)
+    assert len(attempts) == 4
+    assert d.playlist_results(results) == {'https://www.youtube.com/playlist?list=PL123': results}
+
+def test_bandwidth_cap_is_passed_to_yt_dlp(tmp_path, monkeypatch, downloader_environment):
+    monkeypatch.setattr('src.utils.rate_limit._limiter', RateLimiter(max_bandwidth=4096))
+    monkeypatch.setattr('src.classes.video_downloader.app_config.max_concurrent_downloads', 2)
+    d = _get_downloader(tmp_path, custom_filename=None)
+
+    d.download_video()
+
+    cmd = _extract_yt_dlp_command(downloader_environment)
+    assert cmd[cmd.index('--limit-rate') + 1] == '2048'
+
+def test_transfer_profile_skips_missing_external_downloader(tmp_path, monkeypatch, downloader_environment):
+    toolchain = Toolchain('7.1')
+    toolchain._programs = {'aria2c': False}
+    monkeypatch.setattr('src.classes.video_downloader.get_toolchain', lambda: toolchain)
+    d = VideoDownloader.from_options(['http://example.com/a'], download_folder=str(tmp_path),
+                                     transfer_profile='aria2c')
+
+    job = d._build_job('http://example.com/a')
+    assert job.concurrent_fragments == 8
+    assert job.external_downloader is None
+
+    toolchain._programs['aria2c'] = True
+    assert d._build_job('http://example.com/a').external_downloader == 'aria2c'
+    with pytest.raises(ValueError):
+        VideoDownloader.from_options(['http://example.com/a'], download_folder=str(tmp_path),
+                                     transfer_profile='warp')
+
+def test_download_video_emits_job_and_batch_events(tmp_path, monkeypatch, downloader_environment):
+    log = tmp_path / 'events.jsonl'
+    monkeypatch.setattr('src.classes.video_downloader.app_config.event_log_path', str(log))
+    d = _get_downloader(tmp_path, urls=['http://example.com/a', 'http://example.com/b'], custom_filename=None)
+    d.download_video()
+
+    events = [json.loads(line) for line in log.read_text(encoding='utf-8').splitlines()]
+    by_url = {}
+    for event in events[:-1]:
+        by_url.setdefault(event['url'], []).append(event['event'])
+    assert by_url == {'http://example.com/a': ['queued', 'started', 'finished'],
+                      'http://example.com/b': ['queued', 'started', 'finished']}
+    assert events[-1]['event'] == 'batch'
+    assert events[-1]['counts'] == {'done': 2}
+
+def test_download_video_writes_metrics_snapshot(tmp_path, monkeypatch, downloader_environment):
+    snapshot = tmp_path / 'metrics.json'
+    monkeypatch.setattr('src.classes.video_downloader.app_config.metrics_snapshot_path', str(snapshot))
+    monkeypatch.setattr('src.utils.metrics._exporter', None)
+    d = _get_downloader(tmp_path, urls=['http://example.com/a'], custom_filename=None)
+    d.download_video()
+
+    metrics = json.loads(snapshot.read_text(encoding='utf-8'))['metrics']
+    finished = [sample for sample in metrics['streamflow_downloads_total']['samples']
+                if sample['labels'] == {'status': 'finished'}]
+    assert finished and finished[0]['value'] >= 1
+    assert metrics['streamflow_active_workers']['samples'][0]['value'] == 0
+
+def _failing_yt_dlp(stderr_by_attempt):
+    """Fake ``subprocess.run`` whose yt-dlp calls fail with the given stderr, then succeed."""
+    attempts = []
+
+    def fake_run(args, **kwargs):
+        if args[0] != 'yt-dlp':
+            return MagicMock(returncode=0, stdout='')
+        attempts.append(args)
+        if len(attempts) <= len(stderr_by_attempt):
+            raise subprocess.CalledProcessError(1, args, stderr=stderr_by_attempt[len(attempts) - 1])
+        return MagicMock(returncode=0, stdout='', stderr='')
+
+    return fake_run, attempts
+
+def test_transient_failures_are_retried(tmp_path, monkeypatch, downloader_environment):
+    fake_run, attempts = _failing_yt_dlp(["ERROR: HTTP Error 503: Service Unavailable",
+                                          "ERROR: [download] Got error: Connection reset by peer"])
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
+    d = _get_downloader(tmp_path, custom_filename=None, urls=['http://example.com/a'])
+
+    result, = d.download_video()
+
+    assert result.status == 'done' and result.attempts == 3
+    assert len(attempts) == 3
+
+def test_permanent_failures_are_not_retried(tmp_path, monkeypatch, downloader_environment):
+    fake_run, attempts = _failing_yt_dlp(["ERROR: [youtube] abc: Private video"])
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
+    d = _get_downloader(tmp_path, custom_filename=None, urls=['http://example.com/a'])
+
+    result, = d.download_video()
+
+    assert result.status == 'failed' and result.failure == 'permanent'
+    assert len(attempts) == 1
+
+def test_rate_limit_pauses_the_host_through_the_shared_limiter(tmp_path, monkeypatch, downloader_environment):
+    now, slept = [0.0], []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(clock=lambda: now[0], sleep=sleep)
+    monkeypatch.setattr('src.utils.rate_limit._limiter', limiter)
+    monkeypatch.setattr('src.classes.video_downloader.app_config.retry_base_delay', 30.0)
+    fake_run, attempts = _failing_yt_dlp(["ERROR: HTTP Error 429: Too Many Requests"])
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
+    d = _get_downloader(tmp_path, custom_filename=None, urls=['http://example.com/a'])
+    d._wait = lambda seconds: sleep(seconds) or False
+
+    result, = d.download_video()
+
+    assert result.status == 'done' and len(attempts) == 2
+    assert slept and 15.0 <= slept[0] <= 30.0
+
+def test_staged_postprocessing_publishes_merged_files(tmp_path, monkeypatch, downloader_environment):
+    monkeypatch.setattr('src.classes.video_downloader.app_config.staged_postprocessing', True)
+    monkeypatch.setattr('src.classes.video_downloader.app_config.use_download_archive', False)
+    ffmpeg_calls = []
+
+    def staged_run(args, **kwargs):
+        if args[0] == 'yt-dlp' and '-j' in args:
+            return MagicMock(returncode=0, stdout=json.dumps({'format_id': '137+140', 'formats': [],
+                                                              'requested_formats': [{'format_id': '137'},
+                                                                                    {'format_id': '140'}]}))
+        if args[0] == 'yt-dlp':
+            stage = os.path.dirname(args[args.index('--load-info-json') + 1])
+            assert args[args.index('-f') + 1] == '137,140'
+            assert '--merge-output-format' not in args and '--ffmpeg-location' not in args
+            for name in ('media.f137.mp4', 'media.f140.m4a', 'media.f136.mp4'):
+                with open(os.path.join(stage, name), 'w', encoding='utf-8') as f:
+                    f.write(name)
+            name_template = args[args.index('--print-to-file') + 1].split(':', 1)[1]
+            with open(args[args.index('--print-to-file') + 2], 'a', encoding='utf-8') as f:
+                f.write(name_template.replace('%(title)S', 'Clip').replace('%%', '%') + '\n')
+        elif args[0] == 'ffmpeg' and '-i' in args:
+            ffmpeg_calls.append(args)
+            with open(args[-1], 'w', encoding='utf-8') as f:
+                f.write('merged')
+        return MagicMock(returncode=0, stdout='')
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', staged_run)
+    events = []
+    d = VideoDownloader.from_options(['http://example.com/1'], download_folder=str(tmp_path), jobs=1)
+    d.events.subscribe(events.append)
+
+    results = d.download_video()
+
+    assert [r.status for r in results] == ['done']
+    assert (tmp_path / 'Clip.mp4').read_text(encoding='utf-8') == 'merged'
+    assert len(ffmpeg_calls) == 1 and ffmpeg_calls[0].count('-i') == 2
+    assert not os.listdir(tmp_path / '.streamflow-staging')
+    assert [e['event'] for e in events if e['event'] in ('postprocessing', 'finished')] == \
+        ['postprocessing', 'postprocessing', 'finished']
+
+def test_media_store_links_repeated_downloads(tmp_path, monkeypatch, downloader_environment):
+    monkeypatch.setattr('src.classes.video_downloader.app_config.use_download_archive', False)
+    monkeypatch.setattr('src.classes.video_downloader.app_config.use_media_store', True)
+    monkeypatch.setattr('src.classes.video_downloader.app_config.media_store_dir', str(tmp_path / 'store'))
+    spawned = []
+
+    def fake_run(args, **kwargs):
+        if args[0] == 'yt-dlp':
+            spawned.append(args)
+            path = args[args.index('-o') + 1].replace('%(title)s', 'Clip').replace('%(ext)s', 'mp4')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('video')
+            with open(args[args.index('--print-to-file') + 2], 'a', encoding='utf-8') as f:
+                f.write(path + '\n')
+        return MagicMock(returncode=0, stdout='')
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
+    urls = ['https://youtu.be/dQw4w9WgXcQ']
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+
+    first, = VideoDownloader.from_options(urls, download_folder=str(tmp_path / 'a'), jobs=1).download_video()
+    second, = VideoDownloader.from_options(urls, download_folder=str(tmp_path / 'b'), jobs=1).download_video()
+
+    assert first.status == second.status == 'done'
+    assert first.path == str(tmp_path / 'a' / 'Clip.mp4')
+    assert second.path == str(tmp_path / 'b' / 'Clip.mp4')
+    assert os.path.samefile(first.path, second.path)
+    assert len(spawned) == 1
+
+def test_staging_folder_downloads_there_and_moves_finished_files(tmp_path, monkeypatch, downloader_environment):
+    monkeypatch.setattr('src.classes.video_downloader.app_config.use_download_archive', False)
+    monkeypatch.setattr('src.classes.video_downloader.app_config.staging_folder', str(tmp_path / 'ssd'))
+    templates = []
+
+    def fake_run(args, **kwargs):
+        if args[0] == 'yt-dlp':
+            templates.append(args[args.index('-o') + 1])
+            path = templates[-1].replace('%(title)s', 'Clip').replace('%(ext)s', 'mp4')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('video')
+            with open(args[args.index('--print-to-file') + 2], 'a', encoding='utf-8') as f:
+                f.write(path + '\n')
+        return MagicMock(returncode=0, stdout='')
+
+    monkeypatch.setattr('src.classes.download_engine.subprocess.run', fake_run)
+    (tmp_path / 'videos').mkdir()
+
+    result, = VideoDownloader.from_options(['http://example.com/1'], download_folder=str(tmp_path / 'videos'),
+                                           jobs=1).download_video()
+
+    assert result.status == 'done' and result.path == str(tmp_path / 'videos' / 'Clip.mp4')
+    assert templates[0].startswith(str(tmp_path / 'ssd'))
+    assert (tmp_path / 'videos' / 'Clip.mp4').read_text(encoding='utf-8') == 'video'
+    assert not os.listdir(tmp_path / 'ssd')
+
+def test_job_larger_than_free_space_fails_before_spawning(tmp_path, monkeypatch, downloader_environment):
+    from src.utils.storage import SpaceLedger
+    monkeypatch.setattr('src.classes.video_downloader.app_config.use_download_archive', False)
+    monkeypatch.setattr('src.classes.video_downloader.get_space_ledger',
+                        lambda: SpaceLedger(usage=lambda path: (0, 0, 3 * 1024 ** 3)))
+    MetadataCache(str(tmp_path / 'metadata')).put({'extractor': 'youtube', 'id': 'dQw4w9WgXcQ', 'title': 'Big',
+                                                   'filesize': 2 * 1024 ** 3})
+
+    result, = _get_downloader(tmp_path, urls=['https://youtu.be/dQw4w9WgXcQ']).download_video()
+
+    assert result.status == 'failed' and 'No space left on device' in result.error
+    assert result.failure == 'permanent' and result.attempts == 1
+    assert not [c for c in downloader_environment if c[0] == 'yt-dlp']
+
+def test_shortest_policy_downloads_small_videos_first(tmp_path, monkeypatch, downloader_environment):
+    monkeypatch.setattr('src.classes.video_downloader.app_config.use_download_archive', False)
+    monkeypatch.setattr('src.classes.video_downloader.app_config.schedule_policy', 'shortest')
+    cache = MetadataCache(str(tmp_path / 'metadata'))
+    cache.put({'extractor': 'youtube', 'id': 'longvideo01', 'title': 'Stream', 'duration': 4 * 3600})
+    cache.put({'extractor': 'youtube', 'id': 'shortclip01', 'title': 'Clip', 'filesize': 5 * 1024 ** 2})
+    urls = ['https://youtu.be/longvideo01', 'https://youtu.be/shortclip01', 'http://example.com/other priority=1']
+    d = _get_downloader(tmp_path, custom_filename=None, urls=LinkStream(lines=urls))
+    d.jobs = 1
+
+    results = d.download_video()
+
+    started = [next(arg for arg in c if 'longvideo01' in arg or 'shortclip01' in arg or 'other' in arg)
+               for c in downloader_environment if c[0] == 'yt-dlp']
+    assert [r.status for r in results] == ['done'] * 3
+    assert ['other' in s for s in started] == [True, False, False]
+    assert 'shortclip01' in started[1] and 'longvideo01' in started[2]